@@ -38,7 +38,7 @@ def extract_timing(text):
         output['build'] = float(build_matches[0].split(' ')[-1])
 
     load_matches = re.findall(
-        'Loading network from file took \d+\.\d+', text)
+        'Loading network from (?:file|memory) took \d+\.\d+', text)
     if load_matches:
         assert len(load_matches) == 1
         output['load'] = float(load_matches[0].split(' ')[-1])
@@ -0,0 +1,163 @@
+""" Benchmark how the finalize pass of the build scales with network size.
+
+Creates synthetic models with a given number of operators, spread evenly
+over a number of components, and times ``MpiModel.order_operators``, which
+orders the operators on all components and inserts the MpiSend and MpiRecv
+operators. Each component is a set of chains of operators mimicking
+ensembles connected in series, and the output of the last ensemble in each
+chain is sent, without a synapse, to the first ensemble of a chain on the
+next component.
+
+For each size, reports the time taken, the time per operator, and the time
+per operator relative to the smallest size; near-linear scaling shows up as
+a roughly constant time per operator. With ``--compare``, the global
+dependency graph and toposort used by the reference simulator are also
+timed on the same operators.
+
+Peak memory use is about 1.8 GB per million operators, so the default
+largest size of 10 million operators needs about 18 GB; use ``--sizes`` to
+benchmark smaller models.
+
+Example:
+
+    python build_scaling.py --sizes 10000 100000 1000000 --components 16
+
+"""
+from __future__ import print_function
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from nengo.builder import Signal
+from nengo.builder.operator import Copy, DotInc, Reset
+from nengo.utils.graphs import toposort
+from nengo.utils.simulator import operator_depencency_graph
+
+from nengo_mpi.model import MpiModel
+
+OPS_PER_ENSEMBLE = 5
+
+
+def add_ensemble(model, component, x, d, n):
+    """ Add the ops for an ensemble with input ``x``; return its output. """
+    J = Signal(np.zeros(n), name='J')
+    activities = Signal(np.zeros(n), name='activities')
+    y = Signal(np.zeros(d), name='y')
+
+    ops = [
+        Reset(J),
+        DotInc(Signal(np.ones((n, d)), name='encoders'), x, J),
+        Copy(J, activities),
+        Reset(y),
+        DotInc(Signal(np.ones((d, n)), name='decoders'), activities, y)]
+
+    model.assign_ops(component, ops)
+    return y
+
+
+def make_model(n_ops, n_components, chain_length, d, n):
+    """ Create an MpiModel with about ``n_ops`` operators. """
+    fd, save_file = tempfile.mkstemp(suffix='.net')
+    os.close(fd)
+    os.remove(save_file)
+
+    model = MpiModel(n_components, {}, save_file=save_file)
+
+    n_ensembles = max(n_ops // OPS_PER_ENSEMBLE, n_components)
+    n_chains = max(n_ensembles // (chain_length * n_components), 1)
+    tag = 0
+
+    outputs = []
+    for component in range(n_components):
+        for i in range(n_chains):
+            x = Signal(np.zeros(d), name='x')
+
+            if component > 0:
+                # The input to the chain is copied from the output of a
+                # chain on the previous component, then sent over.
+                src = component - 1
+                model.assign_ops(src, [Copy(outputs[i], x)])
+                model.send_signals[src].append((x, tag, component))
+                model.recv_signals[component].append((x, tag, src, False))
+                tag += 1
+
+            y = x
+            for j in range(chain_length):
+                y = add_ensemble(model, component, y, d, n)
+
+            if component > 0:
+                outputs[i] = y
+            else:
+                outputs.append(y)
+
+    return model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the scaling of the finalize pass.")
+
+    parser.add_argument(
+        '--sizes', nargs='+', type=int,
+        default=[10000, 100000, 1000000, 10000000],
+        help="Numbers of operators to benchmark.")
+
+    parser.add_argument(
+        '--components', type=int, default=16,
+        help="Number of components to spread the operators over.")
+
+    parser.add_argument(
+        '--chain-length', type=int, default=10, dest='chain_length',
+        help="Number of ensembles in each chain.")
+
+    parser.add_argument(
+        '-d', type=int, default=2,
+        help="Number of dimensions of each ensemble.")
+
+    parser.add_argument(
+        '-n', type=int, default=20,
+        help="Number of neurons in each ensemble.")
+
+    parser.add_argument(
+        '--compare', action='store_true',
+        help="Also time a global dependency graph and toposort.")
+
+    args = parser.parse_args()
+
+    base = None
+    print("%12s %12s %14s %10s" % ("ops", "seconds", "us per op", "relative"))
+
+    for size in args.sizes:
+        model = make_model(
+            size, args.components, args.chain_length, args.d, args.n)
+
+        n_ops = sum(len(ops) for ops in model.component_ops.values())
+
+        if args.compare:
+            all_ops = [
+                op for component in range(args.components)
+                for op in model.component_ops[component]]
+
+            then = time.time()
+            toposort(operator_depencency_graph(all_ops))
+            global_time = time.time() - then
+
+        then = time.time()
+        model.order_operators()
+        elapsed = time.time() - then
+
+        per_op = elapsed / n_ops
+        if base is None:
+            base = per_op
+
+        print("%12d %12.3f %14.3f %10.2f" % (
+            n_ops, elapsed, 1e6 * per_op, per_op / base))
+
+        if args.compare:
+            print("%12s %12.3f %14.3f" % (
+                "global", global_time, 1e6 * global_time / n_ops))
+
+        del model
@@ -0,0 +1,104 @@
+""" Benchmark the peak memory used by the finalize pass of the build.
+
+Creates a synthetic model with a given number of operators (see
+build_scaling.py), then finalizes it, writing it to a network file. Reports
+the resident memory of the process once the model has been created, the
+peak resident memory reached while finalizing it, and the resident memory
+once it has been finalized. Since the peak resident memory of a process
+can only grow, each size has to be measured by a separate run of this
+script.
+
+With ``--keep``, the components are not released once they are written,
+as was the case before finalize_build released them one at a time, so
+that the two can be compared.
+
+Only works on Linux, where the current resident memory is read from
+``/proc/self/statm``.
+
+Example:
+
+    python finalize_memory.py --size 1000000 --components 16
+    python finalize_memory.py --size 1000000 --components 16 --keep
+
+"""
+from __future__ import print_function
+import argparse
+import os
+import resource
+import time
+
+from nengo_mpi.model import MpiModel
+
+from build_scaling import make_model
+
+
+def current_rss():
+    """ Return the current resident memory of this process in bytes. """
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+def peak_rss():
+    """ Return the peak resident memory of this process in bytes. """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return 1024 * peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the peak memory of the finalize pass.")
+
+    parser.add_argument(
+        '--size', type=int, default=1000000,
+        help="Number of operators in the model.")
+
+    parser.add_argument(
+        '--components', type=int, default=16,
+        help="Number of components to spread the operators over.")
+
+    parser.add_argument(
+        '--chain-length', type=int, default=10, dest='chain_length',
+        help="Number of ensembles in each chain.")
+
+    parser.add_argument(
+        '-d', type=int, default=2,
+        help="Number of dimensions of each ensemble.")
+
+    parser.add_argument(
+        '-n', type=int, default=20,
+        help="Number of neurons in each ensemble.")
+
+    parser.add_argument(
+        '--keep', action='store_true',
+        help="Keep the components once they are written.")
+
+    args = parser.parse_args()
+
+    if args.keep:
+        MpiModel._release_component = lambda self, component: None
+
+    model = make_model(
+        args.size, args.components, args.chain_length, args.d, args.n)
+
+    n_ops = sum(len(ops) for ops in model.component_ops.values())
+    built = current_rss()
+
+    try:
+        then = time.time()
+        model.finalize_build()
+        elapsed = time.time() - then
+
+        file_size = os.path.getsize(model.save_file)
+    finally:
+        os.remove(model.save_file)
+
+    finalized = current_rss()
+    peak = peak_rss()
+
+    print("Operators: %d" % n_ops)
+    print("Finalizing took %f seconds." % elapsed)
+    print("Network file: %.1f MB" % (file_size / 1e6))
+    print("Memory after creating the model: %.1f MB" % (built / 1e6))
+    print("Peak memory while finalizing: %.1f MB (%.1f MB above)" % (
+        peak / 1e6, (peak - built) / 1e6))
+    print("Memory after finalizing: %.1f MB" % (finalized / 1e6))
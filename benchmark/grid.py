@@ -59,6 +59,17 @@ parser.add_argument(
          "later be used by the stand-alone version of nengo_mpi). "
          "In this case, the network will not be simulated.")
 
+parser.add_argument(
+    '--shard', action='store_true',
+    help="Supply to store each component in its own file. "
+         "Only has an effect if --save is also supplied.")
+
+parser.add_argument(
+    '--single', action='store_true',
+    help="Supply to store signals in single precision, for comparing "
+         "single and double precision builds of nengo_mpi. "
+         "Only has an effect if --save is also supplied.")
+
 parser.add_argument(
     '--mpi-log', nargs='?', type=str,
     default='', const='grid', dest='mpi_log',
@@ -197,12 +208,16 @@ if use_ea and split_ea > 1:
     splitter.split(m, max_neurons)
 
 if use_mpi:
+    precision = 'single' if save_file and args.single else 'double'
+
     if partitioner is not None:
         sim = nengo_mpi.Simulator(
-            m, dt=0.001, partitioner=partitioner, save_file=save_file)
+            m, dt=0.001, partitioner=partitioner, save_file=save_file,
+            shard=bool(save_file) and args.shard, precision=precision)
     else:
         sim = nengo_mpi.Simulator(
-            m, dt=0.001, assignments=assignments, save_file=save_file)
+            m, dt=0.001, assignments=assignments, save_file=save_file,
+            shard=bool(save_file) and args.shard, precision=precision)
 
     if save_file:
         print "Saved network to", save_file
@@ -0,0 +1,144 @@
+""" Benchmark loading of network files by the stand-alone executables.
+
+Reports the size of each network file, the number of operators of each type
+that it contains, and the average time taken by the executable to load it.
+
+Network files with format version 1 (operators stored as strings) are
+converted to the current format first; if ``--baseline-exe`` points to an
+executable built from a version of nengo_mpi that reads version 1 files,
+the original file is also timed with that executable so the two layouts
+can be compared directly.
+
+Example:
+
+    python load_network.py grid_p1_sl10_ns10.net --rounds 5
+
+"""
+from __future__ import print_function
+import os
+import re
+import sys
+import argparse
+import subprocess
+import tempfile
+from collections import Counter
+
+import h5py as h5
+import numpy as np
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                    'scripts'))
+from convert_network import convert_network, read_string_list
+
+from nengo_mpi.utils import NETWORK_FORMAT_VERSION, OP_DELIM
+
+
+def count_operators(filename):
+    """ Return a Counter mapping operator types to number of operators. """
+    counts = Counter()
+
+    with h5.File(filename, 'r') as f:
+        version = f.attrs.get('format_version', 1)
+
+        for component in range(f.attrs['n_components']):
+            group = f[str(component)]
+
+            if version == 1:
+                for op_string in read_string_list(group['operators']):
+                    counts[op_string.split(OP_DELIM)[1]] += 1
+            else:
+                for op_type, type_group in group['operators'].items():
+                    counts[op_type] += type_group['index'].shape[0]
+
+    return counts
+
+
+def time_load(filename, exe, n_procs, rounds):
+    """ Return the average time taken by ``exe`` to load ``filename``. """
+    if n_procs > 1:
+        command = ["mpirun", "-np", str(n_procs), exe]
+    else:
+        command = [exe]
+
+    log_file = tempfile.mktemp(suffix='.h5')
+    command += ["--noprog", "--log", log_file, filename, "0.0"]
+
+    times = []
+    for r in range(rounds):
+        output = subprocess.check_output(command, stderr=subprocess.STDOUT)
+        match = re.search(
+            r'Loading network from file took (\d+\.\d+)',
+            output.decode('ascii', 'ignore'))
+
+        if match is None:
+            raise Exception(
+                "No load timing information in output:\n%s" % output)
+
+        times.append(float(match.group(1)))
+
+    if os.path.isfile(log_file):
+        os.remove(log_file)
+
+    return np.mean(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark loading of network files.")
+
+    parser.add_argument(
+        'filenames', nargs='+', type=str, help="Network files to load.")
+
+    parser.add_argument(
+        '--exe', type=str, default='nengo_cpp',
+        help="Executable to load the networks with.")
+
+    parser.add_argument(
+        '--baseline-exe', type=str, default='', dest='baseline_exe',
+        help="Executable that reads format version 1 network files. "
+             "If supplied, version 1 files are timed with this executable "
+             "before being converted.")
+
+    parser.add_argument(
+        '-p', type=int, default=1,
+        help="Number of processors. If greater than 1, the executable "
+             "is launched with mpirun.")
+
+    parser.add_argument(
+        '--rounds', type=int, default=3,
+        help="Number of times to load each network.")
+
+    args = parser.parse_args()
+
+    for filename in args.filenames:
+        print("Network file: %s" % filename)
+
+        with h5.File(filename, 'r') as f:
+            version = f.attrs.get('format_version', 1)
+
+        counts = count_operators(filename)
+        print("    Format version: %d" % version)
+        print("    Operators: %d" % sum(counts.values()))
+        for op_type, count in sorted(counts.items()):
+            print("        %s: %d" % (op_type, count))
+
+        print("    File size: %d bytes" % os.path.getsize(filename))
+
+        converted = ''
+        if version < NETWORK_FORMAT_VERSION:
+            if args.baseline_exe:
+                t = time_load(filename, args.baseline_exe, args.p, args.rounds)
+                print("    Baseline load time: %f seconds" % t)
+
+            converted = tempfile.mktemp(suffix='.net')
+            convert_network(filename, converted)
+            print("    Converted file size: %d bytes" % (
+                os.path.getsize(converted)))
+
+        t = time_load(
+            converted or filename, args.exe, args.p, args.rounds)
+        print("    Load time: %f seconds" % t)
+
+        if converted:
+            os.remove(converted)
@@ -171,6 +171,12 @@ if __name__ == "__main__":
              "later be used by the stand-alone version of nengo_mpi). "
              "In this case, the network will not be simulated.")
 
+    parser.add_argument(
+        '--single', action='store_true',
+        help="Supply to store signals in single precision, for comparing "
+             "single and double precision builds of nengo_mpi. "
+             "Only has an effect if --save is also supplied.")
+
     parser.add_argument(
         '--mpi-log', nargs='?', type=str,
         default='', const='random_graph', dest='mpi_log',
@@ -283,7 +289,8 @@ if __name__ == "__main__":
 
         partitioner = nengo_mpi.Partitioner(n_procs, func=fmap[partitioner])
         sim = nengo_mpi.Simulator(
-            model, dt=0.001, partitioner=partitioner, save_file=save_file)
+            model, dt=0.001, partitioner=partitioner, save_file=save_file,
+            precision='single' if save_file and args.single else 'double')
 
         if save_file:
             print "Saved network to", save_file
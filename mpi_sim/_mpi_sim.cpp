@@ -6,6 +6,9 @@ static char module_docstring[] = "TODO";
 
 static char init_docstring[] = "TODO";
 static char finalize_docstring[] = "TODO";
+static char is_initialized_docstring[] =
+    "is_initialized()\n\n"
+    "Return whether MPI has been initialized in this process, e.g. by init.";
 static char get_rank_docstring[] = "TODO";
 static char get_n_procs_docstring[] = "TODO";
 static char kill_workers_docstring[] = "TODO";
@@ -13,6 +16,21 @@ static char worker_start_docstring[] = "TODO";
 
 static char create_simulator_docstring[] = "TODO";
 static char load_network_docstring[] = "TODO";
+static char load_components_docstring[] =
+    "load_components(dt, probe_strings, components)\n\n"
+    "Load a network from memory into the simulator created by\n"
+    "create_simulator, instead of from a network file.\n\n"
+    "dt: float\n"
+    "    Step length.\n"
+    "probe_strings: list of str\n"
+    "    Info about every probe in the network.\n"
+    "components: iterable of nengo_mpi.model.ComponentData\n"
+    "    One tuple per component: (component, signals, signal_keys,\n"
+    "    signal_shapes, signal_strides, signal_labels, signal_offsets,\n"
+    "    signal_readonly, readonly_signals, op_tables, op_data, probes).\n"
+    "    Each tuple is copied before the next one is taken, so a generator\n"
+    "    can create them one at a time. Components owned by other MPI\n"
+    "    processes are sent to those processes.";
 static char finalize_build_docstring[] = "TODO";
 
 static char run_n_steps_docstring[] = "TODO";
@@ -24,6 +42,7 @@ static char create_PyFunc_docstring[] = "TODO";
 
 extern "C" PyObject* mpi_sim_init(PyObject *self, PyObject *args);
 extern "C" PyObject* mpi_sim_finalize(PyObject *self, PyObject *args);
+extern "C" PyObject* mpi_sim_is_initialized(PyObject *self, PyObject *args);
 extern "C" PyObject* mpi_sim_get_rank(PyObject *self, PyObject *args);
 extern "C" PyObject* mpi_sim_get_n_procs(PyObject *self, PyObject *args);
 extern "C" PyObject* mpi_sim_kill_workers(PyObject *self, PyObject *args);
@@ -31,6 +50,7 @@ extern "C" PyObject* mpi_sim_worker_start(PyObject *self, PyObject *args);
 
 extern "C" PyObject* mpi_sim_create_simulator(PyObject *self, PyObject *args);
 extern "C" PyObject* mpi_sim_load_network(PyObject *self, PyObject *args);
+extern "C" PyObject* mpi_sim_load_components(PyObject *self, PyObject *args);
 extern "C" PyObject* mpi_sim_finalize_build(PyObject *self, PyObject *args);
 
 extern "C" PyObject* mpi_sim_run_n_steps(PyObject *self, PyObject *args);
@@ -43,6 +63,7 @@ extern "C" PyObject* mpi_sim_create_PyFunc(PyObject *self, PyObject *args);
 static PyMethodDef module_functions[] = {
     {"init", mpi_sim_init, METH_VARARGS, init_docstring},
     {"finalize", mpi_sim_finalize, METH_VARARGS, finalize_docstring},
+    {"is_initialized", mpi_sim_is_initialized, METH_VARARGS, is_initialized_docstring},
     {"get_rank", mpi_sim_get_rank, METH_VARARGS, get_rank_docstring},
     {"get_n_procs", mpi_sim_get_n_procs, METH_VARARGS, get_n_procs_docstring},
     {"kill_workers", mpi_sim_kill_workers, METH_VARARGS, kill_workers_docstring},
@@ -50,6 +71,7 @@ static PyMethodDef module_functions[] = {
 
     {"create_simulator", mpi_sim_create_simulator, METH_VARARGS, create_simulator_docstring},
     {"load_network", mpi_sim_load_network, METH_VARARGS, load_network_docstring},
+    {"load_components", mpi_sim_load_components, METH_VARARGS, load_components_docstring},
     {"finalize_build", mpi_sim_finalize_build, METH_VARARGS, finalize_build_docstring},
 
     {"run_n_steps", mpi_sim_run_n_steps, METH_VARARGS, run_n_steps_docstring},
@@ -90,6 +112,10 @@ MOD_INIT(mpi_sim)
     /* Load `numpy` functionality. */
     import_array();
 
+    /* The numpy dtype of signals, which depends on how mpi_sim was built. */
+    PyModule_AddStringConstant(
+        m, "dtype", sizeof(dtype) == sizeof(float) ? "float32" : "float64");
+
     return MOD_SUCCESS_VAL(m);
 }
 
@@ -116,6 +142,14 @@ extern "C" PyObject *mpi_sim_finalize(PyObject *self, PyObject *args){
     return Py_None;
 }
 
+extern "C" PyObject *mpi_sim_is_initialized(PyObject *self, PyObject *args){
+    if(!PyArg_ParseTuple(args, "")){
+        return NULL;
+    }
+
+    return PyBool_FromLong(mpi_is_initialized());
+}
+
 extern "C" PyObject *mpi_sim_get_rank(PyObject *self, PyObject *args){
     if(!PyArg_ParseTuple(args, "")){
         return NULL;
@@ -159,14 +193,15 @@ extern "C" PyObject *mpi_sim_worker_start(PyObject *self, PyObject *args){
 unique_ptr<Simulator> simulator;
 
 extern "C" PyObject *mpi_sim_create_simulator(PyObject *self, PyObject *args){
-    if(!PyArg_ParseTuple(args, "")){
+    unsigned batch_size;
+    if(!PyArg_ParseTuple(args, "I", &batch_size)){
         return NULL;
     }
 
     if(n_processors_available == 1){
-        simulator = unique_ptr<Simulator>(new Simulator(false));
+        simulator = unique_ptr<Simulator>(new Simulator(false, batch_size));
     }else{
-        simulator = unique_ptr<Simulator>(new MpiSimulator(false));
+        simulator = unique_ptr<Simulator>(new MpiSimulator(false, batch_size));
     }
 
     Py_INCREF(Py_None);
@@ -185,6 +220,244 @@ extern "C" PyObject *mpi_sim_load_network(PyObject *self, PyObject *args){
     return Py_None;
 }
 
+// Get a C-contiguous array with the given type and number of dimensions.
+// Only copies if ``obj'' does not already satisfy these requirements.
+static PyArrayObject* as_array(PyObject* obj, int type_num, int ndim){
+    return (PyArrayObject*)PyArray_FROMANY(obj, type_num, ndim, ndim, NPY_ARRAY_IN_ARRAY);
+}
+
+template <class T>
+static void copy_array(PyArrayObject* array, vector<T>& v){
+    T* data = (T*)(PyArray_DATA(array));
+    v.assign(data, data + PyArray_SIZE(array));
+}
+
+static bool to_string_list(PyObject* obj, vector<string>& strings){
+    PyObject* seq = PySequence_Fast(obj, "Expected a sequence of strings.");
+    if(seq == NULL){
+        return false;
+    }
+
+    Py_ssize_t n = PySequence_Fast_GET_SIZE(seq);
+    for(Py_ssize_t i = 0; i < n; i++){
+        PyObject* item = PySequence_Fast_GET_ITEM(seq, i);
+
+#if PY_MAJOR_VERSION >= 3
+        const char* s = PyUnicode_AsUTF8(item);
+#else
+        const char* s = PyString_AsString(item);
+#endif
+
+        if(s == NULL){
+            Py_DECREF(seq);
+            return false;
+        }
+
+        strings.push_back(string(s));
+    }
+
+    Py_DECREF(seq);
+    return true;
+}
+
+static bool to_op_table(PyObject* obj, OpTableSpec& table){
+    const char* type_string;
+    PyObject *py_index, *py_signals, *py_params, *py_arrays;
+
+    if(!PyArg_ParseTuple(
+            obj, "sOOOO", &type_string, &py_index,
+            &py_signals, &py_params, &py_arrays)){
+        return false;
+    }
+
+    PyArrayObject* index = as_array(py_index, NPY_LONGLONG, 1);
+    PyArrayObject* signals = as_array(py_signals, NPY_LONGLONG, 3);
+    PyArrayObject* params = as_array(py_params, NPY_DOUBLE, 2);
+    PyArrayObject* arrays = as_array(py_arrays, NPY_LONGLONG, 2);
+
+    bool success = index && signals && params && arrays;
+
+    if(success){
+        table = OpTableSpec(
+            type_string, PyArray_DIM(index, 0), PyArray_DIM(signals, 1),
+            PyArray_DIM(params, 1), PyArray_DIM(arrays, 1));
+
+        copy_array(index, table.index);
+        copy_array(signals, table.signals);
+        copy_array(params, table.params);
+        copy_array(arrays, table.arrays);
+    }
+
+    Py_XDECREF(index);
+    Py_XDECREF(signals);
+    Py_XDECREF(params);
+    Py_XDECREF(arrays);
+
+    return success;
+}
+
+// Expects a tuple with the fields of nengo_mpi.model.ComponentData.
+static bool to_component_spec(PyObject* obj, ComponentSpec& cs){
+    int component;
+    PyObject *py_signals, *py_keys, *py_shapes, *py_strides, *py_labels;
+    PyObject *py_offsets, *py_readonly, *py_readonly_signals;
+    PyObject *py_op_tables, *py_op_data, *py_probes;
+
+    if(!PyArg_ParseTuple(
+            obj, "iOOOOOOOOOOO", &component, &py_signals, &py_keys, &py_shapes,
+            &py_strides, &py_labels, &py_offsets, &py_readonly,
+            &py_readonly_signals, &py_op_tables, &py_op_data, &py_probes)){
+        return false;
+    }
+
+    PyArrayObject* signals = as_array(py_signals, NPY_DTYPE_NUM, 1);
+    PyArrayObject* keys = as_array(py_keys, NPY_LONGLONG, 1);
+    PyArrayObject* shapes = as_array(py_shapes, NPY_LONGLONG, 2);
+    PyArrayObject* strides = as_array(py_strides, NPY_LONGLONG, 2);
+    PyArrayObject* offsets = as_array(py_offsets, NPY_LONGLONG, 1);
+    PyArrayObject* readonly = as_array(py_readonly, NPY_UBYTE, 1);
+    PyArrayObject* readonly_signals = as_array(py_readonly_signals, NPY_DTYPE_NUM, 1);
+
+    bool success = (
+        signals && keys && shapes && strides &&
+        offsets && readonly && readonly_signals);
+
+    if(success){
+        cs = ComponentSpec(
+            component, PyArray_SIZE(keys), PyArray_SIZE(signals),
+            PyArray_SIZE(readonly_signals));
+
+        memcpy(cs.signal_data.get(), PyArray_DATA(signals),
+               cs.signal_data_size * sizeof(dtype));
+
+        memcpy(cs.readonly_data.get(), PyArray_DATA(readonly_signals),
+               cs.readonly_data_size * sizeof(dtype));
+
+        long long* key_data = (long long*)(PyArray_DATA(keys));
+        cs.signal_keys.assign(key_data, key_data + cs.n_signals);
+
+        long long* offset_data = (long long*)(PyArray_DATA(offsets));
+        cs.signal_offsets.assign(offset_data, offset_data + cs.n_signals);
+
+        unsigned char* readonly_data = (unsigned char*)(PyArray_DATA(readonly));
+        cs.signal_readonly.assign(readonly_data, readonly_data + cs.n_signals);
+
+        copy_array(shapes, cs.signal_shapes);
+        copy_array(strides, cs.signal_strides);
+
+        success = (
+            to_string_list(py_labels, cs.signal_labels) &&
+            to_string_list(py_probes, cs.probes));
+    }
+
+    Py_XDECREF(signals);
+    Py_XDECREF(keys);
+    Py_XDECREF(shapes);
+    Py_XDECREF(strides);
+    Py_XDECREF(offsets);
+    Py_XDECREF(readonly);
+    Py_XDECREF(readonly_signals);
+
+    if(!success){
+        return false;
+    }
+
+    PyObject* op_tables = PySequence_Fast(py_op_tables, "Expected a sequence of op tables.");
+    if(op_tables == NULL){
+        return false;
+    }
+
+    for(Py_ssize_t i = 0; i < PySequence_Fast_GET_SIZE(op_tables); i++){
+        cs.op_tables.push_back(OpTableSpec());
+
+        if(!to_op_table(PySequence_Fast_GET_ITEM(op_tables, i), cs.op_tables.back())){
+            Py_DECREF(op_tables);
+            return false;
+        }
+    }
+
+    Py_DECREF(op_tables);
+
+    // op_data maps integer keys to either arrays or lists of strings.
+    PyObject *key, *value;
+    Py_ssize_t pos = 0;
+
+    while(PyDict_Next(py_op_data, &pos, &key, &value)){
+        long long array_key = PyLong_AsLongLong(key);
+        if(array_key == -1 && PyErr_Occurred()){
+            return false;
+        }
+
+        if(PyArray_Check(value)){
+            PyArrayObject* array = as_array(value, NPY_DTYPE_NUM, 0);
+            if(array == NULL){
+                return false;
+            }
+
+            // Flat arrays become column vectors
+            unsigned shape1 = PyArray_NDIM(array) > 0 ? PyArray_DIM(array, 0) : 1;
+            unsigned shape2 = PyArray_NDIM(array) > 1 ? PyArray_DIM(array, 1) : 1;
+
+            Signal op_array(shape1, shape2, 0.0);
+            memcpy(op_array.raw_data, PyArray_DATA(array), op_array.size * sizeof(dtype));
+            cs.op_arrays[array_key] = op_array;
+
+            Py_DECREF(array);
+        }else if(!to_string_list(value, cs.op_string_lists[array_key])){
+            return false;
+        }
+    }
+
+    return true;
+}
+
+extern "C" PyObject *mpi_sim_load_components(PyObject *self, PyObject *args){
+    double dt;
+    PyObject *py_probe_strings, *py_components;
+
+    if(!PyArg_ParseTuple(
+            args, "dOO", &dt, &py_probe_strings, &py_components)){
+        return NULL;
+    }
+
+    vector<string> probe_strings;
+    if(!to_string_list(py_probe_strings, probe_strings)){
+        return NULL;
+    }
+
+    // Components may be produced one at a time (e.g. by a generator), so
+    // each one is copied and released before the next one is requested.
+    PyObject* iterator = PyObject_GetIter(py_components);
+    if(iterator == NULL){
+        return NULL;
+    }
+
+    vector<ComponentSpec> components;
+    PyObject* item;
+
+    while((item = PyIter_Next(iterator)) != NULL){
+        components.emplace_back();
+        bool success = to_component_spec(item, components.back());
+        Py_DECREF(item);
+
+        if(!success){
+            Py_DECREF(iterator);
+            return NULL;
+        }
+    }
+
+    Py_DECREF(iterator);
+
+    if(PyErr_Occurred()){
+        return NULL;
+    }
+
+    simulator->from_components(dt, probe_strings, components);
+
+    Py_INCREF(Py_None);
+    return Py_None;
+}
+
 extern "C" PyObject *mpi_sim_finalize_build(PyObject *self, PyObject *args){
     if(!PyArg_ParseTuple(args, "")){
         return NULL;
@@ -236,7 +509,7 @@ extern "C" PyObject *mpi_sim_get_probe_data(PyObject *self, PyObject *args){
             ndim = 2;
         }
 
-        array = PyArray_SimpleNew(ndim, shape, NPY_DOUBLE);
+        array = PyArray_SimpleNew(ndim, shape, NPY_DTYPE_NUM);
         if (array == NULL) return NULL; // TODO
         d.copy_to_buffer((dtype*)(PyArray_DATA((PyArrayObject*)(array))));
 
@@ -267,7 +540,7 @@ extern "C" PyObject *mpi_sim_get_signal_value(PyObject *self, PyObject *args){
         ndim = 2;
     }
 
-    array = PyArray_SimpleNew(ndim, shape, NPY_DOUBLE);
+    array = PyArray_SimpleNew(ndim, shape, NPY_DTYPE_NUM);
     if (array == NULL) return NULL; // TODO
     signal.copy_to_buffer((dtype*)(PyArray_DATA((PyArrayObject*)(array))));
 
@@ -301,9 +574,9 @@ extern "C" PyObject *mpi_sim_create_PyFunc(PyObject *self, PyObject *args){
     PyObject *callback;
     char *time_string, *input_string, *output_string;
     PyArrayObject *py_time_buffer, *py_input_buffer, *py_output_buffer;
-    float index;
+    long long index;
 
-    if(!PyArg_ParseTuple(args, "OsssOOOf", &callback, &time_string, &input_string, &output_string,
+    if(!PyArg_ParseTuple(args, "OsssOOOL", &callback, &time_string, &input_string, &output_string,
                          &py_time_buffer, &py_input_buffer, &py_output_buffer, &index)){
         return NULL;
     }
@@ -345,23 +618,33 @@ time_buffer(time_buffer), input_buffer(input_buffer), output_buffer(output_buffe
 
 void PyFunc::operator() (){
     // TODO: currently assuming pyfuncs only accept and return vectors.
-    for(unsigned i = 0; i < time.shape1; i++){
-        time_buffer[i] = time(i);
-    }
 
-    for(unsigned i = 0; i < input.shape1; i++){
-        input_buffer[i] = input(i);
-    }
+    // In batch mode the function is called once for each simulation in the
+    // batch. Signals with a single column are shared by all simulations.
+    unsigned n_columns = max(input.shape2, output.shape2);
 
-    PyObject* arglist = Py_BuildValue("()");
-    PyObject* result = PyObject_CallObject(fn, arglist);
-    Py_DECREF(arglist);
-    if(result == NULL){
-        throw PythonException();
-    }
+    for(unsigned j = 0; j < n_columns; j++){
+        unsigned time_col = min(j, time.shape2 - 1);
+        for(unsigned i = 0; i < time.shape1; i++){
+            time_buffer[i] = time.get(i, time_col);
+        }
+
+        unsigned input_col = min(j, input.shape2 - 1);
+        for(unsigned i = 0; i < input.shape1; i++){
+            input_buffer[i] = input.get(i, input_col);
+        }
 
-    for(unsigned i = 0; i < output.shape1; i++){
-        output(i) = output_buffer[i];
+        PyObject* arglist = Py_BuildValue("()");
+        PyObject* result = PyObject_CallObject(fn, arglist);
+        Py_DECREF(arglist);
+        if(result == NULL){
+            throw PythonException();
+        }
+
+        unsigned output_col = min(j, output.shape2 - 1);
+        for(unsigned i = 0; i < output.shape1; i++){
+            output.get(i, output_col) = output_buffer[i];
+        }
     }
 
     run_dbg(*this);
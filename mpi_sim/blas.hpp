@@ -0,0 +1,85 @@
+#pragma once
+
+#ifdef __cplusplus
+extern "C"
+{
+#endif
+
+#include <cblas.h>
+
+#ifdef __cplusplus
+}
+#endif
+
+/* The BLAS routines used by operators, overloaded on the type of their
+ * arguments so that operators call the single precision routines (cblas_s*)
+ * when dtype is float, and the double precision routines (cblas_d*) when
+ * dtype is double. */
+
+inline void blas_gemv(
+        CBLAS_ORDER order, CBLAS_TRANSPOSE trans, int m, int n, float alpha,
+        const float* A, int lda, const float* x, int incx, float beta,
+        float* y, int incy){
+    cblas_sgemv(order, trans, m, n, alpha, A, lda, x, incx, beta, y, incy);
+}
+
+inline void blas_gemv(
+        CBLAS_ORDER order, CBLAS_TRANSPOSE trans, int m, int n, double alpha,
+        const double* A, int lda, const double* x, int incx, double beta,
+        double* y, int incy){
+    cblas_dgemv(order, trans, m, n, alpha, A, lda, x, incx, beta, y, incy);
+}
+
+inline void blas_gemm(
+        CBLAS_ORDER order, CBLAS_TRANSPOSE trans_A, CBLAS_TRANSPOSE trans_B,
+        int m, int n, int k, float alpha, const float* A, int lda,
+        const float* B, int ldb, float beta, float* C, int ldc){
+    cblas_sgemm(
+        order, trans_A, trans_B, m, n, k, alpha, A, lda, B, ldb, beta, C, ldc);
+}
+
+inline void blas_gemm(
+        CBLAS_ORDER order, CBLAS_TRANSPOSE trans_A, CBLAS_TRANSPOSE trans_B,
+        int m, int n, int k, double alpha, const double* A, int lda,
+        const double* B, int ldb, double beta, double* C, int ldc){
+    cblas_dgemm(
+        order, trans_A, trans_B, m, n, k, alpha, A, lda, B, ldb, beta, C, ldc);
+}
+
+inline void blas_ger(
+        CBLAS_ORDER order, int m, int n, float alpha, const float* x,
+        int incx, const float* y, int incy, float* A, int lda){
+    cblas_sger(order, m, n, alpha, x, incx, y, incy, A, lda);
+}
+
+inline void blas_ger(
+        CBLAS_ORDER order, int m, int n, double alpha, const double* x,
+        int incx, const double* y, int incy, double* A, int lda){
+    cblas_dger(order, m, n, alpha, x, incx, y, incy, A, lda);
+}
+
+inline void blas_copy(int n, const float* x, int incx, float* y, int incy){
+    cblas_scopy(n, x, incx, y, incy);
+}
+
+inline void blas_copy(int n, const double* x, int incx, double* y, int incy){
+    cblas_dcopy(n, x, incx, y, incy);
+}
+
+inline void blas_axpy(
+        int n, float alpha, const float* x, int incx, float* y, int incy){
+    cblas_saxpy(n, alpha, x, incx, y, incy);
+}
+
+inline void blas_axpy(
+        int n, double alpha, const double* x, int incx, double* y, int incy){
+    cblas_daxpy(n, alpha, x, incx, y, incy);
+}
+
+inline void blas_scal(int n, float alpha, float* x, int incx){
+    cblas_sscal(n, alpha, x, incx);
+}
+
+inline void blas_scal(int n, double alpha, double* x, int incx){
+    cblas_dscal(n, alpha, x, incx);
+}
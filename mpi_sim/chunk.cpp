@@ -1,31 +1,150 @@
 #include "chunk.hpp"
 
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/resource.h>
+#include <unistd.h>
+
 // in bytes, for each process.
 #define MAX_RUNTIME_OUTPUT_SIZE 5000
 
-MpiSimulatorChunk::MpiSimulatorChunk(bool collect_timings)
-:dt(0.001), rank(0), n_processors(1), collect_timings(collect_timings){
+MpiSimulatorChunk::MpiSimulatorChunk(bool collect_timings, unsigned batch_size)
+:dt(0.001), batch_size(batch_size), trial(0), n_trials(1), rank(0), n_processors(1),
+trials_comm(MPI_COMM_NULL), arena_size(0), arena_used(0), signal_bytes_loaded(0),
+signal_bytes_stored(0), signal_bytes_mapped(0), collect_timings(collect_timings){
 
+    if(batch_size == 0){
+        throw runtime_error("Batch size must be at least 1.");
+    }
 }
 
-MpiSimulatorChunk::MpiSimulatorChunk(int rank, int n_processors, bool collect_timings)
-:dt(0.001), rank(rank), n_processors(n_processors), collect_timings(collect_timings){
+MpiSimulatorChunk::MpiSimulatorChunk(
+        int rank, int n_processors, bool collect_timings, unsigned batch_size)
+:dt(0.001), batch_size(batch_size), trial(0), n_trials(1), rank(rank),
+n_processors(n_processors), trials_comm(MPI_COMM_NULL), arena_size(0), arena_used(0),
+signal_bytes_loaded(0), signal_bytes_stored(0), signal_bytes_mapped(0),
+collect_timings(collect_timings){
+
+    if(batch_size == 0){
+        throw runtime_error("Batch size must be at least 1.");
+    }
+
     stringstream ss;
     ss << "Chunk " << rank;
     label = ss.str();
 }
 
-void MpiSimulatorChunk::from_file(string filename, hid_t file_plist, hid_t read_plist){
-    herr_t err;
-    hid_t dspace, attr;
-
-    unsigned ndim;
-    hsize_t dset_shape[2];
-    char* str_ptr;
+/* Read a null-separated list of strings, as stored by
+ * ``store_string_list'' in model.py. */
+static vector<string> read_string_list(hid_t dset, hid_t read_plist){
+    hsize_t dset_shape[1];
 
     hid_t str_type = H5Tcopy(H5T_C_S1);
     H5Tset_strpad(str_type, H5T_STR_NULLPAD);
 
+    int n_strings;
+    hid_t attr = H5Aopen(dset, "n_strings", H5P_DEFAULT);
+    H5Aread(attr, H5T_NATIVE_INT, &n_strings);
+    H5Aclose(attr);
+
+    hid_t dspace = H5Dget_space(dset);
+    H5Sget_simple_extent_dims(dspace, dset_shape, NULL);
+    H5Sclose(dspace);
+
+    auto buffer = unique_ptr<char[]>(new char[dset_shape[0]]);
+    H5Dread(dset, str_type, H5S_ALL, H5S_ALL, read_plist, buffer.get());
+    H5Tclose(str_type);
+
+    vector<string> strings;
+    char* str_ptr = buffer.get();
+
+    for(int i = 0; i < n_strings; i++){
+        strings.push_back(string(str_ptr));
+        str_ptr += strings.back().length() + 1;
+    }
+
+    return strings;
+}
+
+/* Map the values of a dataset into memory, straight from the file storing
+ * it. Only datasets of dtype values stored contiguously, without compression
+ * or other filters, at an offset that is a multiple of the size of a dtype,
+ * can be mapped, as is the case for read-only signals in network files saved
+ * with ``aligned=True'' in the precision of the build. Returns null if the
+ * dataset cannot be mapped, in which case it has to be read as usual.
+ *
+ * The mapping is private, so processes on the same node share the pages
+ * of the file in the page cache, and the values are only copied if they
+ * are ever written to. The file is unmapped once the returned pointer,
+ * and every pointer sharing ownership with it, is gone. */
+static shared_ptr<dtype> map_dataset(hid_t dset){
+    hid_t create_plist = H5Dget_create_plist(dset);
+    bool contiguous = (
+        H5Pget_layout(create_plist) == H5D_CONTIGUOUS &&
+        H5Pget_nfilters(create_plist) == 0);
+    H5Pclose(create_plist);
+
+    hid_t type = H5Dget_type(dset);
+    bool native = H5Tequal(type, H5T_NATIVE_DTYPE) > 0;
+    H5Tclose(type);
+
+    hid_t dspace = H5Dget_space(dset);
+    hssize_t size = H5Sget_simple_extent_npoints(dspace);
+    H5Sclose(dspace);
+
+    // Storage for empty datasets is never allocated, so they have no offset.
+    haddr_t address = H5Dget_offset(dset);
+
+    if(!contiguous || !native || size <= 0 || address == HADDR_UNDEF ||
+            address % sizeof(dtype) != 0){
+        return nullptr;
+    }
+
+    ssize_t name_length = H5Fget_name(dset, NULL, 0);
+    vector<char> name(name_length + 1);
+    H5Fget_name(dset, name.data(), name.size());
+
+    int fd = open(name.data(), O_RDONLY);
+    if(fd < 0){
+        return nullptr;
+    }
+
+    // Mappings have to start on a page boundary.
+    size_t page_size = sysconf(_SC_PAGESIZE);
+    size_t start = address - address % page_size;
+    size_t length = address - start + size * sizeof(dtype);
+
+    // Signals are not const, so the pages are writable. Since the mapping
+    // is private, a write would only ever change this process's copy.
+    void* region = mmap(
+        NULL, length, PROT_READ | PROT_WRITE, MAP_PRIVATE, fd, start);
+    close(fd);
+
+    if(region == MAP_FAILED){
+        return nullptr;
+    }
+
+    dtype* data = reinterpret_cast<dtype*>(
+        static_cast<char*>(region) + (address - start));
+
+    return shared_ptr<dtype>(
+        data, [region, length](dtype*){ munmap(region, length); });
+}
+
+/* Number of elements in a dataset. */
+static hssize_t dataset_size(hid_t group, const char* name){
+    hid_t dset = H5Dopen(group, name, H5P_DEFAULT);
+    hid_t dspace = H5Dget_space(dset);
+    hssize_t n_elements = H5Sget_simple_extent_npoints(dspace);
+    H5Sclose(dspace);
+    H5Dclose(dset);
+
+    return n_elements;
+}
+
+void MpiSimulatorChunk::from_file(string filename, hid_t file_plist, hid_t read_plist){
+    hid_t attr;
+
     hid_t f = H5Fopen(filename.c_str(), H5F_ACC_RDONLY, file_plist);
 
     // Get n_components
@@ -39,270 +158,773 @@ void MpiSimulatorChunk::from_file(string filename, hid_t file_plist, hid_t read_
         cout << "Network has " << n_components << " components." << endl;
     }
 
+    // Get format version; files without one were written before operators
+    // were stored as tables.
+    int format_version = 1;
+    if(H5Aexists(f, "format_version") > 0){
+        attr = H5Aopen(f, "format_version", H5P_DEFAULT);
+        H5Aread(attr, H5T_NATIVE_INT, &format_version);
+        H5Aclose(attr);
+    }
+
+    if(format_version != NETWORK_FORMAT_VERSION){
+        H5Fclose(f);
+
+        stringstream msg;
+        msg << "Network file " << filename << " has format version " << format_version
+            << ", but this version of nengo_mpi reads format version "
+            << NETWORK_FORMAT_VERSION << ".";
+
+        if(format_version < NETWORK_FORMAT_VERSION){
+            msg << " Files with older versions can be updated using "
+                << "scripts/convert_network.py.";
+        }
+
+        throw runtime_error(msg.str());
+    }
+
     // Get dt
     attr = H5Aopen(f, "dt", H5P_DEFAULT);
-    H5Aread(attr, H5T_NATIVE_DOUBLE, &dt);
+    H5Aread(attr, H5T_NATIVE_DTYPE, &dt);
     H5Aclose(attr);
 
-    int component = rank;
-    while(component < n_components){
+    // Sharded networks store each component in its own file, listed (relative
+    // to the directory containing the manifest) in the ``shards'' dataset.
+    bool sharded = H5Lexists(f, "shards", H5P_DEFAULT) > 0;
+    vector<string> shards;
 
-        stringstream ss;
-        ss << component;
+    if(sharded){
+        hid_t shards_dset = H5Dopen(f, "shards", H5P_DEFAULT);
+        shards = read_string_list(shards_dset, read_plist);
+        H5Dclose(shards_dset);
+    }
 
-        // Open the group assigned to my component
-        hid_t component_group = H5Gopen(f, ss.str().c_str(), H5P_DEFAULT);
+    // Unsharded networks store the read-only signals of all components in a
+    // single pool, in which each distinct value is stored once.
+    hid_t readonly_pool = -1;
+    shared_ptr<dtype> mapped_pool;
+    if(!sharded){
+        readonly_pool = H5Dopen(f, "readonly_signals", H5P_DEFAULT);
+        mapped_pool = map_dataset(readonly_pool);
+    }
 
-        // signal keys
-        hid_t signal_keys = H5Dopen(component_group, "signal_keys", H5P_DEFAULT);
+    size_t dir_end = filename.find_last_of("/");
+    string directory = dir_end == string::npos ? "" : filename.substr(0, dir_end + 1);
 
-        dspace = H5Dget_space(signal_keys);
-        ndim = H5Sget_simple_extent_dims(dspace, dset_shape, NULL);
-        H5Sclose(dspace);
+    // Call ``visit'' with the group of each component owned by this process.
+    auto for_each_component = [&](
+            function<void(hid_t, hid_t, shared_ptr<dtype>, hid_t)> visit){
 
-        assert(ndim == 1);
+        for(int component = rank; component < n_components; component += n_processors){
+            stringstream ss;
+            ss << component;
 
-        hsize_t n_signals = dset_shape[0];
+            if(sharded){
+                // Each shard is only read by the process that owns it,
+                // so use non-parallel property lists.
+                string shard_filename = directory + shards.at(component);
+                hid_t shard = H5Fopen(shard_filename.c_str(), H5F_ACC_RDONLY, H5P_DEFAULT);
 
-        auto signal_keys_buffer = unique_ptr<key_type[]>(new key_type[n_signals]);
-        err = H5Dread(
-            signal_keys, H5T_NATIVE_LLONG, H5S_ALL, H5S_ALL,
-            read_plist, signal_keys_buffer.get());
+                if(shard < 0){
+                    stringstream msg;
+                    msg << "Could not open shard " << shard_filename
+                        << " for component " << component << "." << endl;
+                    throw runtime_error(msg.str());
+                }
 
-        H5Dclose(signal_keys);
+                hid_t component_group = H5Gopen(shard, ss.str().c_str(), H5P_DEFAULT);
+                visit(component_group, -1, nullptr, H5P_DEFAULT);
+                H5Gclose(component_group);
 
-        // signal shapes
-        hid_t signal_shapes = H5Dopen(component_group, "signal_shapes", H5P_DEFAULT);
+                H5Fclose(shard);
+            }else{
+                // Open the group assigned to my component
+                hid_t component_group = H5Gopen(f, ss.str().c_str(), H5P_DEFAULT);
+                visit(component_group, readonly_pool, mapped_pool, read_plist);
+                H5Gclose(component_group);
+            }
+        }
+    };
+
+    // Size the arena for all of the components before reading any of them,
+    // so their mutable signals can be read straight into it.
+    size_t total_arena_entries = 0;
+    for_each_component(
+        [&](hid_t component_group, hid_t, shared_ptr<dtype>, hid_t){
+            total_arena_entries +=
+                dataset_size(component_group, "signals") * batch_size;
+        });
+
+    allocate_arena(total_arena_entries);
+
+    for_each_component(
+        [&](hid_t component_group, hid_t pool, shared_ptr<dtype> mapped, hid_t plist){
+            read_component(component_group, pool, mapped, plist);
+        });
+
+    if(!sharded){
+        H5Dclose(readonly_pool);
+    }
 
-        dspace = H5Dget_space(signal_shapes);
-        ndim = H5Sget_simple_extent_dims(dspace, dset_shape, NULL);
-        H5Sclose(dspace);
+    // Read probe info - all processes need info about all active probes
+    // for purposes of writing results to the HDF5 file.
 
-        assert(dset_shape[0] == n_signals);
-        assert(n_signals == 0 || dset_shape[1] == 2);
-        assert(n_signals == 0 || ndim == 2);
+    hid_t probe_info_dset = H5Dopen(f, "probe_info", H5P_DEFAULT);
 
-        auto signal_shapes_buffer = unique_ptr<short[]>(new short[2 * n_signals]);
-        err = H5Dread(
-            signal_shapes, H5T_NATIVE_SHORT, H5S_ALL, H5S_ALL,
-            read_plist, signal_shapes_buffer.get());
+    for(string probe_str: read_string_list(probe_info_dset, read_plist)){
+        probe_info.push_back(probe_str);
+    }
 
-        H5Dclose(signal_shapes);
+    H5Dclose(probe_info_dset);
 
-        // signal strides
-        hid_t signal_strides = H5Dopen(component_group, "signal_strides", H5P_DEFAULT);
+    H5Fclose(f);
+}
 
-        dspace = H5Dget_space(signal_strides);
-        ndim = H5Sget_simple_extent_dims(dspace, dset_shape, NULL);
-        H5Sclose(dspace);
+void MpiSimulatorChunk::from_components(
+        dtype dt_, const vector<string>& probe_strings,
+        const vector<ComponentSpec>& components){
 
-        assert(dset_shape[0] == n_signals);
-        assert(n_signals == 0 || dset_shape[1] == 2);
-        assert(n_signals == 0 || ndim == 2);
+    dt = dt_;
 
-        auto signal_strides_buffer = unique_ptr<short[]>(new short[2 * n_signals]);
-        err = H5Dread(
-            signal_strides, H5T_NATIVE_SHORT, H5S_ALL, H5S_ALL,
-            read_plist, signal_strides_buffer.get());
+    size_t total_arena_entries = 0;
+    for(auto& cs : components){
+        if(cs.component % n_processors == rank){
+            total_arena_entries += cs.signal_data_size * batch_size;
+        }
+    }
 
-        H5Dclose(signal_strides);
+    allocate_arena(total_arena_entries);
 
-        // signal labels
-        hid_t labels = H5Dopen(component_group, "signal_labels", H5P_DEFAULT);
+    for(auto& cs : components){
+        if(cs.component % n_processors == rank){
+            add_component(cs);
+        }
+    }
 
-        dspace = H5Dget_space(labels);
-        ndim = H5Sget_simple_extent_dims(dspace, dset_shape, NULL);
-        H5Sclose(dspace);
+    for(auto& probe_str : probe_strings){
+        probe_info.push_back(ProbeSpec(probe_str));
+    }
+}
 
-        assert(ndim == 1);
+void MpiSimulatorChunk::add_component(const ComponentSpec& cs){
+    add_readonly_data(cs);
+    add_signals(cs);
 
-        auto label_buffer = unique_ptr<char>(new char[dset_shape[0]]);
-        err = H5Dread(labels, str_type, H5S_ALL, H5S_ALL, read_plist, label_buffer.get());
-        H5Dclose(labels);
+    for(auto& table : cs.op_tables){
+        for(unsigned i = 0; i < table.n_ops; i++){
+            add_op(table.get_op_spec(i, cs.op_arrays, cs.op_string_lists));
+        }
+    }
 
-        // signals
-        hid_t signals = H5Dopen(component_group, "signals", H5P_DEFAULT);
+    for(auto& probe_str : cs.probes){
+        add_probe(ProbeSpec(probe_str));
+    }
+}
 
-        dspace = H5Dget_space(signals);
-        ndim = H5Sget_simple_extent_dims(dspace, dset_shape, NULL);
-        H5Sclose(dspace);
+/* Offset and size of each entry of the read-only pool used by a component,
+ * in order of increasing offset. */
+static map<long long, size_t> readonly_entries(const ComponentSpec& cs){
+    map<long long, size_t> entries;
 
-        assert(ndim == 1);
+    for(unsigned i = 0; i < cs.n_signals; i++){
+        if(cs.signal_readonly.at(i)){
+            entries[cs.signal_offsets.at(i)] = (
+                cs.signal_shapes.at(2*i) * cs.signal_shapes.at(2*i + 1));
+        }
+    }
 
-        auto signal_buffer = unique_ptr<dtype>(new dtype[dset_shape[0]]);
+    return entries;
+}
 
-        err = H5Dread(
-            signals, H5T_NATIVE_DOUBLE, H5S_ALL, H5S_ALL,
-            read_plist, signal_buffer.get());
+void MpiSimulatorChunk::add_readonly_data(const ComponentSpec& cs){
+    auto entries = readonly_entries(cs);
 
-        H5Dclose(signals);
+    size_t required = 0;
+    bool all_new = true;
 
-        long long signal_offset = 0;
-        str_ptr = label_buffer.get();
+    for(auto& kv : entries){
+        required += kv.second;
+        all_new = all_new && readonly_store.find(kv.first) == readonly_store.end();
+    }
 
-        int shape[2];
-        short stride[2];
+    if(required != cs.readonly_data_size){
+        stringstream msg;
+        msg << "Read-only signal data for component " << cs.component << " has "
+            << cs.readonly_data_size << " entries, but signal shapes "
+            << "require " << required << ".";
+        throw runtime_error(msg.str());
+    }
 
-        // Read signals for component, one at a time
-        // Name of the dataset containing a signal is equal to the signal key
-        for(int i = 0; i < n_signals; i++){
-            shape[0] = signal_shapes_buffer[2*i];
-            shape[1] = signal_shapes_buffer[2*i + 1];
+    // If every entry is new, or the buffer is mapped from a file, the
+    // entries share the component's buffer. Otherwise the new entries are
+    // copied, so that the buffer (including the entries that are already
+    // stored) can be freed.
+    size_t position = 0;
+
+    for(auto& kv : entries){
+        if(readonly_store.find(kv.first) == readonly_store.end()){
+            dtype* start = cs.readonly_data.get() + position;
+
+            if(all_new || cs.readonly_mapped){
+                readonly_store[kv.first] = shared_ptr<dtype>(cs.readonly_data, start);
+            }else{
+                auto data = shared_ptr<dtype>(new dtype[kv.second], default_delete<dtype[]>());
+                copy(start, start + kv.second, data.get());
+                readonly_store[kv.first] = data;
+            }
 
-            stride[0] = signal_strides_buffer[2*i];
-            stride[1] = signal_strides_buffer[2*i + 1];
+            if(cs.readonly_mapped){
+                signal_bytes_mapped += kv.second * sizeof(dtype);
+            }else{
+                signal_bytes_stored += kv.second * sizeof(dtype);
+            }
+        }
 
-            // Get the signal data
-            Signal signal = Signal(shape[0], shape[1], 0.0, string(str_ptr));
-            memcpy(signal.raw_data, signal_buffer.get() + signal_offset,
-                   signal.size * sizeof(dtype));
+        position += kv.second;
+    }
+}
 
-            signal.stride1 = stride[0];
-            signal.stride2 = stride[1];
+void MpiSimulatorChunk::read_readonly_data(
+        const ComponentSpec& cs, hid_t readonly_pool,
+        shared_ptr<dtype> mapped_pool, hid_t read_plist){
 
-            signal_offset += signal.size;
+    map<long long, size_t> missing;
+    hsize_t total = 0;
 
-            while(*str_ptr != '\0'){
-                str_ptr++;
-            }
+    for(auto& kv : readonly_entries(cs)){
+        if(readonly_store.find(kv.first) == readonly_store.end()){
+            missing.insert(kv);
+            total += kv.second;
+        }
+    }
 
-            if(i < n_signals-1){
-                str_ptr++;
+    if(total == 0){
+        return;
+    }
+
+    hid_t file_space = H5Dget_space(readonly_pool);
+
+    if(mapped_pool){
+        hssize_t pool_size = H5Sget_simple_extent_npoints(file_space);
+        H5Sclose(file_space);
+
+        for(auto& kv : missing){
+            if(kv.first < 0 || kv.first + (long long) kv.second > pool_size){
+                stringstream msg;
+                msg << "Read-only signal at offset " << kv.first << " with "
+                    << kv.second << " entries does not fit in the pool of "
+                    << "read-only signals, which has " << pool_size << " entries.";
+                throw runtime_error(msg.str());
             }
 
-            add_base_signal(signal_keys_buffer[i], signal);
+            readonly_store[kv.first] = shared_ptr<dtype>(
+                mapped_pool, mapped_pool.get() + kv.first);
         }
 
-        // Read operators for component
+        signal_bytes_mapped += total * sizeof(dtype);
+        return;
+    }
 
-        // Open the dataset
-        hid_t operators = H5Dopen(component_group, "operators", H5P_DEFAULT);
+    // Select all missing entries at once. Entries that are adjacent in
+    // the pool are merged into a single block by the selection, so the
+    // entries used by the component are read in as few pieces as possible.
+    H5Sselect_none(file_space);
 
-        // Get number of ops
-        int n_operators;
-        attr = H5Aopen(operators, "n_strings", H5P_DEFAULT);
-        H5Aread(attr, H5T_NATIVE_INT, &n_operators);
-        H5Aclose(attr);
+    for(auto& kv : missing){
+        hsize_t start = kv.first;
+        hsize_t count = kv.second;
 
-        // Get its dimensions
-        dspace = H5Dget_space(operators);
-        ndim = H5Sget_simple_extent_dims(dspace, dset_shape, NULL);
-        H5Sclose(dspace);
+        H5Sselect_hyperslab(file_space, H5S_SELECT_OR, &start, NULL, &count, NULL);
+    }
 
-        // Read the data set
-        auto op_buffer = unique_ptr<char>(new char[dset_shape[0]]);
-        err = H5Dread(operators, str_type, H5S_ALL, H5S_ALL, read_plist, op_buffer.get());
-        H5Dclose(operators);
+    hid_t mem_space = H5Screate_simple(1, &total, NULL);
 
-        // Add the ops
-        str_ptr = op_buffer.get();
+    auto buffer = shared_ptr<dtype>(new dtype[total], default_delete<dtype[]>());
+    H5Dread(
+        readonly_pool, H5T_NATIVE_DTYPE, mem_space, file_space,
+        read_plist, buffer.get());
 
-        for(int op_idx=0; op_idx < n_operators; op_idx++){
-            string op_str = string(str_ptr);
+    H5Sclose(mem_space);
+    H5Sclose(file_space);
 
-            add_op(OpSpec(op_str));
+    // The selected elements are read in order of increasing offset.
+    size_t position = 0;
+    for(auto& kv : missing){
+        readonly_store[kv.first] = shared_ptr<dtype>(buffer, buffer.get() + position);
+        position += kv.second;
+    }
 
-            while(*str_ptr != '\0'){
-                str_ptr++;
+    signal_bytes_stored += total * sizeof(dtype);
+}
+
+void MpiSimulatorChunk::add_signals(const ComponentSpec& cs){
+    // The component's mutable signals take up the next entries of the
+    // arena, in the same layout as in signal_data (with a column per
+    // simulation in batch mode). Unbatched signal data may have been read
+    // into place already.
+    size_t n_entries = cs.signal_data_size * batch_size;
+    dtype* component_data = take_arena(n_entries);
+
+    if(batch_size == 1 && cs.signal_data.get() != component_data){
+        copy_n(cs.signal_data.get(), cs.signal_data_size, component_data);
+    }
+
+    for(unsigned i = 0; i < cs.n_signals; i++){
+        unsigned shape1 = cs.signal_shapes.at(2*i);
+        unsigned shape2 = cs.signal_shapes.at(2*i + 1);
+        long long offset = cs.signal_offsets.at(i);
+
+        shared_ptr<dtype> data;
+        bool batched = false;
+
+        string label = cs.signal_labels.empty() ? "" : cs.signal_labels.at(i);
+
+        if(cs.signal_readonly.at(i)){
+            // Read-only signals with identical values share a single copy.
+            data = readonly_store.at(offset);
+        }else{
+            if(offset + shape1 * shape2 > cs.signal_data_size){
+                stringstream msg;
+                msg << "Signal data for component " << cs.component << " has "
+                    << cs.signal_data_size << " entries, but signal shapes "
+                    << "require more than that.";
+                throw runtime_error(msg.str());
             }
 
-            if(op_idx < n_operators-1){
-                str_ptr++;
+            if(batch_size == 1){
+                data = shared_ptr<dtype>(arena, component_data + offset);
+                signal_bytes_stored += shape1 * shape2 * sizeof(dtype);
+            }else{
+                if(shape2 != 1){
+                    stringstream msg;
+                    msg << "Mutable matrix signals (e.g. weights modified by "
+                        << "learning rules) are not supported in batch mode. "
+                        << "Signal is " << label << ", with key "
+                        << cs.signal_keys.at(i) << ".";
+                    throw runtime_error(msg.str());
+                }
+
+                // Give each simulation in the batch its own column,
+                // starting from the same initial value.
+                data = shared_ptr<dtype>(arena, component_data + offset * batch_size);
+
+                const dtype* values = cs.signal_data.get() + offset;
+                for(unsigned j = 0; j < shape1; j++){
+                    fill_n(data.get() + j * batch_size, batch_size, values[j]);
+                }
+
+                signal_bytes_stored += shape1 * batch_size * sizeof(dtype);
+                batched = true;
             }
         }
 
-        // Read probes for component
+        Signal signal(shape1, shape2, data, label);
 
-        // Open the dataset
-        hid_t probes = H5Dopen(component_group, "probes", H5P_DEFAULT);
+        if(batched){
+            signal = Signal(shape1, batch_size, data, label);
+        }else{
+            signal.stride1 = cs.signal_strides.at(2*i);
+            signal.stride2 = cs.signal_strides.at(2*i + 1);
+        }
 
-        // Get number of probes
-        int n_probes;
-        attr = H5Aopen(probes, "n_strings", H5P_DEFAULT);
-        H5Aread(attr, H5T_NATIVE_INT, &n_probes);
-        H5Aclose(attr);
+        signal_bytes_loaded += signal.size * sizeof(dtype);
 
-        // Get its dimensions
-        dspace = H5Dget_space(probes);
-        ndim = H5Sget_simple_extent_dims(dspace, dset_shape, NULL);
+        add_base_signal(cs.signal_keys.at(i), signal, batched);
+    }
+
+    // Keep the initial values of the mutable signals for resetting.
+    init_arena.insert(
+        init_arena.end(), component_data, component_data + n_entries);
+}
+
+void MpiSimulatorChunk::allocate_arena(size_t size){
+    if(arena){
+        throw logic_error("The arena of an MpiSimulatorChunk can only be allocated once.");
+    }
+
+    void* memory = nullptr;
+    if(posix_memalign(&memory, ARENA_ALIGNMENT, max(size, size_t(1)) * sizeof(dtype)) != 0){
+        throw bad_alloc();
+    }
+
+    arena = shared_ptr<dtype>(static_cast<dtype*>(memory), free);
+    arena_size = size;
+    arena_used = 0;
+
+    init_arena.reserve(size);
+}
+
+dtype* MpiSimulatorChunk::take_arena(size_t size){
+    if(!arena || arena_used + size > arena_size){
+        stringstream msg;
+        msg << "Cannot take " << size << " entries from the arena, which has "
+            << arena_size - arena_used << " entries left." << endl;
+        throw runtime_error(msg.str());
+    }
+
+    dtype* entries = arena.get() + arena_used;
+    arena_used += size;
+
+    return entries;
+}
+
+/* Read a whole dataset, converting its elements to ``mem_type''. */
+template<class T>
+static vector<T> read_vector(
+        hid_t group, const char* name, hid_t mem_type, hid_t read_plist){
+
+    hid_t dset = H5Dopen(group, name, H5P_DEFAULT);
+
+    hid_t dspace = H5Dget_space(dset);
+    hssize_t n_elements = H5Sget_simple_extent_npoints(dspace);
+    H5Sclose(dspace);
+
+    vector<T> values(n_elements);
+
+    if(n_elements > 0){
+        H5Dread(dset, mem_type, H5S_ALL, H5S_ALL, read_plist, values.data());
+    }
+
+    H5Dclose(dset);
+
+    return values;
+}
+
+void MpiSimulatorChunk::read_component(
+        hid_t component_group, hid_t readonly_pool,
+        shared_ptr<dtype> mapped_pool, hid_t read_plist){
+
+    herr_t err;
+    hid_t dspace, attr;
+
+    unsigned ndim;
+    hsize_t dset_shape[2];
+    char* str_ptr;
+
+    hid_t str_type = H5Tcopy(H5T_C_S1);
+    H5Tset_strpad(str_type, H5T_STR_NULLPAD);
+
+    // signals
+    auto signal_keys = read_vector<key_type>(
+        component_group, "signal_keys", H5T_NATIVE_LLONG, read_plist);
+
+    hid_t signals = H5Dopen(component_group, "signals", H5P_DEFAULT);
+    hssize_t signal_data_size = dataset_size(component_group, "signals");
+
+    // Sharded networks store the read-only signals used by each component
+    // in the component's group, otherwise they are read from the pool.
+    // If they are stored contiguously and uncompressed, they are mapped
+    // straight from the file instead of being read.
+    bool own_readonly = H5Lexists(component_group, "readonly_signals", H5P_DEFAULT) > 0;
+    hssize_t readonly_data_size = 0;
+    shared_ptr<dtype> mapped_readonly;
+
+    if(own_readonly){
+        hid_t readonly_signals = H5Dopen(component_group, "readonly_signals", H5P_DEFAULT);
+        dspace = H5Dget_space(readonly_signals);
+        readonly_data_size = H5Sget_simple_extent_npoints(dspace);
         H5Sclose(dspace);
+        mapped_readonly = map_dataset(readonly_signals);
+        H5Dclose(readonly_signals);
+    }
 
-        // Read the data set
-        auto probe_buffer = unique_ptr<char>(new char[dset_shape[0]]);
-        err = H5Dread(probes, str_type, H5S_ALL, H5S_ALL, read_plist, probe_buffer.get());
-        H5Dclose(probes);
+    // Unless each signal needs a copy per simulation in the batch, the
+    // mutable signals are read straight into the arena.
+    shared_ptr<dtype> signal_data;
+    if(batch_size == 1){
+        signal_data = shared_ptr<dtype>(arena, arena.get() + arena_used);
+    }
 
-        // Add the probes
-        str_ptr = probe_buffer.get();
+    ComponentSpec cs(
+        -1, signal_keys.size(), signal_data_size,
+        mapped_readonly ? 0 : readonly_data_size, signal_data);
+    cs.signal_keys = signal_keys;
 
-        for(int probe_idx=0; probe_idx < n_probes; probe_idx++){
-            string probe_str = string(str_ptr);
-            add_probe(ProbeSpec(probe_str));
+    if(mapped_readonly){
+        cs.readonly_data_size = readonly_data_size;
+        cs.readonly_data = mapped_readonly;
+        cs.readonly_mapped = true;
+    }
 
-            while(*str_ptr != '\0'){
-                str_ptr++;
-            }
+    if(signal_data_size > 0){
+        H5Dread(
+            signals, H5T_NATIVE_DTYPE, H5S_ALL, H5S_ALL,
+            read_plist, cs.signal_data.get());
+    }
 
-            if(probe_idx < n_probes-1){
-                str_ptr++;
-            }
-        }
+    H5Dclose(signals);
 
-        H5Gclose(component_group);
+    if(readonly_data_size > 0 && !mapped_readonly){
+        hid_t readonly_signals = H5Dopen(component_group, "readonly_signals", H5P_DEFAULT);
+        H5Dread(
+            readonly_signals, H5T_NATIVE_DTYPE, H5S_ALL, H5S_ALL,
+            read_plist, cs.readonly_data.get());
+        H5Dclose(readonly_signals);
+    }
 
-        component += n_processors;
+    cs.signal_shapes = read_vector<long long>(
+        component_group, "signal_shapes", H5T_NATIVE_LLONG, read_plist);
+    cs.signal_strides = read_vector<long long>(
+        component_group, "signal_strides", H5T_NATIVE_LLONG, read_plist);
+    cs.signal_offsets = read_vector<long long>(
+        component_group, "signal_offsets", H5T_NATIVE_LLONG, read_plist);
+    cs.signal_readonly = read_vector<unsigned char>(
+        component_group, "signal_readonly", H5T_NATIVE_UCHAR, read_plist);
+
+    assert(cs.signal_shapes.size() == 2 * cs.n_signals);
+    assert(cs.signal_strides.size() == 2 * cs.n_signals);
+    assert(cs.signal_offsets.size() == cs.n_signals);
+    assert(cs.signal_readonly.size() == cs.n_signals);
+
+    hid_t labels = H5Dopen(component_group, "signal_labels", H5P_DEFAULT);
+    cs.signal_labels = read_string_list(labels, read_plist);
+    H5Dclose(labels);
+
+    if(own_readonly){
+        add_readonly_data(cs);
+    }else{
+        read_readonly_data(cs, readonly_pool, mapped_pool, read_plist);
     }
 
-    // Read probe info - all processes need info about all active probes
-    // for purposes of writing results to the HDF5 file.
+    add_signals(cs);
+
+    // Read operators for component
+    read_op_tables(component_group, read_plist);
+
+    // Read probes for component
 
     // Open the dataset
-    hid_t probe_info_dset = H5Dopen(f, "probe_info", H5P_DEFAULT);
+    hid_t probes = H5Dopen(component_group, "probes", H5P_DEFAULT);
 
-    // Get total number of probes in simulation
-    int n_total_probes;
-    attr = H5Aopen(probe_info_dset, "n_strings", H5P_DEFAULT);
-    H5Aread(attr, H5T_NATIVE_INT, &n_total_probes);
+    // Get number of probes
+    int n_probes;
+    attr = H5Aopen(probes, "n_strings", H5P_DEFAULT);
+    H5Aread(attr, H5T_NATIVE_INT, &n_probes);
     H5Aclose(attr);
 
     // Get its dimensions
-    dspace = H5Dget_space(probe_info_dset);
+    dspace = H5Dget_space(probes);
     ndim = H5Sget_simple_extent_dims(dspace, dset_shape, NULL);
     H5Sclose(dspace);
 
     // Read the data set
     auto probe_buffer = unique_ptr<char>(new char[dset_shape[0]]);
-    err = H5Dread(probe_info_dset, str_type, H5S_ALL, H5S_ALL, read_plist, probe_buffer.get());
-    H5Dclose(probe_info_dset);
+    err = H5Dread(probes, str_type, H5S_ALL, H5S_ALL, read_plist, probe_buffer.get());
+    H5Dclose(probes);
 
+    // Add the probes
     str_ptr = probe_buffer.get();
 
-    for(int probe_idx=0; probe_idx < n_total_probes; probe_idx++){
+    for(int probe_idx=0; probe_idx < n_probes; probe_idx++){
         string probe_str = string(str_ptr);
-        probe_info.push_back(probe_str);
+        add_probe(ProbeSpec(probe_str));
 
         while(*str_ptr != '\0'){
             str_ptr++;
         }
 
-        if(probe_idx < n_total_probes-1){
+        if(probe_idx < n_probes-1){
             str_ptr++;
         }
     }
 
-    H5Fclose(f);
+    H5Tclose(str_type);
+}
+
+void MpiSimulatorChunk::read_op_tables(hid_t component_group, hid_t read_plist){
+    hid_t dspace;
+    unsigned ndim;
+    hsize_t dset_shape[3];
+
+    hid_t op_group = H5Gopen(component_group, "operators", H5P_DEFAULT);
+    hid_t data_group = H5Gopen(component_group, "op_data", H5P_DEFAULT);
+
+    H5G_info_t group_info;
+    H5Gget_info(op_group, &group_info);
+
+    // One group per operator type
+    for(hsize_t type_idx = 0; type_idx < group_info.nlinks; type_idx++){
+        ssize_t name_length = H5Lget_name_by_idx(
+            op_group, ".", H5_INDEX_NAME, H5_ITER_INC, type_idx, NULL, 0, H5P_DEFAULT);
+
+        auto name_buffer = unique_ptr<char[]>(new char[name_length + 1]);
+        H5Lget_name_by_idx(
+            op_group, ".", H5_INDEX_NAME, H5_ITER_INC, type_idx,
+            name_buffer.get(), name_length + 1, H5P_DEFAULT);
+
+        string type_string(name_buffer.get());
+        hid_t type_group = H5Gopen(op_group, type_string.c_str(), H5P_DEFAULT);
+
+        // index
+        hid_t index_dset = H5Dopen(type_group, "index", H5P_DEFAULT);
+
+        dspace = H5Dget_space(index_dset);
+        ndim = H5Sget_simple_extent_dims(dspace, dset_shape, NULL);
+        H5Sclose(dspace);
+
+        assert(ndim == 1);
+
+        hsize_t n_ops = dset_shape[0];
+        auto index_buffer = unique_ptr<long long[]>(new long long[n_ops]);
+        H5Dread(
+            index_dset, H5T_NATIVE_LLONG, H5S_ALL, H5S_ALL,
+            read_plist, index_buffer.get());
+        H5Dclose(index_dset);
+
+        // signals
+        hsize_t n_signals = 0;
+        unique_ptr<long long[]> signal_buffer;
+
+        if(H5Lexists(type_group, "signals", H5P_DEFAULT) > 0){
+            hid_t signals_dset = H5Dopen(type_group, "signals", H5P_DEFAULT);
+
+            dspace = H5Dget_space(signals_dset);
+            ndim = H5Sget_simple_extent_dims(dspace, dset_shape, NULL);
+            H5Sclose(dspace);
+
+            assert(ndim == 3);
+            assert(dset_shape[0] == n_ops);
+            assert(dset_shape[2] == SIGNAL_RECORD_SIZE);
+
+            n_signals = dset_shape[1];
+            signal_buffer = unique_ptr<long long[]>(
+                new long long[n_ops * n_signals * SIGNAL_RECORD_SIZE]);
+            H5Dread(
+                signals_dset, H5T_NATIVE_LLONG, H5S_ALL, H5S_ALL,
+                read_plist, signal_buffer.get());
+            H5Dclose(signals_dset);
+        }
+
+        // params
+        hsize_t n_params = 0;
+        unique_ptr<double[]> param_buffer;
+
+        if(H5Lexists(type_group, "params", H5P_DEFAULT) > 0){
+            hid_t params_dset = H5Dopen(type_group, "params", H5P_DEFAULT);
+
+            dspace = H5Dget_space(params_dset);
+            ndim = H5Sget_simple_extent_dims(dspace, dset_shape, NULL);
+            H5Sclose(dspace);
+
+            assert(ndim == 2);
+            assert(dset_shape[0] == n_ops);
+
+            n_params = dset_shape[1];
+            param_buffer = unique_ptr<double[]>(new double[n_ops * n_params]);
+            H5Dread(
+                params_dset, H5T_NATIVE_DOUBLE, H5S_ALL, H5S_ALL,
+                read_plist, param_buffer.get());
+            H5Dclose(params_dset);
+        }
+
+        // arrays
+        hsize_t n_arrays = 0;
+        unique_ptr<long long[]> array_buffer;
+
+        if(H5Lexists(type_group, "arrays", H5P_DEFAULT) > 0){
+            hid_t arrays_dset = H5Dopen(type_group, "arrays", H5P_DEFAULT);
+
+            dspace = H5Dget_space(arrays_dset);
+            ndim = H5Sget_simple_extent_dims(dspace, dset_shape, NULL);
+            H5Sclose(dspace);
+
+            assert(ndim == 2);
+            assert(dset_shape[0] == n_ops);
+
+            n_arrays = dset_shape[1];
+            array_buffer = unique_ptr<long long[]>(new long long[n_ops * n_arrays]);
+            H5Dread(
+                arrays_dset, H5T_NATIVE_LLONG, H5S_ALL, H5S_ALL,
+                read_plist, array_buffer.get());
+            H5Dclose(arrays_dset);
+        }
+
+        H5Gclose(type_group);
+
+        for(hsize_t i = 0; i < n_ops; i++){
+            OpSpec op_spec(type_string, index_buffer[i]);
+
+            for(hsize_t j = 0; j < n_signals; j++){
+                op_spec.signals.push_back(
+                    SignalSpec(signal_buffer.get() + (i * n_signals + j) * SIGNAL_RECORD_SIZE));
+            }
+
+            for(hsize_t j = 0; j < n_params; j++){
+                op_spec.params.push_back(param_buffer[i * n_params + j]);
+            }
+
+            for(hsize_t j = 0; j < n_arrays; j++){
+                string array_name = std::to_string(array_buffer[i * n_arrays + j]);
+                hid_t array_dset = H5Dopen(data_group, array_name.c_str(), H5P_DEFAULT);
+
+                hid_t array_type = H5Dget_type(array_dset);
+                bool is_string = H5Tget_class(array_type) == H5T_STRING;
+                H5Tclose(array_type);
+
+                if(is_string){
+                    op_spec.string_lists.push_back(read_string_list(array_dset, read_plist));
+                }else{
+                    dspace = H5Dget_space(array_dset);
+                    ndim = H5Sget_simple_extent_dims(dspace, dset_shape, NULL);
+                    H5Sclose(dspace);
+
+                    // Flat arrays become column vectors
+                    unsigned shape1 = dset_shape[0];
+                    unsigned shape2 = ndim == 2 ? dset_shape[1] : 1;
+                    Signal array(shape1, shape2, 0.0);
+
+                    if(array.size > 0){
+                        H5Dread(
+                            array_dset, H5T_NATIVE_DTYPE, H5S_ALL, H5S_ALL,
+                            read_plist, array.raw_data);
+                    }
+
+                    op_spec.arrays.push_back(array);
+                }
+
+                H5Dclose(array_dset);
+            }
+
+            add_op(op_spec);
+        }
+    }
+
+    H5Gclose(data_group);
+    H5Gclose(op_group);
 }
 
 void MpiSimulatorChunk::finalize_build(){
     finalize_build(MPI_COMM_NULL);
 }
 
+void MpiSimulatorChunk::set_trial(unsigned trial, unsigned n_trials, MPI_Comm parent_comm){
+    if(trial >= n_trials){
+        stringstream msg;
+        msg << "Trial index " << trial << " out of range for "
+            << n_trials << " trials." << endl;
+        throw runtime_error(msg.str());
+    }
+
+    this->trial = trial;
+    this->n_trials = n_trials;
+    trials_comm = parent_comm;
+}
+
 void MpiSimulatorChunk::finalize_build(MPI_Comm comm){
-    if(n_processors != 1){
+    if(n_trials > 1){
+        // All trials write to the same file, so even single-process
+        // trials need a parallel log.
         sim_log = unique_ptr<SimulationLog>(
-            new ParallelSimulationLog(n_processors, rank, probe_info, dt, comm));
+            new ParallelSimulationLog(
+                n_processors, rank, probe_info, dt, comm, batch_size,
+                trial, n_trials, trials_comm));
+    }else if(n_processors != 1){
+        sim_log = unique_ptr<SimulationLog>(
+            new ParallelSimulationLog(
+                n_processors, rank, probe_info, dt, comm, batch_size));
     }else{
-        sim_log = unique_ptr<SimulationLog>(new SimulationLog(probe_info, dt));
+        sim_log = unique_ptr<SimulationLog>(
+            new SimulationLog(probe_info, dt, batch_size));
     }
 
     for(auto& send: mpi_sends){
@@ -315,6 +937,59 @@ void MpiSimulatorChunk::finalize_build(MPI_Comm comm){
 
     // Important: ensures ops are executed in correct order
     operator_list.sort(compare_op_ptr);
+
+    fuse_dot_incs();
+    group_lifs();
+
+    unsigned long long signal_bytes[4] = {
+        signal_bytes_loaded, signal_bytes_stored, init_arena.size() * sizeof(dtype),
+        signal_bytes_mapped};
+
+    if(comm != MPI_COMM_NULL){
+        unsigned long long local_bytes[4] = {
+            signal_bytes[0], signal_bytes[1], signal_bytes[2], signal_bytes[3]};
+        MPI_Reduce(
+            local_bytes, signal_bytes, 4, MPI_UNSIGNED_LONG_LONG,
+            MPI_SUM, 0, comm);
+    }
+
+    if(rank == 0){
+        cout << "Signal memory: " << signal_bytes[0] << " bytes before "
+             << "deduplication of read-only signals, " << signal_bytes[1]
+             << " bytes after, plus " << signal_bytes[2] << " bytes of "
+             << "initial values kept for resetting mutable signals." << endl;
+
+        if(signal_bytes[3] > 0){
+            cout << "A further " << signal_bytes[3] << " bytes of read-only "
+                 << "signals are mapped from the network file." << endl;
+        }
+    }
+
+    // Peak resident memory of each process, which includes the operators
+    // and signal views as well as the signal values counted above.
+    struct rusage usage;
+    getrusage(RUSAGE_SELF, &usage);
+    unsigned long long peak_bytes = 1024ULL * usage.ru_maxrss;
+
+    unsigned long long max_peak_bytes = peak_bytes;
+    unsigned long long total_peak_bytes = peak_bytes;
+    int n_reporting = 1;
+
+    if(comm != MPI_COMM_NULL){
+        MPI_Reduce(
+            &peak_bytes, &max_peak_bytes, 1, MPI_UNSIGNED_LONG_LONG,
+            MPI_MAX, 0, comm);
+        MPI_Reduce(
+            &peak_bytes, &total_peak_bytes, 1, MPI_UNSIGNED_LONG_LONG,
+            MPI_SUM, 0, comm);
+        MPI_Comm_size(comm, &n_reporting);
+    }
+
+    if(rank == 0){
+        cout << "Peak memory per process after loading: "
+             << total_peak_bytes / n_reporting << " bytes on average, "
+             << max_peak_bytes << " bytes at most." << endl;
+    }
 }
 
 void MpiSimulatorChunk::run_n_steps(int steps, bool progress){
@@ -421,25 +1096,25 @@ void MpiSimulatorChunk::run_n_steps(int steps, bool progress){
 }
 
 void MpiSimulatorChunk::reset(unsigned seed){
+    seed += trial * batch_size;
+
     for(Operator* op: operator_list){
         op->reset(seed + op->get_seed_modifier());
     }
 
-    // TODO: store whether signals are read-only, only reset if they are not.
-    for(auto& kv: signal_map){
-        key_type key = kv.first;
-        Signal sig = signal_map.at(key);
-        Signal init_value = signal_init_value.at(key);
-        sig.fill_with(init_value);
+    // Read-only signals never change, so only the mutable signals, which
+    // are all in the arena, are restored.
+    if(!init_arena.empty()){
+        memcpy(arena.get(), init_arena.data(), init_arena.size() * sizeof(dtype));
     }
 }
 
-void MpiSimulatorChunk::add_base_signal(key_type key, Signal signal){
+void MpiSimulatorChunk::add_base_signal(key_type key, Signal signal, bool batched){
 
-    auto key_location = signal_map.find(key);
+    auto key_location = signal_indices.find(key);
 
-    if(key_location != signal_map.end()){
-        if(signal != signal_map[key]){
+    if(key_location != signal_indices.end()){
+        if(signal != base_signals.at(key_location->second)){
             stringstream msg;
             msg << "Adding signal with duplicate key to chunk with rank " << rank
                 << ", but the data is not identical. Key is: " << key << "." << endl;
@@ -447,23 +1122,224 @@ void MpiSimulatorChunk::add_base_signal(key_type key, Signal signal){
             throw logic_error(msg.str());
         }
     }else{
-        signal_init_value[key] = signal.deep_copy();
-        signal_map[key] = signal;
+        signal_indices[key] = base_signals.size();
+        base_signals.push_back(signal);
+        batched_signals.push_back(batched);
     }
 }
 
-Signal MpiSimulatorChunk::get_signal_view(
-        key_type key, string label, unsigned ndim,
-        unsigned shape1, unsigned shape2, int stride1, int stride2,
-        unsigned offset){
+unsigned MpiSimulatorChunk::signal_index(key_type key) const{
+    auto key_location = signal_indices.find(key);
 
-    if(signal_map.find(key) == signal_map.end()){
+    if(key_location == signal_indices.end()){
         stringstream msg;
         msg << "In MpiSimulatorChunk, could not find a signal "
             << "with key " << key << "." << endl;
         throw out_of_range(msg.str());
     }
 
+    return key_location->second;
+}
+
+bool MpiSimulatorChunk::is_readonly(const SignalView& signal) const{
+    const dtype* start = arena.get();
+    return !(signal.raw_data >= start && signal.raw_data < start + arena_used);
+}
+
+// The first and one-past-the-last entries of the memory spanned by a view.
+static pair<const dtype*, const dtype*> signal_span(const SignalView& signal){
+    const dtype* first = signal.raw_data;
+    const dtype* last = signal.raw_data;
+
+    for(int step: {int(signal.shape1 - 1) * signal.stride1,
+                   int(signal.shape2 - 1) * signal.stride2}){
+        if(step < 0){
+            first += step;
+        }else{
+            last += step;
+        }
+    }
+
+    return make_pair(first, last + 1);
+}
+
+static bool overlaps(const SignalView& left, const SignalView& right){
+    auto l = signal_span(left);
+    auto r = signal_span(right);
+
+    return l.first < r.second && r.first < l.second;
+}
+
+static bool same_view(const SignalView& left, const SignalView& right){
+    return left.raw_data == right.raw_data &&
+        left.shape1 == right.shape1 && left.shape2 == right.shape2 &&
+        left.stride1 == right.stride1 && left.stride2 == right.stride2;
+}
+
+void MpiSimulatorChunk::fuse_dot_incs(){
+    list<Operator*> fused_list;
+    unordered_set<Operator*> fused;
+
+    // The DotIncs of the current run, grouped by the X they multiply, in
+    // order of the first DotInc in each group, and the Ys of the run.
+    vector<vector<DotInc*>> groups;
+    vector<SignalView> run_Y;
+
+    auto end_run = [&](){
+        for(auto& group: groups){
+            if(group.size() == 1){
+                fused_list.push_back(group.front());
+                continue;
+            }
+
+            unique_ptr<Operator> op(new DotIncGroup(group));
+            op->set_index(group.front()->get_index());
+
+            fused_list.push_back(op.get());
+            operator_store.push_back(move(op));
+            fused.insert(group.begin(), group.end());
+        }
+
+        groups.clear();
+        run_Y.clear();
+    };
+
+    for(Operator* op: operator_list){
+        DotInc* dot_inc = dynamic_cast<DotInc*>(op);
+
+        bool fusable =
+            dot_inc && !dot_inc->is_scalar() &&
+            dot_inc->get_A().size <= MAX_FUSED_DOTINC_SIZE &&
+            is_readonly(dot_inc->get_A()) &&
+            !overlaps(dot_inc->get_Y(), dot_inc->get_X());
+
+        if(!fusable){
+            end_run();
+            fused_list.push_back(op);
+            continue;
+        }
+
+        const SignalView& X = dot_inc->get_X();
+        const SignalView& Y = dot_inc->get_Y();
+
+        auto group = find_if(
+            groups.begin(), groups.end(),
+            [&](const vector<DotInc*>& g){
+                return same_view(g.front()->get_X(), X);
+            });
+
+        // The DotIncs of a run must not write to the X of any DotInc in it.
+        bool conflict = any_of(
+            groups.begin(), groups.end(),
+            [&](const vector<DotInc*>& g){
+                return overlaps(Y, g.front()->get_X());
+            });
+
+        if(!conflict && group == groups.end()){
+            conflict = any_of(
+                run_Y.begin(), run_Y.end(),
+                [&](const SignalView& y){ return overlaps(y, X); });
+        }
+
+        if(conflict){
+            end_run();
+            group = groups.end();
+        }
+
+        if(group == groups.end()){
+            groups.push_back(vector<DotInc*>(1, dot_inc));
+        }else{
+            group->push_back(dot_inc);
+        }
+
+        run_Y.push_back(Y);
+    }
+
+    end_run();
+
+    operator_list.swap(fused_list);
+    operator_store.remove_if(
+        [&](const unique_ptr<Operator>& op){ return fused.count(op.get()) > 0; });
+
+    build_dbg("Fused " << fused.size() << " DotIncs into DotIncGroups.");
+}
+
+void MpiSimulatorChunk::group_lifs(){
+    list<Operator*> grouped_list;
+    unordered_set<Operator*> grouped;
+
+    vector<LIF*> run;
+    vector<LIFGroup::Segment> run_segments;
+
+    auto end_run = [&](){
+        if(run.size() == 1){
+            grouped_list.push_back(run.front());
+        }else if(run.size() > 1){
+            unique_ptr<Operator> op(new LIFGroup(run));
+            op->set_index(run.front()->get_index());
+
+            grouped_list.push_back(op.get());
+            operator_store.push_back(move(op));
+            grouped.insert(run.begin(), run.end());
+        }
+
+        run.clear();
+        run_segments.clear();
+    };
+
+    for(Operator* op: operator_list){
+        // AdaptiveLIFs are also LIFs, but are not grouped.
+        LIF* lif = op->classname() == "LIF" ? dynamic_cast<LIF*>(op) : nullptr;
+
+        if(!lif){
+            end_run();
+            grouped_list.push_back(op);
+            continue;
+        }
+
+        LIFGroup::Segment segment = LIFGroup::make_segment(*lif);
+
+        bool conflict =
+            !run.empty() && !LIFGroup::same_parameters(*run.front(), *lif);
+
+        for(auto& s: run_segments){
+            if(conflict){
+                break;
+            }
+
+            for(auto written: {&s.output, &s.voltage, &s.ref_time}){
+                conflict |= overlaps(*written, segment.J);
+            }
+
+            for(auto written: {&segment.output, &segment.voltage, &segment.ref_time}){
+                conflict |= overlaps(*written, s.J);
+            }
+        }
+
+        if(conflict){
+            end_run();
+        }
+
+        run.push_back(lif);
+        run_segments.push_back(segment);
+    }
+
+    end_run();
+
+    operator_list.swap(grouped_list);
+    operator_store.remove_if(
+        [&](const unique_ptr<Operator>& op){ return grouped.count(op.get()) > 0; });
+
+    build_dbg("Grouped " << grouped.size() << " LIFs into LIFGroups.");
+}
+
+Signal MpiSimulatorChunk::get_signal_view(
+        key_type key, string label, unsigned ndim,
+        unsigned shape1, unsigned shape2, int stride1, int stride2,
+        unsigned offset){
+
+    unsigned index = signal_index(key);
+
     build_dbg("Getting view with args -");
     build_dbg("label: " << label);
     build_dbg("key: " << key);
@@ -474,8 +1350,26 @@ Signal MpiSimulatorChunk::get_signal_view(
     build_dbg("stride2: " << stride2);
     build_dbg("offset: " << offset);
 
-    auto view = signal_map.at(key).get_view(
-        label, ndim, shape1, shape2, stride1, stride2, offset);
+    Signal view;
+
+    if(batched_signals[index]){
+        if(shape2 != 1){
+            stringstream msg;
+            msg << "In MpiSimulatorChunk, got a matrix view of batched "
+                << "signal with key " << key << ". Views of batched "
+                << "signals must be vectors." << endl;
+            throw runtime_error(msg.str());
+        }
+
+        // Each row of the view holds the values of one element of the
+        // vector for every simulation in the batch.
+        view = base_signals[index].get_view(
+            label, 2, shape1, batch_size, stride1 * batch_size, 1,
+            offset * batch_size);
+    }else{
+        view = base_signals[index].get_view(
+            label, ndim, shape1, shape2, stride1, stride2, offset);
+    }
 
     build_dbg("Retrieved view: " << view);
 
@@ -492,61 +1386,76 @@ Signal MpiSimulatorChunk::get_signal_view(string ss){
     return get_signal_view(SignalSpec(ss));
 }
 
-Signal MpiSimulatorChunk::get_signal(key_type key){
-    if(signal_map.find(key) == signal_map.end()){
+Signal MpiSimulatorChunk::get_flat_signal_view(SignalSpec ss){
+    Signal view = get_signal_view(ss);
+    unsigned index = signal_index(ss.key);
+
+    if(!batched_signals[index]){
+        return view;
+    }
+
+    if(!view.is_contiguous){
         stringstream msg;
-        msg << "In MpiSimulatorChunk, could not find a signal "
-            << "with key " << key << "." << endl;
-        throw out_of_range(msg.str());
+        msg << "In MpiSimulatorChunk, could not get a vector view of "
+            << "batched signal with key " << ss.key << " since its "
+            << "elements are not contiguous." << endl;
+        throw runtime_error(msg.str());
     }
 
-    return signal_map.at(key);
+    return base_signals[index].get_view(
+        ss.label, 1, view.size, 1, 1, 1, view.offset);
+}
+
+Signal MpiSimulatorChunk::get_signal(key_type key){
+    return base_signals[signal_index(key)];
 }
 
 void MpiSimulatorChunk::add_op(OpSpec op_spec){
     string type_string = op_spec.type_string;
-    vector<string>& args = op_spec.arguments;
-    float index = op_spec.index;
+    vector<SignalSpec>& signals = op_spec.signals;
+    vector<dtype>& params = op_spec.params;
+    vector<Signal>& arrays = op_spec.arrays;
+    long long index = op_spec.index;
 
     try{
         if(type_string.compare("TimeUpdate") == 0){
-            Signal step = get_signal_view(args[0]);
-            Signal time = get_signal_view(args[1]);
-            dtype dt = boost::lexical_cast<dtype>(args[2]);
+            Signal step = get_signal_view(signals.at(0));
+            Signal time = get_signal_view(signals.at(1));
+            dtype dt = params.at(0);
 
             add_time_update(
                 index,
                 unique_ptr<TimeUpdate>(new TimeUpdate(step, time, dt)));
 
         }else if(type_string.compare("Reset") == 0){
-            Signal dst = get_signal_view(args[0]);
-            dtype value = boost::lexical_cast<dtype>(args[1]);
+            Signal dst = get_signal_view(signals.at(0));
+            dtype value = params.at(0);
 
             add_op(index, unique_ptr<Operator>(new Reset(dst, value)));
 
         }else if(type_string.compare("Copy") == 0){
 
-            Signal dst = get_signal_view(args[0]);
-            Signal src = get_signal_view(args[1]);
+            Signal dst = get_signal_view(signals.at(0));
+            Signal src = get_signal_view(signals.at(1));
 
             add_op(index, unique_ptr<Operator>(new Copy(dst, src)));
 
         }else if(type_string.compare("SlicedCopy") == 0){
-            Signal src = get_signal_view(args[0]);
-            Signal dst = get_signal_view(args[1]);
+            Signal src = get_signal_view(signals.at(0));
+            Signal dst = get_signal_view(signals.at(1));
 
-            int start_src = boost::lexical_cast<int>(args[2]);
-            int stop_src = boost::lexical_cast<int>(args[3]);
-            int step_src = boost::lexical_cast<int>(args[4]);
+            int start_src = int(params.at(0));
+            int stop_src = int(params.at(1));
+            int step_src = int(params.at(2));
 
-            int start_dst = boost::lexical_cast<int>(args[5]);
-            int stop_dst = boost::lexical_cast<int>(args[6]);
-            int step_dst = boost::lexical_cast<int>(args[7]);
+            int start_dst = int(params.at(3));
+            int stop_dst = int(params.at(4));
+            int step_dst = int(params.at(5));
 
-            vector<int> seq_src = python_list_to_index_vector(args[8]);
-            vector<int> seq_dst = python_list_to_index_vector(args[9]);
+            vector<int> seq_src = signal_to_index_vector(arrays.at(0));
+            vector<int> seq_dst = signal_to_index_vector(arrays.at(1));
 
-            bool inc = bool(boost::lexical_cast<int>(args[10]));
+            bool inc = bool(params.at(6));
 
             add_op(index, unique_ptr<Operator>(
                 new SlicedCopy(
@@ -556,30 +1465,30 @@ void MpiSimulatorChunk::add_op(OpSpec op_spec){
                     seq_src, seq_dst, inc)));
 
         }else if(type_string.compare("DotInc") == 0){
-            Signal A = get_signal_view(args[0]);
-            Signal X = get_signal_view(args[1]);
-            Signal Y = get_signal_view(args[2]);
+            Signal A = get_signal_view(signals.at(0));
+            Signal X = get_signal_view(signals.at(1));
+            Signal Y = get_signal_view(signals.at(2));
 
             add_op(index, unique_ptr<Operator>(new DotInc(A, X, Y)));
 
         }else if(type_string.compare("ElementwiseInc") == 0){
-            Signal A = get_signal_view(args[0]);
-            Signal X = get_signal_view(args[1]);
-            Signal Y = get_signal_view(args[2]);
+            Signal A = get_signal_view(signals.at(0));
+            Signal X = get_signal_view(signals.at(1));
+            Signal Y = get_signal_view(signals.at(2));
 
             add_op(index, unique_ptr<Operator>(new ElementwiseInc(A, X, Y)));
 
         }else if(type_string.compare("LIF") == 0){
-            int n_neurons = boost::lexical_cast<int>(args[0]);
-            dtype tau_rc = boost::lexical_cast<dtype>(args[1]);
-            dtype tau_ref = boost::lexical_cast<dtype>(args[2]);
-            dtype min_voltage = boost::lexical_cast<dtype>(args[3]);
-            dtype dt = boost::lexical_cast<dtype>(args[4]);
+            int n_neurons = int(params.at(0)) * batch_size;
+            dtype tau_rc = params.at(1);
+            dtype tau_ref = params.at(2);
+            dtype min_voltage = params.at(3);
+            dtype dt = params.at(4);
 
-            Signal J = get_signal_view(args[5]);
-            Signal output = get_signal_view(args[6]);
-            Signal voltage = get_signal_view(args[7]);
-            Signal ref_time = get_signal_view(args[8]);
+            Signal J = get_flat_signal_view(signals.at(0));
+            Signal output = get_flat_signal_view(signals.at(1));
+            Signal voltage = get_flat_signal_view(signals.at(2));
+            Signal ref_time = get_flat_signal_view(signals.at(3));
 
             add_op(index, unique_ptr<Operator>(
                 new LIF(
@@ -587,32 +1496,32 @@ void MpiSimulatorChunk::add_op(OpSpec op_spec){
                     dt, J, output, voltage, ref_time)));
 
         }else if(type_string.compare("LIFRate") == 0){
-            int n_neurons = boost::lexical_cast<int>(args[0]);
-            dtype tau_rc = boost::lexical_cast<dtype>(args[1]);
-            dtype tau_ref = boost::lexical_cast<dtype>(args[2]);
+            int n_neurons = int(params.at(0)) * batch_size;
+            dtype tau_rc = params.at(1);
+            dtype tau_ref = params.at(2);
 
-            Signal J = get_signal_view(args[3]);
-            Signal output = get_signal_view(args[4]);
+            Signal J = get_flat_signal_view(signals.at(0));
+            Signal output = get_flat_signal_view(signals.at(1));
 
             add_op(index, unique_ptr<Operator>(
                 new LIFRate(n_neurons, tau_rc, tau_ref, J, output)));
 
         }else if(type_string.compare("AdaptiveLIF") == 0){
-            int n_neurons = boost::lexical_cast<int>(args[0]);
+            int n_neurons = int(params.at(0)) * batch_size;
 
-            dtype tau_n = boost::lexical_cast<dtype>(args[1]);
-            dtype inc_n = boost::lexical_cast<dtype>(args[2]);
+            dtype tau_n = params.at(1);
+            dtype inc_n = params.at(2);
 
-            dtype tau_rc = boost::lexical_cast<dtype>(args[3]);
-            dtype tau_ref = boost::lexical_cast<dtype>(args[4]);
-            dtype min_voltage = boost::lexical_cast<dtype>(args[5]);
-            dtype dt = boost::lexical_cast<dtype>(args[6]);
+            dtype tau_rc = params.at(3);
+            dtype tau_ref = params.at(4);
+            dtype min_voltage = params.at(5);
+            dtype dt = params.at(6);
 
-            Signal J = get_signal_view(args[7]);
-            Signal output = get_signal_view(args[8]);
-            Signal voltage = get_signal_view(args[9]);
-            Signal ref_time = get_signal_view(args[10]);
-            Signal adaptation = get_signal_view(args[11]);
+            Signal J = get_flat_signal_view(signals.at(0));
+            Signal output = get_flat_signal_view(signals.at(1));
+            Signal voltage = get_flat_signal_view(signals.at(2));
+            Signal ref_time = get_flat_signal_view(signals.at(3));
+            Signal adaptation = get_flat_signal_view(signals.at(4));
 
             add_op(index, unique_ptr<Operator>(
                 new AdaptiveLIF(
@@ -621,19 +1530,19 @@ void MpiSimulatorChunk::add_op(OpSpec op_spec){
                     adaptation)));
 
         }else if(type_string.compare("AdaptiveLIFRate") == 0){
-            int n_neurons = boost::lexical_cast<int>(args[0]);
+            int n_neurons = int(params.at(0)) * batch_size;
 
-            dtype tau_n = boost::lexical_cast<dtype>(args[1]);
-            dtype inc_n = boost::lexical_cast<dtype>(args[2]);
+            dtype tau_n = params.at(1);
+            dtype inc_n = params.at(2);
 
-            dtype tau_rc = boost::lexical_cast<dtype>(args[3]);
-            dtype tau_ref = boost::lexical_cast<dtype>(args[4]);
+            dtype tau_rc = params.at(3);
+            dtype tau_ref = params.at(4);
 
-            dtype dt = boost::lexical_cast<dtype>(args[5]);
+            dtype dt = params.at(5);
 
-            Signal J = get_signal_view(args[6]);
-            Signal output = get_signal_view(args[7]);
-            Signal adaptation = get_signal_view(args[8]);
+            Signal J = get_flat_signal_view(signals.at(0));
+            Signal output = get_flat_signal_view(signals.at(1));
+            Signal adaptation = get_flat_signal_view(signals.at(2));
 
             add_op(index, unique_ptr<Operator>(
                 new AdaptiveLIFRate(
@@ -641,83 +1550,82 @@ void MpiSimulatorChunk::add_op(OpSpec op_spec){
                     dt, J, output, adaptation)));
 
         }else if(type_string.compare("RectifiedLinear") == 0){
-            int n_neurons = boost::lexical_cast<int>(args[0]);
+            int n_neurons = int(params.at(0)) * batch_size;
 
-            Signal J = get_signal_view(args[1]);
-            Signal output = get_signal_view(args[2]);
+            Signal J = get_flat_signal_view(signals.at(0));
+            Signal output = get_flat_signal_view(signals.at(1));
 
             add_op(index, unique_ptr<Operator>(new RectifiedLinear(n_neurons, J, output)));
 
         }else if(type_string.compare("Sigmoid") == 0){
-            int n_neurons = boost::lexical_cast<int>(args[0]);
-            dtype tau_ref = boost::lexical_cast<dtype>(args[1]);
+            int n_neurons = int(params.at(0)) * batch_size;
+            dtype tau_ref = params.at(1);
 
-            Signal J = get_signal_view(args[2]);
-            Signal output = get_signal_view(args[3]);
+            Signal J = get_flat_signal_view(signals.at(0));
+            Signal output = get_flat_signal_view(signals.at(1));
 
             add_op(index, unique_ptr<Operator>(new Sigmoid(n_neurons, tau_ref, J, output)));
 
         }else if(type_string.compare("NoDenSynapse") == 0){
 
-            Signal input = get_signal_view(args[0]);
-            Signal output = get_signal_view(args[1]);
-            dtype b = boost::lexical_cast<dtype>(args[2]);
+            Signal input = get_signal_view(signals.at(0));
+            Signal output = get_signal_view(signals.at(1));
+            dtype b = params.at(0);
 
             add_op(index, unique_ptr<Operator>(new NoDenSynapse(input, output, b)));
 
         }else if(type_string.compare("SimpleSynapse") == 0){
 
-            Signal input = get_signal_view(args[0]);
-            Signal output = get_signal_view(args[1]);
-            dtype a = boost::lexical_cast<dtype>(args[2]);
-            dtype b = boost::lexical_cast<dtype>(args[3]);
+            Signal input = get_signal_view(signals.at(0));
+            Signal output = get_signal_view(signals.at(1));
+            dtype a = params.at(0);
+            dtype b = params.at(1);
 
             add_op(index, unique_ptr<Operator>(new SimpleSynapse(input, output, a, b)));
 
         }else if(type_string.compare("Synapse") == 0){
 
-            Signal input = get_signal_view(args[0]);
-            Signal output = get_signal_view(args[1]);
+            Signal input = get_signal_view(signals.at(0));
+            Signal output = get_signal_view(signals.at(1));
 
-            Signal numerator = python_list_to_signal(args[2], false);
-            Signal denominator = python_list_to_signal(args[3], false);
+            Signal numerator = arrays.at(0);
+            Signal denominator = arrays.at(1);
 
             add_op(index, unique_ptr<Operator>(new Synapse(input, output, numerator, denominator)));
 
         }else if(type_string.compare("TriangleSynapse") == 0){
 
-            Signal input = get_signal_view(args[0]);
-            Signal output = get_signal_view(args[1]);
+            Signal input = get_signal_view(signals.at(0));
+            Signal output = get_signal_view(signals.at(1));
 
-            dtype n0 = boost::lexical_cast<dtype>(args[2]);
-            dtype ndiff = boost::lexical_cast<dtype>(args[3]);
-            int n_taps = boost::lexical_cast<int>(args[4]);
+            dtype n0 = params.at(0);
+            dtype ndiff = params.at(1);
+            int n_taps = int(params.at(2));
 
             add_op(index, unique_ptr<Operator>(new TriangleSynapse(input, output, n0, ndiff, n_taps)));
 
         }else if(type_string.compare("WhiteNoise") == 0){
 
-            Signal output = get_signal_view(args[0]);
+            Signal output = get_signal_view(signals.at(0));
 
-            dtype mean = boost::lexical_cast<dtype>(args[1]);
-            dtype std = boost::lexical_cast<dtype>(args[2]);
+            dtype mean = params.at(0);
+            dtype std = params.at(1);
 
-            bool do_scale = bool(boost::lexical_cast<int>(args[3]));
-            bool inc = bool(boost::lexical_cast<int>(args[4]));
+            bool do_scale = bool(params.at(2));
+            bool inc = bool(params.at(3));
 
-            dtype dt = boost::lexical_cast<dtype>(args[5]);
+            dtype dt = params.at(4);
 
             add_op(index, unique_ptr<Operator>(
                 new WhiteNoise(output, mean, std, do_scale, inc, dt)));
 
         }else if(type_string.compare("WhiteSignal") == 0){
 
-            bool get_size = true;
-            Signal coefs = python_list_to_signal(args[0], get_size);
+            Signal coefs = arrays.at(0);
 
-            Signal output = get_signal_view(args[1]);
-            Signal time = get_signal_view(args[2]);
-            dtype dt = boost::lexical_cast<dtype>(args[3]);
+            Signal output = get_signal_view(signals.at(0));
+            Signal time = get_signal_view(signals.at(1));
+            dtype dt = params.at(0);
 
             auto op = unique_ptr<Operator>(
                 new WhiteSignal(coefs, output, time, dt));
@@ -725,28 +1633,51 @@ void MpiSimulatorChunk::add_op(OpSpec op_spec){
 
         }else if(type_string.compare("PresentInput") == 0){
 
-            bool get_size = true;
-            Signal input = python_list_to_signal(args[0], get_size);
+            Signal input = arrays.at(0);
 
-            Signal output = get_signal_view(args[1]);
-            Signal time = get_signal_view(args[2]);
+            Signal output = get_signal_view(signals.at(0));
+            Signal time = get_signal_view(signals.at(1));
 
-            dtype presentation_time = boost::lexical_cast<dtype>(args[3]);
-            dtype dt = boost::lexical_cast<dtype>(args[4]);
+            dtype presentation_time = params.at(0);
+            dtype dt = params.at(1);
 
             auto op = unique_ptr<Operator>(
                 new PresentInput(input, output, time, presentation_time, dt));
             add_op(index, move(op));
 
+        }else if(type_string.compare("Tabulated") == 0){
+
+            Signal table = arrays.at(0);
+
+            Signal output = get_signal_view(signals.at(0));
+            Signal step = get_signal_view(signals.at(1));
+
+            auto op = unique_ptr<Operator>(new Tabulated(table, output, step));
+            add_op(index, move(op));
+
+        }else if(type_string.compare("Interpolate") == 0){
+
+            Signal table = arrays.at(0);
+
+            Signal input = get_signal_view(signals.at(0));
+            Signal output = get_signal_view(signals.at(1));
+
+            dtype radius = params.at(0);
+            unsigned n_points = params.at(1);
+
+            auto op = unique_ptr<Operator>(
+                new Interpolate(table, input, output, radius, n_points));
+            add_op(index, move(op));
+
         }else if(type_string.compare("BCM") == 0){
 
-            Signal pre_filtered = get_signal_view(args[0]);
-            Signal post_filtered = get_signal_view(args[1]);
-            Signal theta = get_signal_view(args[2]);
-            Signal delta = get_signal_view(args[3]);
+            Signal pre_filtered = get_signal_view(signals.at(0));
+            Signal post_filtered = get_signal_view(signals.at(1));
+            Signal theta = get_signal_view(signals.at(2));
+            Signal delta = get_signal_view(signals.at(3));
 
-            dtype learning_rate = boost::lexical_cast<dtype>(args[4]);
-            dtype dt = boost::lexical_cast<dtype>(args[5]);
+            dtype learning_rate = params.at(0);
+            dtype dt = params.at(1);
 
             auto op = unique_ptr<Operator>(
                 new BCM(
@@ -756,14 +1687,14 @@ void MpiSimulatorChunk::add_op(OpSpec op_spec){
 
         }else if(type_string.compare("Oja") == 0){
 
-            Signal pre_filtered = get_signal_view(args[0]);
-            Signal post_filtered = get_signal_view(args[1]);
-            Signal weights = get_signal_view(args[2]);
-            Signal delta = get_signal_view(args[3]);
+            Signal pre_filtered = get_signal_view(signals.at(0));
+            Signal post_filtered = get_signal_view(signals.at(1));
+            Signal weights = get_signal_view(signals.at(2));
+            Signal delta = get_signal_view(signals.at(3));
 
-            dtype learning_rate = boost::lexical_cast<dtype>(args[4]);
-            dtype dt = boost::lexical_cast<dtype>(args[5]);
-            dtype beta = boost::lexical_cast<dtype>(args[6]);
+            dtype learning_rate = params.at(0);
+            dtype dt = params.at(1);
+            dtype beta = params.at(2);
 
             add_op(index, unique_ptr<Operator>(
                 new Oja(
@@ -771,16 +1702,16 @@ void MpiSimulatorChunk::add_op(OpSpec op_spec){
 
         }else if(type_string.compare("Voja") == 0){
 
-            Signal pre_decoded = get_signal_view(args[0]);
-            Signal post_filtered = get_signal_view(args[1]);
-            Signal scaled_encoders = get_signal_view(args[2]);
-            Signal delta = get_signal_view(args[3]);
-            Signal learning_signal = get_signal_view(args[4]);
+            Signal pre_decoded = get_signal_view(signals.at(0));
+            Signal post_filtered = get_signal_view(signals.at(1));
+            Signal scaled_encoders = get_signal_view(signals.at(2));
+            Signal delta = get_signal_view(signals.at(3));
+            Signal learning_signal = get_signal_view(signals.at(4));
 
-            Signal scale = python_list_to_signal(args[5], false);
+            Signal scale = arrays.at(0);
 
-            dtype learning_rate = boost::lexical_cast<dtype>(args[6]);
-            dtype dt = boost::lexical_cast<dtype>(args[7]);
+            dtype learning_rate = params.at(0);
+            dtype dt = params.at(1);
 
             add_op(index, unique_ptr<Operator>(
                 new Voja(
@@ -790,13 +1721,12 @@ void MpiSimulatorChunk::add_op(OpSpec op_spec){
         }else if(type_string.compare("MpiSend") == 0){
 
             if(n_processors > 1){
-                int dst = boost::lexical_cast<int>(args[0]);
+                int dst = int(params.at(0));
                 dst = dst % n_processors;
                 if(dst != rank){
 
-                    int tag = boost::lexical_cast<int>(args[1]);
-                    key_type signal_key = boost::lexical_cast<key_type>(args[2]);
-                    Signal content = get_signal(signal_key);
+                    int tag = int(params.at(1));
+                    Signal content = get_signal(signals.at(0).key);
 
                     add_mpi_send(index, dst, tag, content);
                 }
@@ -805,35 +1735,41 @@ void MpiSimulatorChunk::add_op(OpSpec op_spec){
         }else if(type_string.compare("MpiRecv") == 0){
 
             if(n_processors > 1){
-                int src = boost::lexical_cast<int>(args[0]);
+                int src = int(params.at(0));
                 src = src % n_processors;
 
                 if(src != rank){
-                    int tag = boost::lexical_cast<int>(args[1]);
-                    key_type signal_key = boost::lexical_cast<key_type>(args[2]);
-                    Signal content = get_signal(signal_key);
-                    bool is_update = bool(boost::lexical_cast<int>(args[3]));
+                    int tag = int(params.at(1));
+                    Signal content = get_signal(signals.at(0).key);
+                    bool is_update = bool(params.at(2));
 
                     add_mpi_recv(index, src, tag, content, is_update);
                 }
             }
 
-        }else if(type_string.compare("SpaunStimulus") == 0){
-            Signal output = get_signal_view(args[0]);
-            Signal time = get_signal_view(args[1]);
+        }else if(type_string.compare("StreamInput") == 0){
+            Signal output = get_signal_view(signals.at(0));
+            Signal step = get_signal_view(signals.at(1));
 
-            string stim_seq_str = args[2];
-            boost::trim_if(stim_seq_str, boost::is_any_of("[]"));
-            boost::replace_all(stim_seq_str, "\"", "");
-            boost::replace_all(stim_seq_str, "\'", "");
+            vector<string> location = op_spec.string_lists.at(0);
+            unsigned read_ahead = params.at(0);
 
-            vector<string> stim_seq;
-            boost::split(stim_seq, stim_seq_str, boost::is_any_of(","));
+            auto op = unique_ptr<Operator>(
+                new StreamInput(
+                    output, step, location.at(0), location.at(1), read_ahead));
+
+            add_op(index, move(op));
+
+        }else if(type_string.compare("SpaunStimulus") == 0){
+            Signal output = get_signal_view(signals.at(0));
+            Signal time = get_signal_view(signals.at(1));
+
+            vector<string> stim_seq = op_spec.string_lists.at(0);
 
-            dtype present_interval = boost::lexical_cast<dtype>(args[3]);
-            dtype present_blanks = boost::lexical_cast<dtype>(args[4]);
+            dtype present_interval = params.at(0);
+            dtype present_blanks = params.at(1);
 
-            int identifier = boost::lexical_cast<int>(args[5]);
+            int identifier = int(params.at(2));
 
             auto op = unique_ptr<Operator>(
                 new SpaunStimulus(
@@ -848,23 +1784,18 @@ void MpiSimulatorChunk::add_op(OpSpec op_spec){
             throw runtime_error(msg.str());
         }
 
-    }catch(const boost::bad_lexical_cast& e){
+    }catch(const out_of_range& e){
         stringstream msg;
-        msg << "Caught bad lexical cast while extracting operator from OpSpec "
+        msg << "Caught out of range error while extracting operator from OpSpec "
                "with error " << e.what() << endl;
         msg << "The operator type was: " << type_string << endl;
-        msg << "The arguments were: " << endl;
-        int i = 0;
-        for(auto& s: args){
-            msg << i << ": " << s << endl;
-            i++;
-        }
+        msg << op_spec << endl;
 
         throw runtime_error(msg.str());
     }
 }
 
-void MpiSimulatorChunk::add_op(float index, unique_ptr<Operator> op){
+void MpiSimulatorChunk::add_op(long long index, unique_ptr<Operator> op){
     build_dbg(
         "At index " << index << ", adding op:" << endl << *(op.get()));
 
@@ -873,7 +1804,7 @@ void MpiSimulatorChunk::add_op(float index, unique_ptr<Operator> op){
     operator_store.push_back(move(op));
 }
 
-void MpiSimulatorChunk::add_time_update(float index, unique_ptr<TimeUpdate> time_update_){
+void MpiSimulatorChunk::add_time_update(long long index, unique_ptr<TimeUpdate> time_update_){
     if(!time_update){
         operator_list.push_back((Operator*) time_update_.get());
         time_update = move(time_update_);
@@ -881,14 +1812,14 @@ void MpiSimulatorChunk::add_time_update(float index, unique_ptr<TimeUpdate> time
     }
 }
 
-void MpiSimulatorChunk::add_mpi_send(float index, int dst, int tag, Signal content){
+void MpiSimulatorChunk::add_mpi_send(long long index, int dst, int tag, Signal content){
     auto mpi_send = unique_ptr<MPISend>(new MPISend(dst, tag, content));
     operator_list.push_back((Operator *) mpi_send.get());
     mpi_send->set_index(index);
     mpi_sends.push_back(move(mpi_send));
 }
 
-void MpiSimulatorChunk::add_mpi_recv(float index, int src, int tag, Signal content, bool is_update){
+void MpiSimulatorChunk::add_mpi_recv(long long index, int src, int tag, Signal content, bool is_update){
     auto mpi_recv = unique_ptr<MPIRecv>(new MPIRecv(src, tag, content, is_update));
     operator_list.push_back((Operator *) mpi_recv.get());
     mpi_recv->set_index(index);
@@ -896,6 +1827,13 @@ void MpiSimulatorChunk::add_mpi_recv(float index, int src, int tag, Signal conte
 }
 
 void MpiSimulatorChunk::add_probe(ProbeSpec ps){
+    if(batch_size > 1 && !batched_signals[signal_index(ps.signal_spec.key)]){
+        stringstream msg;
+        msg << "Probes on read-only signals are not supported in batch "
+            << "mode. Probe is " << ps.name << "." << endl;
+        throw runtime_error(msg.str());
+    }
+
     Signal signal = get_signal_view(ps.signal_spec);
     probe_map[ps.probe_key] = shared_ptr<Probe>(new Probe(signal, ps.period));
 }
@@ -1019,9 +1957,10 @@ string MpiSimulatorChunk::to_string() const{
     out << "    Label: " << label << endl;
 
     out << "** Signals: **" << endl;
-    for(auto const& kv: signal_map){
+    map<key_type, unsigned> sorted_indices(signal_indices.begin(), signal_indices.end());
+    for(auto const& kv: sorted_indices){
         out << "Key: " << kv.first << endl;
-        out << "Signal: " << kv.second << endl;
+        out << "Signal: " << base_signals[kv.second] << endl;
     }
     out << endl;
 
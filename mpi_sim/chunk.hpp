@@ -1,6 +1,9 @@
 #pragma once
 
 #include <map>
+#include <set>
+#include <unordered_map>
+#include <unordered_set>
 #include <list>
 #include <string>
 #include <sstream>
@@ -9,6 +12,7 @@
 #include <algorithm> // sort_stable
 #include <utility> // pair
 #include <exception>
+#include <functional>
 #include <string>
 #include <assert.h>
 
@@ -20,6 +24,7 @@
 #include "spec.hpp"
 #include "mpi_operator.hpp"
 #include "spaun.hpp"
+#include "stream.hpp"
 #include "probe.hpp"
 #include "sim_log.hpp"
 #include "psim_log.hpp"
@@ -28,37 +33,77 @@
 #include "typedef.hpp"
 #include "debug.hpp"
 
+// Version of the network file layout that from_file can read.
+// Must match NETWORK_FORMAT_VERSION in nengo_mpi/utils.py.
+const int NETWORK_FORMAT_VERSION = 3;
+
 // How frequently to flush the probe buffers, in units of number of steps.
 const int FLUSH_PROBES_EVERY = 1000;
 
+// Alignment of the arena holding the mutable signals, in bytes (a cache line).
+const size_t ARENA_ALIGNMENT = 64;
+
+// Largest number of entries in the A matrix of a DotInc that can be fused
+// with other DotIncs into a DotIncGroup. Fused matrices are copied, so only
+// the small matrices, for which the overhead of each call to BLAS matters
+// most, are fused.
+const unsigned MAX_FUSED_DOTINC_SIZE = 16384;
+
 /* An MpiSimulatorChunk represents the portion of a Nengo
  * network that is simulated by a single MPI process. */
 class MpiSimulatorChunk{
 
 public:
-    MpiSimulatorChunk(bool collect_timings);
-    MpiSimulatorChunk(int rank, int n_processors, bool collect_timings);
+    /* ``batch_size'' copies of the network are simulated side by side.
+     * Each mutable signal stores one copy per simulation in the batch, as
+     * the columns of a matrix, while read-only signals are stored once and
+     * shared by all of them. The simulations in a batch differ only in the
+     * seed used by their stochastic operators. */
+    MpiSimulatorChunk(bool collect_timings, unsigned batch_size=1);
+    MpiSimulatorChunk(
+        int rank, int n_processors, bool collect_timings,
+        unsigned batch_size=1);
     string classname() const { return "MpiSimulatorChunk"; }
 
     /* Add simulation objects to the chunk from an HDF5 file. */
     void from_file(string filename, hid_t file_plist, hid_t read_plist);
 
+    /* Add simulation objects to the chunk from component specs held in
+     * memory. Components that are not owned by the chunk are ignored. */
+    void from_components(
+        dtype dt, const vector<string>& probe_strings,
+        const vector<ComponentSpec>& components);
+
+    /* Add the signals, operators and probes of a single component. */
+    void add_component(const ComponentSpec& cs);
+
     /* Run an integer number of steps. Called by a
      * worker process once it gets a signal from the master
      * process telling the worker to begin a simulation. */
     void run_n_steps(int steps, bool progress);
 
-    /* Reset the chunk. */
+    /* Reset the operators, and restore the mutable base signals
+     * to their initial values. When simulating trial ``t'', the
+     * operators are seeded as if by ``seed + t * batch_size'', so that
+     * no two simulations across trials and batches share a seed. */
     void reset(unsigned seed);
 
+    /* Make the chunk part of trial ``trial'' out of ``n_trials''
+     * independent trials of the same network, each simulated by its own
+     * group of processes. ``parent_comm'' contains the processes of all
+     * trials, which log their results to a single shared file. Must be
+     * called before ``finalize_build''. */
+    void set_trial(unsigned trial, unsigned n_trials, MPI_Comm parent_comm);
+
     // *** Signals ***
 
     /* Add data to the chunk, in the form of a Signal. All data in
      * the simulation is stored in Signals, and Signals are an analog
      * of a Signal in the reference impl of nengo. The supplied key
      * must be unique, as it will later be used by operators to retrieve
-     * views of the base Signal. */
-    void add_base_signal(key_type key, Signal signal);
+     * views of the base Signal. ``batched'' indicates that the signal
+     * stores a copy of its values for each simulation in the batch. */
+    void add_base_signal(key_type key, Signal signal, bool batched=false);
 
     /* Get a ``view'' of a base signal stored at the given key.
      * Most operators work in terms of these views.
@@ -108,21 +153,23 @@ public:
     /* Add an operator from an OpSpec object, which stores the type of operator
      * to add, as well as any parameters that operator needs (e.g. the Signals
      * that it operates on). Identifiies the type of operator that needs to
-     * be created, and calls the constructor appropriately. */
+     * be created, and calls the constructor appropriately. The arguments
+     * expected for each operator type are listed in OP_SIGNATURES in
+     * nengo_mpi/utils.py. */
     void add_op(OpSpec os);
 
     /* Add an existing operator to the chunk. */
-    void add_op(float index, unique_ptr<Operator> op);
+    void add_op(long long index, unique_ptr<Operator> op);
 
     /* Add a TimeUpdate operator. A chunk may have only one TimeUpdate operator,
      * so this function only has an effect the first time that it is called. */
-    void add_time_update(float index, unique_ptr<TimeUpdate> op);
+    void add_time_update(long long index, unique_ptr<TimeUpdate> op);
 
     /* Add MPI-related operators. These have to be added separately,
      * because we need to initialize them in a special way before the
      * simulation begins. */
-    void add_mpi_send(float index, int dst, int tag, Signal content);
-    void add_mpi_recv(float index, int src, int tag, Signal content, bool is_update);
+    void add_mpi_send(long long index, int dst, int tag, Signal content);
+    void add_mpi_recv(long long index, int src, int tag, Signal content, bool is_update);
 
     // *** Probes ***
 
@@ -155,18 +202,117 @@ public:
     dtype dt;
     string label;
 
+    const unsigned batch_size;
+
+    unsigned trial;
+    unsigned n_trials;
+
     map<key_type, shared_ptr<Probe>> probe_map;
     vector<ProbeSpec> probe_info;
 
 private:
+    /* Read the signals, operators and probes stored in the group for
+     * a single component, adding them to the chunk. Read-only signals
+     * not stored in the group are read from ``readonly_pool'', or taken
+     * from ``mapped_pool'' if the pool is mapped into memory. */
+    void read_component(
+        hid_t component_group, hid_t readonly_pool,
+        shared_ptr<dtype> mapped_pool, hid_t read_plist);
+
+    /* Store the read-only signal values held by a component spec, skipping
+     * values that are already stored. */
+    void add_readonly_data(const ComponentSpec& cs);
+
+    /* Read the read-only signal values used by a component spec that are
+     * not stored yet from the pool of read-only signals in a network file.
+     * If the pool is mapped into memory, the values are not read, but
+     * refer to ``mapped_pool'' instead. */
+    void read_readonly_data(
+        const ComponentSpec& cs, hid_t readonly_pool,
+        shared_ptr<dtype> mapped_pool, hid_t read_plist);
+
+    /* Add the base signals of a component spec. Read-only signal values
+     * must already be stored. Mutable signal values are placed in the
+     * arena, unless they were read there already. */
+    void add_signals(const ComponentSpec& cs);
+
+    /* Allocate the arena with room for ``size'' entries. A component with
+     * signal data of size n takes up n * batch_size entries. Must be called
+     * once, before any component is added. */
+    void allocate_arena(size_t size);
+
+    /* Take the next ``size'' entries of the arena. */
+    dtype* take_arena(size_t size);
+
+    /* Read the operator tables stored in the group for a single component,
+     * adding the operators they describe to the chunk. */
+    void read_op_tables(hid_t component_group, hid_t read_plist);
+
+    /* Get a view of a signal as a vector. For batched signals, the vector
+     * holds the values for every simulation in the batch, so that neuron
+     * operators can process the whole batch in a single pass. */
+    Signal get_flat_signal_view(SignalSpec ss);
+
+    /* Get the position in base_signals of the base signal with a key. */
+    unsigned signal_index(key_type key) const;
+
+    /* Whether a signal view belongs to a read-only base signal. */
+    bool is_readonly(const SignalView& signal) const;
+
+    /* Replace DotIncs that multiply the same X by DotIncGroups. Only runs
+     * of consecutive DotIncs are considered, within which a DotInc's Y may
+     * not overlap any DotInc's X, so that the DotIncs in the run can be
+     * reordered freely. Called once the operators are sorted. */
+    void fuse_dot_incs();
+
+    /* Replace runs of consecutive LIF operators with the same parameters
+     * by LIFGroups. A LIF in a run may not read a signal written by another
+     * LIF in the run. Called once the operators are sorted. */
+    void group_lifs();
+
     int rank;
     int n_processors;
 
+    // Communicator over the processes of all trials.
+    MPI_Comm trials_comm;
+
     unique_ptr<SimulationLog> sim_log;
     string log_filename;
 
-    map<key_type, Signal> signal_map;
-    map<key_type, Signal> signal_init_value;
+    // Base signals in the order they were added, and the position of each
+    // in base_signals by key. Operators are handed views of base signals as
+    // they are added, so keys are only looked up while loading (and by
+    // get_signal).
+    vector<Signal> base_signals;
+    unordered_map<key_type, unsigned> signal_indices;
+
+    // For each base signal, whether it stores a copy for each simulation in
+    // the batch. Views of these signals gain a column per simulation.
+    vector<bool> batched_signals;
+
+    // The mutable base signals of all components added to the chunk, stored
+    // one after the other in a single arena aligned to ARENA_ALIGNMENT bytes.
+    // Within a component, signals are laid out in the order that the
+    // component's operators first access them. The initial contents of the
+    // arena are kept in init_arena, so that reset restores every mutable
+    // signal with a single copy. Read-only signals are stored separately
+    // (see readonly_store) and never copied.
+    shared_ptr<dtype> arena;
+    size_t arena_size;
+    size_t arena_used;
+    vector<dtype> init_arena;
+
+    // Values of read-only base signals, keyed by their offset in the
+    // network's pool of read-only signals. Read-only base signals with
+    // identical values share an entry, even across components.
+    map<long long, shared_ptr<dtype>> readonly_store;
+
+    // Bytes of base signal data added to the chunk, bytes actually
+    // stored once identical read-only signals are shared, and bytes of
+    // read-only signals mapped from network files rather than stored.
+    size_t signal_bytes_loaded;
+    size_t signal_bytes_stored;
+    size_t signal_bytes_mapped;
 
     // Contains all operators - don't have to worry about deleting these, since we
     // have unique_ptr's for all these ops in the lists below.
@@ -0,0 +1,142 @@
+/* Microbenchmark of the LIF and AdaptiveLIF operators.
+ *
+ * Times the operators against a reference implementation of the LIF step
+ * that makes one pass over the neurons per vector operation, as the
+ * operators did before the step was fused into a single pass, and checks
+ * that both give the same results. Build with ``make lif_bench'' and run
+ * with ``./lif_bench [n_neurons] [n_steps]''. */
+
+#include <chrono>
+#include <cmath>
+#include <cstdlib>
+#include <iostream>
+#include <random>
+
+#include "operator.hpp"
+
+using namespace std;
+
+/* The LIF step as a sequence of vector operations, using scratch vectors. */
+class ReferenceLIF{
+public:
+    ReferenceLIF(
+        unsigned n_neurons, dtype tau_rc, dtype tau_ref, dtype min_voltage,
+        dtype dt, Signal J, Signal output, Signal voltage, Signal ref_time)
+    :n(n_neurons), dt(dt), dt_inv(1.0 / dt), tau_rc(tau_rc), tau_ref(tau_ref),
+    min_voltage(min_voltage), J(J), output(output), voltage(voltage),
+    ref_time(ref_time), one(n_neurons, (dtype) 1.0), mult(n_neurons),
+    dV(n_neurons){}
+
+    void operator()(){
+        blas_copy(n, J.raw_data, 1, dV.raw_data, 1);
+        blas_axpy(n, -1.0, voltage.raw_data, 1, dV.raw_data, 1);
+        blas_scal(n, -expm1(-dt / tau_rc), dV.raw_data, 1);
+        blas_axpy(n, 1.0, dV.raw_data, 1, voltage.raw_data, 1);
+
+        for(unsigned i = 0; i < n; ++i){
+            dtype v = voltage(i);
+            voltage(i) = v < min_voltage ? min_voltage : v;
+        }
+
+        blas_axpy(n, -dt, one.raw_data, 1, ref_time.raw_data, 1);
+
+        blas_copy(n, ref_time.raw_data, 1, mult.raw_data, 1);
+        blas_scal(n, -dt_inv, mult.raw_data, 1);
+        blas_axpy(n, 1.0, one.raw_data, 1, mult.raw_data, 1);
+
+        for(unsigned i = 0; i < n; ++i){
+            dtype m = mult(i);
+            mult(i) = m > 1.0 ? 1.0 : (m < 0.0 ? 0.0 : m);
+        }
+
+        for(unsigned i = 0; i < n; ++i){
+            voltage(i) *= mult(i);
+            dtype v = voltage(i);
+            if(v > 1.0){
+                output(i) = dt_inv;
+                ref_time(i) = tau_ref + dt * (1.0 - (v - 1.0) / dV(i));
+                voltage(i) = 0.0;
+            }else{
+                output(i) = 0.0;
+            }
+        }
+    }
+
+    unsigned n;
+    dtype dt, dt_inv, tau_rc, tau_ref, min_voltage;
+    Signal J, output, voltage, ref_time, one, mult, dV;
+};
+
+/* Signals of a population of neurons, with random input currents. */
+struct Population{
+    Population(unsigned n)
+    :J(n), output(n), voltage(n), ref_time(n), adaptation(n){
+        mt19937 rng(0);
+        uniform_real_distribution<double> current(0.0, 3.0);
+        for(unsigned i = 0; i < n; i++){
+            J(i) = current(rng);
+        }
+    }
+
+    Signal J, output, voltage, ref_time, adaptation;
+};
+
+template <class Op>
+static double seconds_per_step(Op& op, unsigned n_steps){
+    auto begin = chrono::steady_clock::now();
+    for(unsigned step = 0; step < n_steps; step++){
+        op();
+    }
+    auto end = chrono::steady_clock::now();
+
+    return chrono::duration<double>(end - begin).count() / n_steps;
+}
+
+static dtype max_difference(const Signal& a, const Signal& b){
+    dtype diff = 0.0;
+    for(unsigned i = 0; i < a.size; i++){
+        diff = max(diff, (dtype) fabs(a.raw_data[i] - b.raw_data[i]));
+    }
+
+    return diff;
+}
+
+int main(int argc, char** argv){
+    unsigned n_neurons = argc > 1 ? atoi(argv[1]) : 100000;
+    unsigned n_steps = argc > 2 ? atoi(argv[2]) : 1000;
+
+    const dtype tau_rc = 0.02, tau_ref = 0.002, min_voltage = 0.0, dt = 0.001;
+    const dtype tau_n = 1.0, inc_n = 0.01;
+
+    Population ref(n_neurons), fused(n_neurons), adaptive(n_neurons);
+
+    ReferenceLIF ref_op(
+        n_neurons, tau_rc, tau_ref, min_voltage, dt,
+        ref.J, ref.output, ref.voltage, ref.ref_time);
+    LIF fused_op(
+        n_neurons, tau_rc, tau_ref, min_voltage, dt,
+        fused.J, fused.output, fused.voltage, fused.ref_time);
+    AdaptiveLIF adaptive_op(
+        n_neurons, tau_n, inc_n, tau_rc, tau_ref, min_voltage, dt,
+        adaptive.J, adaptive.output, adaptive.voltage, adaptive.ref_time,
+        adaptive.adaptation);
+
+    double ref_time = seconds_per_step(ref_op, n_steps);
+    double fused_time = seconds_per_step(fused_op, n_steps);
+    double adaptive_time = seconds_per_step(adaptive_op, n_steps);
+
+    cout << n_neurons << " neurons, " << n_steps << " steps" << endl;
+    cout << "Reference LIF: " << 1e9 * ref_time / n_neurons << " ns per neuron-step" << endl;
+    cout << "LIF:           " << 1e9 * fused_time / n_neurons << " ns per neuron-step" << endl;
+    cout << "AdaptiveLIF:   " << 1e9 * adaptive_time / n_neurons << " ns per neuron-step" << endl;
+    cout << "Speedup:       " << ref_time / fused_time << endl;
+
+    dtype diff = max(
+        max_difference(ref.voltage, fused.voltage),
+        max_difference(ref.ref_time, fused.ref_time));
+    diff = max(diff, max_difference(ref.output, fused.output));
+
+    cout << "Largest difference from reference: " << diff << endl;
+
+    return diff > 1e-6 ? 1 : 0;
+}
@@ -21,7 +21,7 @@ void MPISend::operator() (){
 
     memcpy(buffer.get(), content_data, size * sizeof(dtype));
 
-    MPI_Isend(buffer.get(), size, MPI_DOUBLE, dst, tag, comm, &request);
+    MPI_Isend(buffer.get(), size, MPI_DTYPE, dst, tag, comm, &request);
 
     mpi_dbg(*this);
 }
@@ -64,14 +64,14 @@ void MPIRecv::operator() (){
     }else{
         MPI_Wait(&request, &status);
         memcpy(content_data, buffer.get(), size * sizeof(dtype));
-        MPI_Irecv(buffer.get(), size, MPI_DOUBLE, src, tag, comm, &request);
+        MPI_Irecv(buffer.get(), size, MPI_DTYPE, src, tag, comm, &request);
     }
 
     mpi_dbg(*this);
 }
 
 void MPIRecv::init(){
-    MPI_Irecv(buffer.get(), size, MPI_DOUBLE, src, tag, comm, &request);
+    MPI_Irecv(buffer.get(), size, MPI_DTYPE, src, tag, comm, &request);
 }
 
 void MPIRecv::complete(){
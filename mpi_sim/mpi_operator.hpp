@@ -50,7 +50,7 @@ public:
 
 private:
     int dst;
-    Signal content;
+    SignalView content;
     dtype* content_data;
 };
 
@@ -67,7 +67,7 @@ public:
 
 private:
     int src;
-    Signal content;
+    SignalView content;
     dtype* content_data;
     bool is_update;
 };
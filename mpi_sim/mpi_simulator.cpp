@@ -3,8 +3,14 @@
 int n_processors_available = 1;
 
 // This constructor assumes that MPI_Initialize has already been called.
-MpiSimulator::MpiSimulator(bool collect_timings)
-:Simulator(collect_timings), comm(MPI_COMM_WORLD){
+MpiSimulator::MpiSimulator(bool collect_timings, unsigned batch_size)
+:MpiSimulator(collect_timings, batch_size, MPI_COMM_WORLD){
+}
+
+MpiSimulator::MpiSimulator(
+        bool collect_timings, unsigned batch_size, MPI_Comm comm,
+        unsigned trial, unsigned n_trials, MPI_Comm trials_comm)
+:Simulator(collect_timings), comm(comm){
     MPI_Comm_size(comm, &n_processors);
 
     int buflen = 512;
@@ -18,11 +24,17 @@ MpiSimulator::MpiSimulator(bool collect_timings)
     cout << "Master rank in merged communicator: " << rank << " (should be 0)." << endl;
     cout << "Master detected " << n_processors << " processor(s) in total." << endl;
 
-    mpi_wake_workers();
+    if(n_trials > 1){
+        cout << "Master simulating trial " << trial << " of " << n_trials << "." << endl;
+    }
+
+    mpi_wake_workers(comm);
     bcast_send_int(collect_timings ? 1 : 0, comm);
+    bcast_send_unsigned(batch_size, comm);
 
     chunk = unique_ptr<MpiSimulatorChunk>(
-        new MpiSimulatorChunk(0, n_processors, collect_timings));
+        new MpiSimulatorChunk(0, n_processors, collect_timings, batch_size));
+    chunk->set_trial(trial, n_trials, trials_comm);
 }
 
 MpiSimulator::~MpiSimulator(){
@@ -80,6 +92,40 @@ void MpiSimulator::from_file(string filename){
     write_to_loadtimes_file(delta);
 }
 
+void MpiSimulator::from_components(
+        dtype dt, const vector<string>& probe_strings,
+        const vector<ComponentSpec>& components){
+
+    clock_t begin = clock();
+
+    label = "memory";
+
+    // An empty filename tells the workers to expect their
+    // components over MPI instead of from a network file.
+    for(int i = 0; i < n_processors-1; i++){
+        send_string("", i+1, setup_tag, comm);
+    }
+
+    scatter_components(dt, probe_strings, components, comm);
+
+    chunk->from_components(dt, probe_strings, components);
+
+    probe_counts.resize(n_processors);
+    for(const ProbeSpec& pi : chunk->probe_info){
+        probe_data[pi.probe_key] = vector<Signal>();
+        probe_counts[pi.component % n_processors] += 1;
+    }
+
+    // Master barrier 1
+    MPI_Barrier(comm);
+
+    clock_t end = clock();
+    double delta = double(end - begin) / CLOCKS_PER_SEC;
+    cout << "Loading network from memory took " << delta << " seconds." << endl;
+
+    write_to_loadtimes_file(delta);
+}
+
 void MpiSimulator::finalize_build(){
     chunk->finalize_build(comm);
 }
@@ -217,6 +263,12 @@ void mpi_finalize(){
     MPI_Finalize();
 }
 
+bool mpi_is_initialized(){
+    int initialized;
+    MPI_Initialized(&initialized);
+    return initialized;
+}
+
 int mpi_get_rank(){
     int rank;
     MPI_Comm_rank(MPI_COMM_WORLD, &rank);
@@ -228,13 +280,41 @@ int mpi_get_n_procs(){
 }
 
 void mpi_wake_workers(){
+    mpi_wake_workers(MPI_COMM_WORLD);
+}
+
+void mpi_wake_workers(MPI_Comm comm){
     int kill = 0;
-    MPI_Bcast(&kill, 1, MPI_INT, 0, MPI_COMM_WORLD);
+    MPI_Bcast(&kill, 1, MPI_INT, 0, comm);
 }
 
 void mpi_kill_workers(){
+    mpi_kill_workers(MPI_COMM_WORLD);
+}
+
+void mpi_kill_workers(MPI_Comm comm){
     int kill = 1;
-    MPI_Bcast(&kill, 1, MPI_INT, 0, MPI_COMM_WORLD);
+    MPI_Bcast(&kill, 1, MPI_INT, 0, comm);
+}
+
+MPI_Comm mpi_split_trials(MPI_Comm comm, unsigned n_trials, unsigned& trial){
+    int rank, n_processors;
+    MPI_Comm_rank(comm, &rank);
+    MPI_Comm_size(comm, &n_processors);
+
+    if(n_trials == 0 || n_processors % n_trials != 0){
+        stringstream msg;
+        msg << "Cannot split " << n_processors << " processor(s) into "
+            << n_trials << " trials of equal size." << endl;
+        throw runtime_error(msg.str());
+    }
+
+    trial = rank / (n_processors / n_trials);
+
+    MPI_Comm trial_comm;
+    MPI_Comm_split(comm, trial, rank, &trial_comm);
+
+    return trial_comm;
 }
 
 void mpi_worker_start(){
@@ -244,7 +324,12 @@ void mpi_worker_start(){
 // comm: The communicator for the worker to communicate on. Must
 // be an intracommunicator involving all processes, with the master
 // process having rank 0.
-void mpi_worker_start(MPI_Comm comm){
+//
+// trial, n_trials, trials_comm: When several independent trials are
+// simulated, ``comm'' holds the processes of trial ``trial'' only,
+// and ``trials_comm'' the processes of all trials.
+void mpi_worker_start(
+        MPI_Comm comm, unsigned trial, unsigned n_trials, MPI_Comm trials_comm){
 
     int rank, n_processors;
     MPI_Comm_rank(comm, &rank);
@@ -272,25 +357,42 @@ void mpi_worker_start(MPI_Comm comm){
         dbg("Reading collect_timings...");
         int collect_timings = bcast_recv_int(comm);
 
+        dbg("Reading batch_size...");
+        unsigned batch_size = bcast_recv_unsigned(comm);
+
         dbg("Reading filename...");
         string filename = recv_string(0, setup_tag, comm);
 
         dbg("Creating chunk...");
-        MpiSimulatorChunk chunk(rank, n_processors, bool(collect_timings));
+        MpiSimulatorChunk chunk(
+            rank, n_processors, bool(collect_timings), batch_size);
+        chunk.set_trial(trial, n_trials, trials_comm);
 
-        // Use parallel property lists
-        hid_t file_plist = H5Pcreate(H5P_FILE_ACCESS);
-        H5Pset_fapl_mpio(file_plist, comm, MPI_INFO_NULL);
+        if(filename.length() == 0){
+            dbg("Receiving components...");
 
-        hid_t read_plist = H5Pcreate(H5P_DATASET_XFER);
-        H5Pset_dxpl_mpio(read_plist, H5FD_MPIO_INDEPENDENT);
+            dtype dt;
+            vector<string> probe_strings;
+            vector<ComponentSpec> components;
 
-        dbg("Loading from file...");
-        chunk.from_file(filename, file_plist, read_plist);
-        chunk.finalize_build(comm);
+            recv_components(dt, probe_strings, components, comm);
+            chunk.from_components(dt, probe_strings, components);
+        }else{
+            // Use parallel property lists
+            hid_t file_plist = H5Pcreate(H5P_FILE_ACCESS);
+            H5Pset_fapl_mpio(file_plist, comm, MPI_INFO_NULL);
 
-        H5Pclose(file_plist);
-        H5Pclose(read_plist);
+            hid_t read_plist = H5Pcreate(H5P_DATASET_XFER);
+            H5Pset_dxpl_mpio(read_plist, H5FD_MPIO_INDEPENDENT);
+
+            dbg("Loading from file...");
+            chunk.from_file(filename, file_plist, read_plist);
+
+            H5Pclose(file_plist);
+            H5Pclose(read_plist);
+        }
+
+        chunk.finalize_build(comm);
 
         // Worker barrier 1
         MPI_Barrier(comm);
@@ -355,6 +457,114 @@ void mpi_worker_start(MPI_Comm comm){
     }
 }
 
+void scatter_components(
+        dtype dt, const vector<string>& probe_strings,
+        const vector<ComponentSpec>& components, MPI_Comm comm){
+
+    int n_processors;
+    MPI_Comm_size(comm, &n_processors);
+
+    MPI_Bcast(&dt, 1, MPI_DTYPE, 0, comm);
+
+    vector<char> probe_buffer;
+    pack_string_list(probe_buffer, probe_strings);
+    bcast_buffer(probe_buffer, comm);
+
+    // Pack and send the components owned by each worker in turn, in the
+    // same order that the worker will find them in. Only one worker's
+    // buffer is held at a time.
+    vector<char> buffer;
+
+    for(int i = 1; i < n_processors; i++){
+        buffer.clear();
+
+        for(auto& cs : components){
+            if(cs.component % n_processors == i){
+                cs.pack(buffer);
+            }
+        }
+
+        send_buffer(buffer, i, components_tag, comm);
+    }
+}
+
+void recv_components(
+        dtype& dt, vector<string>& probe_strings,
+        vector<ComponentSpec>& components, MPI_Comm comm){
+
+    MPI_Bcast(&dt, 1, MPI_DTYPE, 0, comm);
+
+    vector<char> probe_buffer;
+    bcast_buffer(probe_buffer, comm);
+
+    const char* ptr = probe_buffer.data();
+    probe_strings = unpack_string_list(ptr);
+
+    vector<char> buffer = recv_buffer(0, components_tag, comm);
+
+    ptr = buffer.data();
+    const char* end = ptr + buffer.size();
+
+    while(ptr < end){
+        components.push_back(ComponentSpec::unpack(ptr));
+    }
+
+    if(ptr != end){
+        stringstream s;
+        s << "Components received from the master process overran their "
+          << "buffer of " << buffer.size() << " bytes." << endl;
+        throw runtime_error(s.str());
+    }
+}
+
+// Counts passed to MPI are ints, so buffers are sent in pieces of at
+// most this many bytes.
+const size_t max_message_size = INT_MAX;
+
+void send_buffer(const vector<char>& buffer, int dst, int tag, MPI_Comm comm){
+    unsigned long long size = buffer.size();
+    MPI_Send(&size, 1, MPI_UNSIGNED_LONG_LONG, dst, tag, comm);
+
+    for(size_t sent = 0; sent < buffer.size(); sent += max_message_size){
+        int count = min(buffer.size() - sent, max_message_size);
+        MPI_Send(
+            const_cast<char*>(buffer.data()) + sent, count, MPI_CHAR,
+            dst, tag, comm);
+    }
+}
+
+vector<char> recv_buffer(int src, int tag, MPI_Comm comm){
+    MPI_Status status;
+
+    unsigned long long size;
+    MPI_Recv(&size, 1, MPI_UNSIGNED_LONG_LONG, src, tag, comm, &status);
+
+    vector<char> buffer(size);
+
+    for(size_t received = 0; received < size; received += max_message_size){
+        int count = min(buffer.size() - received, max_message_size);
+        MPI_Recv(
+            buffer.data() + received, count, MPI_CHAR,
+            src, tag, comm, &status);
+    }
+
+    return buffer;
+}
+
+void bcast_buffer(vector<char>& buffer, MPI_Comm comm){
+    int src = 0;
+
+    unsigned long long size = buffer.size();
+    MPI_Bcast(&size, 1, MPI_UNSIGNED_LONG_LONG, src, comm);
+
+    buffer.resize(size);
+
+    for(size_t sent = 0; sent < size; sent += max_message_size){
+        int count = min(buffer.size() - sent, max_message_size);
+        MPI_Bcast(buffer.data() + sent, count, MPI_CHAR, src, comm);
+    }
+}
+
 string recv_string(int src, int tag, MPI_Comm comm){
     int size;
     MPI_Status status;
@@ -387,14 +597,14 @@ void send_string(string s, int dst, int tag, MPI_Comm comm){
 
 dtype recv_dtype(int src, int tag, MPI_Comm comm){
     MPI_Status status;
-    double d;
+    dtype d;
 
-    MPI_Recv(&d, 1, MPI_DOUBLE, src, tag, comm, &status);
+    MPI_Recv(&d, 1, MPI_DTYPE, src, tag, comm, &status);
     return d;
 }
 
 void send_dtype(dtype d, int dst, int tag, MPI_Comm comm){
-    MPI_Send(&d, 1, MPI_DOUBLE, dst, tag, comm);
+    MPI_Send(&d, 1, MPI_DTYPE, dst, tag, comm);
 }
 
 int recv_int(int src, int tag, MPI_Comm comm){
@@ -441,7 +651,7 @@ Signal recv_base_signal(int src, int tag, MPI_Comm comm){
     unsigned size2 = recv_unsigned(src, tag, comm);
 
     Signal signal = Signal(size1, size2);
-    MPI_Recv(signal.raw_data, signal.size, MPI_DOUBLE, src, tag, comm, &status);
+    MPI_Recv(signal.raw_data, signal.size, MPI_DTYPE, src, tag, comm, &status);
 
     return signal;
 }
@@ -451,7 +661,7 @@ void send_base_signal(Signal signal, int dst, int tag, MPI_Comm comm){
     send_unsigned(signal.shape1, dst, tag, comm);
     send_unsigned(signal.shape2, dst, tag, comm);
 
-    MPI_Send(signal.raw_data, signal.size, MPI_DOUBLE, dst, tag, comm);
+    MPI_Send(signal.raw_data, signal.size, MPI_DTYPE, dst, tag, comm);
 }
 
 int bcast_recv_int(MPI_Comm comm){
@@ -5,6 +5,7 @@
 #include <string>
 #include <memory>
 #include <exception>
+#include <climits>
 
 #include <mpi.h>
 
@@ -21,15 +22,28 @@ using namespace std;
 
 const int setup_tag = 1;
 const int probe_tag = 2;
+const int components_tag = 3;
 
 extern int n_processors_available;
 
 class MpiSimulator: public Simulator{
 public:
-    MpiSimulator(bool collect_timings);
+    MpiSimulator(bool collect_timings, unsigned batch_size=1);
+
+    /* Simulate on ``comm'', whose rank 0 must be the calling process.
+     * When several independent trials of the network are simulated (see
+     * ``mpi_split_trials''), ``comm'' holds the processes of trial
+     * ``trial'', and ``trials_comm'' the processes of all trials. */
+    MpiSimulator(
+        bool collect_timings, unsigned batch_size, MPI_Comm comm,
+        unsigned trial=0, unsigned n_trials=1,
+        MPI_Comm trials_comm=MPI_COMM_NULL);
     ~MpiSimulator();
 
     void from_file(string filename) override;
+    void from_components(
+        dtype dt, const vector<string>& probe_strings,
+        const vector<ComponentSpec>& components) override;
     void finalize_build() override;
 
     void run_n_steps(int steps, bool progress, string log_filename) override;
@@ -59,12 +73,40 @@ protected:
 
 void mpi_init();
 void mpi_finalize();
+bool mpi_is_initialized();
 int mpi_get_rank();
 int mpi_get_n_procs();
 void mpi_wake_workers();
+void mpi_wake_workers(MPI_Comm comm);
 void mpi_kill_workers();
+void mpi_kill_workers(MPI_Comm comm);
 void mpi_worker_start();
-void mpi_worker_start(MPI_Comm comm);
+void mpi_worker_start(
+    MPI_Comm comm, unsigned trial=0, unsigned n_trials=1,
+    MPI_Comm trials_comm=MPI_COMM_NULL);
+
+/* Split the processes in ``comm'' into ``n_trials'' groups of consecutive
+ * ranks, each of which simulates an independent trial of the network.
+ * Returns the communicator for the group of the calling process, and
+ * stores the index of that group in ``trial''. */
+MPI_Comm mpi_split_trials(MPI_Comm comm, unsigned n_trials, unsigned& trial);
+
+/* Send every worker the components that it owns, along with the dt and
+ * probe info for the whole network. Called by the master process. */
+void scatter_components(
+    dtype dt, const vector<string>& probe_strings,
+    const vector<ComponentSpec>& components, MPI_Comm comm);
+
+/* Receive the data sent by scatter_components. Called by workers. */
+void recv_components(
+    dtype& dt, vector<string>& probe_strings,
+    vector<ComponentSpec>& components, MPI_Comm comm);
+
+/* Send a buffer of any size, in pieces small enough for MPI's int counts.
+ * ``bcast_buffer'' resizes ``buffer'' on all processes but the root. */
+void send_buffer(const vector<char>& buffer, int dst, int tag, MPI_Comm comm);
+vector<char> recv_buffer(int src, int tag, MPI_Comm comm);
+void bcast_buffer(vector<char>& buffer, MPI_Comm comm);
 
 string recv_string(int src, int tag, MPI_Comm comm);
 void send_string(string s, int dst, int tag, MPI_Comm comm);
@@ -7,7 +7,7 @@
 #include "simulator.hpp"
 
 
-enum serialOptionIndex {UNKNOWN, HELP, NO_PROG, TIMING, LOG, SEED};
+enum serialOptionIndex {UNKNOWN, HELP, NO_PROG, TIMING, LOG, SEED, BATCH};
 
 const option::Descriptor serial_usage[] =
 {
@@ -24,6 +24,8 @@ const option::Descriptor serial_usage[] =
                                                                "If not specified, the log filename is the same as the "
                                                                "name of the network file, but with the .h5 extension."},
  {SEED,     0, "",  "seed",     option::Arg::Numeric, "  --seed  \tSeed for stochastic processes in the network."},
+ {BATCH,    0, "",  "batch",    option::Arg::Numeric, "  --batch  \tNumber of simulations to run side by side, with seeds "
+                                                               "seed, seed+1, etc. Probe data gains a trailing axis of this length."},
  {UNKNOWN,  0, "" , ""   ,      option::Arg::None, "\nExamples:\n"
                                                    "  nengo_cpp --progress basal_ganglia.net 1.0\n"
                                                    "  nengo_cpp --log ~/spaun_results.h5 spaun.net 7.5\n" },
@@ -90,10 +92,16 @@ int main(int argc, char **argv){
     }
 
     cout << "Will simulate with seed: " << seed << endl;
+
+    unsigned batch_size = 1;
+    if(options[BATCH]){
+        batch_size = boost::lexical_cast<unsigned>(options[BATCH].arg);
+    }
+    cout << "Will simulate a batch of size: " << batch_size << endl;
     cout << endl;
 
     cout << "Building network..." << endl;
-    auto sim = unique_ptr<Simulator>(new Simulator(collect_timings));
+    auto sim = unique_ptr<Simulator>(new Simulator(collect_timings, batch_size));
     sim->from_file(net_filename);
     sim->finalize_build();
 
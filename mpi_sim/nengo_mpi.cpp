@@ -12,7 +12,7 @@
 
 using namespace std;
 
-enum serialOptionIndex {UNKNOWN, HELP, NO_PROG, TIMING, LOG, SEED};
+enum serialOptionIndex {UNKNOWN, HELP, NO_PROG, TIMING, LOG, SEED, BATCH, TRIALS};
 
 const option::Descriptor serial_usage[] =
 {
@@ -29,13 +29,37 @@ const option::Descriptor serial_usage[] =
                                                                "If not specified, the log filename is the same as the "
                                                                "name of the network file, but with the .h5 extension."},
  {SEED,     0, "",  "seed",     option::Arg::Numeric, "  --seed  \tSeed for stochastic processes in the network."},
+ {BATCH,    0, "",  "batch",    option::Arg::Numeric, "  --batch  \tNumber of simulations to run side by side, with seeds "
+                                                               "seed, seed+1, etc. Probe data gains a trailing axis of this length."},
+ {TRIALS,   0, "",  "trials",   option::Arg::Numeric, "  --trials  \tNumber of independent trials to simulate, each on its own "
+                                                               "group of processors and with its own seeds. The number of processors "
+                                                               "must be a multiple of this. Probe data gains a leading axis of this length."},
  {UNKNOWN,  0, "" , ""   ,      option::Arg::None, "\nExamples:\n"
                                                    "  nengo_mpi --noprog basal_ganglia.net 1.0\n"
-                                                   "  nengo_mpi --log ~/spaun_results.h5 spaun.net 7.5\n" },
+                                                   "  nengo_mpi --log ~/spaun_results.h5 spaun.net 7.5\n"
+                                                   "  mpirun -np 8 nengo_mpi --trials 4 basal_ganglia.net 1.0\n" },
  {0,0,0,0,0,0}
 };
 
-int mpi_master_start(int argc, char **argv){
+/* Get the number of trials from the command line. Called by every process,
+ * since processes have to be split into trials before they can be
+ * told apart as masters and workers. */
+unsigned parse_n_trials(int argc, char **argv){
+    argc -= (argc > 0); argv += (argc > 0);
+    option::Stats  stats(serial_usage, argc, argv);
+    option::Option options[stats.options_max], buffer[stats.buffer_max];
+    option::Parser parse(serial_usage, argc, argv, options, buffer);
+
+    if(parse.error() || !options[TRIALS]){
+        return 1;
+    }
+
+    return boost::lexical_cast<unsigned>(options[TRIALS].arg);
+}
+
+int mpi_master_start(
+        int argc, char **argv, MPI_Comm comm, unsigned trial, unsigned n_trials,
+        MPI_Comm trials_comm){
 
     argc -= (argc > 0); argv += (argc > 0); // skip program name argv[0] if present
     option::Stats  stats(serial_usage, argc, argv);
@@ -96,10 +120,19 @@ int mpi_master_start(int argc, char **argv){
         seed = boost::lexical_cast<unsigned>(options[SEED].arg);
     }
     cout << "Will simulate with seed: " << seed << endl;
+
+    unsigned batch_size = 1;
+    if(options[BATCH]){
+        batch_size = boost::lexical_cast<unsigned>(options[BATCH].arg);
+    }
+    cout << "Will simulate a batch of size: " << batch_size << endl;
+    cout << "Will simulate trial " << trial << " of " << n_trials << endl;
     cout << endl;
 
     cout << "Building network..." << endl;
-    auto sim = unique_ptr<MpiSimulator>(new MpiSimulator(collect_timings));
+    auto sim = unique_ptr<MpiSimulator>(
+        new MpiSimulator(
+            collect_timings, batch_size, comm, trial, n_trials, trials_comm));
     sim->from_file(net_filename);
     sim->finalize_build();
 
@@ -115,7 +148,7 @@ int mpi_master_start(int argc, char **argv){
     sim->run_n_steps(n_steps, show_progress, log_filename);
     sim->close();
 
-    mpi_kill_workers();
+    mpi_kill_workers(comm);
 
     return 0;
 }
@@ -124,13 +157,29 @@ int main(int argc, char **argv){
 
     MPI_Init(&argc, &argv);
 
+    unsigned n_trials = parse_n_trials(argc, argv);
+    unsigned trial = 0;
+
+    MPI_Comm comm = MPI_COMM_WORLD;
+    MPI_Comm trials_comm = MPI_COMM_NULL;
+
+    if(n_trials > 1){
+        // Each trial gets its own group of processes, with its own master.
+        trials_comm = MPI_COMM_WORLD;
+        comm = mpi_split_trials(trials_comm, n_trials, trial);
+    }
+
     int rank;
-    MPI_Comm_rank(MPI_COMM_WORLD, &rank);
+    MPI_Comm_rank(comm, &rank);
 
     if(rank == 0){
-        mpi_master_start(argc, argv);
+        mpi_master_start(argc, argv, comm, trial, n_trials, trials_comm);
     }else{
-        mpi_worker_start(MPI_COMM_WORLD);
+        mpi_worker_start(comm, trial, n_trials, trials_comm);
+    }
+
+    if(comm != MPI_COMM_WORLD){
+        MPI_Comm_free(&comm);
     }
 
     MPI_Finalize();
@@ -7,8 +7,11 @@ TimeUpdate::TimeUpdate(Signal step, Signal time, dtype dt)
 }
 
 void TimeUpdate::operator() (){
-    step(0) += 1;
-    time(0) = step(0) * dt;
+    // In batch mode, each simulation in the batch has its own step and time.
+    for(unsigned j = 0; j < step.shape2; j++){
+        step(0, j) += 1;
+        time(0, j) = step(0, j) * dt;
+    }
 
     run_dbg(*this);
 }
@@ -52,12 +55,24 @@ string Reset::to_string() const {
 
 // ********************************************************************************
 Copy::Copy(Signal dst, Signal src)
-:dst(dst), src(src){
+:dst(dst), src(src), broadcast(src.shape2 == 1 && dst.shape2 > 1){
 
 }
 
 void Copy::operator() (){
-    dst.fill_with(src);
+    if(broadcast){
+        // Copy a vector into every column, e.g. a read-only
+        // signal into a signal that is batched.
+        for(unsigned i = 0; i < dst.shape1; i++){
+            dtype value = src(i);
+
+            for(unsigned j = 0; j < dst.shape2; j++){
+                dst(i, j) = value;
+            }
+        }
+    }else{
+        dst.fill_with(src);
+    }
 
     run_dbg(*this);
 }
@@ -80,7 +95,8 @@ SlicedCopy::SlicedCopy(
     int start_src, int stop_src, int step_src,
     int start_dst, int stop_dst, int step_dst,
     vector<int> seq_src, vector<int> seq_dst, bool inc)
-:src(src), dst(dst), length_src(src.shape1), length_dst(dst.shape1), inc(inc),
+:src(src), dst(dst), length_src(src.shape1), length_dst(dst.shape1),
+n_columns(dst.shape2), col_stride_src(src.shape2 > 1 ? 1 : 0), inc(inc),
 start_src(start_src), stop_src(stop_src), step_src(step_src),
 start_dst(start_dst), stop_dst(stop_dst), step_dst(step_dst),
 seq_src(seq_src), seq_dst(seq_dst){
@@ -128,78 +144,58 @@ seq_src(seq_src), seq_dst(seq_dst){
     }
 
     n_assignments = n_assignments_src;
-}
-
-void SlicedCopy::operator() (){
-    unsigned idx_src, idx_dst;
-    if(seq_src.size() > 0 && seq_dst.size() > 0){
-        if(inc){
-            for(unsigned i = 0; i < n_assignments; i++){
-                idx_src = seq_src[i] % length_src;
-                idx_dst = seq_dst[i] % length_dst;
 
-                dst(idx_dst) += src(idx_src);
-            }
+    for(unsigned i = 0; i < n_assignments; i++){
+        if(seq_src.size() > 0){
+            indices_src.push_back(seq_src[i] % length_src);
         }else{
-            for(unsigned i = 0; i < n_assignments; i++){
-                idx_src = seq_src[i] % length_src;
-                idx_dst = seq_dst[i] % length_dst;
-
-                dst(idx_dst) = src(idx_src);
-            }
+            indices_src.push_back((start_src + i * step_src) % length_src);
         }
 
-    }else if(seq_src.size() > 0){
-        if(inc){
-            for(unsigned i = 0; i < n_assignments; i++){
-                idx_src = seq_src[i] % length_src;
-                idx_dst = (start_dst + i * step_dst) % length_dst;
-
-                dst(idx_dst) += src(idx_src);
-            }
+        if(seq_dst.size() > 0){
+            indices_dst.push_back(seq_dst[i] % length_dst);
         }else{
-            for(unsigned i = 0; i < n_assignments; i++){
-                idx_src = seq_src[i] % length_src;
-                idx_dst = (start_dst + i * step_dst) % length_dst;
-
-                dst(idx_dst) = src(idx_src);
-            }
+            indices_dst.push_back((start_dst + i * step_dst) % length_dst);
         }
+    }
+}
 
-    }else if(seq_dst.size() > 0){
-        if(inc){
-            for(unsigned i = 0; i < n_assignments; i++){
-                idx_src = (start_src + i * step_src) % length_src;
-                idx_dst = seq_dst[i] % length_dst;
-
-                dst(idx_dst) += src(idx_src);
-            }
-        }else{
-            for(unsigned i = 0; i < n_assignments; i++){
-                idx_src = (start_src + i * step_src) % length_src;
-                idx_dst = seq_dst[i] % length_dst;
-
-                dst(idx_dst) = src(idx_src);
-            }
-        }
-
-    }else{
-        if(inc){
-            for(unsigned i = 0; i < n_assignments; i++){
-                idx_src = (start_src + i * step_src) % length_src;
-                idx_dst = (start_dst + i * step_dst) % length_dst;
-
-                dst(idx_dst) += src(idx_src);
+void SlicedCopy::operator() (){
+    // Signals in a batch are copied column by column. A src with a
+    // single column is copied into every column of dst.
+    const unsigned* idx_src = indices_src.data();
+    const unsigned* idx_dst = indices_dst.data();
+
+    for(unsigned j = 0; j < n_columns; j++){
+        const dtype* src_col = src.raw_data + int(j * col_stride_src) * src.stride2;
+        dtype* dst_col = dst.raw_data + int(j) * dst.stride2;
+
+        const int src_stride = src.stride1;
+        const int dst_stride = dst.stride1;
+
+        if(src_stride == 1 && dst_stride == 1){
+            if(inc){
+                for(unsigned i = 0; i < n_assignments; i++){
+                    dst_col[idx_dst[i]] += src_col[idx_src[i]];
+                }
+            }else{
+                for(unsigned i = 0; i < n_assignments; i++){
+                    dst_col[idx_dst[i]] = src_col[idx_src[i]];
+                }
             }
         }else{
-            for(unsigned i = 0; i < n_assignments; i++){
-                idx_src = (start_src + i * step_src) % length_src;
-                idx_dst = (start_dst + i * step_dst) % length_dst;
-
-                dst(idx_dst) = src(idx_src);
+            if(inc){
+                for(unsigned i = 0; i < n_assignments; i++){
+                    dst_col[int(idx_dst[i]) * dst_stride] +=
+                        src_col[int(idx_src[i]) * src_stride];
+                }
+            }else{
+                for(unsigned i = 0; i < n_assignments; i++){
+                    dst_col[int(idx_dst[i]) * dst_stride] =
+                        src_col[int(idx_src[i]) * src_stride];
+                }
             }
         }
-
     }
 
     run_dbg(*this);
@@ -241,12 +237,16 @@ string SlicedCopy::to_string() const{
 
 // ********************************************************************************
 DotInc::DotInc(Signal A, Signal X, Signal Y)
-:scalar(A.shape2 != X.shape1), matrix_vector(X.shape2 == 1), A(A), X(X), Y(Y){
+:scalar(A.shape2 != X.shape1), matrix_vector(X.shape2 == 1),
+broadcast(X.shape2 == 1 && Y.shape2 > 1), A(A), X(X), Y(Y){
 
+    // When broadcasting, X is a single vector (e.g. a read-only signal)
+    // and the product is added to every column of Y.
     if(scalar){
         // Scalar multiplication
         bool bad_shapes =
-            A.shape1 != 1 || A.shape2 != 1 || X.shape1 != Y.shape1 || X.shape2 != Y.shape2;
+            A.shape1 != 1 || A.shape2 != 1 || X.shape1 != Y.shape1 ||
+            (X.shape2 != Y.shape2 && !broadcast);
 
         if(bad_shapes){
             stringstream ss;
@@ -261,7 +261,8 @@ DotInc::DotInc(Signal A, Signal X, Signal Y)
     }else{
         // MM or MV multiplication
         bool bad_shapes =
-            A.shape1 != Y.shape1 || X.shape2 != Y.shape2 || A.shape2 != X.shape1;
+            A.shape1 != Y.shape1 || (X.shape2 != Y.shape2 && !broadcast) ||
+            A.shape2 != X.shape1;
 
         if(bad_shapes){
             stringstream ss;
@@ -311,6 +312,10 @@ DotInc::DotInc(Signal A, Signal X, Signal Y)
             throw runtime_error(ss.str());
         }
         leading_dim_Y = Y.stride1;
+
+        if(broadcast){
+            product.resize(Y.shape1);
+        }
     }
 }
 
@@ -318,19 +323,31 @@ void DotInc::operator() (){
     if(scalar){
         dtype a = A(0);
 
-        for(unsigned i = 0; i < X.shape1; i++){
-            for(unsigned j = 0; j < X.shape2; j++){
-                Y(i, j) += a * X(i, j);
+        for(unsigned i = 0; i < Y.shape1; i++){
+            for(unsigned j = 0; j < Y.shape2; j++){
+                Y(i, j) += a * X(i, broadcast ? 0 : j);
+            }
+        }
+
+    }else if(broadcast){
+        blas_gemv(
+            CblasRowMajor, transpose_A, m, n, 1.0,
+            A.raw_data, leading_dim_A, X.raw_data, X.stride1,
+            0.0, product.data(), 1);
+
+        for(unsigned i = 0; i < Y.shape1; i++){
+            for(unsigned j = 0; j < Y.shape2; j++){
+                Y(i, j) += product[i];
             }
         }
 
     }else if(X.shape2 == 1){
-        cblas_dgemv(
+        blas_gemv(
             CblasRowMajor, transpose_A, m, n, 1.0,
             A.raw_data, leading_dim_A, X.raw_data, X.stride1,
             1.0, Y.raw_data, Y.stride1);
     }else{
-        cblas_dgemm(
+        blas_gemm(
             CblasRowMajor, transpose_A, transpose_X, m, n, k,
             1.0, A.raw_data, leading_dim_A, X.raw_data, leading_dim_X,
             1.0, Y.raw_data, leading_dim_Y);
@@ -355,6 +372,112 @@ string DotInc::to_string() const{
     return out.str();
 }
 
+// ********************************************************************************
+// Stack the A matrices of ``ops`` on top of one another, in row-major order.
+static Signal stack_matrices(const vector<DotInc*>& ops){
+    unsigned n_rows = 0;
+    for(auto op: ops){
+        n_rows += op->get_A().shape1;
+    }
+
+    Signal stacked(n_rows, ops.front()->get_A().shape2);
+
+    dtype* dst = stacked.raw_data;
+    for(auto op: ops){
+        const SignalView& A = op->get_A();
+
+        for(unsigned i = 0; i < A.shape1; i++){
+            for(unsigned j = 0; j < A.shape2; j++){
+                *(dst++) = A(i, j);
+            }
+        }
+    }
+
+    return stacked;
+}
+
+DotIncGroup::DotIncGroup(const vector<DotInc*>& ops)
+:A(stack_matrices(ops)), X(ops.front()->get_X()){
+
+    unsigned offset = 0;
+    for(auto op: ops){
+        const SignalView& op_X = op->get_X();
+
+        bool same_X =
+            op_X.raw_data == X.raw_data && op_X.shape1 == X.shape1 &&
+            op_X.shape2 == X.shape2 && op_X.stride1 == X.stride1 &&
+            op_X.stride2 == X.stride2;
+
+        if(op->is_scalar() || !same_X){
+            stringstream ss;
+            ss << "While creating DotIncGroup, got a DotInc that cannot be "
+               << "grouped. Shapes are: A - " << shape_string(op->get_A())
+               << ", X - " << shape_string(op_X)
+               << ", expected X - " << shape_string(X) << "." << endl;
+
+            throw runtime_error(ss.str());
+        }
+
+        Y.push_back(op->get_Y());
+        offsets.push_back(offset);
+        offset += op->get_A().shape1;
+    }
+
+    transpose_X = X.row_major ? CblasNoTrans : CblasTrans;
+    leading_dim_X = X.row_major ? X.stride1 : X.stride2;
+
+    product.resize(A.shape1 * X.shape2);
+}
+
+void DotIncGroup::operator() (){
+    unsigned n_cols = X.shape2;
+
+    if(n_cols == 1){
+        blas_gemv(
+            CblasRowMajor, CblasNoTrans, A.shape1, A.shape2, 1.0,
+            A.raw_data, A.shape2, X.raw_data, X.stride1,
+            0.0, product.data(), 1);
+    }else{
+        blas_gemm(
+            CblasRowMajor, CblasNoTrans, transpose_X, A.shape1, n_cols, A.shape2,
+            1.0, A.raw_data, A.shape2, X.raw_data, leading_dim_X,
+            0.0, product.data(), n_cols);
+    }
+
+    // When X is a single vector, its product is added to every column of Y.
+    for(unsigned k = 0; k < Y.size(); k++){
+        SignalView& y = Y[k];
+        const dtype* rows = product.data() + offsets[k] * n_cols;
+
+        for(unsigned i = 0; i < y.shape1; i++){
+            for(unsigned j = 0; j < y.shape2; j++){
+                y(i, j) += rows[i * n_cols + (n_cols == 1 ? 0 : j)];
+            }
+        }
+    }
+
+    run_dbg(*this);
+}
+
+string DotIncGroup::to_string() const{
+
+    stringstream out;
+    out << Operator::to_string();
+    out << "n_ops: " << Y.size() << endl;
+
+    out << "A:" << endl;
+    out << signal_to_string(A) << endl;
+    out << "X:" << endl;
+    out << signal_to_string(X) << endl;
+
+    for(unsigned k = 0; k < Y.size(); k++){
+        out << "Y " << k << " (offset " << offsets[k] << "):" << endl;
+        out << signal_to_string(Y[k]) << endl;
+    }
+
+    return out.str();
+}
+
 // ********************************************************************************
 ElementwiseInc::ElementwiseInc(Signal A, Signal X, Signal Y)
 :A(A), X(X), Y(Y),
@@ -383,21 +506,35 @@ X_row_stride(X.shape1 > 1 ? 1 : 0), X_col_stride(X.shape2 > 1 ? 1 : 0){
 }
 
 void ElementwiseInc::operator() (){
-    unsigned A_i = 0, A_j = 0, X_i = 0, X_j = 0;
+    if(same_layout(A, Y) && same_layout(X, Y)){
+        const dtype* a = A.raw_data;
+        const dtype* x = X.raw_data;
+        dtype* y = Y.raw_data;
 
-    for(unsigned Y_i = 0; Y_i < Y.shape1; Y_i++){
-        A_j = 0;
-        X_j = 0;
+        for(unsigned k = 0; k < Y.size; k++){
+            y[k] += a[k] * x[k];
+        }
+    }else{
+        // Steps through A and X in elements, 0 along broadcast axes.
+        const int A_row_step = A_row_stride * A.stride1;
+        const int A_col_step = A_col_stride * A.stride2;
+        const int X_row_step = X_row_stride * X.stride1;
+        const int X_col_step = X_col_stride * X.stride2;
 
-        for(unsigned Y_j = 0; Y_j < Y.shape2; Y_j++){
-            Y(Y_i, Y_j) += A(A_i, A_j) * X(X_i, X_j);
+        const dtype* a_row = A.raw_data;
+        const dtype* x_row = X.raw_data;
 
-            A_j += A_col_stride;
-            X_j += X_col_stride;
-        }
+        for(unsigned Y_i = 0; Y_i < Y.shape1; Y_i++){
+            dtype* y_row = Y.raw_data + int(Y_i) * Y.stride1;
+
+            for(unsigned Y_j = 0; Y_j < Y.shape2; Y_j++){
+                y_row[int(Y_j) * Y.stride2] +=
+                    a_row[int(Y_j) * A_col_step] * x_row[int(Y_j) * X_col_step];
+            }
 
-        A_i += A_row_stride;
-        X_i += X_row_stride;
+            a_row += A_row_step;
+            x_row += X_row_step;
+        }
     }
 
     run_dbg(*this);
@@ -435,9 +572,18 @@ NoDenSynapse::NoDenSynapse(
 }
 
 void NoDenSynapse::operator() (){
-    for(unsigned i = 0; i < output.shape1; i++){
-        for(unsigned j = 0; j < output.shape2; j++){
-            output(i, j) = b * input(i, j);
+    if(same_layout(input, output)){
+        const dtype* in = input.raw_data;
+        dtype* out = output.raw_data;
+
+        for(unsigned k = 0; k < output.size; k++){
+            out[k] = b * in[k];
+        }
+    }else{
+        for(unsigned i = 0; i < output.shape1; i++){
+            for(unsigned j = 0; j < output.shape2; j++){
+                output.get(i, j) = b * input.get(i, j);
+            }
         }
     }
 
@@ -467,10 +613,19 @@ SimpleSynapse::SimpleSynapse(Signal input, Signal output, dtype a, dtype b)
 }
 
 void SimpleSynapse::operator() (){
-    for(unsigned i = 0; i < output.shape1; i++){
-        for(unsigned j = 0; j < output.shape2; j++){
-            output(i, j) *= -a;
-            output(i, j) += b * input(i, j);
+    if(same_layout(input, output)){
+        const dtype* in = input.raw_data;
+        dtype* out = output.raw_data;
+
+        for(unsigned k = 0; k < output.size; k++){
+            out[k] = out[k] * -a + b * in[k];
+        }
+    }else{
+        for(unsigned i = 0; i < output.shape1; i++){
+            for(unsigned j = 0; j < output.shape2; j++){
+                dtype& out = output.get(i, j);
+                out = out * -a + b * input.get(i, j);
+            }
         }
     }
 
@@ -512,19 +667,20 @@ void Synapse::operator() (){
     unsigned idx = 0;
     for(unsigned i = 0; i < output.shape1; i++){
         for(unsigned j = 0; j < output.shape2; j++){
-            x[idx].push_front(input(i, j));
+            x[idx].push_front(input.get(i, j));
 
-            output(i, j) = 0.0;
+            dtype out = 0.0;
 
             for(unsigned k = 0; k < x[idx].size(); k++){
-                output(i, j) += numer(k) * x[idx][k];
+                out += numer.get(k) * x[idx][k];
             }
 
             for(unsigned k = 0; k < y[idx].size(); k++){
-                output(i, j) -= denom(k) * y[idx][k];
+                out -= denom.get(k) * y[idx][k];
             }
 
-            y[idx].push_front(output(i, j));
+            output.get(i, j) = out;
+            y[idx].push_front(out);
 
             idx++;
         }
@@ -605,13 +761,15 @@ void TriangleSynapse::operator() (){
     unsigned idx = 0;
     for(unsigned i = 0; i < output.shape1; i++){
         for(unsigned j = 0; j < output.shape2; j++){
-            output(i, j) += n0 * input(i, j);
+            dtype in = input.get(i, j);
+            dtype out = output.get(i, j) + n0 * in;
 
             for(unsigned k = 0; k < x[idx].size(); k++){
-                output(i, j) -= x[idx][k];
+                out -= x[idx][k];
             }
 
-            x[idx].push_front(ndiff * input(i, j));
+            output.get(i, j) = out;
+            x[idx].push_front(ndiff * in);
             idx++;
         }
     }
@@ -663,19 +821,25 @@ void TriangleSynapse::reset(unsigned seed){
 // ********************************************************************************
 WhiteNoise::WhiteNoise(
     Signal output, dtype mean, dtype std, bool do_scale, bool inc, dtype dt)
-:output(output), mean(mean), std(std), dist(mean, std),
+:output(output), mean(mean), std(std),
+rngs(output.shape2), dists(output.shape2, normal_distribution<dtype>(mean, std)),
 alpha(do_scale ? 1.0 / dt : 1.0), do_scale(do_scale), inc(inc), dt(dt){
 
 }
 
 void WhiteNoise::operator() (){
-    if(inc){
-        for(unsigned i = 0; i < output.shape1; i++){
-            output(i) += alpha * dist(rng);
-        }
-    }else{
-        for(unsigned i = 0; i < output.shape1; i++){
-            output(i) = alpha * dist(rng);
+    for(unsigned j = 0; j < output.shape2; j++){
+        default_random_engine& rng = rngs[j];
+        normal_distribution<dtype>& dist = dists[j];
+
+        if(inc){
+            for(unsigned i = 0; i < output.shape1; i++){
+                output(i, j) += alpha * dist(rng);
+            }
+        }else{
+            for(unsigned i = 0; i < output.shape1; i++){
+                output(i, j) = alpha * dist(rng);
+            }
         }
     }
 
@@ -698,7 +862,12 @@ string WhiteNoise::to_string() const{
 }
 
 void WhiteNoise::reset(unsigned seed){
-    rng.seed(seed);
+    // Column j of a batch gets the noise that a single
+    // simulation would get with seed ``seed + j''.
+    for(unsigned j = 0; j < output.shape2; j++){
+        rngs[j].seed(seed + j);
+        dists[j].reset();
+    }
 }
 
 // ********************************************************************************
@@ -710,7 +879,11 @@ WhiteSignal::WhiteSignal(Signal coefs, Signal output, Signal time, dtype dt)
 void WhiteSignal::operator() (){
     unsigned idx = int(round(time(0) / dt));
     for(unsigned i = 0; i < output.shape1; i++){
-        output(i) = coefs(idx % coefs.shape1, i);
+        dtype value = coefs(idx % coefs.shape1, i);
+
+        for(unsigned j = 0; j < output.shape2; j++){
+            output(i, j) = value;
+        }
     }
 
     run_dbg(*this);
@@ -740,7 +913,11 @@ PresentInput::PresentInput(Signal input, Signal output, Signal time, dtype prese
 void PresentInput::operator() (){
     unsigned idx = int((time(0) - dt) / presentation_time + 1e-7);
     for(unsigned i = 0; i < output.shape1; i++){
-        output(i) = input(idx % input.shape1, i);
+        dtype value = input(idx % input.shape1, i);
+
+        for(unsigned j = 0; j < output.shape2; j++){
+            output(i, j) = value;
+        }
     }
 
     run_dbg(*this);
@@ -764,67 +941,253 @@ string PresentInput::to_string() const{
 
 
 // ********************************************************************************
-LIF::LIF(
-    unsigned n_neurons, dtype tau_rc, dtype tau_ref, dtype min_voltage,
-    dtype dt, Signal J, Signal output, Signal voltage,
-    Signal ref_time)
-:n_neurons(n_neurons), dt(dt), dt_inv(1.0 / dt), tau_rc(tau_rc), tau_ref(tau_ref),
-min_voltage(min_voltage), J(J), output(output), voltage(voltage), ref_time(ref_time),
-one(n_neurons, (dtype) 1.0), mult(n_neurons), dV(n_neurons){
+Tabulated::Tabulated(Signal table, Signal output, Signal step)
+:table(table), output(output), step(step){
+
+    if(table.shape2 != output.shape1){
+        stringstream ss;
+        ss << "While creating Tabulated, got mismatching shapes for table "
+           << "and output. Shapes are: table - " << shape_string(table)
+           << ", output - " << shape_string(output) << "." << endl;
 
+        throw runtime_error(ss.str());
+    }
 }
 
-void LIF::operator() (){
-    // dV = -expm1(-dt / tau_rc) * (J - voltage)
-    cblas_dcopy(n_neurons, J.raw_data, J.stride1, dV.raw_data, dV.stride1);
-    cblas_daxpy(n_neurons, -1.0, voltage.raw_data, voltage.stride1, dV.raw_data, dV.stride1);
-    dtype scale = -expm1(-dt / tau_rc);
-    cblas_dscal(n_neurons, scale, dV.raw_data, dV.stride1);
+void Tabulated::operator() (){
+    unsigned row = unsigned(step(0)) - 1;
+
+    if(row >= table.shape1){
+        stringstream ss;
+        ss << "Tabulated function was only evaluated for the first "
+           << table.shape1 << " steps, but reached step " << step(0) << ".";
 
-    // voltage += dV
-    cblas_daxpy(n_neurons, 1.0, dV.raw_data, dV.stride1, voltage.raw_data, voltage.stride1);
+        throw runtime_error(ss.str());
+    }
 
-    // voltage = max(voltage, 0)
-    dtype v;
-    for(unsigned i = 0; i < n_neurons; ++i){
-        v = voltage(i);
-        voltage(i) = v < min_voltage ? min_voltage : v;
+    for(unsigned i = 0; i < output.shape1; i++){
+        dtype value = table(row, i);
+
+        for(unsigned j = 0; j < output.shape2; j++){
+            output(i, j) = value;
+        }
     }
 
-    // ref_time -= dt_vec
-    cblas_daxpy(n_neurons, -dt, one.raw_data, one.stride1,
-                ref_time.raw_data, ref_time.stride1);
+    run_dbg(*this);
+}
+
+string Tabulated::to_string() const{
 
-    // mult = -dt_inv * ref_time + 1
-    cblas_dcopy(n_neurons, ref_time.raw_data, ref_time.stride1, mult.raw_data, mult.stride1);
-    cblas_dscal(n_neurons, -dt_inv, mult.raw_data, mult.stride1);
-    cblas_daxpy(n_neurons, 1.0, one.raw_data, one.stride1, mult.raw_data, mult.stride1);
+    stringstream out;
+    out << Operator::to_string();
+    out << "table:" << endl;
+    out << signal_to_string(table) << endl;
+    out << "output:" << endl;
+    out << signal_to_string(output) << endl;
+    out << "step:" << endl;
+    out << signal_to_string(step) << endl;
 
-    // mult = mult.clip(0, 1)
-    dtype m;
-    for(unsigned i = 0; i < n_neurons; ++i){
-        m = mult(i);
-        mult(i) = m > 1.0 ? 1.0 : (m < 0.0 ? 0.0 : m);
+    return out.str();
+}
+
+// ********************************************************************************
+Interpolate::Interpolate(
+    Signal table, Signal input, Signal output, dtype radius, unsigned n_points)
+:table(table), input(input), output(output), radius(radius),
+n_points(n_points), n_dims(input.shape1), scale((n_points - 1) / (2 * radius)){
+
+    unsigned n_rows = 1;
+    for(unsigned k = 0; k < n_dims; k++){
+        n_rows *= n_points;
     }
 
-    dtype overshoot;
-    for(unsigned i = 0; i < n_neurons; ++i){
-        voltage(i) *= mult(i);
-        v = voltage(i);
-        if(v > 1.0){
-            output(i) = dt_inv;
-            overshoot = (v - 1.0) / dV(i);
-            ref_time(i) = tau_ref + dt * (1.0 - overshoot);
-            voltage(i) = 0.0;
+    bool bad_shapes =
+        n_dims == 0 || n_dims > max_dims || n_points < 2 ||
+        table.shape1 != n_rows || table.shape2 != output.shape1 ||
+        input.shape2 != output.shape2;
+
+    if(bad_shapes){
+        stringstream ss;
+        ss << "While creating Interpolate, got mismatching shapes for table, "
+           << "input and output with " << n_points << " points per dimension. "
+           << "Shapes are: table - " << shape_string(table)
+           << ", input - " << shape_string(input)
+           << ", output - " << shape_string(output) << "." << endl;
+
+        throw runtime_error(ss.str());
+    }
+}
+
+void Interpolate::operator() (){
+    unsigned lower[max_dims];
+    dtype frac[max_dims];
+
+    for(unsigned j = 0; j < output.shape2; j++){
+        for(unsigned k = 0; k < n_dims; k++){
+            dtype pos = (input(k, j) + radius) * scale;
+            pos = min(max(pos, dtype(0.0)), dtype(n_points - 1));
+
+            lower[k] = min(unsigned(pos), n_points - 2);
+            frac[k] = pos - lower[k];
         }
-        else
-        {
-            output(i) = 0.0;
+
+        for(unsigned i = 0; i < output.shape1; i++){
+            output(i, j) = 0.0;
+        }
+
+        // Sum over the corners of the grid cell containing the input.
+        for(unsigned corner = 0; corner < (1u << n_dims); corner++){
+            dtype weight = 1.0;
+            unsigned row = 0;
+
+            for(unsigned k = 0; k < n_dims; k++){
+                unsigned upper = (corner >> (n_dims - 1 - k)) & 1;
+
+                weight *= upper ? frac[k] : 1.0 - frac[k];
+                row = row * n_points + lower[k] + upper;
+            }
+
+            for(unsigned i = 0; i < output.shape1; i++){
+                output(i, j) += weight * table(row, i);
+            }
         }
     }
 
     run_dbg(*this);
+}
 
+string Interpolate::to_string() const{
+
+    stringstream out;
+    out << Operator::to_string();
+    out << "radius:" << radius << endl;
+    out << "n_points:" << n_points << endl;
+    out << "table:" << endl;
+    out << signal_to_string(table) << endl;
+    out << "input:" << endl;
+    out << signal_to_string(input) << endl;
+    out << "output:" << endl;
+    out << signal_to_string(output) << endl;
+
+    return out.str();
+}
+
+// ********************************************************************************
+/* Advance ``n'' LIF neurons by one step, in a single pass over the neurons
+ * that keeps every intermediate value in registers. Gives the same results
+ * as the step of nengo.neurons.LIF, computed one vector operation at a time.
+ * If ``adaptive'', the input current of each neuron is first reduced by its
+ * adaptation, which then decays towards ``inc_n'' times the neuron's output,
+ * as in nengo.neurons.AdaptiveLIF. When ``contiguous'', the strides are
+ * known to be 1, so the compiler can drop the index arithmetic and, if
+ * trapping math is disabled (-fno-trapping-math), vectorize the loop. */
+template <bool adaptive, bool contiguous>
+static inline void lif_loop(
+        unsigned n, dtype dt, dtype tau_rc, dtype tau_ref, dtype min_voltage,
+        const SignalView& J, SignalView& output, SignalView& voltage,
+        SignalView& ref_time, SignalView* adaptation, dtype tau_n, dtype inc_n){
+
+    // Constants are dtypes, so that single precision builds do not compute
+    // in double precision.
+    const dtype zero = 0.0;
+    const dtype one = 1.0;
+
+    const dtype dt_inv = one / dt;
+    const dtype scale = -expm1(-dt / tau_rc);
+    const dtype decay = adaptive ? dt / tau_n : zero;
+
+    const dtype* J_data = J.raw_data;
+    dtype* output_data = output.raw_data;
+    dtype* voltage_data = voltage.raw_data;
+    dtype* ref_data = ref_time.raw_data;
+    dtype* adapt_data = adaptive ? adaptation->raw_data : nullptr;
+
+    const int J_stride = contiguous ? 1 : J.stride1;
+    const int output_stride = contiguous ? 1 : output.stride1;
+    const int voltage_stride = contiguous ? 1 : voltage.stride1;
+    const int ref_stride = contiguous ? 1 : ref_time.stride1;
+    const int adapt_stride = contiguous || !adaptive ? 1 : adaptation->stride1;
+
+    for(unsigned i = 0; i < n; ++i){
+        dtype j = J_data[i * J_stride];
+        if(adaptive){
+            j -= adapt_data[i * adapt_stride];
+        }
+
+        // dV = -expm1(-dt / tau_rc) * (J - voltage), voltage += dV
+        dtype v = voltage_data[i * voltage_stride];
+        dtype dV = scale * (j - v);
+        v += dV;
+        v = max(v, min_voltage);
+
+        // Scale voltage by the fraction of the step spent out of the
+        // refractory period.
+        dtype ref = ref_data[i * ref_stride] - dt;
+        dtype mult = ref * -dt_inv + one;
+        mult = min(max(mult, zero), one);
+        v *= mult;
+
+        // The refractory time of spiking neurons is computed for every
+        // neuron, so that there are no branches in the loop, and discarded
+        // for neurons that did not spike.
+        bool spiked = v > one;
+        dtype out = spiked ? dt_inv : zero;
+        dtype spike_ref = tau_ref + dt * (one - (v - one) / dV);
+
+        output_data[i * output_stride] = out;
+        ref_data[i * ref_stride] = spiked ? spike_ref : ref;
+        voltage_data[i * voltage_stride] = spiked ? zero : v;
+
+        if(adaptive){
+            dtype& a = adapt_data[i * adapt_stride];
+            a += decay * (inc_n * out - a);
+        }
+    }
+}
+
+template <bool adaptive>
+static void lif_step(
+        unsigned n, dtype dt, dtype tau_rc, dtype tau_ref, dtype min_voltage,
+        const SignalView& J, SignalView& output, SignalView& voltage,
+        SignalView& ref_time, SignalView* adaptation, dtype tau_n, dtype inc_n){
+
+    bool contiguous =
+        J.stride1 == 1 && output.stride1 == 1 && voltage.stride1 == 1 &&
+        ref_time.stride1 == 1 && (!adaptive || adaptation->stride1 == 1);
+
+    if(contiguous){
+        lif_loop<adaptive, true>(
+            n, dt, tau_rc, tau_ref, min_voltage, J, output, voltage,
+            ref_time, adaptation, tau_n, inc_n);
+    }else{
+        lif_loop<adaptive, false>(
+            n, dt, tau_rc, tau_ref, min_voltage, J, output, voltage,
+            ref_time, adaptation, tau_n, inc_n);
+    }
+}
+
+LIF::LIF(
+    unsigned n_neurons, dtype tau_rc, dtype tau_ref, dtype min_voltage,
+    dtype dt, Signal J, Signal output, Signal voltage,
+    Signal ref_time)
+:n_neurons(n_neurons), dt(dt), dt_inv(1.0 / dt), tau_rc(tau_rc), tau_ref(tau_ref),
+min_voltage(min_voltage), J(J), output(output), voltage(voltage), ref_time(ref_time){
+
+}
+
+void LIF::operator() (){
+    update(n_neurons, J, output, voltage, ref_time);
+
+    run_dbg(*this);
+}
+
+void LIF::update(
+        unsigned n, SignalView& J, SignalView& output, SignalView& voltage,
+        SignalView& ref_time){
+
+    lif_step<false>(
+        n, dt, tau_rc, tau_ref, min_voltage, J, output, voltage, ref_time,
+        nullptr, 1.0, 0.0);
 }
 
 string LIF::to_string() const{
@@ -848,6 +1211,111 @@ string LIF::to_string() const{
     return out.str();
 }
 
+// ********************************************************************************
+// Total number of neurons in a list of segments.
+static unsigned total_neurons(const vector<LIFGroup::Segment>& segments){
+    unsigned total = 0;
+    for(auto& segment: segments){
+        total += segment.n_neurons;
+    }
+
+    return total;
+}
+
+LIFGroup::LIFGroup(const vector<LIF*>& ops)
+:LIF(total_neurons(make_segments(ops)), ops.front()->tau_rc,
+     ops.front()->tau_ref, ops.front()->min_voltage, ops.front()->dt,
+     Signal(), Signal(), Signal(), Signal()),
+segments(make_segments(ops)), n_ops(ops.size()){
+
+    for(auto op: ops){
+        if(!same_parameters(*ops.front(), *op)){
+            stringstream ss;
+            ss << "While creating LIFGroup, got LIF operators with different "
+               << "parameters: " << endl << *ops.front() << endl << *op << endl;
+
+            throw runtime_error(ss.str());
+        }
+    }
+}
+
+bool LIFGroup::same_parameters(const LIF& first, const LIF& second){
+    return first.tau_rc == second.tau_rc && first.tau_ref == second.tau_ref &&
+        first.min_voltage == second.min_voltage && first.dt == second.dt;
+}
+
+LIFGroup::Segment LIFGroup::make_segment(const LIF& op){
+    return {op.n_neurons, op.J, op.output, op.voltage, op.ref_time};
+}
+
+vector<LIFGroup::Segment> LIFGroup::make_segments(const vector<LIF*>& ops){
+    vector<Segment> segments;
+
+    for(auto op: ops){
+        Segment next = make_segment(*op);
+
+        if(!segments.empty()){
+            Segment& last = segments.back();
+
+            bool follows = true;
+            for(auto views: {
+                    make_pair(&last.J, &next.J),
+                    make_pair(&last.output, &next.output),
+                    make_pair(&last.voltage, &next.voltage),
+                    make_pair(&last.ref_time, &next.ref_time)}){
+                follows &=
+                    views.first->stride1 == 1 && views.second->stride1 == 1 &&
+                    views.second->raw_data == views.first->raw_data + last.n_neurons;
+            }
+
+            if(follows){
+                last.n_neurons += next.n_neurons;
+
+                for(auto view: {&last.J, &last.output, &last.voltage, &last.ref_time}){
+                    view->shape1 = last.n_neurons;
+                    view->size = last.n_neurons;
+                }
+
+                continue;
+            }
+        }
+
+        segments.push_back(next);
+    }
+
+    return segments;
+}
+
+void LIFGroup::operator() (){
+    for(auto& s: segments){
+        update(s.n_neurons, s.J, s.output, s.voltage, s.ref_time);
+    }
+
+    run_dbg(*this);
+}
+
+string LIFGroup::to_string() const{
+
+    stringstream out;
+
+    out << Operator::to_string();
+    out << "n_ops: " << n_ops << endl;
+    out << "n_segments: " << segments.size() << endl;
+    out << "tau_rc: " << tau_rc << endl;
+    out << "tau_ref: " << tau_ref << endl;
+    out << "min_voltage: " << min_voltage << endl;
+
+    for(unsigned k = 0; k < segments.size(); k++){
+        out << "Segment " << k << ", n_neurons: " << segments[k].n_neurons << endl;
+        out << "J:" << endl;
+        out << signal_to_string(segments[k].J) << endl;
+        out << "output:" << endl;
+        out << signal_to_string(segments[k].output) << endl;
+    }
+
+    return out.str();
+}
+
 // ********************************************************************************
 LIFRate::LIFRate(
     unsigned n_neurons, dtype tau_rc, dtype tau_ref, Signal J, Signal output)
@@ -889,30 +1357,14 @@ AdaptiveLIF::AdaptiveLIF(
     dtype min_voltage, dtype dt, Signal J, Signal output, Signal voltage,
     Signal ref_time, Signal adaptation)
 :LIF(n_neurons, tau_rc, tau_ref, min_voltage, dt, J, output, voltage, ref_time),
-tau_n(tau_n), inc_n(inc_n), adaptation(adaptation), temp_J(n_neurons), dAdapt(n_neurons){
+tau_n(tau_n), inc_n(inc_n), adaptation(adaptation){
 
 }
 
 void AdaptiveLIF::operator() (){
-    // temp_J = J
-    cblas_dcopy(n_neurons, J.raw_data, J.stride1, temp_J.raw_data, temp_J.stride1);
-
-    // J -= adaptation
-    cblas_daxpy(n_neurons, -1.0, adaptation.raw_data, adaptation.stride1,
-                J.raw_data, J.stride1);
-
-    LIF::operator()();
-
-    // J = temp_J
-    cblas_dcopy(n_neurons, temp_J.raw_data, temp_J.stride1, J.raw_data, J.stride1);
-
-    // adaptation += (dt / tau_n) * (inc_n * output - adaptation);
-    cblas_dcopy(n_neurons, output.raw_data, output.stride1, dAdapt.raw_data, dAdapt.stride1);
-    cblas_dscal(n_neurons, inc_n, dAdapt.raw_data, dAdapt.stride1);
-    cblas_daxpy(n_neurons, -1.0, adaptation.raw_data, adaptation.stride1,
-                dAdapt.raw_data, dAdapt.stride1);
-    cblas_daxpy(n_neurons, dt/tau_n, dAdapt.raw_data, dAdapt.stride1,
-                adaptation.raw_data, adaptation.stride1);
+    lif_step<true>(
+        n_neurons, dt, tau_rc, tau_ref, min_voltage, J, output, voltage,
+        ref_time, &adaptation, tau_n, inc_n);
 
     run_dbg(*this);
 }
@@ -941,24 +1393,24 @@ temp_J(n_neurons), dAdapt(n_neurons){
 
 void AdaptiveLIFRate::operator() (){
     // temp_J = J
-    cblas_dcopy(n_neurons, J.raw_data, J.stride1, temp_J.raw_data, temp_J.stride1);
+    blas_copy(n_neurons, J.raw_data, J.stride1, temp_J.raw_data, temp_J.stride1);
 
     // J -= adaptation
-    cblas_daxpy(n_neurons, -1.0, adaptation.raw_data, adaptation.stride1,
-                J.raw_data, J.stride1);
+    blas_axpy(n_neurons, -1.0, adaptation.raw_data, adaptation.stride1,
+              J.raw_data, J.stride1);
 
     LIFRate::operator()();
 
     // J = temp_J
-    cblas_dcopy(n_neurons, temp_J.raw_data, temp_J.stride1, J.raw_data, J.stride1);
+    blas_copy(n_neurons, temp_J.raw_data, temp_J.stride1, J.raw_data, J.stride1);
 
     // adaptation += (dt / tau_n) * (inc_n * output - adaptation);
-    cblas_dcopy(n_neurons, output.raw_data, output.stride1, dAdapt.raw_data, dAdapt.stride1);
-    cblas_dscal(n_neurons, inc_n, dAdapt.raw_data, dAdapt.stride1);
-    cblas_daxpy(n_neurons, -1.0, adaptation.raw_data, adaptation.stride1,
-                dAdapt.raw_data, dAdapt.stride1);
-    cblas_daxpy(n_neurons, dt/tau_n, dAdapt.raw_data, dAdapt.stride1,
-                adaptation.raw_data, adaptation.stride1);
+    blas_copy(n_neurons, output.raw_data, output.stride1, dAdapt.raw_data, dAdapt.stride1);
+    blas_scal(n_neurons, inc_n, dAdapt.raw_data, dAdapt.stride1);
+    blas_axpy(n_neurons, -1.0, adaptation.raw_data, adaptation.stride1,
+              dAdapt.raw_data, dAdapt.stride1);
+    blas_axpy(n_neurons, dt/tau_n, dAdapt.raw_data, dAdapt.stride1,
+              adaptation.raw_data, adaptation.stride1);
 
     run_dbg(*this);
 }
@@ -1049,7 +1501,7 @@ void BCM::operator() (){
 
     delta.fill_with(0.0);
 
-    cblas_dger(
+    blas_ger(
         CblasRowMajor, delta.shape1, delta.shape2, alpha, squared_pf.raw_data, squared_pf.stride1,
         pre_filtered.raw_data, pre_filtered.stride1, delta.raw_data, delta.stride1);
 
@@ -1092,7 +1544,7 @@ void Oja::operator() (){
         }
     }
 
-    cblas_dger(
+    blas_ger(
         CblasRowMajor, delta.shape1, delta.shape2, alpha, post_filtered.raw_data, post_filtered.stride1,
         pre_filtered.raw_data, pre_filtered.stride1, delta.raw_data, delta.stride1);
 
@@ -12,17 +12,7 @@
 #include <boost/algorithm/string.hpp>
 #include <boost/lexical_cast.hpp>
 
-#ifdef __cplusplus
-extern "C"
-{
-#endif
-
-#include <cblas.h>
-
-#ifdef __cplusplus
-}
-#endif
-
+#include "blas.hpp"
 #include "signal.hpp"
 #include "typedef.hpp"
 #include "debug.hpp"
@@ -40,6 +30,11 @@ using namespace std;
 // or, ideally, finding some way to make these functions non-pointers and non-virtual.
 //
 // Note that in general reset must be called before the () operator can be called.
+//
+// Operators hold the signals they operate on as SignalViews, which don't own
+// their values, since the chunk keeps the base signals alive. Buffers that an
+// operator allocates itself, and arrays it is given (e.g. filter coefficients),
+// are owned by the operator and held as Signals.
 
 class Operator{
 
@@ -73,13 +68,13 @@ public:
         return out;
     }
 
-    void set_index(float i){ index = i;}
-    float get_index() const{ return index; }
+    void set_index(long long i){ index = i;}
+    long long get_index() const{ return index; }
 
     virtual unsigned get_seed_modifier() const{ return unsigned(index); }
 
 protected:
-    float index;
+    long long index;
 };
 
 class TimeUpdate: public Operator{
@@ -92,8 +87,8 @@ public:
     virtual string to_string() const;
 
 protected:
-    Signal step;
-    Signal time;
+    SignalView step;
+    SignalView time;
     const dtype dt;
 };
 
@@ -108,7 +103,7 @@ public:
     virtual string to_string() const;
 
 protected:
-    Signal dst;
+    SignalView dst;
     const dtype value;
 };
 
@@ -121,8 +116,10 @@ public:
     virtual string to_string() const;
 
 protected:
-    Signal dst;
-    Signal src;
+    SignalView dst;
+    SignalView src;
+
+    const bool broadcast;
 };
 
 class SlicedCopy: public Operator{
@@ -138,12 +135,17 @@ public:
     virtual string to_string() const;
 
 protected:
-    Signal src;
-    Signal dst;
+    SignalView src;
+    SignalView dst;
 
     const unsigned length_src;
     const unsigned length_dst;
 
+    // Number of columns to copy, and 0 if src has a single column
+    // that is copied into all of them.
+    const unsigned n_columns;
+    const unsigned col_stride_src;
+
     const int start_src;
     const int stop_src;
     const int step_src;
@@ -157,6 +159,10 @@ protected:
 
     const bool inc;
     unsigned n_assignments;
+
+    // Index into src and dst of each assignment.
+    vector<unsigned> indices_src;
+    vector<unsigned> indices_dst;
 };
 
 
@@ -169,13 +175,19 @@ public:
     void operator()();
     virtual string to_string() const;
 
+    bool is_scalar() const { return scalar; }
+    const SignalView& get_A() const { return A; }
+    const SignalView& get_X() const { return X; }
+    const SignalView& get_Y() const { return Y; }
+
 protected:
     const bool scalar;
     bool matrix_vector;
+    const bool broadcast;
 
-    Signal A;
-    Signal X;
-    Signal Y;
+    SignalView A;
+    SignalView X;
+    SignalView Y;
 
     CBLAS_TRANSPOSE transpose_A;
     CBLAS_TRANSPOSE transpose_X;
@@ -187,6 +199,38 @@ protected:
     unsigned m;
     unsigned n;
     unsigned k;
+
+    // Holds dot(A, X) when broadcasting.
+    vector<dtype> product;
+};
+
+/* Several DotIncs that multiply the same X, run as a single product of X
+ * with their A matrices stacked into one contiguous block. The slice of the
+ * product belonging to each DotInc is then added to its Y. Groups are formed
+ * by the chunk once all operators have been added: the A matrices are
+ * copied, so they must be read-only, and the DotIncs must be free to run in
+ * any order. */
+class DotIncGroup: public Operator{
+public:
+    DotIncGroup(const vector<DotInc*>& ops);
+    virtual string classname() const { return "DotIncGroup"; }
+
+    void operator()();
+    virtual string to_string() const;
+
+protected:
+    const Signal A;
+    SignalView X;
+    vector<SignalView> Y;
+
+    // Row of the stacked product at which the slice for each Y starts.
+    vector<unsigned> offsets;
+
+    CBLAS_TRANSPOSE transpose_X;
+    unsigned leading_dim_X;
+
+    // Holds dot(A, X), one row per row of A.
+    vector<dtype> product;
 };
 
 
@@ -199,9 +243,9 @@ public:
     virtual string to_string() const;
 
 protected:
-    Signal A;
-    Signal X;
-    Signal Y;
+    SignalView A;
+    SignalView X;
+    SignalView Y;
 
     // Strides are 0 or 1, to support broadcasting
     const unsigned A_row_stride;
@@ -222,8 +266,8 @@ public:
     virtual string to_string() const;
 
 protected:
-    Signal input;
-    Signal output;
+    SignalView input;
+    SignalView output;
 
     const dtype b;
 };
@@ -239,8 +283,8 @@ public:
     virtual string to_string() const;
 
 protected:
-    Signal input;
-    Signal output;
+    SignalView input;
+    SignalView output;
 
     const dtype a;
     const dtype b;
@@ -261,8 +305,8 @@ public:
     virtual void reset(unsigned seed);
 
 protected:
-    Signal input;
-    Signal output;
+    SignalView input;
+    SignalView output;
 
     const Signal numer;
     const Signal denom;
@@ -284,8 +328,8 @@ public:
     virtual void reset(unsigned seed);
 
 protected:
-    Signal input;
-    Signal output;
+    SignalView input;
+    SignalView output;
 
     const dtype n0;
     const dtype ndiff;
@@ -310,13 +354,15 @@ public:
     virtual void reset(unsigned seed);
 
 protected:
-    Signal output;
+    SignalView output;
 
     const dtype mean;
     const dtype std;
 
-    default_random_engine rng;
-    normal_distribution<dtype> dist;
+    // One generator per column of output, so that each
+    // simulation in a batch gets independent noise.
+    vector<default_random_engine> rngs;
+    vector<normal_distribution<dtype>> dists;
 
     const dtype alpha;
 
@@ -338,8 +384,8 @@ public:
 
 protected:
     const Signal coefs;
-    Signal output;
-    Signal time;
+    SignalView output;
+    SignalView time;
     dtype dt;
 };
 
@@ -357,14 +403,67 @@ public:
 
 protected:
     const Signal input;
-    Signal output;
-    Signal time;
+    SignalView output;
+    SignalView time;
 
     dtype presentation_time;
     dtype dt;
 };
 
 
+/* Sets ``output'' to a row of ``table'', which holds the values of a function
+ * of time computed ahead of time in python. Row i holds the value on step
+ * i + 1, so the operator can only run for as many steps as the table has
+ * rows. */
+class Tabulated: public Operator{
+
+public:
+    Tabulated(Signal table, Signal output, Signal step);
+
+    virtual string classname() const { return "Tabulated"; }
+
+    void operator()();
+    virtual string to_string() const;
+
+protected:
+    const Signal table;
+    SignalView output;
+    SignalView step;
+};
+
+
+/* Sets ``output'' to a function of ``input'', by interpolating between
+ * samples of the function taken in python. ``table'' holds the function's
+ * values on a grid with ``n_points'' evenly spaced points per input
+ * dimension, running from -radius to radius, with the last dimension
+ * varying fastest. Inputs outside of the grid are clamped to its edge. */
+class Interpolate: public Operator{
+
+public:
+    // Largest number of input dimensions that can be interpolated over.
+    static const unsigned max_dims = 3;
+
+    Interpolate(
+        Signal table, Signal input, Signal output,
+        dtype radius, unsigned n_points);
+
+    virtual string classname() const { return "Interpolate"; }
+
+    void operator()();
+    virtual string to_string() const;
+
+protected:
+    const Signal table;
+    SignalView input;
+    SignalView output;
+
+    dtype radius;
+    unsigned n_points;
+    unsigned n_dims;
+    dtype scale;
+};
+
+
 class LIF: public Operator{
 
 public:
@@ -377,7 +476,14 @@ public:
     void operator()();
     virtual string to_string() const;
 
+    friend class LIFGroup;
+
 protected:
+    /* Advance the first ``n`` neurons of the given signals by one step. */
+    void update(
+        unsigned n, SignalView& J, SignalView& output, SignalView& voltage,
+        SignalView& ref_time);
+
     const unsigned n_neurons;
 
     const dtype dt;
@@ -388,14 +494,48 @@ protected:
 
     const dtype min_voltage;
 
-    Signal J;
-    Signal output;
-    Signal voltage;
-    Signal ref_time;
+    SignalView J;
+    SignalView output;
+    SignalView voltage;
+    SignalView ref_time;
+};
+
+/* Several LIF operators with the same parameters, run as a single operator.
+ * Where the signals of one LIF directly follow those of the previous one in
+ * memory, the two are merged, so the group is run over as few contiguous
+ * segments of neurons as possible. Groups are formed by the chunk from runs
+ * of consecutive LIFs, which the python code orders together whenever they
+ * are ready to run at the same time (see nengo_mpi.ordering.group_key). */
+class LIFGroup: public LIF{
+public:
+    struct Segment{
+        unsigned n_neurons;
+
+        SignalView J;
+        SignalView output;
+        SignalView voltage;
+        SignalView ref_time;
+    };
+
+    LIFGroup(const vector<LIF*>& ops);
+    virtual string classname() const { return "LIFGroup"; }
 
-    const Signal one;
-    Signal mult;
-    Signal dV;
+    void operator()();
+    virtual string to_string() const;
+
+    /* Whether ``first`` and ``second`` have the same parameters. */
+    static bool same_parameters(const LIF& first, const LIF& second);
+
+    /* The neurons of a single LIF operator. */
+    static Segment make_segment(const LIF& op);
+
+    /* Split the neurons of ``ops`` into as few contiguous segments as
+     * possible. */
+    static vector<Segment> make_segments(const vector<LIF*>& ops);
+
+protected:
+    vector<Segment> segments;
+    const unsigned n_ops;
 };
 
 class LIFRate: public Operator{
@@ -412,8 +552,8 @@ protected:
     const dtype tau_rc;
     const dtype tau_ref;
 
-    Signal J;
-    Signal output;
+    SignalView J;
+    SignalView output;
 };
 
 class AdaptiveLIF: public LIF{
@@ -431,9 +571,7 @@ protected:
     const dtype tau_n;
     const dtype inc_n;
 
-    Signal adaptation;
-    Signal temp_J;
-    Signal dAdapt;
+    SignalView adaptation;
 };
 
 class AdaptiveLIFRate: public LIFRate{
@@ -452,7 +590,7 @@ protected:
     const dtype tau_n;
     const dtype inc_n;
 
-    Signal adaptation;
+    SignalView adaptation;
     Signal temp_J;
     Signal dAdapt;
 };
@@ -468,8 +606,8 @@ public:
 protected:
     const unsigned n_neurons;
 
-    Signal J;
-    Signal output;
+    SignalView J;
+    SignalView output;
 };
 
 class Sigmoid: public Operator{
@@ -486,8 +624,8 @@ protected:
     const dtype tau_ref;
     const dtype tau_ref_inv;
 
-    Signal J;
-    Signal output;
+    SignalView J;
+    SignalView output;
 };
 
 class BCM: public Operator{
@@ -503,10 +641,10 @@ public:
 protected:
     const dtype alpha;
 
-    Signal pre_filtered;
-    Signal post_filtered;
-    Signal theta;
-    Signal delta;
+    SignalView pre_filtered;
+    SignalView post_filtered;
+    SignalView theta;
+    SignalView delta;
 
     Signal squared_pf;
 };
@@ -525,10 +663,10 @@ protected:
     const dtype alpha;
     const dtype beta;
 
-    Signal pre_filtered;
-    Signal post_filtered;
-    Signal weights;
-    Signal delta;
+    SignalView pre_filtered;
+    SignalView post_filtered;
+    SignalView weights;
+    SignalView delta;
 };
 
 class Voja: public Operator{
@@ -545,11 +683,11 @@ public:
 protected:
     const dtype alpha;
 
-    Signal pre_decoded;
-    Signal post_filtered;
-    Signal scaled_encoders;
-    Signal delta;
-    Signal learning_signal;
+    SignalView pre_decoded;
+    SignalView post_filtered;
+    SignalView scaled_encoders;
+    SignalView delta;
+    SignalView learning_signal;
 
     Signal scale;
 };
\ No newline at end of file
@@ -43,7 +43,7 @@ protected:
     vector<Signal> data;
 
     // The signal to record
-    Signal signal;
+    SignalView signal;
     bool signal_contiguous;
 
     // How frequently to sample the recorded signal
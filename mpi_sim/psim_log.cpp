@@ -1,8 +1,14 @@
 #include "psim_log.hpp"
 
 ParallelSimulationLog::ParallelSimulationLog(
-    unsigned n_processors, unsigned processor, vector<ProbeSpec> probe_info, dtype dt, MPI_Comm comm)
-:SimulationLog(probe_info, dt), n_processors(n_processors), processor(processor), comm(comm){}
+    unsigned n_processors, unsigned processor, vector<ProbeSpec> probe_info, dtype dt, MPI_Comm comm,
+    unsigned batch_size, unsigned trial, unsigned n_trials, MPI_Comm file_comm)
+:SimulationLog(probe_info, dt, batch_size), n_processors(n_processors), processor(processor), comm(comm),
+file_comm(file_comm == MPI_COMM_NULL ? comm : file_comm){
+
+    this->trial = trial;
+    this->n_trials = n_trials;
+}
 
 // Master version
 void ParallelSimulationLog::prep_for_simulation(string fn, unsigned n_steps){
@@ -61,7 +67,7 @@ void ParallelSimulationLog::setup_hdf5(unsigned n_steps){
 
     // Set up file access property list with parallel I/O access
     plist_id = H5Pcreate(H5P_FILE_ACCESS);
-    H5Pset_fapl_mpio(plist_id, comm, MPI_INFO_NULL);
+    H5Pset_fapl_mpio(plist_id, file_comm, MPI_INFO_NULL);
 
     // Create a new file collectively and release property list identifier.
     file_id = H5Fcreate(filename.c_str(), H5F_ACC_TRUNC, H5P_DEFAULT, plist_id);
@@ -72,16 +78,13 @@ void ParallelSimulationLog::setup_hdf5(unsigned n_steps){
     H5Tset_strpad(str_type, H5T_STR_NULLTERM);
 
     for(ProbeSpec ps : probe_info){
-        hsize_t dset_dims[] = {n_steps, ps.signal_spec.shape1};
-
-        // Create the dataspace for the dataset.
-        dataspace_id = H5Screate_simple(2, dset_dims, NULL);
+        dataspace_id = create_probe_dataspace(ps, n_steps);
 
         string dspace_key = to_string(ps.probe_key);
 
         // Create the dataset with default properties
         dset_id = H5Dcreate(
-            file_id, dspace_key.c_str(), H5T_NATIVE_DOUBLE, dataspace_id,
+            file_id, dspace_key.c_str(), H5T_NATIVE_DTYPE, dataspace_id,
             H5P_DEFAULT, H5P_DEFAULT, H5P_DEFAULT);
 
         // Set the ``name'' attribute of the dataset so we know which probe the data came from
@@ -126,9 +129,10 @@ void ParallelSimulationLog::write_file(
     char c_filename[fn.length() + 1];
     strcpy(c_filename, fn.c_str());
 
-    MPI_File_open(comm, c_filename, MPI_MODE_CREATE | MPI_MODE_WRONLY, MPI_INFO_NULL, &fh);
+    MPI_File_open(file_comm, c_filename, MPI_MODE_CREATE | MPI_MODE_WRONLY, MPI_INFO_NULL, &fh);
 
-    MPI_Offset offset = max_buffer_size * rank * sizeof(char);
+    // Trials share the file, each taking a contiguous block of records.
+    MPI_Offset offset = max_buffer_size * (trial * n_processors + rank) * sizeof(char);
     MPI_File_set_view(fh, offset, MPI_CHAR, MPI_CHAR, (char*)"native", MPI_INFO_NULL);
 
     char c_data[data.length() + 1];
@@ -25,7 +25,9 @@ public:
 
     ParallelSimulationLog(
         unsigned n_processors, unsigned processor,
-        vector<ProbeSpec> probe_info, dtype dt, MPI_Comm comm);
+        vector<ProbeSpec> probe_info, dtype dt, MPI_Comm comm,
+        unsigned batch_size=1, unsigned trial=0, unsigned n_trials=1,
+        MPI_Comm file_comm=MPI_COMM_NULL);
 
     // Called by master
     void prep_for_simulation(string fn, unsigned n_steps);
@@ -45,6 +47,10 @@ protected:
     unsigned processor;
     MPI_Comm comm;
 
+    // Communicator over all processors sharing the file. Differs from
+    // ``comm'' when several independent trials write to the same file.
+    MPI_Comm file_comm;
+
     unsigned mpi_rank;
     unsigned mpi_size;
 };
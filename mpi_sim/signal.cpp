@@ -1,87 +1,104 @@
 #include "signal.hpp"
 
-Signal::Signal()
-:label(""), ndim(0), size(0), shape1(0), shape2(0),
-stride1(0), stride2(0), offset(0), is_view(false),
+SignalView::SignalView()
+:raw_data(nullptr), size(0), shape1(0), shape2(0), stride1(0), stride2(0),
 is_contiguous(true), row_major(true){
 
 }
 
+SignalView::SignalView(
+    dtype* raw_data, unsigned shape1, unsigned shape2, int stride1, int stride2)
+:raw_data(raw_data), size(shape1 * shape2), shape1(shape1), shape2(shape2),
+stride1(stride1), stride2(stride2), row_major(stride2 == 1){
+
+    is_contiguous = _is_contiguous(*this);
+}
+
+string SignalView::to_string() const{
+    return describe("");
+}
+
+string SignalView::describe(const string& label) const{
+    stringstream out;
+    out << "<Signal - " << (label.size() > 0 ? label : "(NULL)") << " | "
+        << " shape=" << shape_string(*this)
+        << ", size=" << size
+        << ", stride=" << stride_string(*this)
+        << ", raw_data=" << raw_data;
+
+    if(RUN_DEBUG_TEST){
+        out << endl;
+        for(unsigned i = 0; i < shape1; i++){
+            out << i << ": ";
+            for(unsigned j = 0; j < shape2; j++){
+                out << operator()(i, j) << ", ";
+            }
+
+            out << endl;
+        }
+    }
+
+    out << ">";
+
+    return out.str();
+}
+
+Signal::Signal()
+:ndim(0), offset(0), is_view(false){
+
+}
+
 // Create a vector (ndim=1) base signal.
 Signal::Signal(
     unsigned n, dtype val, string label)
-:label(label), data(shared_ptr<dtype>(new dtype[n])), ndim(1), size(n),
-shape1(n), shape2(1), stride1(1), stride2(1), offset(0),
-is_view(false), is_contiguous(true), row_major(true){
+:SignalView(nullptr, n, 1, 1, 1), ndim(1), offset(0), is_view(false),
+data(shared_ptr<dtype>(new dtype[n], default_delete<dtype[]>())){
 
     raw_data = data.get();
     fill(raw_data, raw_data + n, val);
+    set_label(label);
 }
 
 // Create a vector (ndim=1) from an existing buffer.
 Signal::Signal(
     unsigned n, shared_ptr<dtype> data, string label)
-:label(label), data(data), ndim(1), size(n),
-shape1(n), shape2(1), stride1(1), stride2(1), offset(0),
-is_view(false), is_contiguous(true), row_major(true){
+:SignalView(data.get(), n, 1, 1, 1), ndim(1), offset(0), is_view(false),
+data(data){
 
-    raw_data = data.get();
+    set_label(label);
 }
 
 // Create a matrix (ndim=2) base signal.
 Signal::Signal(
     unsigned m, unsigned n, dtype val, string label)
-:label(label), data(shared_ptr<dtype>(new dtype[m*n])), ndim(2), size(m*n),
-shape1(m), shape2(n), stride1(n), stride2(1), offset(0), is_view(false),
-is_contiguous(true), row_major(true){
+:SignalView(nullptr, m, n, n, 1), ndim(2), offset(0), is_view(false),
+data(shared_ptr<dtype>(new dtype[m*n], default_delete<dtype[]>())){
 
     raw_data = data.get();
     fill(raw_data, raw_data + m * n, val);
+    set_label(label);
 }
 
 // Create a matrix (ndim=2) from an existing buffer.
 Signal::Signal(
     unsigned m, unsigned n, shared_ptr<dtype> data, string label)
-:label(label), data(data), ndim(2), size(m*n),
-shape1(m), shape2(n), stride1(n), stride2(1), offset(0),
-is_view(false), is_contiguous(true), row_major(true){
+:SignalView(data.get(), m, n, n, 1), ndim(2), offset(0), is_view(false),
+data(data){
 
-    raw_data = data.get();
+    set_label(label);
 }
 
 string Signal::to_string() const{
-    stringstream out;
-    out << "<Signal - " << (label.size() > 0 ? label : "(NULL)") << " | "
-        << " ndim=" << ndim
-        << ", shape=" << shape_string(*this)
-        << ", size=" << size
-        << ", stride=" << stride_string(*this)
-        << ", raw_data=" << raw_data;
-
-    if(RUN_DEBUG_TEST){
-        out << endl;
-        for(unsigned i = 0; i < shape1; i++){
-            out << i << ": ";
-            for(unsigned j = 0; j < shape2; j++){
-                out << operator()(i, j) << ", ";
-            }
-
-            out << endl;
-        }
-    }
-
-    out << ">";
-
-    return out.str();
+    return describe(get_label());
 }
 
-Signal Signal::deep_copy() const{
+Signal SignalView::deep_copy() const{
     Signal signal(shape1, shape2);
     signal.fill_with(*this);
     return signal;
 }
 
-void Signal::copy_to_buffer(dtype* buffer) const{
+void SignalView::copy_to_buffer(dtype* buffer) const{
     if(is_contiguous){
         memcpy(buffer, raw_data, size * sizeof(dtype));
     }else if(stride2 == 1){
@@ -112,7 +129,7 @@ Signal Signal::get_view(
 
     Signal view(*this);
 
-    view.label = label_;
+    view.set_label(label_);
     view.ndim = ndim_;
     view.shape1 = shape1_;
     view.shape2 = shape2_;
@@ -132,7 +149,7 @@ Signal Signal::get_view(
 }
 
 // ********************************************************************************
-bool _is_contiguous(const Signal signal){
+bool _is_contiguous(const SignalView& signal){
     if(signal.shape1 == 1){
         return signal.stride2 == 1 || signal.shape2 == 1;
     }
@@ -145,7 +162,7 @@ bool _is_contiguous(const Signal signal){
         || (signal.stride2 == 1 && signal.stride1 == signal.shape2);
 }
 
-string signal_to_string(const Signal signal){
+string signal_to_string(const SignalView& signal){
 
     stringstream ss;
 
@@ -158,13 +175,13 @@ string signal_to_string(const Signal signal){
     return ss.str();
 }
 
-string shape_string(const Signal signal){
+string shape_string(const SignalView& signal){
     stringstream ss;
     ss << "(" << signal.shape1 << ", " << signal.shape2 << ")";
     return ss.str();
 }
 
-string stride_string(const Signal signal){
+string stride_string(const SignalView& signal){
     stringstream ss;
     ss << "(" << signal.stride1 << ", " << signal.stride2 << ")";
     return ss.str();
@@ -15,25 +15,18 @@ using namespace std;
 
 string out_of_range_message(unsigned max, unsigned idx, unsigned axis);
 
-struct Signal {
-    Signal();
-
-    // Create a vector (ndim=1) base signal.
-    Signal(unsigned n, dtype val=0.0, string label="");
-
-    // Create a vector (ndim=1) from an existing buffer.
-    Signal(unsigned n, shared_ptr<dtype> data, string label="");
-
-    // Create a matrix (ndim=2) base signal.
-    Signal(unsigned m, unsigned n, dtype val=0.0, string label="");
-
-    // Create a matrix (ndim=2) from an existing buffer.
-    Signal(unsigned m, unsigned n, shared_ptr<dtype> data, string label="");
-
-    Signal(const Signal& s)=default;
-    Signal& operator= (const Signal& signal)=default;
-
-    void fill_with(const Signal& signal);
+struct Signal;
+
+/* A view of the values of a signal, without ownership of them. Operators
+ * hold their signals as SignalViews, since a network may have millions of
+ * operators; the base Signals that own the values are kept by the chunk. */
+struct SignalView {
+    SignalView();
+    SignalView(
+        dtype* raw_data, unsigned shape1, unsigned shape2,
+        int stride1, int stride2);
+
+    void fill_with(const SignalView& signal);
     void fill_with(const dtype& scalar);
 
     string to_string() const;
@@ -45,21 +38,24 @@ struct Signal {
     dtype& operator() (unsigned idx);
     dtype operator() (unsigned idx) const;
 
-    bool operator== (const Signal& other) const;
-    bool operator!= (const Signal& other) const;
+    // Unchecked versions of operator(), for the inner loops of operators.
+    // Indices are only checked in debug builds.
+    dtype& get(unsigned row, unsigned col);
+    dtype get(unsigned row, unsigned col) const;
+    dtype& get(unsigned idx);
+    dtype get(unsigned idx) const;
+
+    bool operator== (const SignalView& other) const;
+    bool operator!= (const SignalView& other) const;
 
     Signal deep_copy() const;
 
     // Copy to a buffer in row-major order.
     void copy_to_buffer(dtype* buffer) const;
 
-    Signal get_view(
-            string label_, unsigned ndim_, unsigned shape1_, unsigned shape2_,
-            int stride1_, int stride2_, unsigned offset_) const;
-
-    string label;
+    // A pointer to the location in the base array where the current signal starts.
+    dtype* raw_data;
 
-    unsigned ndim;
     unsigned size;
 
     unsigned shape1;
@@ -68,17 +64,59 @@ struct Signal {
     int stride1;
     int stride2;
 
-    unsigned offset;
-    bool is_view;
     bool is_contiguous;
     bool row_major;
 
+    friend ostream& operator << (ostream &out, const SignalView &sv){
+        out << sv.to_string();
+        return out;
+    }
+
+protected:
+    string describe(const string& label) const;
+};
+
+/* A signal that shares ownership of its values. Base signals, and views
+ * of them handed out by the chunk, are Signals. The label is only stored
+ * in debug builds. */
+struct Signal: public SignalView {
+    Signal();
+
+    // Create a vector (ndim=1) base signal.
+    Signal(unsigned n, dtype val=0.0, string label="");
+
+    // Create a vector (ndim=1) from an existing buffer.
+    Signal(unsigned n, shared_ptr<dtype> data, string label="");
+
+    // Create a matrix (ndim=2) base signal.
+    Signal(unsigned m, unsigned n, dtype val=0.0, string label="");
+
+    // Create a matrix (ndim=2) from an existing buffer.
+    Signal(unsigned m, unsigned n, shared_ptr<dtype> data, string label="");
+
+    Signal(const Signal& s)=default;
+    Signal& operator= (const Signal& signal)=default;
+
+    string to_string() const;
+
+    Signal get_view(
+            string label_, unsigned ndim_, unsigned shape1_, unsigned shape2_,
+            int stride1_, int stride2_, unsigned offset_) const;
+
+    string get_label() const;
+    void set_label(const string& label_);
+
+    unsigned ndim;
+
+    unsigned offset;
+    bool is_view;
+
     // A pointer to the base array. Offset is not included in this.
     shared_ptr<dtype> data;
 
-    // A pointer to the location in the base array where the current signal starts.
-    // Roughly equivalent to ``data.get() + offset``.
-    dtype* raw_data;
+#ifdef DEBUG
+    string label;
+#endif
 
     friend ostream& operator << (ostream &out, const Signal &sv){
         out << sv.to_string();
@@ -87,7 +125,23 @@ struct Signal {
 };
 
 inline
-void Signal::fill_with(const Signal& signal){
+string Signal::get_label() const{
+#ifdef DEBUG
+    return label;
+#else
+    return "";
+#endif
+}
+
+inline
+void Signal::set_label(const string& label_){
+#ifdef DEBUG
+    label = label_;
+#endif
+}
+
+inline
+void SignalView::fill_with(const SignalView& signal){
 
     if(shape1 != signal.shape1 || shape2 != signal.shape2){
         stringstream out;
@@ -111,7 +165,7 @@ void Signal::fill_with(const Signal& signal){
 }
 
 inline
-void Signal::fill_with(const dtype& scalar){
+void SignalView::fill_with(const dtype& scalar){
     if(is_contiguous){
         fill(raw_data, raw_data + size, scalar);
     }else if(stride2 == 1){
@@ -128,7 +182,7 @@ void Signal::fill_with(const dtype& scalar){
 }
 
 inline
-dtype& Signal::operator() (unsigned row, unsigned col){
+dtype& SignalView::operator() (unsigned row, unsigned col){
     if (row >= shape1){
         throw out_of_range(out_of_range_message(shape1, row, 0));
     }
@@ -141,7 +195,7 @@ dtype& Signal::operator() (unsigned row, unsigned col){
 }
 
 inline
-dtype Signal::operator() (unsigned row, unsigned col) const{
+dtype SignalView::operator() (unsigned row, unsigned col) const{
     if (row >= shape1){
         throw out_of_range(out_of_range_message(shape1, row, 0));
     }
@@ -155,7 +209,7 @@ dtype Signal::operator() (unsigned row, unsigned col) const{
 
 // for dealing with vectors.
 inline
-dtype& Signal::operator() (unsigned idx){
+dtype& SignalView::operator() (unsigned idx){
     if (idx >= shape1){
         throw out_of_range(out_of_range_message(shape1, idx, 0));
     }
@@ -164,7 +218,7 @@ dtype& Signal::operator() (unsigned idx){
 }
 
 inline
-dtype Signal::operator() (unsigned idx) const{
+dtype SignalView::operator() (unsigned idx) const{
     if (idx >= shape1){
         throw out_of_range(out_of_range_message(shape1, idx, 0));
     }
@@ -173,7 +227,43 @@ dtype Signal::operator() (unsigned idx) const{
 }
 
 inline
-bool Signal::operator== (const Signal& other) const{
+dtype& SignalView::get(unsigned row, unsigned col){
+#ifdef DEBUG
+    return operator()(row, col);
+#else
+    return raw_data[int(row) * stride1 + int(col) * stride2];
+#endif
+}
+
+inline
+dtype SignalView::get(unsigned row, unsigned col) const{
+#ifdef DEBUG
+    return operator()(row, col);
+#else
+    return raw_data[int(row) * stride1 + int(col) * stride2];
+#endif
+}
+
+inline
+dtype& SignalView::get(unsigned idx){
+#ifdef DEBUG
+    return operator()(idx);
+#else
+    return raw_data[int(idx) * stride1];
+#endif
+}
+
+inline
+dtype SignalView::get(unsigned idx) const{
+#ifdef DEBUG
+    return operator()(idx);
+#else
+    return raw_data[int(idx) * stride1];
+#endif
+}
+
+inline
+bool SignalView::operator== (const SignalView& other) const{
     bool identical = true;
     identical &= other.shape1 == shape1;
     identical &= other.shape2 == shape2;
@@ -194,12 +284,23 @@ bool Signal::operator== (const Signal& other) const{
 }
 
 inline
-bool Signal::operator!= (const Signal& other) const{
+bool SignalView::operator!= (const SignalView& other) const{
     return !(*this == other);
 }
 
-bool _is_contiguous(const Signal signal);
+bool _is_contiguous(const SignalView& signal);
+
+/* Whether element (i, j) of ``a'' and of ``b'' is at the same offset from
+ * raw_data for every i and j, with both signals contiguous. Elementwise
+ * operators can then treat the signals as flat arrays. */
+inline
+bool same_layout(const SignalView& a, const SignalView& b){
+    return a.is_contiguous && b.is_contiguous &&
+        a.shape1 == b.shape1 && a.shape2 == b.shape2 &&
+        (a.shape1 == 1 || a.shape2 == 1 ||
+         (a.stride1 == b.stride1 && a.stride2 == b.stride2));
+}
 
-string signal_to_string(const Signal signal);
-string shape_string(const Signal signal);
-string stride_string(const Signal signal);
+string signal_to_string(const SignalView& signal);
+string shape_string(const SignalView& signal);
+string stride_string(const SignalView& signal);
@@ -1,12 +1,14 @@
 #include "sim_log.hpp"
 
 
-SimulationLog::SimulationLog(vector<ProbeSpec> probe_info, dtype dt)
-:probe_info(probe_info), dt(dt), ready_for_simulation(false), closed(true){
+SimulationLog::SimulationLog(vector<ProbeSpec> probe_info, dtype dt, unsigned batch_size)
+:ready_for_simulation(false), dt(dt), batch_size(batch_size), trial(0),
+n_trials(1), probe_info(probe_info), closed(true){
 }
 
 SimulationLog::SimulationLog(dtype dt)
-:dt(dt), ready_for_simulation(false), closed(true){
+:ready_for_simulation(false), dt(dt), batch_size(1), trial(0), n_trials(1),
+closed(true){
 }
 
 void SimulationLog::prep_for_simulation(string fn, unsigned n_steps){
@@ -38,16 +40,13 @@ void SimulationLog::setup_hdf5(unsigned n_steps){
     H5Tset_strpad(str_type, H5T_STR_NULLTERM);
 
     for(ProbeSpec ps : probe_info){
-        hsize_t dset_dims[] = {n_steps, ps.signal_spec.shape1};
-
-        // Create the dataspace for the dataset.
-        dataspace_id = H5Screate_simple(2, dset_dims, NULL);
+        dataspace_id = create_probe_dataspace(ps, n_steps);
 
         string dspace_key = to_string(ps.probe_key);
 
         // Create the dataset with default properties
         dset_id = H5Dcreate2(
-            file_id, dspace_key.c_str(), H5T_NATIVE_DOUBLE, dataspace_id,
+            file_id, dspace_key.c_str(), H5T_NATIVE_DTYPE, dataspace_id,
             H5P_DEFAULT, H5P_DEFAULT, H5P_DEFAULT);
 
         // Set the ``name'' attribute of the dataset so we know which probe the data came from
@@ -67,6 +66,24 @@ void SimulationLog::setup_hdf5(unsigned n_steps){
     H5Tclose(str_type);
 }
 
+hid_t SimulationLog::create_probe_dataspace(const ProbeSpec& ps, unsigned n_steps){
+    hsize_t dset_dims[4];
+    int rank = 0;
+
+    if(n_trials > 1){
+        dset_dims[rank++] = n_trials;
+    }
+
+    dset_dims[rank++] = n_steps;
+    dset_dims[rank++] = ps.signal_spec.shape1;
+
+    if(batch_size > 1){
+        dset_dims[rank++] = batch_size;
+    }
+
+    return H5Screate_simple(rank, dset_dims, NULL);
+}
+
 void SimulationLog::write(key_type probe_key, shared_ptr<dtype> buffer, unsigned n_rows){
     herr_t status;
 
@@ -74,18 +91,32 @@ void SimulationLog::write(key_type probe_key, shared_ptr<dtype> buffer, unsigned
 
     unsigned n_cols = d.n_cols;
 
-    hsize_t     count[] = {n_rows, n_cols};
-    hsize_t     offset[] = {d.row_offset, 0};
-    hsize_t     stride[] = {1, 1};
-    hsize_t     block[] = {1, 1};
+    hsize_t count[4], offset[4];
+    int rank = 0;
+
+    if(n_trials > 1){
+        count[rank] = 1;
+        offset[rank++] = trial;
+    }
+
+    count[rank] = n_rows;
+    offset[rank++] = d.row_offset;
+
+    count[rank] = n_cols;
+    offset[rank++] = 0;
+
+    if(batch_size > 1){
+        count[rank] = batch_size;
+        offset[rank++] = 0;
+    }
 
-    hid_t memspace_id = H5Screate_simple(2, count, NULL);
+    hid_t memspace_id = H5Screate_simple(rank, count, NULL);
 
     status = H5Sselect_hyperslab(
-        d.dataspace_id, H5S_SELECT_SET, offset, stride, count, block);
+        d.dataspace_id, H5S_SELECT_SET, offset, NULL, count, NULL);
 
     status = H5Dwrite(
-        d.dset_id, H5T_NATIVE_DOUBLE, memspace_id, d.dataspace_id,
+        d.dset_id, H5T_NATIVE_DTYPE, memspace_id, d.dataspace_id,
         d.plist_id, buffer.get());
 
     H5Sclose(memspace_id);
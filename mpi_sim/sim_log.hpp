@@ -58,7 +58,7 @@ class SimulationLog{
 public:
     SimulationLog(){};
 
-    SimulationLog(vector<ProbeSpec> probe_info, dtype dt);
+    SimulationLog(vector<ProbeSpec> probe_info, dtype dt, unsigned batch_size=1);
     SimulationLog(dtype dt);
 
     virtual void prep_for_simulation(string fn, unsigned n_steps);
@@ -71,6 +71,9 @@ public:
     // Called at the beginning of a simulation.
     virtual void setup_hdf5(unsigned n_steps);
 
+    // Create the dataspace for the dataset that stores a probe's data.
+    hid_t create_probe_dataspace(const ProbeSpec& ps, unsigned n_steps);
+
     // Write some data recorded by a probe in the simulator to the dataset in the
     // HDF5 that was reserved for that probe at the beginning of the simulation
     // (by calling the method `setup_hdf5`).
@@ -88,6 +91,17 @@ protected:
 
     dtype dt;
 
+    // Number of simulations run side by side. If greater than 1, the
+    // dataset for each probe gets a trailing axis of this length.
+    unsigned batch_size;
+
+    // Index of the trial whose results are written by this log, out of
+    // ``n_trials'' independent trials sharing the file. If ``n_trials'' is
+    // greater than 1, the dataset for each probe gets a leading axis
+    // indexed by trial.
+    unsigned trial;
+    unsigned n_trials;
+
     hid_t file_id;
     string filename;
 
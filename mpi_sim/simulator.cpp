@@ -1,8 +1,9 @@
 #include "simulator.hpp"
 
-Simulator::Simulator(bool collect_timings)
+Simulator::Simulator(bool collect_timings, unsigned batch_size)
 :collect_timings(collect_timings){
-    chunk = unique_ptr<MpiSimulatorChunk>(new MpiSimulatorChunk(collect_timings));
+    chunk = unique_ptr<MpiSimulatorChunk>(
+        new MpiSimulatorChunk(collect_timings, batch_size));
 }
 
 void Simulator::from_file(string filename){
@@ -45,6 +46,27 @@ void Simulator::from_file(string filename){
     write_to_loadtimes_file(delta);
 }
 
+void Simulator::from_components(
+        dtype dt, const vector<string>& probe_strings,
+        const vector<ComponentSpec>& components){
+
+    clock_t begin = clock();
+
+    label = "memory";
+
+    chunk->from_components(dt, probe_strings, components);
+
+    for(const ProbeSpec& pi : chunk->probe_info){
+        probe_data[pi.probe_key] = vector<Signal>();
+    }
+
+    clock_t end = clock();
+    double delta = double(end - begin) / CLOCKS_PER_SEC;
+    cout << "Loading network from memory took " << delta << " seconds." << endl;
+
+    write_to_loadtimes_file(delta);
+}
+
 void Simulator::finalize_build(){
     chunk->finalize_build();
 }
@@ -57,7 +79,7 @@ Signal Simulator::get_signal(key_type key){
     return chunk->get_signal(key);
 }
 
-void Simulator::add_pyfunc(float index, unique_ptr<Operator> pyfunc){
+void Simulator::add_pyfunc(long long index, unique_ptr<Operator> pyfunc){
     chunk->add_op(index, move(pyfunc));
 }
 
@@ -106,8 +128,14 @@ vector<Signal> Simulator::get_probe_data(key_type probe_key){
 }
 
 void Simulator::reset(unsigned seed){
+    clock_t begin = clock();
+
     chunk->reset(seed);
 
+    clock_t end = clock();
+    double delta = double(end - begin) / CLOCKS_PER_SEC;
+    cout << "Resetting took " << delta << " seconds." << endl;
+
     // probe_data should already be clear, since it is
     // gathered after every simulation.
     for(auto& kv: chunk->probe_map){
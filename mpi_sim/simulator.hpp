@@ -23,16 +23,19 @@ using namespace std;
 class Simulator{
 
 public:
-    Simulator(bool collect_timings);
+    Simulator(bool collect_timings, unsigned batch_size=1);
 
     virtual ~Simulator(){};
 
     virtual void from_file(string filename);
+    virtual void from_components(
+        dtype dt, const vector<string>& probe_strings,
+        const vector<ComponentSpec>& components);
     virtual void finalize_build();
 
     virtual Signal get_signal_view(string signal_string);
     virtual Signal get_signal(key_type key);
-    virtual void add_pyfunc(float index, unique_ptr<Operator> pyfunc);
+    virtual void add_pyfunc(long long index, unique_ptr<Operator> pyfunc);
 
     virtual void run_n_steps(int steps, bool progress, string log_filename);
 
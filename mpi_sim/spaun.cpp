@@ -47,8 +47,17 @@ void SpaunStimulus::operator() (){
         if(index >= n_stimuli){
             dtype init_value = 0.0;
             output.fill_with(0.0);
+        }else if(output.shape2 == 1){
+            output.fill_with(images[0][index]);
         }else{
-            output.fill_with(images[index]);
+            // Each simulation in a batch presents its own images.
+            for(unsigned j = 0; j < output.shape2; j++){
+                const Signal& image = images[j][index];
+
+                for(unsigned i = 0; i < output.shape1; i++){
+                    output(i, j) = image(i);
+                }
+            }
         }
 
         previous_index = index;
@@ -82,29 +91,36 @@ string SpaunStimulus::to_string() const{
 }
 
 void SpaunStimulus::reset(unsigned seed){
-    default_random_engine rng(seed);
+    images.clear();
 
-    // We shouldn't need to do this, but in practice I've found the first number is
-    // consistently 0. Not sure why.
-    rng.discard(1);
+    // Column j of a batch gets the images that a single
+    // simulation would get with seed ``seed + j''.
+    for(unsigned j = 0; j < output.shape2; j++){
+        default_random_engine rng(seed + j);
 
-    images.clear();
+        // We shouldn't need to do this, but in practice I've found the first number is
+        // consistently 0. Not sure why.
+        rng.discard(1);
 
-    int stim_count = 0;
-    for(string label: stim_sequence){
-        cout << "Loading image for stimulus " << stim_count << " with label " << label << endl;
+        vector<Signal> column_images;
 
-        Signal image;
-        if(label == "None" || label == "NULL"){
-            dtype init_value = 0.0;
-            image = Signal(image_size, init_value);
-        }else{
-            image = image_store->get_image_with_label(label, image_size, rng);
-        }
+        int stim_count = 0;
+        for(string label: stim_sequence){
+            cout << "Loading image for stimulus " << stim_count << " with label " << label << endl;
 
-        images.push_back(image);
+            Signal image;
+            if(label == "None" || label == "NULL"){
+                image = image_store->get_blank_image(image_size);
+            }else{
+                image = image_store->get_image_with_label(label, image_size, rng);
+            }
 
-        stim_count++;
+            column_images.push_back(image);
+
+            stim_count++;
+        }
+
+        images.push_back(column_images);
     }
 
     previous_index = -1;
@@ -147,6 +163,13 @@ Signal ImageStore::get_image_with_label(
     uniform_int_distribution<int> dist(0, image_counts[label]-1);
     int index = dist(rng);
 
+    auto key = make_tuple(label, index, desired_img_size);
+    auto cached = image_cache.find(key);
+
+    if(cached != image_cache.end()){
+        return cached->second;
+    }
+
     stringstream image_file;
     image_file << dir_name << "/" << label << "/" << index;
     cout << "Loading image from file: " << image_file.str() << endl;
@@ -176,9 +199,23 @@ Signal ImageStore::get_image_with_label(
         throw runtime_error("SpaunStimulus: loaded images too small.");
     }
 
+    image_cache[key] = image;
+
     return image;
 }
 
+Signal ImageStore::get_blank_image(unsigned img_size){
+    auto blank = blank_images.find(img_size);
+
+    if(blank == blank_images.end()){
+        dtype init_value = 0.0;
+        blank = blank_images.insert(
+            make_pair(img_size, Signal(img_size, init_value))).first;
+    }
+
+    return blank->second;
+}
+
 Signal do_down_sample(Signal image, unsigned new_size){
     dtype init_value = 0.0;
     Signal new_image(new_size, init_value);
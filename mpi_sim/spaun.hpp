@@ -8,6 +8,7 @@
 #include <sstream>
 #include <memory>
 #include <cmath>
+#include <tuple>
 #include <time.h>
 
 #include "signal.hpp"
@@ -45,9 +46,11 @@ protected:
     dtype present_blanks;
 
     int image_size;
-    vector<Signal> images;
-    Signal output;
-    Signal t;
+
+    // The images to present, for each column of output.
+    vector<vector<Signal>> images;
+    SignalView output;
+    SignalView t;
     int previous_index;
 
     int identifier;
@@ -65,10 +68,18 @@ public:
     Signal get_image_with_label(
         string label, unsigned desired_img_size, default_random_engine rng);
 
+    // Get an image of the given size with all pixels set to 0
+    Signal get_blank_image(unsigned img_size);
+
 protected:
     string dir_name;
     map<string, int> image_counts;
 
+    // Images are never modified, so stimuli that present the same image
+    // share a single copy. Keyed by label, image index and image size.
+    map<tuple<string, int, unsigned>, Signal> image_cache;
+    map<unsigned, Signal> blank_images;
+
     // -1 initially; set properly when we load the first image
     int loaded_img_size;
 };
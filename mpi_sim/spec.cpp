@@ -1,41 +1,5 @@
 #include "spec.hpp"
 
-OpSpec::OpSpec(string op_string){
-    try{
-        vector<string> tokens;
-        boost::split(tokens, op_string, boost::is_any_of(OP_DELIM));
-
-        index = boost::lexical_cast<dtype>(tokens[0]);
-        tokens.erase(tokens.begin());
-
-        type_string = tokens[0];
-        tokens.erase(tokens.begin());
-
-        arguments = tokens;
-
-    }catch(const boost::bad_lexical_cast& e){
-        stringstream msg;
-        msg << "Caught bad lexical cast while extracting OpSpec from string "
-               "with error: " << e.what() << endl;
-        msg << "The op string was: " << op_string << endl;
-        throw logic_error(msg.str());
-    }
-}
-
-string OpSpec::to_string() const{
-    stringstream out;
-
-    out << "OpSpec:" << endl;
-    out << "Type: " << type_string << endl;
-    out << "Index: " << index << endl;
-    out << "Arguments:" << endl;
-    for(auto& s : arguments){
-        out << s << endl;
-    }
-
-    return out.str();
-}
-
 SignalSpec::SignalSpec(string signal_string){
     try{
         vector<string> tokens;
@@ -70,6 +34,10 @@ SignalSpec::SignalSpec(string signal_string){
     }
 }
 
+SignalSpec::SignalSpec(const long long* record)
+:key(record[0]), label(""), ndim(record[1]), shape1(record[2]), shape2(record[3]),
+stride1(record[4]), stride2(record[5]), offset(record[6]){}
+
 string SignalSpec::to_string() const{
     stringstream out;
 
@@ -82,6 +50,41 @@ string SignalSpec::to_string() const{
     return out.str();
 }
 
+OpSpec::OpSpec(string type_string, long long index)
+:type_string(type_string), index(index){}
+
+string OpSpec::to_string() const{
+    stringstream out;
+
+    out << "OpSpec:" << endl;
+    out << "Type: " << type_string << endl;
+    out << "Index: " << index << endl;
+    out << "Signals:" << endl;
+    for(auto& s : signals){
+        out << s << endl;
+    }
+
+    out << "Params:" << endl;
+    for(auto& p : params){
+        out << p << endl;
+    }
+
+    out << "Arrays:" << endl;
+    for(auto& a : arrays){
+        out << a << endl;
+    }
+
+    out << "String lists:" << endl;
+    for(auto& sl : string_lists){
+        for(auto& s : sl){
+            out << s << ",";
+        }
+        out << endl;
+    }
+
+    return out.str();
+}
+
 ProbeSpec::ProbeSpec(string probe_string){
     try{
         vector<string> tokens;
@@ -115,3 +118,261 @@ string ProbeSpec::to_string() const{
 
     return out.str();
 }
+
+OpTableSpec::OpTableSpec(
+    string type_string, unsigned n_ops, unsigned n_signals,
+    unsigned n_params, unsigned n_arrays)
+:type_string(type_string), n_ops(n_ops), n_signals(n_signals),
+n_params(n_params), n_arrays(n_arrays), index(n_ops),
+signals(n_ops * n_signals * SIGNAL_RECORD_SIZE), params(n_ops * n_params),
+arrays(n_ops * n_arrays){}
+
+OpSpec OpTableSpec::get_op_spec(
+        unsigned i, const map<long long, Signal>& op_arrays,
+        const map<long long, vector<string>>& op_string_lists) const{
+
+    OpSpec op_spec(type_string, index.at(i));
+
+    for(unsigned j = 0; j < n_signals; j++){
+        op_spec.signals.push_back(
+            SignalSpec(signals.data() + (i * n_signals + j) * SIGNAL_RECORD_SIZE));
+    }
+
+    for(unsigned j = 0; j < n_params; j++){
+        op_spec.params.push_back(params[i * n_params + j]);
+    }
+
+    for(unsigned j = 0; j < n_arrays; j++){
+        long long array_key = arrays[i * n_arrays + j];
+
+        auto array = op_arrays.find(array_key);
+        if(array != op_arrays.end()){
+            op_spec.arrays.push_back(array->second);
+        }else{
+            auto string_list = op_string_lists.find(array_key);
+
+            if(string_list == op_string_lists.end()){
+                stringstream msg;
+                msg << "Operator of type " << type_string << " with index "
+                    << index[i] << " refers to missing op data " << array_key << ".";
+                throw runtime_error(msg.str());
+            }
+
+            op_spec.string_lists.push_back(string_list->second);
+        }
+    }
+
+    return op_spec;
+}
+
+string OpTableSpec::to_string() const{
+    stringstream out;
+
+    out << "OpTableSpec:" << endl;
+    out << "Type: " << type_string << endl;
+    out << "n_ops: " << n_ops << endl;
+    out << "n_signals: " << n_signals << endl;
+    out << "n_params: " << n_params << endl;
+    out << "n_arrays: " << n_arrays << endl;
+
+    return out.str();
+}
+
+ComponentSpec::ComponentSpec(
+    int component, unsigned n_signals, size_t signal_data_size,
+    size_t readonly_data_size, shared_ptr<dtype> signal_data)
+:component(component), n_signals(n_signals), signal_data_size(signal_data_size),
+signal_data(signal_data ? signal_data : shared_ptr<dtype>(
+    new dtype[signal_data_size], default_delete<dtype[]>())),
+signal_keys(n_signals), signal_shapes(2 * n_signals), signal_strides(2 * n_signals),
+signal_offsets(n_signals), signal_readonly(n_signals),
+readonly_data_size(readonly_data_size),
+readonly_data(shared_ptr<dtype>(new dtype[readonly_data_size], default_delete<dtype[]>())){}
+
+// Helpers for (un)packing plain values and vectors of them. Values are copied
+// byte-by-byte, since there are no alignment guarantees within a buffer.
+template <class T>
+static void pack_value(vector<char>& buffer, const T& value){
+    const char* bytes = reinterpret_cast<const char*>(&value);
+    buffer.insert(buffer.end(), bytes, bytes + sizeof(T));
+}
+
+template <class T>
+static T unpack_value(const char*& ptr){
+    T value;
+    memcpy(&value, ptr, sizeof(T));
+    ptr += sizeof(T);
+    return value;
+}
+
+template <class T>
+static void pack_array(vector<char>& buffer, const T* data, size_t n){
+    pack_value(buffer, (unsigned long long) n);
+    const char* bytes = reinterpret_cast<const char*>(data);
+    buffer.insert(buffer.end(), bytes, bytes + n * sizeof(T));
+}
+
+template <class T>
+static void unpack_array(const char*& ptr, T* data, size_t n){
+    memcpy(data, ptr, n * sizeof(T));
+    ptr += n * sizeof(T);
+}
+
+template <class T>
+static void pack_vector(vector<char>& buffer, const vector<T>& v){
+    pack_array(buffer, v.data(), v.size());
+}
+
+template <class T>
+static vector<T> unpack_vector(const char*& ptr){
+    vector<T> v(unpack_value<unsigned long long>(ptr));
+    unpack_array(ptr, v.data(), v.size());
+    return v;
+}
+
+static void pack_string(vector<char>& buffer, const string& s){
+    pack_array(buffer, s.data(), s.size());
+}
+
+static string unpack_string(const char*& ptr){
+    size_t size = unpack_value<unsigned long long>(ptr);
+    string s(ptr, size);
+    ptr += size;
+    return s;
+}
+
+void pack_string_list(vector<char>& buffer, const vector<string>& strings){
+    pack_value(buffer, (unsigned long long) strings.size());
+    for(auto& s : strings){
+        pack_string(buffer, s);
+    }
+}
+
+vector<string> unpack_string_list(const char*& ptr){
+    vector<string> strings(unpack_value<unsigned long long>(ptr));
+    for(auto& s : strings){
+        s = unpack_string(ptr);
+    }
+
+    return strings;
+}
+
+void ComponentSpec::pack(vector<char>& buffer) const{
+    pack_value(buffer, component);
+    pack_value(buffer, n_signals);
+
+    pack_array(buffer, signal_data.get(), signal_data_size);
+    pack_vector(buffer, signal_keys);
+    pack_vector(buffer, signal_shapes);
+    pack_vector(buffer, signal_strides);
+    pack_string_list(buffer, signal_labels);
+    pack_vector(buffer, signal_offsets);
+    pack_vector(buffer, signal_readonly);
+    pack_array(buffer, readonly_data.get(), readonly_data_size);
+
+    pack_value(buffer, (unsigned long long) op_tables.size());
+    for(auto& table : op_tables){
+        pack_string(buffer, table.type_string);
+        pack_value(buffer, table.n_ops);
+        pack_value(buffer, table.n_signals);
+        pack_value(buffer, table.n_params);
+        pack_value(buffer, table.n_arrays);
+
+        pack_vector(buffer, table.index);
+        pack_vector(buffer, table.signals);
+        pack_vector(buffer, table.params);
+        pack_vector(buffer, table.arrays);
+    }
+
+    // Op arrays are base signals, and therefore contiguous.
+    pack_value(buffer, (unsigned long long) op_arrays.size());
+    for(auto& kv : op_arrays){
+        pack_value(buffer, kv.first);
+        pack_value(buffer, kv.second.shape1);
+        pack_value(buffer, kv.second.shape2);
+        pack_array(buffer, kv.second.raw_data, kv.second.size);
+    }
+
+    pack_value(buffer, (unsigned long long) op_string_lists.size());
+    for(auto& kv : op_string_lists){
+        pack_value(buffer, kv.first);
+        pack_string_list(buffer, kv.second);
+    }
+
+    pack_string_list(buffer, probes);
+}
+
+ComponentSpec ComponentSpec::unpack(const char*& ptr){
+    int component = unpack_value<int>(ptr);
+    unsigned n_signals = unpack_value<unsigned>(ptr);
+    size_t signal_data_size = unpack_value<unsigned long long>(ptr);
+
+    ComponentSpec cs(component, n_signals, signal_data_size);
+
+    unpack_array(ptr, cs.signal_data.get(), signal_data_size);
+    cs.signal_keys = unpack_vector<key_type>(ptr);
+    cs.signal_shapes = unpack_vector<long long>(ptr);
+    cs.signal_strides = unpack_vector<long long>(ptr);
+    cs.signal_labels = unpack_string_list(ptr);
+    cs.signal_offsets = unpack_vector<long long>(ptr);
+    cs.signal_readonly = unpack_vector<unsigned char>(ptr);
+
+    cs.readonly_data_size = unpack_value<unsigned long long>(ptr);
+    cs.readonly_data = shared_ptr<dtype>(
+        new dtype[cs.readonly_data_size], default_delete<dtype[]>());
+    unpack_array(ptr, cs.readonly_data.get(), cs.readonly_data_size);
+
+    size_t n_tables = unpack_value<unsigned long long>(ptr);
+    for(size_t i = 0; i < n_tables; i++){
+        OpTableSpec table;
+        table.type_string = unpack_string(ptr);
+        table.n_ops = unpack_value<unsigned>(ptr);
+        table.n_signals = unpack_value<unsigned>(ptr);
+        table.n_params = unpack_value<unsigned>(ptr);
+        table.n_arrays = unpack_value<unsigned>(ptr);
+
+        table.index = unpack_vector<long long>(ptr);
+        table.signals = unpack_vector<long long>(ptr);
+        table.params = unpack_vector<double>(ptr);
+        table.arrays = unpack_vector<long long>(ptr);
+
+        cs.op_tables.push_back(move(table));
+    }
+
+    size_t n_arrays = unpack_value<unsigned long long>(ptr);
+    for(size_t i = 0; i < n_arrays; i++){
+        long long key = unpack_value<long long>(ptr);
+        unsigned shape1 = unpack_value<unsigned>(ptr);
+        unsigned shape2 = unpack_value<unsigned>(ptr);
+
+        Signal array(shape1, shape2, 0.0);
+        size_t size = unpack_value<unsigned long long>(ptr);
+        unpack_array(ptr, array.raw_data, size);
+
+        cs.op_arrays[key] = array;
+    }
+
+    size_t n_string_lists = unpack_value<unsigned long long>(ptr);
+    for(size_t i = 0; i < n_string_lists; i++){
+        long long key = unpack_value<long long>(ptr);
+        cs.op_string_lists[key] = unpack_string_list(ptr);
+    }
+
+    cs.probes = unpack_string_list(ptr);
+
+    return cs;
+}
+
+string ComponentSpec::to_string() const{
+    stringstream out;
+
+    out << "ComponentSpec:" << endl;
+    out << "component: " << component << endl;
+    out << "n_signals: " << n_signals << endl;
+    out << "signal_data_size: " << signal_data_size << endl;
+    out << "readonly_data_size: " << readonly_data_size << endl;
+    out << "n_op_tables: " << op_tables.size() << endl;
+    out << "n_probes: " << probes.size() << endl;
+
+    return out.str();
+}
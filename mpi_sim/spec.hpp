@@ -1,12 +1,15 @@
 #pragma once
 
+#include <map>
 #include <string>
 #include <vector>
+#include <memory>
 #include <sstream>
 
 #include <boost/algorithm/string.hpp>
 #include <boost/lexical_cast.hpp>
 
+#include "signal.hpp"
 #include "typedef.hpp"
 #include "debug.hpp"
 
@@ -17,6 +20,10 @@ const string OP_DELIM = ";";
 const string SIGNAL_DELIM = ":";
 const string PROBE_DELIM = "|";
 
+// Number of integers used to encode a signal view in an operator table:
+//     key, ndim, shape1, shape2, stride1, stride2, offset
+const int SIGNAL_RECORD_SIZE = 7;
+
 struct Spec{
     virtual string to_string() const = 0;
 
@@ -26,23 +33,16 @@ struct Spec{
     }
 };
 
-struct OpSpec: public Spec {
-    OpSpec(){};
-    OpSpec(string op_string);
-
-    string type_string;
-    vector<string> arguments;
-    float index;
-
-    string to_string() const override;
-};
-
 /* Expected format of signal_string:
 *     key:label:ndim:(shape1, shape2):(stride1, stride2):offset */
 struct SignalSpec: public Spec {
     SignalSpec(){};
     SignalSpec(string signal_string);
 
+    /* Create from a row of the ``signals'' table of an operator type,
+     * which has SIGNAL_RECORD_SIZE entries. */
+    SignalSpec(const long long* record);
+
     key_type key;
     string label;
 
@@ -59,6 +59,24 @@ struct SignalSpec: public Spec {
     string to_string() const override;
 };
 
+/* One row of an operator table. The arguments of the operator are split up by
+ * kind, with the order within each kind matching the order in which they
+ * are passed to the operator's constructor. */
+struct OpSpec: public Spec {
+    OpSpec(){};
+    OpSpec(string type_string, long long index);
+
+    string type_string;
+    long long index;
+
+    vector<SignalSpec> signals;
+    vector<dtype> params;
+    vector<Signal> arrays;
+    vector<vector<string>> string_lists;
+
+    string to_string() const override;
+};
+
 struct ProbeSpec: public Spec {
     ProbeSpec(){};
     ProbeSpec(string probe_string);
@@ -72,3 +90,94 @@ struct ProbeSpec: public Spec {
 
     string to_string() const override;
 };
+
+/* All operators of a single type belonging to one component, laid out like
+ * the ``operators/<type>'' group of a network file. Columns that an operator
+ * type doesn't use have width 0. */
+struct OpTableSpec: public Spec {
+    OpTableSpec(){};
+    OpTableSpec(
+        string type_string, unsigned n_ops, unsigned n_signals,
+        unsigned n_params, unsigned n_arrays);
+
+    string type_string;
+
+    unsigned n_ops;
+    unsigned n_signals;
+    unsigned n_params;
+    unsigned n_arrays;
+
+    vector<long long> index;
+    vector<long long> signals;
+    vector<double> params;
+    vector<long long> arrays;
+
+    /* Create the OpSpec for row ``i'' of the table. Entries of the
+     * ``arrays'' column are looked up in ``op_arrays'' or ``op_string_lists''. */
+    OpSpec get_op_spec(
+        unsigned i, const map<long long, Signal>& op_arrays,
+        const map<long long, vector<string>>& op_string_lists) const;
+
+    string to_string() const override;
+};
+
+/* Everything needed to add a single component to a chunk, held in memory.
+ * Mirrors the group that stores a component in a network file. */
+struct ComponentSpec: public Spec {
+    ComponentSpec(){};
+    /* ``signal_data'', if supplied, must hold ``signal_data_size''
+     * entries, and is used instead of allocating a new buffer. */
+    ComponentSpec(
+        int component, unsigned n_signals, size_t signal_data_size,
+        size_t readonly_data_size=0, shared_ptr<dtype> signal_data=nullptr);
+
+    int component;
+    unsigned n_signals;
+
+    // Initial values of the mutable base signals, stored one after the
+    // other. The mutable base signals added to a chunk are views into
+    // this buffer.
+    size_t signal_data_size;
+    shared_ptr<dtype> signal_data;
+
+    vector<key_type> signal_keys;
+    vector<long long> signal_shapes;
+    vector<long long> signal_strides;
+    vector<string> signal_labels;
+
+    // For each base signal, whether it is read-only, and its offset. For
+    // mutable signals the offset is into signal_data, for read-only signals
+    // it is into the network's pool of read-only signals, in which each
+    // distinct value is stored once.
+    vector<long long> signal_offsets;
+    vector<unsigned char> signal_readonly;
+
+    // The entries of the read-only pool used by the component, in order
+    // of increasing offset. Empty if the entries are to be read from the
+    // pool stored in the network file instead.
+    size_t readonly_data_size;
+    shared_ptr<dtype> readonly_data;
+
+    // Whether readonly_data is mapped from a network file rather than
+    // held in memory. Mapped entries are never copied when added to a
+    // chunk. Not serialized, since mapped specs never leave the process.
+    bool readonly_mapped = false;
+
+    vector<OpTableSpec> op_tables;
+    map<long long, Signal> op_arrays;
+    map<long long, vector<string>> op_string_lists;
+
+    vector<string> probes;
+
+    /* Append a serialized copy of the spec to ``buffer'', so that it can be
+     * sent to another process. */
+    void pack(vector<char>& buffer) const;
+
+    /* Read a spec serialized by ``pack'', advancing ``ptr'' past it. */
+    static ComponentSpec unpack(const char*& ptr);
+
+    string to_string() const override;
+};
+
+void pack_string_list(vector<char>& buffer, const vector<string>& strings);
+vector<string> unpack_string_list(const char*& ptr);
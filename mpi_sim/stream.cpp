@@ -0,0 +1,291 @@
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include <algorithm>
+#include <cstring>
+
+#include "stream.hpp"
+
+// ********************************************************************************
+NpySource::NpySource(string filename)
+:mapping(nullptr), mapping_size(0), data_offset(0), item_size(0), released(0){
+
+    int fd = open(filename.c_str(), O_RDONLY);
+    if(fd < 0){
+        throw runtime_error("Could not open .npy file " + filename + ".");
+    }
+
+    struct stat info;
+    fstat(fd, &info);
+    mapping_size = info.st_size;
+
+    void* region = MAP_FAILED;
+    if(mapping_size > 0){
+        region = mmap(nullptr, mapping_size, PROT_READ, MAP_SHARED, fd, 0);
+    }
+
+    close(fd);
+
+    if(region == MAP_FAILED){
+        throw runtime_error("Could not map .npy file " + filename + ".");
+    }
+
+    mapping = static_cast<char*>(region);
+
+    // Header: magic string, 2 version bytes, the length of the header dict
+    // (2 bytes in version 1, 4 bytes after), and the header dict itself.
+    const char magic[] = "\x93NUMPY";
+    size_t length_size = mapping_size > 8 && mapping[6] == 1 ? 2 : 4;
+
+    if(mapping_size < 8 + length_size || memcmp(mapping, magic, 6) != 0){
+        munmap(mapping, mapping_size);
+        throw runtime_error(filename + " is not a .npy file.");
+    }
+
+    size_t header_size = 0;
+    for(size_t i = 0; i < length_size; i++){
+        header_size |= size_t((unsigned char) mapping[8 + i]) << (8 * i);
+    }
+
+    data_offset = 8 + length_size + header_size;
+    string header(
+        mapping + 8 + length_size,
+        min(header_size, mapping_size - 8 - length_size));
+
+    // Only C-ordered little-endian float64 or float32 arrays with 1 or 2
+    // dimensions are supported, e.g.
+    // {'descr': '<f8', 'fortran_order': False, 'shape': (1000, 3), }
+    size_t shape_start = header.find("'shape': (");
+    item_size =
+        header.find("'descr': '<f8'") != string::npos ? sizeof(double) :
+        header.find("'descr': '<f4'") != string::npos ? sizeof(float) : 0;
+
+    bool valid =
+        item_size > 0 &&
+        header.find("'fortran_order': False") != string::npos &&
+        shape_start != string::npos;
+
+    vector<unsigned long> shape;
+    if(valid){
+        stringstream shape_stream(header.substr(shape_start + 10));
+
+        unsigned long extent;
+        while(shape_stream >> extent){
+            shape.push_back(extent);
+
+            char delim;
+            shape_stream >> delim;
+            if(delim == ')'){
+                break;
+            }
+        }
+    }
+
+    valid &= shape.size() == 1 || shape.size() == 2;
+
+    if(valid){
+        n_rows = shape[0];
+        n_cols = shape.size() == 2 ? shape[1] : 1;
+        valid &= data_offset + item_size * n_rows * n_cols <= mapping_size;
+    }
+
+    if(!valid){
+        munmap(mapping, mapping_size);
+        throw runtime_error(
+            "Cannot stream " + filename + ", only C-ordered float64 or "
+            "float32 arrays with 1 or 2 dimensions are supported.");
+    }
+}
+
+NpySource::~NpySource(){
+    munmap(mapping, mapping_size);
+}
+
+void NpySource::advise(size_t start, size_t stop, int advice){
+    size_t page_size = sysconf(_SC_PAGESIZE);
+
+    start = (data_offset + start) / page_size * page_size;
+    stop = min(data_offset + stop, mapping_size);
+
+    if(stop > start){
+        madvise(mapping + start, stop - start, advice);
+    }
+}
+
+const dtype* NpySource::get_block(unsigned first, unsigned n){
+    size_t row_size = item_size * n_cols;
+    size_t start = first * row_size;
+    size_t stop = (size_t(first) + n) * row_size;
+
+    // Release the pages of earlier blocks that the current block does not
+    // share, and prefetch the next block.
+    size_t page_size = sysconf(_SC_PAGESIZE);
+    size_t first_page = (data_offset + start) / page_size * page_size;
+
+    if(first_page > data_offset + released){
+        advise(released, first_page - data_offset, MADV_DONTNEED);
+        released = first_page - data_offset;
+    }else if(start < released){
+        // Rewound, e.g. by a reset.
+        released = 0;
+    }
+
+    advise(start, stop + (stop - start), MADV_WILLNEED);
+
+    const char* rows = mapping + data_offset + start;
+
+    if(item_size == sizeof(dtype)){
+        return reinterpret_cast<const dtype*>(rows);
+    }
+
+    // The array's precision differs from the simulator's, so the block is
+    // converted into a buffer instead.
+    buffer.resize(size_t(n) * n_cols);
+
+    if(item_size == sizeof(double)){
+        const double* values = reinterpret_cast<const double*>(rows);
+        copy(values, values + buffer.size(), buffer.begin());
+    }else{
+        const float* values = reinterpret_cast<const float*>(rows);
+        copy(values, values + buffer.size(), buffer.begin());
+    }
+
+    return buffer.data();
+}
+
+// ********************************************************************************
+HDF5Source::HDF5Source(string filename, string dataset){
+    file_id = H5Fopen(filename.c_str(), H5F_ACC_RDONLY, H5P_DEFAULT);
+    if(file_id < 0){
+        throw runtime_error("Could not open HDF5 file " + filename + ".");
+    }
+
+    dset_id = H5Dopen(file_id, dataset.c_str(), H5P_DEFAULT);
+    if(dset_id < 0){
+        H5Fclose(file_id);
+        throw runtime_error(
+            "Could not open dataset " + dataset + " in HDF5 file " +
+            filename + ".");
+    }
+
+    hid_t dspace = H5Dget_space(dset_id);
+    int rank = H5Sget_simple_extent_ndims(dspace);
+
+    hsize_t dims[2] = {0, 1};
+    if(rank == 1 || rank == 2){
+        H5Sget_simple_extent_dims(dspace, dims, NULL);
+    }
+
+    H5Sclose(dspace);
+
+    if(rank != 1 && rank != 2){
+        H5Dclose(dset_id);
+        H5Fclose(file_id);
+        throw runtime_error(
+            "Cannot stream dataset " + dataset + " in " + filename +
+            ", only datasets with 1 or 2 dimensions are supported.");
+    }
+
+    ndim = rank;
+    n_rows = dims[0];
+    n_cols = dims[1];
+}
+
+HDF5Source::~HDF5Source(){
+    H5Dclose(dset_id);
+    H5Fclose(file_id);
+}
+
+const dtype* HDF5Source::get_block(unsigned first, unsigned n){
+    buffer.resize(size_t(n) * n_cols);
+
+    hsize_t offset[2] = {first, 0};
+    hsize_t count[2] = {n, n_cols};
+
+    hid_t dspace = H5Dget_space(dset_id);
+    H5Sselect_hyperslab(dspace, H5S_SELECT_SET, offset, NULL, count, NULL);
+
+    hid_t mem_dspace = H5Screate_simple(ndim, count, NULL);
+
+    herr_t err = H5Dread(
+        dset_id, H5T_NATIVE_DTYPE, mem_dspace, dspace, H5P_DEFAULT,
+        buffer.data());
+
+    H5Sclose(mem_dspace);
+    H5Sclose(dspace);
+
+    if(err < 0){
+        throw runtime_error("Could not read rows of a streamed HDF5 dataset.");
+    }
+
+    return buffer.data();
+}
+
+// ********************************************************************************
+StreamInput::StreamInput(
+    Signal output, Signal step, string filename, string dataset,
+    unsigned read_ahead)
+:output(output), step(step), filename(filename), dataset(dataset),
+read_ahead(max(read_ahead, 1u)), block(nullptr), block_start(0),
+block_size(0){
+
+    if(dataset.empty()){
+        source = unique_ptr<RowSource>(new NpySource(filename));
+    }else{
+        source = unique_ptr<RowSource>(new HDF5Source(filename, dataset));
+    }
+
+    if(source->n_cols != output.shape1){
+        stringstream ss;
+        ss << "While creating StreamInput, rows of " << filename
+           << " have " << source->n_cols << " entries, but output has shape "
+           << shape_string(output) << "." << endl;
+
+        throw runtime_error(ss.str());
+    }
+}
+
+void StreamInput::operator() (){
+    unsigned row = unsigned(step(0)) - 1;
+
+    if(row >= source->n_rows){
+        stringstream ss;
+        ss << "StreamInput reached step " << step(0) << ", but " << filename
+           << " only has " << source->n_rows << " rows.";
+
+        throw runtime_error(ss.str());
+    }
+
+    if(block == nullptr || row < block_start || row >= block_start + block_size){
+        block_start = row - row % read_ahead;
+        block_size = min(read_ahead, source->n_rows - block_start);
+        block = source->get_block(block_start, block_size);
+    }
+
+    const dtype* values = block + size_t(row - block_start) * source->n_cols;
+
+    for(unsigned i = 0; i < output.shape1; i++){
+        for(unsigned j = 0; j < output.shape2; j++){
+            output(i, j) = values[i];
+        }
+    }
+
+    run_dbg(*this);
+}
+
+string StreamInput::to_string() const{
+
+    stringstream out;
+    out << Operator::to_string();
+    out << "filename:" << filename << endl;
+    out << "dataset:" << dataset << endl;
+    out << "read_ahead:" << read_ahead << endl;
+    out << "output:" << endl;
+    out << signal_to_string(output) << endl;
+    out << "step:" << endl;
+    out << signal_to_string(step) << endl;
+
+    return out.str();
+}
@@ -0,0 +1,106 @@
+#pragma once
+
+#include <string>
+#include <vector>
+#include <memory>
+#include <sstream>
+#include <exception>
+
+#include <hdf5.h>
+
+#include "signal.hpp"
+#include "operator.hpp"
+
+#include "typedef.hpp"
+#include "debug.hpp"
+
+
+using namespace std;
+
+/* A 2-D array of values stored in a file, from which a StreamInput operator
+ * reads rows a block at a time. */
+class RowSource{
+public:
+    virtual ~RowSource(){}
+
+    /* Make rows [first, first + n) available, returning a pointer to row
+     * ``first''. Rows are stored one after the other, with n_cols entries
+     * each. The pointer is only valid until the next call. */
+    virtual const dtype* get_block(unsigned first, unsigned n) = 0;
+
+    unsigned n_rows;
+    unsigned n_cols;
+};
+
+/* Rows of a C-ordered float64 or float32 array in a .npy file, which is
+ * mapped into memory. Rows are read by the operating system as they are
+ * accessed. When a block is requested, the following block is prefetched
+ * asynchronously and pages before the block are released, so only a few
+ * blocks are ever resident. Blocks of arrays whose precision differs from
+ * dtype are converted into a buffer. */
+class NpySource: public RowSource{
+public:
+    NpySource(string filename);
+    ~NpySource();
+
+    const dtype* get_block(unsigned first, unsigned n);
+
+protected:
+    /* Give ``advice'' to madvise for the whole pages between byte offsets
+     * ``start'' and ``stop'' of the array's data. */
+    void advise(size_t start, size_t stop, int advice);
+
+    char* mapping;
+    size_t mapping_size;
+    size_t data_offset;
+    size_t item_size;
+    size_t released;
+    vector<dtype> buffer;
+};
+
+/* Rows of a 1-D or 2-D numerical dataset in an HDF5 file, which are read
+ * into a buffer one block at a time and converted to dtype. */
+class HDF5Source: public RowSource{
+public:
+    HDF5Source(string filename, string dataset);
+    ~HDF5Source();
+
+    const dtype* get_block(unsigned first, unsigned n);
+
+protected:
+    hid_t file_id;
+    hid_t dset_id;
+    unsigned ndim;
+    vector<dtype> buffer;
+};
+
+/* Sets ``output'' to a row of an array stored in a file: row i on step i + 1.
+ * The array is a .npy file if ``dataset'' is empty, and otherwise the
+ * dataset named ``dataset'' in an HDF5 file. Rows are read in blocks of
+ * ``read_ahead'' rows, so the whole array is never held in memory. */
+class StreamInput: public Operator{
+public:
+    StreamInput(
+        Signal output, Signal step, string filename, string dataset,
+        unsigned read_ahead);
+
+    string classname() const { return "StreamInput"; }
+
+    void operator() ();
+    virtual string to_string() const;
+
+protected:
+    SignalView output;
+    SignalView step;
+
+    string filename;
+    string dataset;
+    unsigned read_ahead;
+
+    unique_ptr<RowSource> source;
+
+    // The block of rows currently available from source.
+    const dtype* block;
+    unsigned block_start;
+    unsigned block_size;
+};
@@ -1,7 +1,25 @@
+#pragma once
+
 /* Type of keys for various maps in the MpiSimulatorChunk. Keys are typically
  * addresses of python objects, so we need to use long long ints (64 bits). */
 typedef uintmax_t key_type;
 
-/* Type for data used throughout the simulation. */
+/* Type for data used throughout the simulation. Double precision unless the
+ * code is built with SINGLE_PRECISION defined (``make single''), in which
+ * case signals, MPI messages and probe data are all single precision.
+ *
+ * MPI_DTYPE, H5T_NATIVE_DTYPE and NPY_DTYPE_NUM are the matching types of
+ * MPI, HDF5 and numpy, for use wherever those libraries handle dtypes. */
+#ifdef SINGLE_PRECISION
+typedef float dtype;
+
+#define MPI_DTYPE MPI_FLOAT
+#define H5T_NATIVE_DTYPE H5T_NATIVE_FLOAT
+#define NPY_DTYPE_NUM NPY_FLOAT
+#else
 typedef double dtype;
 
+#define MPI_DTYPE MPI_DOUBLE
+#define H5T_NATIVE_DTYPE H5T_NATIVE_DOUBLE
+#define NPY_DTYPE_NUM NPY_DOUBLE
+#endif
@@ -57,3 +57,15 @@ vector<int> python_list_to_index_vector(string s){
 
     return result;
 }
+
+vector<int> signal_to_index_vector(const Signal& s){
+    vector<int> result;
+
+    for(unsigned i = 0; i < s.shape1; i++){
+        for(unsigned j = 0; j < s.shape2; j++){
+            result.push_back(int(s(i, j)));
+        }
+    }
+
+    return result;
+}
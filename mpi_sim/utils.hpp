@@ -25,3 +25,7 @@ Signal python_list_to_signal(string s, bool get_size=false);
  * index_0, index_1, ..., index_(n-1)
  * The length of the returned vector is n */
 vector<int> python_list_to_index_vector(string s);
+
+/* Helper function to extract a vector of indices from a Signal storing
+ * the indices as floating point values, in row-major order. */
+vector<int> signal_to_index_vector(const Signal& s);
@@ -26,6 +26,7 @@ class PartitionError(NengoMpiException):
 from .simulator import Simulator
 from .partition import Partitioner
 from .spaun_mpi import SpaunStimulus
+from .stream import StreamInput
 
 import logging
 logger = logging.getLogger(__name__)
@@ -0,0 +1,705 @@
+"""Caching of built networks and decoders.
+
+Building a large network (partitioning, running the builder, and finalizing
+the result) can take much longer than loading the finished network from a
+file. A BuildCache stores finished network files in a directory, indexed by
+a hash of everything that determines the result of the build: the structure
+and parameters of the network, its seeds, dt, and the partition. When the
+same network is simulated again, the network file is loaded from the cache
+and the build is skipped.
+
+Decoders are cached by a DecoderCache, which extends nengo's decoder cache
+so that it can be shared by many builds running at once, e.g. batch jobs
+on a shared filesystem, and counts cache hits and misses.
+
+"""
+from __future__ import print_function
+import binascii
+import errno
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+import socket
+import tempfile
+import time
+import types
+import uuid
+import warnings
+
+import numpy as np
+import six
+
+import nengo
+from nengo.base import ObjView
+from nengo.cache import (
+    CacheIndex, NoDecoderCache, get_fragment_size, safe_makedirs,
+    safe_remove, safe_stat)
+from nengo.cache import DecoderCache as _DecoderCache
+from nengo.connection import LearningRule
+from nengo.ensemble import Neurons
+from nengo.exceptions import TimeoutError
+from nengo.params import FrozenObject, ObsoleteParam
+from nengo.rc import rc
+from nengo.utils import nco
+from nengo.utils.cache import byte_align, human2bytes
+from nengo.utils.compat import is_string, pickle
+from nengo.utils.lock import FileLock
+from nengo.utils.paths import cache_dir as nengo_cache_dir
+
+from nengo_mpi.__about__ import __version__
+from nengo_mpi.utils import NETWORK_FORMAT_VERSION, get_closures
+
+logger = logging.getLogger(__name__)
+
+default_build_cache_dir = os.path.join(nengo_cache_dir, "nengo_mpi_builds")
+
+# Default age in seconds after which a lock on the decoder cache whose owner
+# cannot be checked is assumed to have been left behind by a build that was
+# killed while holding it. Locks taken by a DecoderCache record the host and
+# process holding them, and locks held by a process on the same host are
+# only broken once that process has exited, however old they are. The age
+# applies to locks held on other hosts, and to locks taken by nengo itself,
+# which record no owner.
+stale_lock_age = 60.
+
+
+def _ordered_objects(network):
+    """ Return all networks and nengo objects in ``network``, in a fixed order.
+    """
+    return (
+        [network] + network.all_networks + network.all_ensembles +
+        network.all_nodes + network.all_connections + network.all_probes)
+
+
+def _describe(value, index, seen):
+    """ Return a string describing ``value``, for the purposes of hashing.
+
+    Values that are equal in all respects relevant to building a network
+    have the same description. Nengo objects belonging to the network being
+    described are referred to by their position in ``index``, rather than
+    by their id, so that descriptions are the same from one run to the next.
+
+    """
+    if value is None or isinstance(
+            value, (bool, float, complex) + six.integer_types):
+        return repr(value)
+
+    if isinstance(value, six.string_types):
+        return repr(value)
+
+    if isinstance(value, six.binary_type):
+        return binascii.hexlify(value).decode('ascii')
+
+    if isinstance(value, np.generic):
+        return repr(value.item())
+
+    if isinstance(value, np.ndarray):
+        if value.dtype == object:
+            data = _describe(value.ravel().tolist(), index, seen)
+        else:
+            data = hashlib.sha1(
+                np.ascontiguousarray(value).tobytes()).hexdigest()
+
+        return "array(%s, %s, %s)" % (value.dtype.str, value.shape, data)
+
+    if id(value) in index:
+        return "obj%d" % index[id(value)]
+
+    if isinstance(value, (list, tuple)):
+        return "[%s]" % ", ".join(_describe(v, index, seen) for v in value)
+
+    if isinstance(value, dict):
+        return "{%s}" % ", ".join(sorted(
+            "%s: %s" % (_describe(k, index, seen), _describe(v, index, seen))
+            for k, v in six.iteritems(value)))
+
+    if isinstance(value, slice):
+        return repr(value)
+
+    if isinstance(value, ObjView):
+        return "ObjView(%s, %s)" % (
+            _describe(value.obj, index, seen),
+            _describe(value.slice, index, seen))
+
+    if isinstance(value, Neurons):
+        return "Neurons(%s)" % _describe(value.ensemble, index, seen)
+
+    if isinstance(value, LearningRule):
+        return "LearningRule(%s, %s)" % (
+            _describe(value.connection, index, seen),
+            _describe(value.learning_rule_type, index, seen))
+
+    if id(value) in seen:
+        return "<cycle>"
+
+    seen = seen | set([id(value)])
+
+    if isinstance(value, types.CodeType):
+        return "code(%s, %s, %s)" % (
+            _describe(value.co_code, index, seen),
+            _describe(value.co_consts, index, seen),
+            _describe(value.co_names, index, seen))
+
+    if isinstance(value, types.FunctionType):
+        closures = get_closures(value) if value.__closure__ else {}
+        return "function(%s, %s, %s)" % (
+            _describe(value.__code__, index, seen),
+            _describe(value.__defaults__, index, seen),
+            _describe(dict(closures), index, seen))
+
+    if isinstance(value, FrozenObject):
+        return "%s(%s)" % (type(value).__name__, ", ".join(
+            "%s=%s" % (k, _describe(getattr(value, k), index, seen))
+            for k in sorted(value._paramdict)))
+
+    if hasattr(value, '__dict__'):
+        return "%s(%s)" % (
+            type(value).__name__, _describe(vars(value), index, seen))
+
+    return repr(value)
+
+
+def _describe_object(obj, index):
+    """ Return a string describing a network or nengo object. """
+    if isinstance(obj, nengo.Network):
+        params = [('label', obj.label), ('seed', obj.seed)]
+    else:
+        # Obsolete params raise an error when accessed, and cannot affect
+        # the build anyway.
+        params = [
+            (name, getattr(obj, name)) for name in sorted(obj.params)
+            if not isinstance(getattr(type(obj), name), ObsoleteParam)]
+
+        # Objects specific to nengo_mpi (e.g. StreamInput) can depend on
+        # attributes that are not parameters.
+        params.extend(
+            (name, getattr(obj, name))
+            for name in getattr(obj, 'build_attributes', ()))
+
+    return "%s(%s)" % (type(obj).__name__, ", ".join(
+        "%s=%s" % (name, _describe(value, index, set()))
+        for name, value in params))
+
+
+def object_digests(network, objects):
+    """ Return a hash of the description of each object in ``objects``.
+
+    Used to find the objects that changed since an earlier build of the
+    same network (see MpiModel.build_distributed). Objects refer to one
+    another by position, so the hash of a Connection does not change when
+    only its pre or post object does.
+
+    """
+    index = {id(obj): i for i, obj in enumerate(_ordered_objects(network))}
+
+    return [
+        hashlib.sha1(_describe_object(obj, index).encode('utf-8')).hexdigest()
+        for obj in objects]
+
+
+class BuildCache(object):
+    """ A cache of built networks, stored as network files in a directory.
+
+    For each cached network, the directory contains a network file
+    ``<key>.net`` and a file ``<key>.json`` storing the probe keys and
+    shapes that are needed to use the network file from python.
+
+    Only networks with a seed can be cached, since otherwise building the
+    network is not deterministic. Networks containing Nodes that execute
+    python functions are not cached either, since the functions cannot be
+    stored in network files.
+
+    Parameters
+    ----------
+    cache_dir: string
+        Directory to store cached networks in. Created if it does not exist.
+
+    """
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = default_build_cache_dir
+
+        self.cache_dir = cache_dir
+
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def get_key(
+            self, network, dt, n_components, assignments, aligned=False,
+            tabulate=None, tabulate_error=None, precision='double'):
+        """ Return the cache key for a network, or None if it can't be cached.
+
+        Parameters
+        ----------
+        network: nengo.Network
+            The network to be built.
+        dt: float
+            Step length.
+        n_components: int
+            Number of components in the partition.
+        assignments: dict
+            Maps nengo objects to the components they are assigned to.
+        aligned: bool
+            Whether the network file is to be aligned (see MpiModel).
+        tabulate: float
+            Length of simulated time over which functions are to be
+            tabulated (see MpiModel).
+        tabulate_error: float
+            Error allowed when interpolating tabulated functions (see
+            MpiModel).
+        precision: string
+            Precision that signals are stored in the network file with
+            (see MpiModel).
+
+        """
+        if network.seed is None:
+            logger.info(
+                "Not caching build of network %s, as it has no seed.",
+                network)
+            return None
+
+        objects = _ordered_objects(network)
+        index = {id(obj): i for i, obj in enumerate(objects)}
+
+        h = hashlib.sha1()
+
+        header = [
+            __version__, nengo.__version__, NETWORK_FORMAT_VERSION,
+            repr(float(dt)), n_components, aligned,
+            None if tabulate is None else int(np.round(tabulate / dt)),
+            tabulate_error, precision]
+        h.update(repr(header).encode('utf-8'))
+
+        for obj in objects:
+            h.update(_describe_object(obj, index).encode('utf-8'))
+
+        h.update(_describe(assignments, index, set()).encode('utf-8'))
+
+        return h.hexdigest()
+
+    def _path(self, key, ext):
+        return os.path.join(self.cache_dir, key + ext)
+
+    def __contains__(self, key):
+        return os.path.isfile(self._path(key, '.json'))
+
+    def load(self, key, network):
+        """ Return the cached network file for a key.
+
+        Returns
+        -------
+        filename: string
+            Name of the cached network file.
+        probe_keys: dict
+            Maps each probe in ``network`` to its key in the file.
+        probe_shapes: dict
+            Maps each probe in ``network`` to the shape of its signal.
+
+        """
+        with open(self._path(key, '.json'), 'r') as f:
+            info = json.load(f)
+
+        probes = network.all_probes
+
+        probe_keys = dict(zip(probes, info['probe_keys']))
+        probe_shapes = dict(
+            zip(probes, [tuple(s) for s in info['probe_shapes']]))
+
+        return self._path(key, '.net'), probe_keys, probe_shapes
+
+    def temp_file(self):
+        """ Return the name of a new temporary network file in the cache.
+
+        Used to write a network while it is finalized, so that it can then
+        be added to the cache by ``store``.
+
+        """
+        fd, tmp_net = tempfile.mkstemp(suffix='.net', dir=self.cache_dir)
+        os.close(fd)
+        return tmp_net
+
+    def store(self, key, model, network, network_file=None):
+        """ Add a finalized MpiModel to the cache.
+
+        Returns whether the model was added. Files are written under
+        temporary names and then renamed, so that other processes using
+        the same cache never see partially written entries.
+
+        Parameters
+        ----------
+        key: string
+            The cache key of the network.
+        model: MpiModel
+            The finalized model.
+        network: nengo.Network
+            The network that was built into ``model``.
+        network_file: string
+            A file from ``temp_file`` that the network was written to while
+            it was finalized. Finalizing releases the built network, so this
+            is required when the model is runnable. Otherwise, the model's
+            save_file is copied into the cache.
+
+        """
+        if model.pyfunc_ops:
+            logger.info(
+                "Not caching build of network %s, as it contains Nodes "
+                "that execute python functions.", network)
+
+            if network_file is not None:
+                os.remove(network_file)
+
+            return False
+
+        probes = network.all_probes
+        info = {
+            'probe_keys': [int(model.probe_keys[p]) for p in probes],
+            'probe_shapes': [
+                [int(s) for s in model.probe_shapes[p]] for p in probes]}
+
+        if network_file is None:
+            network_file = self.temp_file()
+            shutil.copyfile(model.save_file, network_file)
+
+        os.rename(network_file, self._path(key, '.net'))
+
+        fd, tmp_json = tempfile.mkstemp(suffix='.json', dir=self.cache_dir)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(info, f)
+
+        os.rename(tmp_json, self._path(key, '.json'))
+
+        return True
+
+
+def get_default_decoder_cache():
+    """ Return the decoder cache configured by nengo's rc settings. """
+    if rc.getboolean('decoder_cache', 'enabled'):
+        return DecoderCache(rc.getboolean('decoder_cache', 'readonly'))
+
+    return NoDecoderCache()
+
+
+def cache_stats(decoder_cache):
+    """ Return the numbers of hits and misses of a decoder cache. """
+    return (
+        getattr(decoder_cache, 'n_hits', 0),
+        getattr(decoder_cache, 'n_misses', 0))
+
+
+def add_cache_stats(decoder_cache, n_hits, n_misses):
+    """ Count hits and misses that happened in another process. """
+    # A SolvedDecoderCache only serves decoders that were solved already,
+    # so the counts belong to the decoder cache it wraps.
+    decoder_cache = getattr(decoder_cache, 'decoder_cache', decoder_cache)
+
+    if hasattr(decoder_cache, 'n_hits'):
+        decoder_cache.n_hits += n_hits
+        decoder_cache.n_misses += n_misses
+
+
+class _OwnedFileLock(FileLock):
+    """ A FileLock that records the host and process holding it. """
+    def acquire(self):
+        super(_OwnedFileLock, self).acquire()
+        owner = "%s %d\n" % (socket.gethostname(), os.getpid())
+        os.write(self._fd, owner.encode('utf-8'))
+
+
+def _lock_is_stale(path, stat, max_age):
+    """ Whether the lock at ``path``, with stat result ``stat``, is stale.
+
+    A lock recording an owner on this host is stale if the owner has
+    exited. Any other lock is stale if it is older than ``max_age``.
+
+    """
+    try:
+        with open(path) as f:
+            host, pid = f.read().split()
+        pid = int(pid)
+    except (IOError, OSError, ValueError):
+        host, pid = None, None
+
+    if host == socket.gethostname():
+        try:
+            os.kill(pid, 0)
+        except OSError as err:
+            return err.errno == errno.ESRCH
+
+        return False
+
+    return time.time() - stat.st_mtime > max_age
+
+
+def _break_stale_locks(cache_dir, max_age=None):
+    """ Remove locks in ``cache_dir`` that were left behind by dead builds.
+
+    A stale lock is first renamed to a unique name, which only one process
+    can do, and is then checked again under that name. If the file that was
+    renamed is not the one that was found to be stale, because the lock was
+    released and taken again in between, it is put back.
+
+    """
+    max_age = stale_lock_age if max_age is None else max_age
+
+    for name in ['index.lock', 'legacy.lock']:
+        path = os.path.join(cache_dir, name)
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+
+        if not _lock_is_stale(path, stat, max_age):
+            continue
+
+        broken = "%s.%s.broken" % (path, uuid.uuid4().hex)
+        try:
+            os.rename(path, broken)
+        except OSError:
+            # Broken or released by another process.
+            continue
+
+        renamed = safe_stat(broken)
+        same_file = (
+            renamed is not None and
+            (renamed.st_ino, renamed.st_mtime) == (stat.st_ino, stat.st_mtime))
+
+        if same_file and _lock_is_stale(broken, renamed, max_age):
+            logger.warning(
+                "Removed decoder cache lock %s, which was left behind by a "
+                "build that did not release it.", path)
+            safe_remove(broken)
+            continue
+
+        # A live lock was renamed. Put it back, unless the lock has been
+        # taken yet again.
+        try:
+            os.link(broken, path)
+        except OSError:
+            logger.warning(
+                "Could not restore decoder cache lock %s, which was taken "
+                "while stale locks were being removed.", path)
+        safe_remove(broken)
+
+
+class _CacheIndex(CacheIndex):
+    """ Index of a DecoderCache, safe for concurrent builds.
+
+    The index is written to a temporary file which is then renamed, so a
+    build killed while writing the index never leaves a truncated index.
+    Keys removed by other builds while this build was running are ignored.
+    The lock on the index records its owner (see _OwnedFileLock).
+
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self._lock = _OwnedFileLock(self.filename + '.lock')
+        with self._lock:
+            self._index = self._load_index()
+        self._updates = {}
+        self._deletes = set()
+        self._removed_files = set()
+
+    def sync(self):
+        try:
+            with self._lock:
+                self._index = self._load_index()
+                self._index.update(self._updates)
+
+                for key in self._deletes:
+                    self._index.pop(key, None)
+
+                index = dict(
+                    (k, v) for k, v in self._index.items()
+                    if v[0] not in self._removed_files)
+
+                fd, tmp_index = tempfile.mkstemp(
+                    dir=os.path.dirname(self.filename))
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(index, f, pickle.HIGHEST_PROTOCOL)
+
+                os.rename(tmp_index, self.filename)
+        except TimeoutError:
+            warnings.warn(
+                "Decoder cache index could not acquire lock. "
+                "Cache index was not synced.")
+
+        self._updates.clear()
+        self._deletes.clear()
+
+
+class DecoderCache(_DecoderCache):
+    """ Cache for decoders, which can be shared by concurrent builds.
+
+    Stores decoders in the same format, and under the same keys, as nengo's
+    DecoderCache, with the following differences:
+
+    * Locks left behind by builds that were killed while holding them are
+      removed, instead of disabling the cache for all later builds. Locks
+      record the host and process holding them; a lock held on the same
+      host is removed once its process has exited, and any other lock once
+      it is older than ``stale_lock_age`` seconds.
+    * The index is replaced atomically when it is written.
+    * Cached decoders are marked as used whenever they are loaded, and
+      ``shrink`` removes the least recently used decoders first. nengo
+      relies on access times for this, which are not recorded on
+      filesystems mounted with ``noatime``, as shared filesystems often
+      are.
+    * The number of cache hits and misses are counted, in ``n_hits`` and
+      ``n_misses``.
+
+    Parameters
+    ----------
+    readonly: bool
+        Whether to only use decoders already in the cache, without adding
+        new ones.
+    cache_dir: string
+        Directory storing the cache. Defaults to the directory given by
+        nengo's rc settings.
+    stale_lock_age: float
+        Age in seconds after which a lock whose owner cannot be checked,
+        because it is held on another host or was taken by nengo, is
+        assumed to be stale. Should be longer than any build takes to write
+        the index. Defaults to the module's ``stale_lock_age``.
+
+    """
+    def __init__(self, readonly=False, cache_dir=None, stale_lock_age=None):
+        self.readonly = readonly
+
+        if cache_dir is None:
+            cache_dir = self.get_default_dir()
+
+        self.cache_dir = cache_dir
+        safe_makedirs(self.cache_dir)
+        self._fragment_size = get_fragment_size(self.cache_dir)
+        self._fd = None
+
+        self.n_hits = 0
+        self.n_misses = 0
+
+        _break_stale_locks(self.cache_dir, stale_lock_age)
+
+        try:
+            self._remove_legacy_files()
+            self._index = _CacheIndex(
+                os.path.join(self.cache_dir, self._INDEX))
+        except TimeoutError:
+            warnings.warn(
+                "Decoder cache could not acquire lock and was deactivated.")
+            self._index = {}
+            self.readonly = True
+
+    def _remove_legacy_files(self):
+        """ As in nengo, but with a lock that records its owner. """
+        lock_filename = 'legacy.lock'
+        with _OwnedFileLock(os.path.join(self.cache_dir, lock_filename)):
+            if self._check_legacy_file():
+                return
+
+            for f in os.listdir(self.cache_dir):
+                if f == lock_filename:
+                    continue
+                path = os.path.join(self.cache_dir, f)
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+
+            self._write_legacy_file()
+
+    def wrap_solver(self, solver_fn):
+        def cached_solver(solver, neuron_type, gain, bias, x, targets,
+                          rng=None, E=None):
+
+            try:
+                args, _, _, defaults = inspect.getargspec(solver)
+            except TypeError:
+                args, _, _, defaults = inspect.getargspec(solver.__call__)
+
+            args = args[-len(defaults):]
+            if rng is None and 'rng' in args:
+                rng = defaults[args.index('rng')]
+            if E is None and 'E' in args:
+                E = defaults[args.index('E')]
+
+            key = self._get_cache_key(
+                solver_fn, solver, neuron_type, gain, bias, x, targets, rng, E)
+
+            try:
+                path, start, end = self._index[key]
+                if self._fd is not None:
+                    self._fd.flush()
+
+                with open(path, 'rb') as f:
+                    f.seek(start)
+                    solver_info, decoders = nco.read(f)
+            except Exception:
+                logger.debug("Cache miss [%s].", key)
+                self.n_misses += 1
+
+                decoders, solver_info = solver_fn(
+                    solver, neuron_type, gain, bias, x, targets, rng=rng, E=E)
+
+                if not self.readonly:
+                    fd = self._get_fd()
+                    start = fd.tell()
+                    nco.write(fd, solver_info, decoders)
+                    end = fd.tell()
+                    self._index[key] = (fd.name, start, end)
+            else:
+                logger.debug("Cache hit [%s]: Loaded stored decoders.", key)
+                self.n_hits += 1
+
+                try:
+                    os.utime(path, None)
+                except OSError:
+                    pass
+
+            return decoders, solver_info
+
+        return cached_solver
+
+    def shrink(self, limit=None):
+        """ Remove the least recently used decoders until under ``limit``.
+
+        Parameters
+        ----------
+        limit: int or string
+            Maximum size of the cache in bytes, or a string such as
+            "512 MB". Defaults to the size given by nengo's rc settings.
+
+        """
+        if self.readonly:
+            return
+
+        if limit is None:
+            limit = rc.get('decoder_cache', 'size')
+
+        if is_string(limit):
+            limit = human2bytes(limit)
+
+        self._close_fd()
+
+        fileinfo = []
+        excess = -limit
+        for path in self.get_files():
+            stat = safe_stat(path)
+            if stat is not None:
+                size = byte_align(stat.st_size, self._fragment_size)
+                excess += size
+                fileinfo.append((stat.st_mtime, size, path))
+
+        fileinfo.sort()
+
+        for _, size, path in fileinfo:
+            if excess <= 0:
+                break
+
+            excess -= size
+            self._index.remove_file_entry(path)
+            safe_remove(path)
+
+        self._index.sync()
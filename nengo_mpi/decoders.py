@@ -0,0 +1,237 @@
+"""Solving for decoders in parallel.
+
+When a network is built, the decoders of each Connection are found by
+computing the activities of the presynaptic neurons at the evaluation
+points and solving a least-squares problem. nengo does this one connection
+at a time, in the middle of building the connection, so for large networks
+the solves dominate the build and use a single processor.
+
+``solve_decoders`` finds the decoders of all connections before the
+network is built. It first runs the builder on a scratch model whose
+decoder cache only records the problems to be solved, then solves the
+recorded problems with a pool of processes, and finally installs a
+SolvedDecoderCache on the model, which hands the solutions to the real
+build in the order they are asked for.
+
+Only connections that nengo passes through the decoder cache, i.e. those
+with a seed, are solved in parallel. Any other solve is carried out
+during the build, as usual.
+
+"""
+from __future__ import print_function
+from collections import defaultdict, deque
+import hashlib
+import os
+import struct
+import time
+
+import numpy as np
+
+from nengo_mpi.cache import add_cache_stats, cache_stats
+from nengo_mpi.model import MpiBuilder, MpiModel, fork_context
+
+
+def _problem_key(solver, neuron_type, gain, bias, x, targets, rng, E):
+    """ Return a key identifying a decoder solve within a single build. """
+    h = hashlib.sha1()
+
+    for array in [gain, bias, x, targets] + ([] if E is None else [E]):
+        h.update(np.ascontiguousarray(array).data)
+
+    state = rng.get_state()
+    h.update(state[1].data)
+    h.update(struct.pack('qqd', state[2], state[3], state[4]))
+
+    return id(solver), id(neuron_type), h.hexdigest()
+
+
+class _DecoderRecorder(object):
+    """ Decoder cache that records decoder solves instead of carrying them out.
+
+    Returns decoders of the correct shape, filled with zeros, so that the
+    rest of the build can go ahead.
+
+    """
+    def __init__(self):
+        self.keys = []
+        self.problems = []
+
+    def wrap_solver(self, solver_fn):
+        def record(solver, neuron_type, gain, bias, x, targets,
+                   rng=None, E=None):
+
+            self.keys.append(_problem_key(
+                solver, neuron_type, gain, bias, x, targets, rng, E))
+
+            rng_copy = np.random.RandomState()
+            rng_copy.set_state(rng.get_state())
+
+            self.problems.append((
+                solver_fn, (solver, neuron_type, gain, bias, x, targets),
+                dict(rng=rng_copy, E=E)))
+
+            n_columns = targets.shape[1] if E is None else E.shape[1]
+            return np.zeros((x.shape[1], n_columns)), {}
+
+        return record
+
+    def shrink(self, limit=None):
+        pass
+
+
+class SolvedDecoderCache(object):
+    """ Decoder cache holding the results of ``solve_decoders``.
+
+    Solves that were carried out in advance are answered from memory, in
+    the order they were solved. Any other solve is passed on to the
+    wrapped decoder cache. All other attributes are those of the wrapped
+    decoder cache.
+
+    Parameters
+    ----------
+    decoder_cache: DecoderCache
+        The decoder cache to wrap.
+    keys: list
+        Key of each solve that was carried out (see _problem_key).
+    results: list
+        The (decoders, solver_info) found by each solve.
+
+    """
+    def __init__(self, decoder_cache, keys, results):
+        self.decoder_cache = decoder_cache
+        self.n_solved = len(results)
+        self.n_served = 0
+
+        self._solved = defaultdict(deque)
+        for key, result in zip(keys, results):
+            self._solved[key].append(result)
+
+    def wrap_solver(self, solver_fn):
+        cached_solver = self.decoder_cache.wrap_solver(solver_fn)
+
+        def solved(solver, neuron_type, gain, bias, x, targets,
+                   rng=None, E=None):
+
+            key = _problem_key(
+                solver, neuron_type, gain, bias, x, targets, rng, E)
+
+            if self._solved.get(key):
+                self.n_served += 1
+                return self._solved[key].popleft()
+
+            return cached_solver(
+                solver, neuron_type, gain, bias, x, targets, rng=rng, E=E)
+
+        return solved
+
+    def __getattr__(self, name):
+        return getattr(self.decoder_cache, name)
+
+
+# The recorded problems and the decoder cache used to solve them. Worker
+# processes are forked after these are set (see fork_context), so they
+# inherit the problems instead of receiving pickled copies.
+_solving_problems = None
+_solving_cache = None
+
+
+def _solve_problems(indices):
+    n_hits, n_misses = cache_stats(_solving_cache)
+    results = []
+
+    for i in indices:
+        solver_fn, args, kwargs = _solving_problems[i]
+        results.append(
+            _solving_cache.wrap_solver(solver_fn)(*args, **kwargs))
+
+    # Writes any newly cached decoders to the cache's index, which
+    # is locked while being written, so workers can share the cache.
+    _solving_cache.shrink()
+
+    stats = cache_stats(_solving_cache)
+    return results, (stats[0] - n_hits, stats[1] - n_misses)
+
+
+def solve_decoders(model, network, n_processes):
+    """ Solve for the decoders of ``network`` before it is built.
+
+    The solutions are stored in ``model.decoder_cache``, which is also
+    used by the processes to look up decoders that were cached by earlier
+    builds. Afterwards ``model.decoder_cache`` is a SolvedDecoderCache
+    wrapping the original decoder cache, from which the build of
+    ``network`` into ``model`` takes its decoders.
+
+    Parameters
+    ----------
+    model: MpiModel
+        The model that ``network`` will be built into.
+    network: nengo.Network
+        The network to solve for.
+    n_processes: int
+        Number of processes to solve with. The processes are forked, so
+        this raises a BuildError if this process has initialized MPI
+        (e.g. when running with ``python -m nengo_mpi``).
+
+    """
+    then = time.time()
+
+    recorder = _DecoderRecorder()
+
+    # The scratch model is never saved; giving it a save_file only avoids
+    # creating a native simulator.
+    scratch = MpiModel(
+        model.n_components, model.assignments, dt=model.dt,
+        decoder_cache=recorder, save_file=os.devnull)
+
+    # The builder draws the seed of an unseeded network from numpy's global
+    # random state, which must be left as it was for the real build.
+    random_state = np.random.get_state()
+
+    try:
+        MpiBuilder.build(scratch, network)
+    finally:
+        np.random.set_state(random_state)
+
+    del scratch
+
+    n_problems = len(recorder.problems)
+    print("    Found %d decoders to solve for in %f seconds." % (
+        n_problems, time.time() - then))
+
+    then = time.time()
+
+    global _solving_problems, _solving_cache
+    _solving_problems, _solving_cache = recorder.problems, model.decoder_cache
+
+    results = []
+
+    try:
+        if n_problems:
+            n_processes = min(n_processes, n_problems)
+            chunks = np.array_split(
+                np.arange(n_problems), min(4 * n_processes, n_problems))
+
+            pool = fork_context('solve for decoders').Pool(n_processes)
+
+            try:
+                for chunk_results, stats in pool.map(
+                        _solve_problems, chunks):
+
+                    # Unpickled arrays do not own their memory, which
+                    # nengo requires of the base arrays of signals.
+                    results.extend(
+                        (np.array(decoders), solver_info)
+                        for decoders, solver_info in chunk_results)
+
+                    add_cache_stats(model.decoder_cache, *stats)
+            finally:
+                pool.close()
+                pool.join()
+    finally:
+        _solving_problems, _solving_cache = None, None
+
+    print("    Solved for %d decoders with %d processes in %f seconds." % (
+        n_problems, n_processes, time.time() - then))
+
+    model.decoder_cache = SolvedDecoderCache(
+        model.decoder_cache, recorder.keys, results)
@@ -9,13 +9,20 @@ except ImportError:
     h5py_available = False
 
 import numpy as np
-from collections import defaultdict, OrderedDict
-import warnings
+from collections import defaultdict, OrderedDict, namedtuple
 from itertools import chain
+import warnings
+from multiprocessing import cpu_count
+import binascii
+import gc
+import hashlib
+import json
 import os
-import tempfile
+import shutil
 import sys
+import traceback
 import logging
+import multiprocessing
 import six
 
 import nengo
@@ -23,34 +30,40 @@ from nengo import Probe
 from nengo import builder
 from nengo.builder import Signal, Operator, Model
 from nengo.builder.ensemble import build_ensemble
-from nengo.builder.node import build_node
 from nengo.builder.network import build_network
-from nengo.builder.connection import build_connection
 from nengo.builder.probe import build_probe
 from nengo.builder.operator import TimeUpdate
 from nengo.builder import Builder as DefaultBuilder
+from nengo.base import ObjView
 from nengo.neurons import LIF, LIFRate, RectifiedLinear, Sigmoid
 from nengo.neurons import AdaptiveLIF, AdaptiveLIFRate, Izhikevich
 from nengo.synapses import LinearFilter, Triangle
 from nengo.processes import (
     WhiteNoise, FilteredNoise, BrownNoise, WhiteSignal, PresentInput)
-from nengo.utils.graphs import toposort
-from nengo.utils.simulator import operator_depencency_graph
 from nengo.cache import NoDecoderCache
 from nengo.network import Network
-from nengo.connection import Connection
-from nengo.ensemble import Ensemble
+from nengo.connection import Connection, LearningRule
+from nengo.ensemble import Ensemble, Neurons
 from nengo.node import Node
 from nengo.exceptions import BuildError
 
 from nengo_mpi import PartitionError
+from nengo_mpi.__about__ import __version__
 from nengo_mpi.utils import (
-    OP_DELIM, PROBE_DELIM, make_key,
-    pad, ndarray_to_string, get_closures)
+    PROBE_DELIM, NETWORK_FORMAT_VERSION, SIGNAL_RECORD_SIZE, OP_SIGNATURES,
+    KeyMaker, pad, get_closures)
 from nengo_mpi.utils import signal_to_string as _signal_to_string
-from nengo_mpi.native import NativeSimulator, native_sim_available
+from nengo_mpi.utils import signal_to_record as _signal_to_record
+from nengo_mpi.cache import add_cache_stats, cache_stats, object_digests
+from nengo_mpi.native import (
+    NativeSimulator, mpi_initialized, native_sim_available)
+from nengo_mpi.ordering import DependencyGraph, OpIndex, schedule
 from nengo_mpi.spaun_mpi import SpaunStimulus, build_spaun_stimulus
 from nengo_mpi.spaun_mpi import SpaunStimulusOperator
+from nengo_mpi.stream import StreamInput, StreamInputOperator
+from nengo_mpi.stream import build_stream_input
+from nengo_mpi.tabulate import SimTabulated, SimInterpolate
+from nengo_mpi.tabulate import build_tabulated_node, build_tabulated_connection
 
 logger = logging.getLogger(__name__)
 if sys.version_info > (3,):
@@ -96,14 +109,17 @@ with warnings.catch_warnings():
 
     MpiBuilder.register(Ensemble)(make_builder(build_ensemble))
 
-    MpiBuilder.register(Node)(make_builder(build_node))
+    MpiBuilder.register(Node)(make_builder(build_tabulated_node))
 
-    MpiBuilder.register(Connection)(make_builder(build_connection))
+    MpiBuilder.register(Connection)(
+        make_builder(build_tabulated_connection))
 
     MpiBuilder.register(Probe)(make_builder(build_probe))
 
     MpiBuilder.register(SpaunStimulus)(make_builder(build_spaun_stimulus))
 
+    MpiBuilder.register(StreamInput)(make_builder(build_stream_input))
+
     MpiBuilder.register(Network)(make_builder(build_network))
 
 
@@ -173,39 +189,64 @@ def split_connection(conn_ops, signal, is_update):
     post_ops: A list of the ops that come after the updated signal.
 
     """
-    post_ops = conn_ops[:]
-    pre_ops = []
-
-    for op in post_ops[:]:
-        writes_signal = signal in op.updates
-        if not is_update:
-            writes_signal |= signal in op.incs
-            writes_signal |= signal in op.sets
-
-        if writes_signal:
-            pre_ops.append(op)
-            post_ops.remove(op)
+    # signal -> ops in conn_ops that write to it
+    written_by = defaultdict(list)
+    for op in conn_ops:
+        for sig in op.updates + op.incs + op.sets:
+            written_by[sig].append(op)
 
     if is_update:
-        assert len(pre_ops) == 1
+        pre = [op for op in conn_ops if signal in op.updates]
+        assert len(pre) == 1
     else:
-        assert len(pre_ops) >= 1
+        pre = list(OrderedDict.fromkeys(written_by[signal]))
+        assert len(pre) >= 1
+
+    # Walk backwards from the ops writing to ``signal``.
+    is_pre = set(pre)
+    stack = list(pre)
+    while stack:
+        op = stack.pop()
+        for sig in op.reads:
+            for writer in written_by.get(sig, ()):
+                if writer not in is_pre:
+                    is_pre.add(writer)
+                    stack.append(writer)
+
+    pre_ops = [op for op in conn_ops if op in is_pre]
+    post_ops = [op for op in conn_ops if op not in is_pre]
+
+    return pre_ops, post_ops
 
-    reads = set([sig for op in pre_ops for sig in op.reads])
 
-    changed = True
-    while changed:
-        changed = False
-        for op in post_ops[:]:
-            writes = set(op.incs) | set(op.sets) | set(op.updates)
+# In network files saved with ``aligned=True``, objects of at least this
+# many bytes start at a multiple of this many bytes in the file.
+FILE_ALIGNMENT = 4096
 
-            if writes & reads:
-                pre_ops.append(op)
-                post_ops.remove(op)
-                reads |= set(op.reads)
-                changed = True
+# Type that the values of signals are stored with in network files, for
+# each precision that they can be saved in.
+PRECISION_DTYPES = {'double': 'float64', 'single': 'float32'}
 
-    return pre_ops, post_ops
+
+def create_network_file(filename, aligned=False):
+    """ Create an hdf5 file to store a built network in, truncating it.
+
+    If ``aligned`` is True, large objects such as the datasets storing
+    read-only signals start at a multiple of FILE_ALIGNMENT bytes in the
+    file, so that the C++ simulator can map them into memory.
+
+    """
+    if not aligned:
+        return h5.File(filename, 'w')
+
+    if isinstance(filename, six.text_type):
+        filename = filename.encode(sys.getfilesystemencoding())
+
+    fapl = h5.h5p.create(h5.h5p.FILE_ACCESS)
+    fapl.set_alignment(FILE_ALIGNMENT, FILE_ALIGNMENT)
+    fid = h5.h5f.create(filename, h5.h5f.ACC_TRUNC, fapl=fapl)
+
+    return h5.File(fid)
 
 
 def store_string_list(
@@ -231,6 +272,416 @@ def store_string_list(
     dset.attrs['n_strings'] = len(strings)
 
 
+def make_op_tables(op_records):
+    """ Arrange a list of operator records into one table per operator type.
+
+    Each record is a tuple (op_type, index, args), where the kinds of
+    the entries in args are given by OP_SIGNATURES[op_type].
+
+    Returns
+    -------
+    op_tables: list
+        One tuple (op_type, index, signals, params, arrays) per operator
+        type, where:
+
+            index: int64, shape (n_ops,)
+            signals: int64, shape (n_ops, n_signals, SIGNAL_RECORD_SIZE)
+            params: float64, shape (n_ops, n_params)
+            arrays: int64, shape (n_ops, n_arrays)
+
+        Entries in ``arrays`` are keys into op_data.
+    op_data: OrderedDict
+        Maps integer keys to array-valued arguments of operators (e.g. the
+        inputs of a PresentInput operator). Values are float64 arrays,
+        or lists of strings.
+
+    """
+    by_type = OrderedDict()
+    for op_type, index, args in op_records:
+        by_type.setdefault(op_type, []).append((index, args))
+
+    op_tables = []
+    op_data = OrderedDict()
+
+    for op_type, records in six.iteritems(by_type):
+        signature = OP_SIGNATURES[op_type]
+
+        indices, signals, params, arrays = [], [], [], []
+
+        for index, args in records:
+            if len(args) != len(signature):
+                raise ValueError(
+                    "Operator of type %s expects %d arguments, "
+                    "received %d." % (op_type, len(signature), len(args)))
+
+            indices.append(index)
+            signals.append([])
+            params.append([])
+            arrays.append([])
+
+            for kind, arg in zip(signature, args):
+                if kind == 'S':
+                    signals[-1].append(arg)
+                elif kind == 'f':
+                    params[-1].append(float(arg))
+                else:
+                    key = len(op_data)
+
+                    if kind == 'T':
+                        op_data[key] = list(arg)
+                    else:
+                        data = np.asarray(arg, dtype='float64')
+                        op_data[key] = (
+                            np.atleast_2d(data) if kind == 'A'
+                            else data.flatten())
+
+                    arrays[-1].append(key)
+
+        n_ops = len(records)
+        n_signals = signature.count('S')
+        n_params = signature.count('f')
+        n_arrays = len(signature) - n_signals - n_params
+
+        op_tables.append((
+            op_type,
+            np.array(indices, dtype='int64'),
+            np.array(signals, dtype='int64').reshape(
+                n_ops, n_signals, SIGNAL_RECORD_SIZE),
+            np.array(params, dtype='float64').reshape(n_ops, n_params),
+            np.array(arrays, dtype='int64').reshape(n_ops, n_arrays)))
+
+    return op_tables, op_data
+
+
+def store_op_tables(h5_file, op_records, compression='gzip'):
+    """ Store a list of operator records as tables in an hdf5 file or group.
+
+    The records are arranged by make_op_tables. One group is created for
+    each operator type under ``operators``, containing datasets ``index``,
+    ``signals``, ``params`` and ``arrays``. Datasets whose second dimension
+    would be 0 are omitted. Array-valued arguments are stored in the
+    ``op_data`` group, in datasets named after their keys.
+
+    """
+    op_tables, op_data = make_op_tables(op_records)
+    store_op_data(h5_file, op_tables, op_data, compression)
+
+
+def store_op_data(
+        h5_file, op_tables, op_data, compression='gzip', dtype='float64'):
+    """ Store the output of make_op_tables in an hdf5 file or group.
+
+    Array-valued arguments are stored with type ``dtype``.
+
+    """
+    op_group = h5_file.create_group('operators')
+    data_group = h5_file.create_group('op_data')
+
+    for key, data in six.iteritems(op_data):
+        if isinstance(data, list):
+            store_string_list(
+                data_group, str(key), data, compression=compression)
+        else:
+            data_group.create_dataset(
+                str(key), data=data, dtype=dtype,
+                compression=compression if data.size else None)
+
+    for op_type, index, signals, params, arrays in op_tables:
+        type_group = op_group.create_group(op_type)
+        type_group.create_dataset(
+            'index', data=index, compression=compression)
+
+        for name, data in [
+                ('signals', signals), ('params', params), ('arrays', arrays)]:
+            if data.shape[1]:
+                type_group.create_dataset(
+                    name, data=data, compression=compression)
+
+    op_group.attrs['n_operators'] = sum(
+        len(index) for _, index, _, _, _ in op_tables)
+
+
+def signal_values(base):
+    """ Return the initial value of a base signal as a flat float64 array.
+
+    Values are in the order they are stored in memory by the C++ code, which
+    depends on whether the signal is stored in row-major or column-major
+    order.
+
+    """
+    shape = base.shape
+    stride = base.elemstrides
+
+    if base.ndim == 2:
+        # assert that the signal is contiguous
+        assert ((stride[1] == 1 and shape[1] == stride[0]) or
+                (stride[0] == 1 and shape[0] == stride[1]))
+
+        if stride[1] == 1:
+            values = base.initial_value.flatten()
+        elif stride[0] == 1:
+            values = base.initial_value.T.flatten()
+        else:
+            raise ValueError(
+                "Received a signal with strides that "
+                "nengo_mpi cannot handle. Signal "
+                "was %s, stride is %s." % (base, stride))
+    else:
+        # assert that the signal is contiguous
+        assert base.ndim == 0 or stride[0] == 1
+        values = np.ravel(base.initial_value)
+
+    return np.ascontiguousarray(values, dtype='float64')
+
+
+# Everything needed to simulate a single component, in the form expected by
+# both _store_component and mpi_sim.load_components. Mutable signals are
+# stored one after the other in ``signals``, and ``signal_offsets`` gives
+# the offset of each one. Read-only signals are instead stored in a pool
+# shared by all components, in which each distinct value is stored once;
+# their offsets are offsets into the pool. ``readonly_signals`` holds the
+# entries of the pool used by the component, in order of increasing offset.
+ComponentData = namedtuple(
+    'ComponentData',
+    ['component', 'signals', 'signal_keys', 'signal_shapes', 'signal_strides',
+     'signal_labels', 'signal_offsets', 'signal_readonly', 'readonly_signals',
+     'op_tables', 'op_data', 'probes'])
+
+
+# What a build of a sharded network records about itself, so that later
+# builds of the network can reuse its shards (see build_distributed).
+# ``header`` has to match for the record to be reused. ``objects`` holds,
+# for each object in build order, a hash of the object and the components
+# its ops were assigned to. ``mpi_tags`` maps the index of each connection
+# crossing components to its tag, and ``readonly_offsets`` maps the hash of
+# each read-only value to its (offset, size). ``components`` maps each
+# component to a ComponentRecord.
+BuildRecord = namedtuple(
+    'BuildRecord',
+    ['header', 'objects', 'mpi_tags', 'readonly_offsets', 'components'])
+
+# The exported dependency graph of a component (see _build_part), the index
+# of each of the graph's ops in the ordering, the (hash, size) of the
+# read-only values used by the component, and its probes, as
+# (index, key, shape, probe_string).
+ComponentRecord = namedtuple(
+    'ComponentRecord', ['exported', 'ordering', 'digests', 'probes'])
+
+
+def _store_json(h5_file, dset_name, value, compression='gzip'):
+    store_string_list(
+        h5_file, dset_name, [json.dumps(value)], final_null=False,
+        compression=compression)
+
+
+def _load_json(h5_file, dset_name):
+    return json.loads(h5_file[dset_name][()].tobytes().decode('ascii'))
+
+
+def _hex(digest):
+    return binascii.hexlify(digest).decode('ascii')
+
+
+def store_build_record(h5_file, record, compression='gzip'):
+    """ Store a BuildRecord in an hdf5 file or group.
+
+    The graph edges and ordering of each component are stored as datasets
+    in a group named after the component. Everything else is stored as
+    JSON.
+
+    """
+    _store_json(h5_file, 'info', {
+        'header': record.header,
+        'objects': record.objects,
+        'mpi_tags': sorted(six.iteritems(record.mpi_tags)),
+        'readonly_offsets': [
+            [_hex(digest), offset, size] for digest, (offset, size)
+            in six.iteritems(record.readonly_offsets)]},
+        compression=compression)
+
+    for component, c_record in six.iteritems(record.components):
+        n_ops, n_barriers, edges, keys, sends, recvs, updated = (
+            c_record.exported)
+
+        group = h5_file.create_group(str(component))
+
+        for name, data in [
+                ('edges', edges), ('ordering', c_record.ordering)]:
+            group.create_dataset(
+                name, data=data, dtype='int64',
+                compression=compression if data.size else None)
+
+        _store_json(group, 'info', {
+            'n_ops': n_ops,
+            'n_barriers': n_barriers,
+            'keys': sorted(six.iteritems(keys)),
+            'sends': [
+                [tag, send, writers]
+                for tag, (send, writers) in six.iteritems(sends)],
+            'recvs': sorted(six.iteritems(recvs)),
+            'updated': sorted(six.iteritems(updated)),
+            'digests': [
+                [_hex(digest), size] for digest, size in c_record.digests],
+            'probes': c_record.probes},
+            compression=compression)
+
+
+def load_build_record(h5_file):
+    """ Load a BuildRecord stored by store_build_record. """
+    info = _load_json(h5_file, 'info')
+
+    components = {}
+    for name in h5_file:
+        if name == 'info':
+            continue
+
+        group = h5_file[name]
+        c_info = _load_json(group, 'info')
+
+        exported = (
+            c_info['n_ops'], c_info['n_barriers'],
+            group['edges'][()].reshape(-1, 2),
+            dict((i, tuple(key)) for i, key in c_info.get('keys', [])),
+            dict((tag, (send, writers))
+                 for tag, send, writers in c_info['sends']),
+            dict(c_info['recvs']), dict(c_info['updated']))
+
+        components[int(name)] = ComponentRecord(
+            exported, group['ordering'][()],
+            [(binascii.unhexlify(digest), size)
+             for digest, size in c_info['digests']],
+            c_info['probes'])
+
+    return BuildRecord(
+        info['header'], info['objects'], dict(info['mpi_tags']),
+        dict((binascii.unhexlify(digest), (offset, size))
+             for digest, offset, size in info['readonly_offsets']),
+        components)
+
+
+def fork_context(purpose):
+    """ Return a multiprocessing context that starts processes by forking.
+
+    The processes used while building are handed the state that they work
+    on through module globals (e.g. _sharding_model), which they inherit
+    by being forked, so they cannot be started any other way. Raises a
+    BuildError if MPI has been initialized, since a process that has
+    initialized MPI cannot safely be forked.
+
+    """
+    if mpi_initialized():
+        raise BuildError(
+            "Cannot %s with several processes once MPI has been "
+            "initialized (e.g. when running with ``python -m nengo_mpi``)."
+            % purpose)
+
+    if not hasattr(multiprocessing, 'get_context'):
+        # Python 2, which always forks where it can.
+        return multiprocessing
+
+    return multiprocessing.get_context('fork')
+
+
+# The MpiModel whose shards are currently being written. Worker processes
+# are forked after this is set, so they inherit the model instead of
+# receiving a pickled copy of it.
+_sharding_model = None
+
+
+def _write_shard(component):
+    _sharding_model._write_shard(component)
+
+
+# The MpiModel and Network being built by a distributed build. As with
+# sharding, the build processes are forked after these are set.
+_building_model = None
+_building_network = None
+
+
+def _build_part(conn, owned):
+    _building_model._build_part(_building_network, conn, owned)
+
+
+def _recv_part(conn):
+    """ Receive the result of a step of a distributed build. """
+    status, result = conn.recv()
+
+    if status != 'ok':
+        raise BuildError(
+            "Building part of the network failed:\n%s" % result)
+
+    return result
+
+
+def _base_object(obj):
+    """ Return the object whose build creates the signals of ``obj``. """
+    if isinstance(obj, ObjView):
+        obj = obj.obj
+
+    if isinstance(obj, Neurons):
+        return obj.ensemble
+
+    if isinstance(obj, LearningRule):
+        return obj.connection
+
+    return obj
+
+
+def _objects_in_build_order(network):
+    """ Yield the objects in a network in the order they finish building.
+
+    Follows the order used by nengo's network builder. Each network comes
+    after the objects it contains.
+
+    """
+    for obj in network.ensembles + network.nodes:
+        yield obj
+
+    for subnetwork in network.networks:
+        for obj in _objects_in_build_order(subnetwork):
+            yield obj
+
+    for conn in network.connections:
+        yield conn
+
+    for probe in network.probes:
+        yield probe
+
+    yield network
+
+
+def _component_links(sends, recvs, updated):
+    """ Find the constraints between the orderings of different components.
+
+    Parameters
+    ----------
+    sends: dict
+        Maps the tag of each MpiSend to (component, mpi_send, writers),
+        where ``writers`` are the ops that write to the sent signal.
+    recvs: dict
+        Maps the tag of each MpiRecv of a signal that is not updated to
+        (component, mpi_recv).
+    updated: dict
+        Maps the tag of each MpiRecv of an updated signal to a barrier
+        coming after all ops on the receiving component that read it.
+
+    Returns
+    -------
+    links: list of (node, int, Operator)
+        The links expected by nengo_mpi.ordering.schedule.
+
+    """
+    links = [
+        (sends[tag][1], component, mpi_recv)
+        for tag, (component, mpi_recv) in six.iteritems(recvs)]
+
+    for tag, barrier in six.iteritems(updated):
+        component, _, writers = sends[tag]
+        links.extend((barrier, component, w) for w in writers)
+
+    return links
+
+
 class MpiModel(Model):
     """Output of the MpiBuilder, used by nengo_mpi.Simulator.
 
@@ -260,12 +711,44 @@ class MpiModel(Model):
         the executables bin/nengo_mpi and bin/nengo_cpp to run simulations.
     debug: bool
         Whether to run in debug mode. In debug mode, labels of operators and
-        strings are passed to C++.
+        strings are passed to C++. Signal labels are only kept by debug
+        builds of the C++ code (e.g. ``make dbg`` in mpi_sim).
+    shard: bool
+        Whether to store each component in its own file. Only valid when
+        save_file is non-empty. In that case, save_file becomes a small
+        manifest listing the shards, and the components are finalized and
+        written by a pool of processes. When the network is loaded, each
+        MPI process opens only the shards for the components it owns.
+    batch_size: int
+        Number of copies of the network to simulate side by side, each
+        with its own seed. Has no effect on saved network files.
+    aligned: bool
+        Whether to store read-only signals in save_file uncompressed, and
+        aligned within the file, so that they are mapped into memory
+        rather than read when the network is loaded. Only valid when
+        save_file is non-empty.
+    tabulate: float
+        Length of simulated time, in seconds, over which to evaluate the
+        functions of the objects in ``tabulated`` while building. The
+        network can then only be simulated for that long.
+    tabulate_error: float
+        Largest absolute error allowed when interpolating between samples
+        of the functions of input of the objects in ``tabulated``.
+    tabulated: set
+        Nodes, Connections and Direct-mode ensembles whose python functions
+        are to be simulated by looking up their values in tables rather
+        than by calling them (see nengo_mpi.tabulate.tabulated_objects).
+    precision: string
+        Precision that the values of signals are stored in save_file with,
+        either 'double' or 'single' (see PRECISION_DTYPES). Only valid
+        when save_file is non-empty.
 
     """
     def __init__(
             self, n_components, assignments, dt=0.001, label=None,
-            decoder_cache=NoDecoderCache(), save_file="", debug=False):
+            decoder_cache=NoDecoderCache(), save_file="", debug=False,
+            shard=False, batch_size=1, aligned=False, tabulate=None,
+            tabulate_error=None, tabulated=(), precision='double'):
 
         self.dt = dt
         self.label = label
@@ -299,6 +782,10 @@ class MpiModel(Model):
         self.base_signals = defaultdict(OrderedDict)
         self.total_base_signal_size = defaultdict(int)
 
+        # Creates keys for signals and probes. Keys depend only on the
+        # order in which objects are encountered during the build.
+        self.make_key = KeyMaker()
+
         self.sig = defaultdict(dict)
         self.sig['common'][0] = Signal(0., readonly=True, name='ZERO')
         self.sig['common'][1] = Signal(1., readonly=True, name='ONE')
@@ -313,19 +800,60 @@ class MpiModel(Model):
         self.time = Signal(np.array(0, dtype=np.float64), name='time')
         self.time_update = TimeUpdate(self.step, self.time)
 
+        # Key these now, so that they get the same keys even if
+        # the network is loaded from a build cache rather than built.
+        self.make_key(self.step)
+        self.make_key(self.time)
+
         if not save_file and not native_sim_available():
             raise ValueError(
                 "mpi_sim.so is unavailable, so nengo_mpi can only save "
                 "network files (cannot run simulations). However, save_file "
                 "argument was empty.")
 
+        if shard and not save_file:
+            raise ValueError(
+                "Networks can only be sharded when saving to file, "
+                "but save_file argument was empty.")
+
+        if aligned and not save_file:
+            raise ValueError(
+                "Networks can only be aligned when saving to file, "
+                "but save_file argument was empty.")
+
+        if precision not in PRECISION_DTYPES:
+            raise ValueError(
+                "``precision'' must be one of %s, got %r." % (
+                    sorted(PRECISION_DTYPES), precision))
+
+        if precision != 'double' and not save_file:
+            raise ValueError(
+                "Precision can only be chosen when saving to file, "
+                "but save_file argument was empty.")
+
         # Only create a working simulator if necessary.
-        self.native_sim = NativeSimulator(self.sig) if not save_file else None
+        self.native_sim = (
+            NativeSimulator(self.sig, self.make_key, batch_size)
+            if not save_file else None)
+
+        self.save_file = save_file
+        self.shard = shard
+        self.aligned = aligned
+        self.precision = precision
 
-        self.save_file = save_file if save_file else tempfile.mktemp()
+        self.tabulated = set(tabulated)
+        self.tabulate_steps = (
+            None if tabulate is None else int(np.round(tabulate / dt)))
+        self.tabulate_error = tabulate_error
 
         self.h5_compression = 'gzip'
-        self.op_strings = defaultdict(list)
+        self.op_records = defaultdict(list)
+
+        # Distinct values of read-only base signals, and the offset of
+        # each read-only base signal's value (see _pool_readonly_signals).
+        self.readonly_pool = np.zeros(0, dtype='float64')
+        self.readonly_values = {}
+        self.readonly_offsets = {}
         self.probe_strings = defaultdict(list)
         self.all_probe_strings = []
 
@@ -337,17 +865,33 @@ class MpiModel(Model):
         # Used to query the C++ simulator for probe data
         self.probe_keys = {}
 
+        # probe -> shape of the probed signal
+        self.probe_shapes = {}
+
         self._object_context = [None]
 
         # high-level nengo object -> list of operators
         # stores the operators implementing each high-level object
         self.object_ops = defaultdict(list)
 
+        # high-level nengo object -> sorted list of component indices
+        # stores the components that each object's operators went to
+        self.object_components = {}
+
         self._mpi_tag = 0
 
         self.pyfunc_ops = []
         self.probed_connections = set()
 
+        # Only used by the processes of a distributed build (see
+        # build_distributed). The components owned by the process, the
+        # objects it has to build, the position of every object in the
+        # network, and the tag of every connection crossing components.
+        self._owned = None
+        self._needed = None
+        self._object_indices = None
+        self._mpi_tags = None
+
     def __str__(self):
         return "MpiModel: %s" % self.label
 
@@ -365,24 +909,36 @@ class MpiModel(Model):
     def get_value(self, signal):
         if not self.runnable:
             return 0
-        value = self.native_sim.get_signal_value(make_key(signal))
+        value = self.native_sim.get_signal_value(self.make_key(signal))
         return value
 
     def build(self, obj, *args, **kwargs):
         """ Overrides Model.build """
+        if (self._needed is not None and
+                isinstance(obj, (Ensemble, Node, Connection, Probe)) and
+                obj in self._object_indices and obj not in self._needed):
+            return None
+
         return MpiBuilder.build(self, obj, *args, **kwargs)
 
-    def _next_mpi_tag(self):
-        """ Return the next mpi tag.
+    def _next_mpi_tag(self, conn):
+        """ Return the mpi tag for a Connection.
 
         Used to ensure that each Connection which straddles a component
         boundary uses a unique tag.
 
         """
+        if self._mpi_tags is not None:
+            return self._mpi_tags[conn]
+
         mpi_tag = self._mpi_tag
         self._mpi_tag += 1
         return mpi_tag
 
+    def _owns(self, component):
+        """ Return whether this process finalizes ``component``. """
+        return self._owned is None or component in self._owned
+
     def push_object(self, obj):
         """ Push high-level object onto context stack.
 
@@ -408,6 +964,11 @@ class MpiModel(Model):
         """
         obj = self._object_context.pop()
 
+        if self._object_indices is not None:
+            self._key_object(obj)
+
+        self.object_components[obj] = self._components_of(obj)
+
         if not isinstance(obj, Connection):
             component = self.assignments[obj]
             self.assign_ops(component, self.object_ops[obj])
@@ -436,12 +997,15 @@ class MpiModel(Model):
             pre_ops, post_ops = split_connection(
                 self.object_ops[conn], signal, is_update)
 
-            tag = self._next_mpi_tag()
+            tag = self._next_mpi_tag(conn)
+
+            if self._owns(pre_component):
+                self.send_signals[pre_component].append(
+                    (signal, tag, post_component))
 
-            self.send_signals[pre_component].append(
-                (signal, tag, post_component))
-            self.recv_signals[post_component].append(
-                (signal, tag, pre_component, is_update))
+            if self._owns(post_component):
+                self.recv_signals[post_component].append(
+                    (signal, tag, pre_component, is_update))
 
             self.assign_ops(pre_component, pre_ops)
             self.assign_ops(post_component, post_ops)
@@ -461,7 +1025,7 @@ class MpiModel(Model):
 
         """
         base = signal.base
-        key = make_key(base)
+        key = self.make_key(base)
 
         if key not in self.base_signals[component]:
             logger.debug(
@@ -482,6 +1046,9 @@ class MpiModel(Model):
             Operators to assign to the component.
 
         """
+        if not self._owns(component):
+            return
+
         # Add all base signals needed by the ops
         for op in ops:
             for signal in op.all_signals:
@@ -489,6 +1056,35 @@ class MpiModel(Model):
 
         self.component_ops[component].extend(ops)
 
+    def _key_object(self, obj):
+        """ Key an object that has finished building, and its signals.
+
+        Used by distributed builds, in which each process builds only some
+        of the objects. Keys are handed out from a range that depends only
+        on the position of ``obj`` in the network, in an order that depends
+        only on how ``obj`` was built, so that the signals of an object get
+        the same keys in every process that builds it. Objects created
+        by builders (e.g. the connections of probes on ensembles) share the
+        range of the network object being built.
+
+        """
+        scope = obj
+        context = reversed(self._object_context)
+
+        while scope not in self._object_indices:
+            scope = next(context)
+
+        self.make_key.set_scope(self._object_indices[scope])
+        self.make_key(obj)
+
+        for signal in self.sig[obj].values():
+            if signal is not None:
+                self.make_key(signal.base)
+
+        for op in self.object_ops[obj]:
+            for signal in op.all_signals:
+                self.make_key(signal.base)
+
     def add_op(self, op):
         """ Add operator to model. Overrides Model.add_op.
 
@@ -498,526 +1094,1460 @@ class MpiModel(Model):
         """
         self.object_ops[self._object_context[-1]].append(op)
 
-    def finalize_build(self):
+    def finalize_build(self, network_file=None):
         """ Finalize the build step.
 
         Called once the MpiBuilder has finished running. Finalizes
-        operators and probes, converting them to strings. Then writes
-        all relevant information (signals, ops and probes for each component)
-        to an HDF5 file. Then, if self.native_sim is not None (so we want to
-        create a runnable MPI simulator), calls self.native_sim.load_file which
-        tells the C++ code to load the HDF5 file we have just written and
-        create a working simulator.
+        operators and probes, converting them to records. If self.native_sim
+        is None, then writes all relevant information (signals, ops and probes
+        for each component) to an HDF5 file. If self.shard is True, components
+        are instead written to separate files (see self._write_shards).
+        Otherwise, the same information is handed directly to the C++ code
+        through self.native_sim.load_components, which creates a working
+        simulator without going through the file system.
+
+        Components are finalized one at a time, and the operators, signals
+        and records of each component are released as soon as it has been
+        written or handed to the C++ code (see self._release_component).
+        The finalized network therefore cannot be written out afterwards.
+
+        Parameters
+        ----------
+        network_file: string
+            Name of a file to also write the network to, when the network
+            is handed directly to the C++ code (e.g. for a build cache).
 
         """
-        all_ops = list(chain(
-            *[self.component_ops[component]
-              for component in range(self.n_components)]))
-        dg = operator_depencency_graph(all_ops)
-        global_ordering = [
-            op for op in toposort(dg) if hasattr(op, 'make_step')]
-        self.global_ordering = {op: i for i, op in enumerate(global_ordering)}
-        self.global_ordering[self.time_update] = -1
+        self.order_operators()
+
+        # From here on, every operator is held by the components that it
+        # was assigned to.
+        self.object_ops.clear()
 
-        # Needs to be done after calling operator_depencency_graph.
-        # operator_depencency_graph will detect an error caused
-        # by multiple sets of the time signal
+        # The time update is shared by all components, so it is added
+        # after ordering, and given an index that puts it first.
         for component in range(self.n_components):
             self.assign_ops(component, [self.time_update])
 
-        self._finalize_ops()
         self._finalize_probes()
+        self._pool_readonly_signals()
+
+        if self.shard:
+            self._write_shards()
+        elif self.native_sim is None:
+            self.write_network(self.save_file)
+        elif network_file is None:
+            self._load_components(self._finalized_components())
+        else:
+            with create_network_file(network_file) as save_file:
+                self._store_network(save_file)
+                self._load_components(self._stored_components(
+                    save_file, self._finalized_components()))
 
-        with h5.File(self.save_file, 'w') as save_file:
-            save_file.attrs['dt'] = self.dt
-            save_file.attrs['n_components'] = self.n_components
+        self.readonly_pool = np.zeros(0, dtype='float64')
+        self.readonly_values = {}
 
-            for component in range(self.n_components):
-                component_group = save_file.create_group(str(component))
-
-                # base signals
-                base_signals = self.base_signals[component]
-                signal_dset = component_group.create_dataset(
-                    'signals', (self.total_base_signal_size[component],),
-                    dtype='float64', compression=self.h5_compression)
-
-                offset = 0
-                for base in base_signals.values():
-                    shape = base.shape
-                    stride = base.elemstrides
-
-                    if base.ndim == 2:
-                        # assert that the signal is contiguous
-                        assert ((stride[1] == 1 and shape[1] == stride[0]) or
-                                (stride[0] == 1 and shape[0] == stride[1]))
-
-                        if base.elemstrides[1] == 1:
-                            values = base.initial_value.flatten()
-                        elif base.elemstrides[0] == 1:
-                            values = base.initial_value.T.flatten()
-                        else:
-                            raise ValueError(
-                                "Received a signal with strides that "
-                                "nengo_mpi cannot handle. Signal "
-                                "was %s, stride is %s." % (
-                                    base, base.elemstrides))
-
-                        signal_dset[offset:offset+base.size] = values
-                    else:
-                        # assert that the signal is contiguous
-                        assert base.ndim == 0 or stride[0] == 1
-                        signal_dset[
-                            offset:offset+base.size] = base.initial_value
+    def _load_components(self, components):
+        """ Hand finalized components to the C++ code, then finish the build.
+
+        Parameters
+        ----------
+        components: iterable of ComponentData
+            The components of the network, which the C++ code takes one at
+            a time.
 
-                    offset += base.size
+        """
+        self.native_sim.load_components(
+            self.dt, self.all_probe_strings, components)
 
-                # base signal keys
-                base_signal_keys = np.array([
-                    long(key) for key in base_signals.keys()])
+        for op in self.pyfunc_ops:
+            self.native_sim.create_PyFunc(op, self.global_ordering[op])
 
-                component_group.create_dataset(
-                    'signal_keys', data=base_signal_keys,
-                    dtype='int64', compression=self.h5_compression)
+        self.native_sim.finalize_build()
 
-                # base signal shapes
-                base_signal_shapes = np.array([
-                    pad(sig.shape) for sig in base_signals.values()])
+    def _finalized_components(self, with_readonly_signals=True):
+        """ Finalize the components one at a time.
 
-                component_group.create_dataset(
-                    'signal_shapes', data=base_signal_shapes,
-                    dtype='int64', compression=self.h5_compression)
+        Yields the ComponentData of each component in turn. The Python
+        build state of a component is released before its ComponentData is
+        yielded, so only the component being handed on is held in memory.
 
-                # base signal strides
-                base_signal_strides = np.array([
-                    pad(sig.elemstrides) for sig in base_signals.values()])
+        """
+        for component in range(self.n_components):
+            self._finalize_component_ops(component)
+            data = self._component_data(component, with_readonly_signals)
+            self._release_component(component)
 
-                component_group.create_dataset(
-                    'signal_strides', data=base_signal_strides,
-                    dtype='int64', compression=self.h5_compression)
+            yield data
 
-                # base signal labels
-                if self.debug:
-                    signal_labels = [sig.name for sig in base_signals.values()]
-                else:
-                    signal_labels = ['' for sig in base_signals.values()]
+    def _stored_components(self, save_file, components):
+        """ Store each ComponentData in ``save_file``, then yield it. """
+        for data in components:
+            component_group = save_file.create_group(str(data.component))
+            self._store_component(component_group, data, shared_readonly=True)
 
-                store_string_list(
-                    component_group, 'signal_labels', signal_labels,
-                    compression=self.h5_compression)
+            yield data
 
-                # operators
-                op_strings = self.op_strings[component]
-                store_string_list(
-                    component_group, 'operators', op_strings,
-                    compression=self.h5_compression)
+    def _release_component(self, component):
+        """ Release the Python build state of a finalized component.
 
-                # probes
-                probe_strings = self.probe_strings[component]
-                store_string_list(
-                    component_group, 'probes', probe_strings,
-                    compression=self.h5_compression)
+        Drops the component's operators, base signals, operator records and
+        probe strings, along with the operators' entries in the ordering,
+        and releases the base signals from make_key. Signals that are no
+        longer used by any operator or component are then freed, unless
+        the Model's ``sig`` or ``params`` refer to them. PyFunc operators
+        are kept, since they are created in the C++ code once all
+        components have been loaded.
 
-            store_string_list(
-                save_file, 'probe_info', self.all_probe_strings,
-                compression=self.h5_compression)
+        """
+        for op in self.component_ops.pop(component, ()):
+            if (op is not self.time_update and
+                    type(op) is not builder.node.SimPyFunc):
+                self.global_ordering.pop(op, None)
+
+        for base in self.base_signals.pop(component, {}).values():
+            self.make_key.release(base)
+
+        self.op_records.pop(component, None)
+        self.probe_strings.pop(component, None)
+
+    def order_operators(self):
+        """ Find an ordering for the operators on all components.
+
+        Creates the MpiSend and MpiRecv operators for the signals in
+        send_signals and recv_signals and adds them to their components.
+        Each component is then ordered using a dependency graph built from
+        its own operators (see nengo_mpi.ordering). An MpiSend comes after
+        all ops on its component that write to the sent signal, and an
+        MpiRecv before all ops on its component that read the received
+        signal. When a signal is not updated, the MpiRecv also has to wait
+        for the MpiSend on the other component within the same time step.
+        When it is updated, the ops that update it have to wait for all ops
+        on the receiving component that read it, since components that
+        share an MPI process skip the MpiSend and MpiRecv and access the
+        signal directly. These are the only constraints between components.
+
+        The result is stored in self.global_ordering, which maps each
+        operator to its index.
+
+        """
+        # The graphs consist of a great many small objects, none of which
+        # are part of reference cycles. Disabling the cyclic garbage
+        # collector while they are created avoids repeated full
+        # collections, which would make this pass quadratic.
+        gc_enabled = gc.isenabled()
+        gc.disable()
 
-        if self.native_sim is not None:
-            self.native_sim.load_network(self.save_file)
-            os.remove(self.save_file)
+        try:
+            self._order_operators()
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _order_operators(self):
+        graphs = []
+        sends, recvs, updated = {}, {}, {}
+
+        for component in range(self.n_components):
+            graph, c_sends, c_recvs, c_updated = (
+                self._component_graph(component))
+
+            graphs.append(graph)
+            sends.update(c_sends)
+            recvs.update(c_recvs)
+            updated.update(c_updated)
+
+        links = _component_links(sends, recvs, updated)
+
+        self.global_ordering = schedule(graphs, links)
+        self.global_ordering[self.time_update] = -1
+
+    def _component_graph(self, component):
+        """ Build the dependency graph for the ops of a single component.
+
+        Also creates the component's MpiSend and MpiRecv operators, and adds
+        them to the graph. Returns the graph, followed by the entries for
+        the component's sends, recvs and updated signals in the arguments
+        of ``_component_links``.
+
+        """
+        sends, recvs, updated = {}, {}, {}
+
+        component_ops = self.component_ops[component]
+
+        index = OpIndex(component_ops)
+        graph = index.dependency_graph(component_ops)
+
+        for sig, tag, dst in self.send_signals[component]:
+            mpi_send = MpiSend(dst, tag, sig)
+
+            writers = index.writers(sig)
+            assert len(writers) > 0
+
+            graph.add_op(mpi_send)
+            graph.add_edges(writers, [mpi_send])
+            component_ops.append(mpi_send)
+            sends[tag] = (component, mpi_send, writers)
+
+        for sig, tag, src, is_update in self.recv_signals[component]:
+            mpi_recv = MpiRecv(src, tag, sig, is_update)
+
+            readers = index.readers(sig)
+            assert len(readers) > 0
+
+            graph.add_op(mpi_recv)
+            graph.add_edges([mpi_recv], readers)
+            component_ops.append(mpi_recv)
+
+            if is_update:
+                updated[tag] = graph.add_barrier(readers)
+            else:
+                recvs[tag] = (component, mpi_recv)
+
+        return graph, sends, recvs, updated
+
+    def write_network(self, filename):
+        """ Finalize the network, writing it to a single network file.
+
+        Components are finalized and written one at a time, and released
+        once written (see finalize_build).
+
+        """
+        with create_network_file(filename, self.aligned) as save_file:
+            self._store_network(save_file)
+
+            for data in self._stored_components(
+                    save_file,
+                    self._finalized_components(with_readonly_signals=False)):
+                pass
+
+    def _store_network(self, save_file):
+        """ Store the manifest and the read-only pool of a network file. """
+        self._store_manifest(save_file)
 
-            for op in self.pyfunc_ops:
-                self.native_sim.create_PyFunc(op, self.global_ordering[op])
+        save_file.create_dataset(
+            'readonly_signals', data=self.readonly_pool,
+            dtype=PRECISION_DTYPES[self.precision],
+            compression=self._readonly_compression())
 
+    def load_network(self, filename, probe_keys, probe_shapes):
+        """ Take the finalized network from an existing network file.
+
+        Used in place of building and finalizing the network, e.g. when the
+        network is found in a BuildCache. If the model is runnable, the C++
+        simulator loads the file, otherwise the file is copied to save_file.
+
+        Parameters
+        ----------
+        filename: string
+            Network file to load.
+        probe_keys: dict
+            Maps each probe in the network to its key in the file.
+        probe_shapes: dict
+            Maps each probe in the network to the shape of the probed signal.
+
+        """
+        self.probe_keys.update(probe_keys)
+        self.probe_shapes.update(probe_shapes)
+        self.probes.extend(probe_keys)
+
+        if self.native_sim is None:
+            shutil.copyfile(filename, self.save_file)
+        else:
+            self.native_sim.load_network(filename)
             self.native_sim.finalize_build()
 
-    def _finalize_ops(self):
-        """ Finalize operators.
+    def shard_filename(self, component):
+        """ Return the name of the file storing a component, when sharding. """
+        base, ext = os.path.splitext(self.save_file)
+        return "%s.%d%s" % (base, component, ext)
+
+    def _write_shards(self):
+        """ Write each component to its own file, then write the manifest.
 
-        Main jobs are to create MpiSend and MpiRecv operators based on
-        send_signals and recv_signals, and to turn all ops belonging to
-        each component into strings, which are then stored in
-        self.op_strings. PyFunc ops are the only exception, as it is
-        not generally possible to encode an arbitrary python function
-        (and all its context) as a string.
+        Components are finalized and written in parallel by a pool of
+        processes, or one after the other by this process if it has
+        initialized MPI and so cannot be forked. The manifest lists the
+        shards relative to the directory containing it.
 
         """
+        global _sharding_model
+
+        if mpi_initialized():
+            for component in range(self.n_components):
+                self._write_shard(component)
+        else:
+            _sharding_model = self
+
+            try:
+                pool = fork_context('write shards').Pool(
+                    min(cpu_count(), self.n_components))
+
+                try:
+                    pool.map(_write_shard, range(self.n_components))
+                finally:
+                    pool.close()
+                    pool.join()
+            finally:
+                _sharding_model = None
+
         for component in range(self.n_components):
-            send_signals = self.send_signals[component]
-            recv_signals = self.recv_signals[component]
-            component_ops = self.component_ops[component]
+            self._release_component(component)
 
-            written_by, read_by = defaultdict(list), defaultdict(list)
+        self._write_shard_manifest()
 
-            # Store info to make the next two loops faster
-            for i, op in enumerate(component_ops):
-                for sig in op.updates + op.incs + op.sets:
-                    written_by[sig].append(op)
+    def _write_shard_manifest(self, record=None):
+        """ Write the manifest listing the shards of the network.
 
-                for sig in op.reads:
-                    read_by[sig].append(op)
+        If a BuildRecord is supplied, it is stored alongside, so that later
+        builds of the network can reuse the shards (see build_distributed).
 
-            for sig, tag, dst in send_signals:
-                mpi_send = MpiSend(dst, tag, sig)
+        """
+        with h5.File(self.save_file, 'w') as save_file:
+            self._store_manifest(save_file)
 
-                assert len(written_by[sig]) > 0
+            shards = [
+                os.path.basename(self.shard_filename(component))
+                for component in range(self.n_components)]
 
-                # Put the send after the last op that writes to the signal.
-                max_index = max(
-                    self.global_ordering[op] for op in written_by[sig])
-                self.global_ordering[mpi_send] = max_index + 0.5
-                component_ops.append(mpi_send)
+            store_string_list(
+                save_file, 'shards', shards, compression=self.h5_compression)
+
+            if record is not None:
+                store_build_record(
+                    save_file.create_group('build_record'), record,
+                    compression=self.h5_compression)
 
-            for sig, tag, src, is_update in recv_signals:
-                mpi_recv = MpiRecv(src, tag, sig, is_update)
+    def _write_shard(self, component):
+        """ Finalize a single component and write it to its shard. """
+        self._finalize_component_ops(component)
+        data = self._component_data(component)
+        self._release_component(component)
+
+        shard_filename = self.shard_filename(component)
+
+        with create_network_file(shard_filename, self.aligned) as shard_file:
+            component_group = shard_file.create_group(str(component))
+            self._store_component(
+                component_group, data, shared_readonly=False)
+
+    def build_distributed(self, network, n_processes, incremental=False):
+        """ Build a network using several processes, and write its shards.
+
+        Used in place of building with the MpiBuilder and calling
+        finalize_build. Requires ``shard=True``. Components are divided
+        between forked processes, and each process builds only the objects
+        that it needs for its components: the objects assigned to them,
+        the connections into and out of them, and the objects at the other
+        end of those connections. Each process then finalizes and writes
+        the shards for its components, so the full network is never held
+        by any one process. Since a process that has initialized MPI cannot
+        be forked, this cannot be used when running with
+        ``python -m nengo_mpi``.
+
+        The processes agree on signal keys, since keys only depend on the
+        position of each object in the network (see _key_object), and on
+        the tags of connections crossing components, which are assigned
+        here beforehand. The dependency graphs of the components are
+        scheduled together by this process (see nengo_mpi.ordering), as
+        are the offsets of read-only signals, so that components built by
+        different processes can share an MPI process.
+
+        If ``incremental`` is True, a BuildRecord is stored in the manifest.
+        If save_file already holds a network built that way, from a network
+        with the same objects in the same order, then only the components
+        affected by objects that changed since are built again (see
+        _affected_components). The shards of the other components are
+        reused, and only the indices of their operators in the ordering
+        are updated.
 
-                assert len(read_by[sig]) > 0
+        Parameters
+        ----------
+        network: nengo.Network
+            The network to build.
+        n_processes: int
+            Number of processes to build with. At most one process is used
+            per component.
+        incremental: bool
+            Whether to reuse the shards of an earlier build of the network.
 
-                # Put the recv in front of the first op that reads the signal.
-                min_index = min(
-                    self.global_ordering[op] for op in read_by[sig])
-                self.global_ordering[mpi_recv] = min_index - 0.5
-                component_ops.append(mpi_recv)
+        """
+        if not self.shard:
+            raise ValueError(
+                "Networks can only be built by several processes when "
+                "they are sharded.")
 
-            # Sort to make the ordering take effect.
-            op_order = sorted(
-                component_ops, key=self.global_ordering.__getitem__)
-            self.component_ops[component] = op_order
+        objects = list(_objects_in_build_order(network))
+        self._object_indices = dict((obj, i) for i, obj in enumerate(objects))
 
-            for op in op_order:
-                op_type = type(op)
+        self.object_components = dict(
+            (obj, self._components_of(obj)) for obj in objects)
 
-                if op_type == builder.node.SimPyFunc:
-                    if not self.runnable:
-                        raise BuildError(
-                            "Cannot create SimPyFunc operator "
-                            "when saving to file.")
+        previous = None
+        if incremental:
+            digests = object_digests(network, objects)
+            header = self._build_record_header(objects)
+            previous = self._load_build_record(header)
 
-                    if component != 0:
-                        raise BuildError(
-                            "Cannot add SimPyFunc operator on any "
-                            "component other than component 0.")
+        if previous is None:
+            components = list(range(self.n_components))
+            self._mpi_tags = {}
+        else:
+            components = self._affected_components(objects, digests, previous)
 
-                    self.pyfunc_ops.append(op)
-                else:
-                    op_string = self._op_to_string(op)
+            # Connections keep their tags, which the reused shards refer to.
+            self._mpi_tags = dict(
+                (objects[index], tag)
+                for index, tag in six.iteritems(previous.mpi_tags)
+                if len(self.object_components[objects[index]]) > 1)
 
-                    if op_string:
-                        logger.debug(
-                            "Component %d: Adding operator with string: %s",
-                            component, op_string)
+            print("    Reusing %d of %d components..." % (
+                self.n_components - len(components), self.n_components))
 
-                        self.op_strings[component].append(op_string)
+        reused = dict(
+            (c, previous.components[c]) for c in range(self.n_components)
+            if c not in components)
 
-    def signal_to_string(self, signal):
-        return _signal_to_string(signal, self.debug)
+        next_tag = max(list(self._mpi_tags.values()) + [-1]) + 1
+        for obj in objects:
+            if (len(self.object_components[obj]) > 1 and
+                    obj not in self._mpi_tags):
+                self._mpi_tags[obj] = next_tag
+                next_tag += 1
 
-    def _op_to_string(self, op):
-        """ Convert operator to a string.
+        n_processes = min(n_processes, len(components))
+        context = fork_context('build a network')
 
-        Such strings will eventually be used to construct operators in the
-        C++ code. See the MpiSimulatorChunk::add_op for details on how these
-        strings are used by the C++ code.
+        global _building_model, _building_network
+        _building_model, _building_network = self, network
 
-        We also prepend the operator's index in the global ordering of
-        operators, which allows the C++ code to put the operators in
-        the appropriate order.
+        processes, conns = [], []
+
+        try:
+            for i in range(n_processes):
+                owned = components[i::n_processes]
+
+                parent_conn, child_conn = context.Pipe()
+                process = context.Process(
+                    target=_build_part, args=(child_conn, owned))
+                process.start()
+                child_conn.close()
+
+                processes.append(process)
+                conns.append(parent_conn)
+
+            parts = [_recv_part(conn) for conn in conns]
+
+            exported = dict(
+                (c, c_record.exported)
+                for c, c_record in six.iteritems(reused))
+            component_digests = dict(
+                (c, c_record.digests)
+                for c, c_record in six.iteritems(reused))
+
+            for part_exported, part_digests in parts:
+                exported.update(part_exported)
+                component_digests.update(part_digests)
+
+            orderings, offsets = self._schedule_parts(
+                exported, component_digests,
+                previous.readonly_offsets if previous is not None else None)
+
+            for conn, (part_exported, part_digests) in zip(conns, parts):
+                conn.send((
+                    dict((c, orderings[c]) for c in part_exported),
+                    dict((d, offsets[d])
+                         for c in part_digests
+                         for d, size in part_digests[c])))
+
+            results = [_recv_part(conn) for conn in conns]
+
+            for process in processes:
+                process.join()
+        finally:
+            _building_model, _building_network = None, None
+
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        for component, c_record in six.iteritems(reused):
+            self._reindex_shard(
+                component, c_record.ordering, orderings[component])
+
+        for probes, stats in results:
+            add_cache_stats(self.decoder_cache, *stats)
+
+        probe_info = sorted(
+            [info for probes, stats in results for info in probes] +
+            [tuple(info) for c_record in reused.values()
+             for info in c_record.probes],
+            key=lambda info: info[0])
+
+        for index, probe_key, shape, probe_string in probe_info:
+            probe = objects[index]
+
+            self.probes.append(probe)
+            self.probe_keys[probe] = probe_key
+            self.probe_shapes[probe] = tuple(shape)
+            self.all_probe_strings.append(probe_string)
+
+        record = None
+        if incremental:
+            record = BuildRecord(
+                header,
+                [[digest, self.object_components[obj]]
+                 for obj, digest in zip(objects, digests)],
+                dict((self._object_indices[conn], tag)
+                     for conn, tag in six.iteritems(self._mpi_tags)),
+                dict((digest, (offsets[digest], size))
+                     for c in component_digests
+                     for digest, size in component_digests[c]),
+                dict((c, ComponentRecord(
+                    exported[c], orderings[c], component_digests[c],
+                    [list(info) for info in probe_info
+                     if self.assignments[objects[info[0]]] == c]))
+                     for c in range(self.n_components)))
+
+        self._write_shard_manifest(record)
+
+    def _components_of(self, obj):
+        """ Return the components that the ops of ``obj`` are assigned to. """
+        if isinstance(obj, Connection):
+            return sorted(set([
+                int(self.assignments[obj.pre_obj]),
+                int(self.assignments[obj.post_obj])]))
+
+        return [int(self.assignments[obj])]
+
+    def _build_record_header(self, objects):
+        """ Return what must match for a BuildRecord to be reused. """
+        structure = hashlib.sha1(
+            repr([type(obj).__name__ for obj in objects]).encode('utf-8'))
+
+        return [
+            __version__, nengo.__version__, NETWORK_FORMAT_VERSION,
+            repr(float(self.dt)), self.n_components, structure.hexdigest(),
+            self.aligned, self.tabulate_steps, self.tabulate_error,
+            self.precision]
+
+    def _load_build_record(self, header):
+        """ Return the BuildRecord in save_file, if there is a usable one.
+
+        Returns None if save_file does not exist, was not built with
+        ``incremental=True``, or was built from a network with different
+        objects, dt, number of components, alignment, tabulation or
+        precision.
 
         """
-        op_type = type(op)
-        signal_to_string = self.signal_to_string
+        if not os.path.isfile(self.save_file):
+            return None
 
-        if op_type == builder.operator.TimeUpdate:
-            op_args = [
-                "TimeUpdate", signal_to_string(op.step),
-                signal_to_string(op.time), self.dt]
+        try:
+            with h5.File(self.save_file, 'r') as save_file:
+                if 'build_record' not in save_file:
+                    return None
 
-        elif op_type == builder.operator.Reset:
-            op_args = ["Reset", signal_to_string(op.dst), op.value]
+                record = load_build_record(save_file['build_record'])
+        except (IOError, KeyError, ValueError):
+            logger.warning(
+                "Could not read the build record in %s.", self.save_file)
+            return None
 
-        elif op_type == builder.operator.Copy:
-            op_args = [
-                "Copy", signal_to_string(op.dst), signal_to_string(op.src)]
+        if record.header != header:
+            logger.info(
+                "Not reusing the components in %s, as they were built from "
+                "a different network.", self.save_file)
+            return None
 
-        elif op_type == builder.operator.SlicedCopy:
-            try:
-                seq_src = list(iter(op.src_slice))
-                start_src, stop_src, step_src = 0, 0, 0
-            except:
-                seq_src = []
-                if op.src_slice == Ellipsis:
-                    start_src, stop_src, step_src = 0, op.src.size, 1
-                else:
-                    start_src, stop_src, step_src = (
-                        op.src_slice.indices(op.src.size))
+        return record
 
-            try:
-                seq_dst = list(iter(op.dst_slice))
-                start_dst, stop_dst, step_dst = 0, 0, 0
-            except:
-                seq_dst = []
-                if op.dst_slice == Ellipsis:
-                    start_dst, stop_dst, step_dst = 0, op.dst.size, 1
+    def _affected_components(self, objects, digests, previous):
+        """ Find the components that have to be built again.
+
+        An object is stale if its hash (see nengo_mpi.cache.object_digests)
+        or the components it is assigned to differ from ``previous``, or
+        if it is a Connection or Probe whose target is stale. Every
+        component that holds ops of a stale object, now or in the previous
+        build, is affected, as is any component whose shard is missing. If
+        a Network changed, its seed may have changed the seeds of all the
+        objects it contains, so all components are affected.
+
+        """
+        stale = set()
+
+        for obj, digest, (old_digest, old_components) in zip(
+                objects, digests, previous.objects):
+
+            if (digest != old_digest or
+                    self.object_components[obj] != old_components):
+
+                if isinstance(obj, Network):
+                    return list(range(self.n_components))
+
+                stale.add(obj)
+
+        changed = True
+        while changed:
+            changed = False
+
+            for obj in objects:
+                if isinstance(obj, Connection):
+                    targets = [obj.pre_obj, obj.post_obj]
+                elif isinstance(obj, Probe):
+                    targets = [obj.obj]
                 else:
-                    start_dst, stop_dst, step_dst = (
-                        op.dst_slice.indices(op.dst.size))
+                    continue
 
-            op_args = [
-                "SlicedCopy",
-                signal_to_string(op.src), signal_to_string(op.dst),
-                start_src, stop_src, step_src, start_dst, stop_dst, step_dst,
-                str(seq_src), str(seq_dst), int(op.inc)]
+                if (obj not in stale and
+                        any(_base_object(t) in stale for t in targets)):
+                    stale.add(obj)
+                    changed = True
 
-        elif op_type == builder.operator.DotInc:
-            op_args = [
-                "DotInc", signal_to_string(op.A), signal_to_string(op.X),
-                signal_to_string(op.Y)]
+        affected = set()
+        for obj in stale:
+            affected.update(self.object_components[obj])
+            affected.update(previous.objects[self._object_indices[obj]][1])
 
-        elif op_type == builder.operator.ElementwiseInc:
-            op_args = [
-                "ElementwiseInc", signal_to_string(op.A),
-                signal_to_string(op.X), signal_to_string(op.Y)]
+        affected.update(
+            c for c in range(self.n_components)
+            if not os.path.isfile(self.shard_filename(c)))
 
-        elif op_type == builder.neurons.SimNeurons:
-            n_neurons = op.J.size
-            neuron_type = type(op.neurons)
+        return sorted(affected)
 
-            if neuron_type is LIF:
-                tau_ref = op.neurons.tau_ref
-                tau_rc = op.neurons.tau_rc
-                min_voltage = op.neurons.min_voltage
+    def _reindex_shard(self, component, old_ordering, new_ordering):
+        """ Update the indices of the operators in a reused shard.
 
-                voltage_signal = signal_to_string(op.states[0])
-                ref_time_signal = signal_to_string(op.states[1])
+        ``old_ordering`` and ``new_ordering`` give the index of each op in
+        the component's exported dependency graph in the build that wrote
+        the shard, and in the current build, respectively.
 
-                op_args = [
-                    "LIF", n_neurons, tau_rc, tau_ref, min_voltage, self.dt,
-                    signal_to_string(op.J), signal_to_string(op.output),
-                    voltage_signal, ref_time_signal]
+        """
+        if np.array_equal(old_ordering, new_ordering):
+            return
 
-            elif neuron_type is LIFRate:
-                tau_ref = op.neurons.tau_ref
-                tau_rc = op.neurons.tau_rc
-                op_args = [
-                    "LIFRate", n_neurons, tau_rc, tau_ref,
-                    signal_to_string(op.J), signal_to_string(op.output)]
+        order = np.argsort(old_ordering)
+        old_sorted = old_ordering[order]
 
-            elif neuron_type is AdaptiveLIF:
-                tau_n = op.neurons.tau_n
-                inc_n = op.neurons.inc_n
+        with h5.File(self.shard_filename(component), 'r+') as shard_file:
+            op_group = shard_file[str(component)]['operators']
 
-                tau_rc = op.neurons.tau_rc
-                tau_ref = op.neurons.tau_ref
+            for type_group in op_group.values():
+                index = type_group['index'][()]
 
-                min_voltage = op.neurons.min_voltage
+                # The time update is not part of the graph, and stays first.
+                in_graph = index >= 0
+                positions = np.searchsorted(old_sorted, index[in_graph])
+                index[in_graph] = new_ordering[order[positions]]
 
-                voltage_signal = signal_to_string(op.states[0])
-                ref_time_signal = signal_to_string(op.states[1])
-                adaptation = signal_to_string(op.states[2])
+                type_group['index'][...] = index
 
-                op_args = [
-                    "AdaptiveLIF", n_neurons, tau_n, inc_n, tau_rc, tau_ref,
-                    min_voltage, self.dt, signal_to_string(op.J),
-                    signal_to_string(op.output), voltage_signal,
-                    ref_time_signal, adaptation]
+    def _schedule_parts(self, exported, digests, previous_offsets=None):
+        """ Order the ops of all components, and place read-only values.
 
-            elif neuron_type is AdaptiveLIFRate:
-                tau_n = op.neurons.tau_n
-                inc_n = op.neurons.inc_n
+        Parameters
+        ----------
+        exported: dict
+            Maps each component to its exported dependency graph (see
+            _build_part).
+        digests: dict
+            Maps each component to the (hash, size) of each distinct
+            read-only value it uses.
+        previous_offsets: dict
+            Maps the hash of each read-only value placed by an earlier
+            build, whose shards are being reused, to its (offset, size).
+            These values keep their offsets, and other values are placed
+            after all of them.
+
+        Returns
+        -------
+        orderings: dict
+            Maps each component to the indices of its ops in the ordering,
+            with the ops in the order of the exported graph.
+        offsets: dict
+            Maps each read-only value's hash to its offset in the pool.
 
-                tau_rc = op.neurons.tau_rc
-                tau_ref = op.neurons.tau_ref
+        """
+        graphs = {}
+        sends, recvs, updated = {}, {}, {}
 
-                adaptation = signal_to_string(op.states[0])
+        for component, c_exported in six.iteritems(exported):
+            n_ops, n_barriers, edges, keys, c_sends, c_recvs, c_updated = (
+                c_exported)
 
-                op_args = [
-                    "AdaptiveLIFRate", n_neurons, tau_n, inc_n,
-                    tau_rc, tau_ref, self.dt, signal_to_string(op.J),
-                    signal_to_string(op.output), adaptation]
+            ops = [(component, i) for i in range(n_ops)]
+            graph, nodes = DependencyGraph.from_export(
+                ops, n_barriers, edges, keys)
+            graphs[component] = graph
 
-            elif neuron_type is RectifiedLinear:
-                op_args = [
-                    "RectifiedLinear", n_neurons, signal_to_string(op.J),
-                    signal_to_string(op.output)]
+            for tag, (send, writers) in six.iteritems(c_sends):
+                sends[tag] = (
+                    component, nodes[send], [nodes[w] for w in writers])
 
-            elif neuron_type is Sigmoid:
-                op_args = [
-                    "Sigmoid", n_neurons, op.neurons.tau_ref,
-                    signal_to_string(op.J), signal_to_string(op.output)]
+            for tag, recv in six.iteritems(c_recvs):
+                recvs[tag] = (component, nodes[recv])
 
-            elif neuron_type is Izhikevich:
-                tau_recovery = op.neurons.tau_recovery
-                coupling = op.neurons.coupling
-                reset_voltage = op.neurons.reset_voltage
-                reset_recovery = op.neurons.reset_recovery
+            for tag, barrier in six.iteritems(c_updated):
+                updated[tag] = nodes[barrier]
 
-                voltage = signal_to_string(op.states[0])
-                recovery = signal_to_string(op.states[1])
+        ordering = schedule(
+            [graphs[c] for c in range(self.n_components)],
+            _component_links(sends, recvs, updated))
 
-                op_args = [
-                    "Izhikevich", n_neurons, tau_recovery, coupling,
-                    reset_voltage, reset_recovery, self.dt,
-                    signal_to_string(op.J), signal_to_string(op.output),
-                    voltage, recovery]
+        orderings = dict(
+            (c, np.array([ordering[op] for op in graphs[c].ops]))
+            for c in range(self.n_components))
+
+        offsets = {}
+        pool_size = 0
+
+        for digest, (offset, size) in six.iteritems(previous_offsets or {}):
+            offsets[digest] = offset
+            pool_size = max(pool_size, offset + size)
+
+        for component in range(self.n_components):
+            for digest, size in digests[component]:
+                if digest not in offsets:
+                    offsets[digest] = pool_size
+                    pool_size += size
+
+        return orderings, offsets
+
+    def _build_part(self, network, conn, owned):
+        """ Build and write the components owned by one build process.
 
+        Runs in a forked process. Communicates with the parent process,
+        running build_distributed, through the connection ``conn``.
+
+        """
+        try:
+            self._owned = set(owned)
+            self._needed = self._needed_objects()
+
+            n_hits, n_misses = cache_stats(self.decoder_cache)
+
+            MpiBuilder.build(self, network)
+
+            # Writes any newly cached decoders to the cache's index. The
+            # index is locked while being written, so that all the build
+            # processes can share the decoder cache.
+            self.decoder_cache.shrink()
+
+            self.object_ops.clear()
+
+            graphs, exported = {}, {}
+            for component in owned:
+                graph, sends, recvs, updated = (
+                    self._component_graph(component))
+
+                ids, edges, keys = graph.export()
+                graphs[component] = graph
+                exported[component] = (
+                    len(graph.ops), len(ids) - len(graph.ops), edges, keys,
+                    dict((tag, (ids[s], [ids[w] for w in writers]))
+                         for tag, (c, s, writers) in six.iteritems(sends)),
+                    dict((tag, ids[r])
+                         for tag, (c, r) in six.iteritems(recvs)),
+                    dict((tag, ids[b])
+                         for tag, b in six.iteritems(updated)))
+
+            for component in owned:
+                self.assign_ops(component, [self.time_update])
+
+            digests, values = self._readonly_digests(owned)
+
+            component_digests = {}
+            for component in owned:
+                used = OrderedDict(
+                    (digests[key], None)
+                    for key in self.base_signals[component] if key in digests)
+                component_digests[component] = [
+                    (digest, values[digest].size) for digest in used]
+
+            conn.send(('ok', (exported, component_digests)))
+
+            orderings, offsets = conn.recv()
+
+            self.global_ordering = {self.time_update: -1}
+            for component, graph in six.iteritems(graphs):
+                self.global_ordering.update(
+                    zip(graph.ops, orderings[component]))
+
+            self._set_readonly_offsets(digests, values, offsets)
+            self._finalize_probes()
+
+            for component in owned:
+                self._write_shard(component)
+
+            stats = cache_stats(self.decoder_cache)
+
+            conn.send(('ok', ([
+                (self._object_indices[probe], self.probe_keys[probe],
+                 self.probe_shapes[probe], probe_string)
+                for probe, probe_string in zip(
+                    self.probes, self.all_probe_strings)],
+                (stats[0] - n_hits, stats[1] - n_misses))))
+        except Exception:
+            conn.send(('error', traceback.format_exc()))
+
+    def _needed_objects(self):
+        """ Find the objects needed to build the owned components. """
+        needed = set()
+        stack = []
+
+        for obj in self._object_indices:
+            if isinstance(obj, Connection):
+                owned = (
+                    self._owns(self.assignments[obj.pre_obj]) or
+                    self._owns(self.assignments[obj.post_obj]))
+            elif isinstance(obj, Network):
+                continue
             else:
-                raise NotImplementedError(
-                    'nengo_mpi cannot handle neurons of type ' +
-                    str(neuron_type))
+                owned = self._owns(self.assignments[obj])
 
-        elif op_type == builder.processes.SimProcess:
-            process_type = type(op.process)
+            if owned:
+                stack.append(obj)
 
-            if isinstance(op.process, LinearFilter):
+        while stack:
+            obj = stack.pop()
 
-                shape_in = op.input.shape if op.input is not None else (0,)
-                shape_out = op.output.shape if op.output is not None else (0,)
+            if obj in needed:
+                continue
 
-                rng = op.process.get_rng(np.random)
-                step = op.process.make_step(
-                    shape_in, shape_out, self.dt, rng=rng)
+            needed.add(obj)
 
-                den = step.den
-                num = step.num
+            if isinstance(obj, Connection):
+                stack.append(_base_object(obj.pre_obj))
+                stack.append(_base_object(obj.post_obj))
+            elif isinstance(obj, Probe):
+                stack.append(_base_object(obj.obj))
 
-                if len(num) == 1 and len(den) == 0:
-                    op_args = [
-                        "NoDenSynapse", signal_to_string(op.input),
-                        signal_to_string(op.output), num[0]]
-                elif len(num) == 1 and len(den) == 1:
-                    op_args = [
-                        "SimpleSynapse", signal_to_string(op.input),
-                        signal_to_string(op.output), den[0], num[0]]
-                else:
-                    op_args = [
-                        "Synapse", signal_to_string(op.input),
-                        signal_to_string(op.output),
-                        ",".join(map(str, num)),
-                        ",".join(map(str, den))]
-
-            elif isinstance(op.process, Triangle):
-                shape_in = op.input.shape if op.input is not None else (0,)
-                shape_out = op.output.shape if op.output is not None else (0,)
-
-                rng = op.process.get_rng(np.random)
-                f = op.process.make_step(shape_in, shape_out,
-                                         self.dt, rng=rng)
-
-                closures = get_closures(f)
-                n0 = closures['n0']
-                ndiff = closures['ndiff']
-                x = closures['x']
-                n_taps = x.maxlen
+        return needed
 
-                op_args = [
-                    "TriangleSynapse", signal_to_string(op.input),
-                    signal_to_string(op.output), n0, ndiff, n_taps]
+    def _store_manifest(self, save_file):
+        """ Store information about the network as a whole. """
+        save_file.attrs['dt'] = self.dt
+        save_file.attrs['n_components'] = self.n_components
+        save_file.attrs['format_version'] = NETWORK_FORMAT_VERSION
 
-            elif process_type is WhiteNoise:
-                assert type(op.process.dist) is nengo.dists.Gaussian
-                mean = op.process.dist.mean
-                std = op.process.dist.std
-                do_scale = op.process.scale
-                inc = op.mode == 'inc'
+        store_string_list(
+            save_file, 'probe_info', self.all_probe_strings,
+            compression=self.h5_compression)
 
-                op_args = [
-                    "WhiteNoise", signal_to_string(op.output),
-                    float(mean), float(std), int(do_scale), int(inc),
-                    self.dt]
-
-            elif process_type is WhiteSignal:
-                rng = op.process.get_rng(np.random)
-                f = op.process.make_step(
-                    (0,), op.output.shape, self.dt, rng=rng)
-                closures = get_closures(f)
-                assert closures['dt'] == self.dt
-                coefs = closures['signal']
+    def _component_data(self, component, with_readonly_signals=True):
+        """ Collect signals, operators and probes for a single component.
 
-                op_args = [
-                    "WhiteSignal", ndarray_to_string(coefs),
-                    signal_to_string(op.output),
-                    signal_to_string(op.t), self.dt]
-
-            elif process_type is PresentInput:
-                rng = op.process.get_rng(np.random)
-                f = op.process.make_step(
-                    (0,), op.output.shape, self.dt, rng=rng)
-                closures = get_closures(f)
-                assert closures['dt'] == self.dt
-                inputs = closures['inputs']
-                presentation_time = closures['presentation_time']
+        Parameters
+        ----------
+        component: int
+            Index of the component to collect.
+        with_readonly_signals: bool
+            Whether to collect the values of the read-only signals used by
+            the component. Not needed when the component is stored in a
+            file alongside the whole read-only pool.
 
-                op_args = [
-                    "PresentInput", ndarray_to_string(inputs),
-                    signal_to_string(op.output),
-                    signal_to_string(op.t), presentation_time, self.dt]
-
-            elif process_type in [FilteredNoise, BrownNoise]:
-                raise NotImplementedError(
-                    'nengo_mpi cannot handle processes of '
-                    'type %s' % str(process_type))
+        Returns
+        -------
+        ComponentData
+
+        """
+        base_signals = self.base_signals[component]
+
+        signal_readonly = np.array(
+            [key in self.readonly_offsets for key in base_signals],
+            dtype='uint8')
+
+        signal_offsets = np.zeros(len(base_signals), dtype='int64')
+        mutable_values = []
+        readonly_entries = {}
+
+        # Mutable signals are laid out in the order that the component's
+        # operators first access them, so that signals used together are
+        # stored together. The C++ code keeps this layout in its arena.
+        indices = dict((key, i) for i, key in enumerate(base_signals))
+        layout = OrderedDict()
+
+        for op in self.component_ops[component]:
+            for sig in chain(op.sets, op.incs, op.reads, op.updates):
+                key = self.make_key(sig.base)
+                if key in indices:
+                    layout[key] = None
+
+        for key in base_signals:
+            layout[key] = None
+
+        offset = 0
+        for key in layout:
+            i, base = indices[key], base_signals[key]
+
+            if signal_readonly[i]:
+                signal_offsets[i] = self.readonly_offsets[key]
+                readonly_entries[signal_offsets[i]] = base.size
+            else:
+                signal_offsets[i] = offset
+                mutable_values.append(signal_values(base))
+                offset += base.size
+
+        signals = (
+            np.concatenate(mutable_values) if mutable_values
+            else np.zeros(0, dtype='float64'))
+
+        if with_readonly_signals and readonly_entries:
+            readonly_signals = np.concatenate([
+                self.readonly_values[o] for o in sorted(readonly_entries)])
+        else:
+            readonly_signals = np.zeros(0, dtype='float64')
+
+        signal_keys = np.array(
+            [long(key) for key in base_signals.keys()], dtype='int64')
+
+        signal_shapes = np.array(
+            [pad(sig.shape) for sig in base_signals.values()],
+            dtype='int64').reshape(-1, 2)
+
+        signal_strides = np.array(
+            [pad(sig.elemstrides) for sig in base_signals.values()],
+            dtype='int64').reshape(-1, 2)
+
+        if self.debug:
+            signal_labels = [sig.name for sig in base_signals.values()]
+        else:
+            signal_labels = ['' for sig in base_signals.values()]
+
+        op_tables, op_data = make_op_tables(self.op_records[component])
+
+        return ComponentData(
+            component, signals, signal_keys, signal_shapes, signal_strides,
+            signal_labels, signal_offsets, signal_readonly, readonly_signals,
+            op_tables, op_data, list(self.probe_strings[component]))
+
+    def _pool_readonly_signals(self):
+        """ Store each distinct read-only base signal once.
+
+        Read-only base signals with identical values (e.g. the constants
+        ZERO and ONE, which every component has, or the encoders of
+        ensembles built with the same seed) are identified by a hash of
+        their values. Each distinct value is stored once, in
+        self.readonly_pool, and self.readonly_offsets maps the key of each
+        read-only base signal to the offset of its value in the pool.
+
+        """
+        digests, values = self._readonly_digests(range(self.n_components))
+
+        offsets = {}
+        pool_size = 0
+
+        for digest, value in six.iteritems(values):
+            offsets[digest] = pool_size
+            pool_size += value.size
+
+        self._set_readonly_offsets(digests, values, offsets)
+
+        self.readonly_pool = (
+            np.concatenate(list(values.values())) if values
+            else np.zeros(0, dtype='float64'))
+
+        total_size = sum(
+            base.size for component in range(self.n_components)
+            for base in self.base_signals[component].values()
+            if base.readonly)
+
+        # Signals are stored with the precision of the simulation.
+        itemsize = np.dtype(PRECISION_DTYPES[self.precision]).itemsize
+
+        logger.info(
+            "Read-only signals: %d bytes before deduplication, "
+            "%d bytes after.", itemsize * total_size, itemsize * pool_size)
+
+    def _readonly_digests(self, components):
+        """ Identify the read-only base signals used by ``components``.
+
+        Returns
+        -------
+        digests: dict
+            Maps the key of each read-only base signal to a hash of its
+            value.
+        values: OrderedDict
+            Maps each distinct hash to the corresponding value, in the
+            order in which the values were first seen.
+
+        """
+        digests = {}
+        values = OrderedDict()
+
+        for component in components:
+            for key, base in six.iteritems(self.base_signals[component]):
+                if not base.readonly or key in digests:
+                    continue
+
+                value = signal_values(base)
+                digest = hashlib.sha1(value.tobytes()).digest()
+
+                digests[key] = digest
+                values.setdefault(digest, value)
+
+        return digests, values
+
+    def _set_readonly_offsets(self, digests, values, offsets):
+        """ Place read-only values at the given offsets in the pool.
+
+        ``digests`` and ``values`` are as returned by _readonly_digests,
+        and ``offsets`` maps each hash to an offset in the pool.
+
+        """
+        self.readonly_offsets = dict(
+            (key, offsets[digest]) for key, digest in six.iteritems(digests))
+        self.readonly_values = dict(
+            (offsets[digest], value)
+            for digest, value in six.iteritems(values))
+
+    def _store_component(self, component_group, data, shared_readonly):
+        """ Store signals, operators and probes for a single component.
+
+        Parameters
+        ----------
+        component_group: h5py.Group
+            Group to store the component in.
+        data: ComponentData
+            The component to store.
+        shared_readonly: bool
+            Whether the file stores the whole read-only pool, shared by all
+            components. If not, the read-only signals used by the component
+            are stored in the component's group.
+
+        """
+        dtype = PRECISION_DTYPES[self.precision]
+
+        component_group.create_dataset(
+            'signals', data=data.signals, dtype=dtype,
+            compression=self.h5_compression)
+
+        names = [
+            'signal_keys', 'signal_shapes', 'signal_strides',
+            'signal_offsets', 'signal_readonly']
+
+        for name in names:
+            component_group.create_dataset(
+                name, data=getattr(data, name),
+                compression=self.h5_compression)
+
+        if not shared_readonly:
+            component_group.create_dataset(
+                'readonly_signals', data=data.readonly_signals, dtype=dtype,
+                compression=self._readonly_compression())
+
+        store_string_list(
+            component_group, 'signal_labels', data.signal_labels,
+            compression=self.h5_compression)
+
+        store_op_data(
+            component_group, data.op_tables, data.op_data,
+            compression=self.h5_compression, dtype=dtype)
+
+        store_string_list(
+            component_group, 'probes', data.probes,
+            compression=self.h5_compression)
+
+    def _readonly_compression(self):
+        """ Return the compression to store read-only signals with.
+
+        Aligned files store read-only signals uncompressed, since only
+        contiguous, unfiltered datasets can be mapped into memory.
+
+        """
+        return None if self.aligned else self.h5_compression
+
+    def _finalize_component_ops(self, component):
+        """ Finalize the operators belonging to a single component.
+
+        Parameters
+        ----------
+        component: int
+            Index of the component to finalize.
+
+        """
+        # Sort to make the ordering take effect.
+        op_order = sorted(
+            self.component_ops[component],
+            key=self.global_ordering.__getitem__)
+        self.component_ops[component] = op_order
+
+        for op in op_order:
+            op_type = type(op)
+
+            if op_type == builder.node.SimPyFunc:
+                if not self.runnable:
+                    raise BuildError(
+                        "Cannot create SimPyFunc operator "
+                        "when saving to file.")
+
+                if component != 0:
+                    raise BuildError(
+                        "Cannot add SimPyFunc operator on any "
+                        "component other than component 0.")
+
+                self.pyfunc_ops.append(op)
             else:
-                raise NotImplementedError(
-                    'Unrecognized process type: %s.' % str(process_type))
+                op_record = self._op_to_record(op)
+
+                if op_record:
+                    logger.debug(
+                        "Component %d: Adding operator with record: %s",
+                        component, op_record)
+
+                    self.op_records[component].append(op_record)
+
+    def signal_to_string(self, signal):
+        return _signal_to_string(signal, self.make_key, self.debug)
+
+    def signal_to_record(self, signal):
+        return _signal_to_record(signal, self.make_key)
+
+    def _op_to_record(self, op):
+        """ Convert operator to a record.
+
+        Records have the form (op_type, index, args), where the kinds of
+        the entries in args are given by OP_SIGNATURES[op_type]. They are
+        grouped by type and stored as tables (see store_op_tables), and
+        eventually used to construct operators in the C++ code. See
+        MpiSimulatorChunk::add_op for details on how they are used.
+
+        index is the operator's index in the global ordering of operators,
+        which allows the C++ code to put the operators in the
+        appropriate order.
+
+        Returns None for operators that have no native counterpart.
+
+        """
+        op_type = type(op)
+
+        if op_type == builder.operator.TimeUpdate:
+            op_args = [
+                "TimeUpdate", self.signal_to_record(op.step),
+                self.signal_to_record(op.time), self.dt]
+
+        elif op_type == builder.operator.Reset:
+            op_args = ["Reset", self.signal_to_record(op.dst), op.value]
+
+        elif op_type == builder.operator.Copy:
+            op_args = [
+                "Copy", self.signal_to_record(op.dst),
+                self.signal_to_record(op.src)]
+
+        elif op_type == builder.operator.SlicedCopy:
+            op_args = self._sliced_copy_args(op)
+
+        elif op_type == builder.operator.DotInc:
+            op_args = [
+                "DotInc", self.signal_to_record(op.A),
+                self.signal_to_record(op.X), self.signal_to_record(op.Y)]
+
+        elif op_type == builder.operator.ElementwiseInc:
+            op_args = [
+                "ElementwiseInc", self.signal_to_record(op.A),
+                self.signal_to_record(op.X), self.signal_to_record(op.Y)]
+
+        elif op_type == builder.neurons.SimNeurons:
+            op_args = self._neuron_args(op)
+
+        elif op_type == builder.processes.SimProcess:
+            op_args = self._process_args(op)
 
         elif op_type == builder.learning_rules.SimBCM:
             op_args = [
-                "BCM", signal_to_string(op.pre_filtered),
-                signal_to_string(op.post_filtered),
-                signal_to_string(op.theta),
-                signal_to_string(op.delta),
+                "BCM", self.signal_to_record(op.pre_filtered),
+                self.signal_to_record(op.post_filtered),
+                self.signal_to_record(op.theta),
+                self.signal_to_record(op.delta),
                 op.learning_rate, self.dt]
 
         elif op_type == builder.learning_rules.SimOja:
             op_args = [
-                "Oja", signal_to_string(op.pre_filtered),
-                signal_to_string(op.post_filtered),
-                signal_to_string(op.weights),
-                signal_to_string(op.delta),
+                "Oja", self.signal_to_record(op.pre_filtered),
+                self.signal_to_record(op.post_filtered),
+                self.signal_to_record(op.weights),
+                self.signal_to_record(op.delta),
                 op.learning_rate, self.dt, op.beta]
 
         elif op_type == builder.learning_rules.SimVoja:
             op_args = [
-                "Voja", signal_to_string(op.pre_decoded),
-                signal_to_string(op.post_filtered),
-                signal_to_string(op.scaled_encoders),
-                signal_to_string(op.delta),
-                signal_to_string(op.learning_signal),
-                ",".join(map(str, op.scale)),
+                "Voja", self.signal_to_record(op.pre_decoded),
+                self.signal_to_record(op.post_filtered),
+                self.signal_to_record(op.scaled_encoders),
+                self.signal_to_record(op.delta),
+                self.signal_to_record(op.learning_signal),
+                op.scale,
                 op.learning_rate, self.dt]
 
         elif op_type == builder.operator.PreserveValue:
             logger.debug(
                 "Skipping PreserveValue, operator: %s, signal: %s",
-                str(op.dst), signal_to_string(op.dst))
+                str(op.dst), self.signal_to_record(op.dst))
 
             op_args = []
 
         elif op_type == MpiSend:
-            signal_key = make_key(op.signal.base)
-            op_args = ["MpiSend", op.dst, op.tag, signal_key]
+            op_args = [
+                "MpiSend", op.dst, op.tag,
+                self.signal_to_record(op.signal.base)]
 
         elif op_type == MpiRecv:
-            signal_key = make_key(op.signal.base)
             op_args = [
-                "MpiRecv", op.src, op.tag, signal_key, int(op.is_update)]
+                "MpiRecv", op.src, op.tag,
+                self.signal_to_record(op.signal.base), int(op.is_update)]
 
         elif op_type == SpaunStimulusOperator:
-            output = signal_to_string(op.output)
+            output = self.signal_to_record(op.output)
+            time = self.signal_to_record(self.time)
 
             op_args = [
-                "SpaunStimulus", output, self.time, op.stimulus_sequence,
+                "SpaunStimulus", output, time, op.stimulus_sequence,
                 op.present_interval, op.present_blanks, op.identifier]
 
+        elif op_type == StreamInputOperator:
+            op_args = [
+                "StreamInput", self.signal_to_record(op.output),
+                self.signal_to_record(op.step),
+                [op.filename, op.dataset or ""], op.read_ahead]
+
+        elif op_type == SimTabulated:
+            op_args = [
+                "Tabulated", op.table, self.signal_to_record(op.output),
+                self.signal_to_record(op.step)]
+
+        elif op_type == SimInterpolate:
+            op_args = [
+                "Interpolate", op.table, self.signal_to_record(op.input),
+                self.signal_to_record(op.output), op.radius, op.n_points]
+
         else:
             raise NotImplementedError(
                 "nengo_mpi cannot handle operator of "
                 "type %s" % str(op_type))
 
-        if op_args:
-            op_args = [self.global_ordering[op]] + op_args
+        if not op_args:
+            return None
+
+        return (op_args[0], self.global_ordering[op], op_args[1:])
+
+    def _sliced_copy_args(self, op):
+        """ Return the arguments of the record of a SlicedCopy. """
+        try:
+            seq_src = list(iter(op.src_slice))
+            start_src, stop_src, step_src = 0, 0, 0
+        except:
+            seq_src = []
+            if op.src_slice == Ellipsis:
+                start_src, stop_src, step_src = 0, op.src.size, 1
+            else:
+                start_src, stop_src, step_src = (
+                    op.src_slice.indices(op.src.size))
+
+        try:
+            seq_dst = list(iter(op.dst_slice))
+            start_dst, stop_dst, step_dst = 0, 0, 0
+        except:
+            seq_dst = []
+            if op.dst_slice == Ellipsis:
+                start_dst, stop_dst, step_dst = 0, op.dst.size, 1
+            else:
+                start_dst, stop_dst, step_dst = (
+                    op.dst_slice.indices(op.dst.size))
+
+        op_args = [
+            "SlicedCopy",
+            self.signal_to_record(op.src), self.signal_to_record(op.dst),
+            start_src, stop_src, step_src, start_dst, stop_dst, step_dst,
+            seq_src, seq_dst, int(op.inc)]
+
+        return op_args
 
-        op_string = OP_DELIM.join(map(str, op_args))
-        return op_string
+    def _neuron_args(self, op):
+        """ Return the arguments of the record of a SimNeurons. """
+        n_neurons = op.J.size
+        neuron_type = type(op.neurons)
+
+        if neuron_type is LIF:
+            tau_ref = op.neurons.tau_ref
+            tau_rc = op.neurons.tau_rc
+            min_voltage = op.neurons.min_voltage
+
+            voltage_signal = self.signal_to_record(op.states[0])
+            ref_time_signal = self.signal_to_record(op.states[1])
+
+            op_args = [
+                "LIF", n_neurons, tau_rc, tau_ref, min_voltage, self.dt,
+                self.signal_to_record(op.J), self.signal_to_record(op.output),
+                voltage_signal, ref_time_signal]
+
+        elif neuron_type is LIFRate:
+            tau_ref = op.neurons.tau_ref
+            tau_rc = op.neurons.tau_rc
+            op_args = [
+                "LIFRate", n_neurons, tau_rc, tau_ref,
+                self.signal_to_record(op.J), self.signal_to_record(op.output)]
+
+        elif neuron_type is AdaptiveLIF:
+            tau_n = op.neurons.tau_n
+            inc_n = op.neurons.inc_n
+
+            tau_rc = op.neurons.tau_rc
+            tau_ref = op.neurons.tau_ref
+
+            min_voltage = op.neurons.min_voltage
+
+            voltage_signal = self.signal_to_record(op.states[0])
+            ref_time_signal = self.signal_to_record(op.states[1])
+            adaptation = self.signal_to_record(op.states[2])
+
+            op_args = [
+                "AdaptiveLIF", n_neurons, tau_n, inc_n, tau_rc, tau_ref,
+                min_voltage, self.dt, self.signal_to_record(op.J),
+                self.signal_to_record(op.output), voltage_signal,
+                ref_time_signal, adaptation]
+
+        elif neuron_type is AdaptiveLIFRate:
+            tau_n = op.neurons.tau_n
+            inc_n = op.neurons.inc_n
+
+            tau_rc = op.neurons.tau_rc
+            tau_ref = op.neurons.tau_ref
+
+            adaptation = self.signal_to_record(op.states[0])
+
+            op_args = [
+                "AdaptiveLIFRate", n_neurons, tau_n, inc_n,
+                tau_rc, tau_ref, self.dt, self.signal_to_record(op.J),
+                self.signal_to_record(op.output), adaptation]
+
+        elif neuron_type is RectifiedLinear:
+            op_args = [
+                "RectifiedLinear", n_neurons, self.signal_to_record(op.J),
+                self.signal_to_record(op.output)]
+
+        elif neuron_type is Sigmoid:
+            op_args = [
+                "Sigmoid", n_neurons, op.neurons.tau_ref,
+                self.signal_to_record(op.J), self.signal_to_record(op.output)]
+
+        elif neuron_type is Izhikevich:
+            tau_recovery = op.neurons.tau_recovery
+            coupling = op.neurons.coupling
+            reset_voltage = op.neurons.reset_voltage
+            reset_recovery = op.neurons.reset_recovery
+
+            voltage = self.signal_to_record(op.states[0])
+            recovery = self.signal_to_record(op.states[1])
+
+            op_args = [
+                "Izhikevich", n_neurons, tau_recovery, coupling,
+                reset_voltage, reset_recovery, self.dt,
+                self.signal_to_record(op.J), self.signal_to_record(op.output),
+                voltage, recovery]
+
+        else:
+            raise NotImplementedError(
+                'nengo_mpi cannot handle neurons of type ' +
+                str(neuron_type))
+
+        return op_args
+
+    def _process_args(self, op):
+        """ Return the arguments of the record of a SimProcess. """
+        process_type = type(op.process)
+
+        if isinstance(op.process, LinearFilter):
+
+            shape_in = op.input.shape if op.input is not None else (0,)
+            shape_out = op.output.shape if op.output is not None else (0,)
+
+            rng = op.process.get_rng(np.random)
+            step = op.process.make_step(
+                shape_in, shape_out, self.dt, rng=rng)
+
+            den = step.den
+            num = step.num
+
+            if len(num) == 1 and len(den) == 0:
+                op_args = [
+                    "NoDenSynapse", self.signal_to_record(op.input),
+                    self.signal_to_record(op.output), num[0]]
+            elif len(num) == 1 and len(den) == 1:
+                op_args = [
+                    "SimpleSynapse", self.signal_to_record(op.input),
+                    self.signal_to_record(op.output), den[0], num[0]]
+            else:
+                op_args = [
+                    "Synapse", self.signal_to_record(op.input),
+                    self.signal_to_record(op.output),
+                    num, den]
+
+        elif isinstance(op.process, Triangle):
+            shape_in = op.input.shape if op.input is not None else (0,)
+            shape_out = op.output.shape if op.output is not None else (0,)
+
+            rng = op.process.get_rng(np.random)
+            f = op.process.make_step(shape_in, shape_out,
+                                     self.dt, rng=rng)
+
+            closures = get_closures(f)
+            n0 = closures['n0']
+            ndiff = closures['ndiff']
+            x = closures['x']
+            n_taps = x.maxlen
+
+            op_args = [
+                "TriangleSynapse", self.signal_to_record(op.input),
+                self.signal_to_record(op.output), n0, ndiff, n_taps]
+
+        elif process_type is WhiteNoise:
+            assert type(op.process.dist) is nengo.dists.Gaussian
+            mean = op.process.dist.mean
+            std = op.process.dist.std
+            do_scale = op.process.scale
+            inc = op.mode == 'inc'
+
+            op_args = [
+                "WhiteNoise", self.signal_to_record(op.output),
+                float(mean), float(std), int(do_scale), int(inc),
+                self.dt]
+
+        elif process_type is WhiteSignal:
+            rng = op.process.get_rng(np.random)
+            f = op.process.make_step(
+                (0,), op.output.shape, self.dt, rng=rng)
+            closures = get_closures(f)
+            assert closures['dt'] == self.dt
+            coefs = closures['signal']
+
+            op_args = [
+                "WhiteSignal", coefs,
+                self.signal_to_record(op.output),
+                self.signal_to_record(op.t), self.dt]
+
+        elif process_type is PresentInput:
+            rng = op.process.get_rng(np.random)
+            f = op.process.make_step(
+                (0,), op.output.shape, self.dt, rng=rng)
+            closures = get_closures(f)
+            assert closures['dt'] == self.dt
+            inputs = closures['inputs']
+            presentation_time = closures['presentation_time']
+
+            op_args = [
+                "PresentInput", inputs,
+                self.signal_to_record(op.output),
+                self.signal_to_record(op.t), presentation_time, self.dt]
+
+        elif process_type in [FilteredNoise, BrownNoise]:
+            raise NotImplementedError(
+                'nengo_mpi cannot handle processes of '
+                'type %s' % str(process_type))
+        else:
+            raise NotImplementedError(
+                'Unrecognized process type: %s.' % str(process_type))
+
+        return op_args
 
     def _finalize_probes(self):
         """ Finalize probes.
@@ -1031,10 +2561,11 @@ class MpiModel(Model):
                 1 if probe.sample_every is None
                 else probe.sample_every / self.dt)
 
-            probe_key = make_key(probe)
+            probe_key = self.make_key(probe)
             self.probe_keys[probe] = probe_key
 
             signal = self.sig[probe]['in']
+            self.probe_shapes[probe] = signal.shape
             signal_string = self.signal_to_string(signal)
 
             component = self.assignments[probe]
@@ -1045,9 +2576,14 @@ class MpiModel(Model):
                 component, str(signal), probe_key,
                 signal_string, period)
 
+            # The default string for unlabeled probes contains their id.
+            name = (
+                str(probe) if getattr(probe, 'label', None) is not None
+                else "<Probe %d>" % probe_key)
+
             probe_string = PROBE_DELIM.join(
                 str(i) for i
-                in [component, probe_key, signal_string, period, str(probe)])
+                in [component, probe_key, signal_string, period, name])
 
             self.probe_strings[component].append(probe_string)
             self.all_probe_strings.append(probe_string)
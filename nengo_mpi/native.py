@@ -21,31 +21,73 @@ def native_sim_available():
     return _native_sim_available
 
 
+def mpi_initialized():
+    """ Return whether the native simulator has initialized MPI.
+
+    This is the case when running with ``python -m nengo_mpi``. Most MPI
+    implementations do not support forking a process once it has
+    initialized MPI.
+
+    """
+    return _native_sim_available and mpi_sim.is_initialized()
+
+
 class NativeSimulator(object):
     """ A python wrapper for the native simulator implemented by mpi_sim.so.
 
     Talks to the native simulator using ctypes.
 
+    Parameters
+    ----------
+    sig: dict
+        The signals of the model being simulated.
+    make_key: KeyMaker
+        Assigns keys to signals.
+    batch_size: int
+        Number of copies of the network to simulate side by side.
+
     """
-    def __init__(self, sig):
+    def __init__(self, sig, make_key, batch_size=1):
         if not native_sim_available():
             raise Exception(
                 "Created NativeSimulator, but mpi_sim.so is not available.")
 
         self.sig = sig
+        self.make_key = make_key
 
         self.callbacks = []
         self.time_buffers = []
         self.input_buffers = []
         self.output_buffers = []
 
-        mpi_sim.create_simulator()
+        self.batch_size = batch_size
+
+        mpi_sim.create_simulator(batch_size)
 
     def load_network(self, filename):
         assert isinstance(filename,
                           six.text_type if six.PY3 else six.binary_type)
         mpi_sim.load_network(filename)
 
+    def load_components(self, dt, probe_strings, components):
+        """ Load a network directly from memory.
+
+        Parameters
+        ----------
+        dt: float
+            Step length.
+        probe_strings: list of strings
+            Info about all probes in the network.
+        components: iterable of nengo_mpi.model.ComponentData
+            Signals, operators and probes for every component. Components
+            that are owned by other MPI processes are sent to them by the
+            native simulator. Each component is copied by the native
+            simulator before the next one is taken, so ``components`` can
+            be a generator that creates them one at a time.
+
+        """
+        mpi_sim.load_components(float(dt), list(probe_strings), components)
+
     def finalize_build(self):
         mpi_sim.finalize_build()
 
@@ -78,32 +120,36 @@ class NativeSimulator(object):
     def create_PyFunc(self, op, index):
         fn = op.fn
 
+        # The native simulator reads and writes the buffers directly, so
+        # they must have the type of its signals.
+        dtype = mpi_sim.dtype
+
         # Handle time.
         pass_time = op.t is not None
         t_signal = op.t if pass_time else self.sig['common'][0]
-        t_string = signal_to_string(t_signal)
-        time_buffer = np.array([22.0])
+        t_string = signal_to_string(t_signal, self.make_key)
+        time_buffer = np.array([22.0], dtype=dtype)
         self.time_buffers.append(time_buffer)
 
         # Handle input.
         pass_input = op.x is not None
         input_signal = op.x if pass_input else self.sig['common'][0]
-        input_string = signal_to_string(input_signal)
+        input_string = signal_to_string(input_signal, self.make_key)
         if not input_signal.shape:
-            input_buffer = np.array([0.0])
+            input_buffer = np.array([0.0], dtype=dtype)
         else:
-            input_buffer = input_signal.initial_value.copy()
+            input_buffer = input_signal.initial_value.astype(dtype)
         self.input_buffers.append(input_buffer)
 
         # Handle output.
         return_output = op.output is not None
         output_signal = (
             op.output if return_output else self.sig['common']['NULL'])
-        output_string = signal_to_string(output_signal)
+        output_string = signal_to_string(output_signal, self.make_key)
         if not output_signal:
-            output_buffer = np.array([0.0])
+            output_buffer = np.array([0.0], dtype=dtype)
         else:
-            output_buffer = output_signal.initial_value.copy()
+            output_buffer = output_signal.initial_value.astype(dtype)
         self.output_buffers.append(output_buffer)
 
         def py_func():
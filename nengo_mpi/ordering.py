@@ -0,0 +1,379 @@
+"""Ordering of operators within and across components.
+
+The operators assigned to each component are ordered using a dependency
+graph built from that component's operators alone. Components only
+constrain one another through the MpiSend and MpiRecv operators that carry
+signals across component boundaries, so those are the only points at which
+the per-component orderings have to be reconciled (see ``schedule``).
+
+"""
+from collections import defaultdict, deque, OrderedDict
+from itertools import chain
+
+import numpy as np
+
+from nengo.builder.neurons import SimNeurons
+from nengo.exceptions import BuildError
+from nengo.neurons import LIF
+from nengo.utils.simulator import validate_ops
+
+
+def group_key(op):
+    """ Return the key of the group of operators that ``op`` belongs to.
+
+    Operators with the same key that are ready to run at the same time are
+    ordered one after the other, so that the C++ simulator can run them as
+    a single operator (e.g. a LIFGroup). Returns None for operators that
+    are not grouped.
+
+    """
+    if type(op) is SimNeurons and type(op.neurons) is LIF:
+        neurons = op.neurons
+        return ('LIF', neurons.tau_rc, neurons.tau_ref, neurons.min_voltage)
+
+    return None
+
+
+class OpIndex(object):
+    """ Index from signals to the operators that access them.
+
+    Built once from a list of operators, after which all lookups are
+    dictionary accesses rather than scans over the operators.
+
+    Parameters
+    ----------
+    ops: list of Operator
+        Operators to index.
+
+    """
+    def __init__(self, ops):
+        self.sets = defaultdict(list)
+        self.incs = defaultdict(list)
+        self.reads = defaultdict(list)
+        self.updates = defaultdict(list)
+
+        # base signal -> views of the base accessed by the ops
+        self.views = defaultdict(OrderedDict)
+        self._aliases = {}
+
+        for op in ops:
+            for sig in op.sets:
+                self.sets[sig].append(op)
+
+            for sig in op.incs:
+                self.incs[sig].append(op)
+
+            for sig in op.reads:
+                self.reads[sig].append(op)
+
+            for sig in op.updates:
+                self.updates[sig].append(op)
+
+            for sig in chain(op.sets, op.incs, op.reads, op.updates):
+                self.views[sig.base][sig] = None
+
+    def writers(self, sig):
+        """ Return the ops that set, inc or update ``sig``. """
+        return (
+            self.sets.get(sig, []) + self.incs.get(sig, []) +
+            self.updates.get(sig, []))
+
+    def readers(self, sig):
+        """ Return the ops that read ``sig``. """
+        return self.reads.get(sig, [])
+
+    def aliases(self, sig):
+        """ Return the indexed views that may share memory with ``sig``.
+
+        The result includes ``sig`` itself.
+
+        """
+        aliases = self._aliases.get(sig)
+
+        if aliases is None:
+            views = self.views[sig.base]
+
+            if len(views) == 1:
+                aliases = [sig]
+            else:
+                aliases = [
+                    view for view in views if sig.may_share_memory(view)]
+
+            self._aliases[sig] = aliases
+
+        return aliases
+
+    def _accessors(self, sig, kinds):
+        ops = OrderedDict()
+        for alias in self.aliases(sig):
+            for kind in kinds:
+                for op in kind.get(alias, ()):
+                    ops[op] = None
+
+        return list(ops)
+
+    def dependency_graph(self, ops):
+        """ Return a DependencyGraph for ``ops``, the ops that were indexed.
+
+        Uses the same scheduling rules as the reference simulator: on any
+        block of memory, sets come before incs, which come before reads,
+        which come before updates.
+
+        """
+        validate_ops(self.sets, self.updates, self.incs)
+
+        graph = DependencyGraph(ops)
+
+        # -- incs depend on sets
+        for sig, post_ops in self.incs.items():
+            graph.add_edges(self._accessors(sig, [self.sets]), post_ops)
+
+        # -- reads depend on writes (sets and incs)
+        for sig, post_ops in self.reads.items():
+            graph.add_edges(
+                self._accessors(sig, [self.sets, self.incs]), post_ops)
+
+        # -- updates depend on reads, sets, and incs.
+        for sig, post_ops in self.updates.items():
+            graph.add_edges(
+                self._accessors(sig, [self.sets, self.incs, self.reads]),
+                post_ops)
+
+        return graph
+
+
+class _Barrier(object):
+    """ Graph node standing for the completion of a group of operators. """
+    __slots__ = ()
+
+
+class DependencyGraph(object):
+    """ Dependency graph for the operators of a single component.
+
+    When every op in a group ``pre`` has to come before every op in a group
+    ``post``, a single barrier node is inserted between the two groups
+    instead of adding an edge for each pair of ops. The size of the graph
+    is therefore linear in the number of signal accesses, rather than
+    quadratic in the number of ops accessing each signal.
+
+    Each op may also have a group key (see ``group_key``), which
+    ``schedule`` uses to order ops of the same group together.
+
+    Parameters
+    ----------
+    ops: list of Operator
+        The nodes of the graph.
+
+    """
+    def __init__(self, ops):
+        self.ops = list(OrderedDict.fromkeys(ops))
+        self.edges = defaultdict(list)
+        self.n_deps = defaultdict(int)
+        self.keys = {}
+
+        for op in self.ops:
+            self._add_key(op)
+
+    def _add_key(self, op):
+        key = group_key(op)
+        if key is not None:
+            self.keys[op] = key
+
+    def add_op(self, op):
+        self.ops.append(op)
+        self._add_key(op)
+
+    def add_barrier(self, pre):
+        """ Return a node that comes after every op in ``pre``. """
+        barrier = _Barrier()
+        self.add_edges(pre, [barrier])
+        return barrier
+
+    def add_edges(self, pre, post):
+        """ Make every op in ``pre`` come before every op in ``post``. """
+        if not pre or not post:
+            return
+
+        if len(pre) > 1 and len(post) > 1:
+            pre = [self.add_barrier(pre)]
+
+        for p in pre:
+            self.edges[p].extend(post)
+
+        for q in post:
+            self.n_deps[q] += len(pre)
+
+    def export(self):
+        """ Describe the graph in terms of node indices.
+
+        Used to send the graph to another process, which can rebuild it
+        with ``from_export`` without needing the operators themselves.
+
+        Returns
+        -------
+        ids: dict
+            Maps each node to its index. Ops are numbered in the order of
+            ``self.ops``, followed by the barriers.
+        edges: ndarray
+            Array of shape (n_edges, 2) holding the indices of the nodes
+            at either end of each edge.
+        keys: dict
+            Maps the index of each op that has a group key to the key.
+
+        """
+        ids = dict((op, i) for i, op in enumerate(self.ops))
+
+        for node, succs in self.edges.items():
+            for n in chain([node], succs):
+                if n not in ids:
+                    ids[n] = len(ids)
+
+        edges = np.array(
+            [(ids[node], ids[succ])
+             for node, succs in self.edges.items() for succ in succs],
+            dtype='int64').reshape(-1, 2)
+
+        keys = dict((ids[op], key) for op, key in self.keys.items())
+
+        return ids, edges, keys
+
+    @classmethod
+    def from_export(cls, ops, n_barriers, edges, keys=None):
+        """ Rebuild a graph described by ``export``.
+
+        Parameters
+        ----------
+        ops: list
+            Hashable objects standing in for the exported ops, in order.
+        n_barriers: int
+            Number of barriers in the exported graph.
+        edges: ndarray
+            Edges returned by ``export``.
+        keys: dict
+            Group keys returned by ``export``.
+
+        Returns
+        -------
+        graph: DependencyGraph
+        nodes: list
+            The nodes of the graph, indexed as in ``edges``.
+
+        """
+        graph = cls(ops)
+        nodes = graph.ops + [_Barrier() for i in range(n_barriers)]
+
+        for i, j in edges:
+            graph.edges[nodes[i]].append(nodes[j])
+            graph.n_deps[nodes[j]] += 1
+
+        for i, key in (keys or {}).items():
+            graph.keys[nodes[i]] = key
+
+        return graph, nodes
+
+
+def schedule(graphs, links):
+    """ Find a single ordering for the operators in several components.
+
+    Kahn's algorithm is run on each component's graph in turn. A component
+    is only put aside when all of its remaining ops are waiting, directly or
+    indirectly, on a node in another component that has not been scheduled
+    yet (e.g. an MpiRecv waiting on its matching MpiSend); it is picked up
+    again once that node has been scheduled. The result is a topological
+    ordering of all components taken together, so any components can share
+    an MPI process, and the ordering can never deadlock. Whenever an op with
+    a group key is ordered, the other ready ops of its component with the
+    same key are ordered right after it.
+
+    Parameters
+    ----------
+    graphs: list of DependencyGraph
+        Dependency graph for each component.
+    links: list of (node, int, Operator)
+        Each entry says that, within a time step, the operator in the
+        component with the given index has to wait for the node, which is
+        an operator or barrier in the graph of another component.
+
+    Returns
+    -------
+    ordering: dict
+        Maps each operator (i.e. each node that is not a barrier) to its
+        position in the ordering.
+
+    """
+    waiting = defaultdict(list)
+
+    for pre, component, post in links:
+        waiting[pre].append((component, post))
+        graphs[component].n_deps[post] += 1
+
+    ready = [deque() for graph in graphs]
+
+    # Ready ops of each component that have a group key, by key.
+    grouped = [defaultdict(list) for graph in graphs]
+
+    def make_ready(component, node):
+        ready[component].append(node)
+
+        key = graphs[component].keys.get(node)
+        if key is not None:
+            grouped[component][key].append(node)
+
+    for component, graph in enumerate(graphs):
+        for op in graph.ops:
+            if not graph.n_deps[op]:
+                make_ready(component, op)
+
+    active = deque(range(len(graphs)))
+    is_active = [True] * len(graphs)
+    ordering = {}
+
+    while active:
+        component = active.popleft()
+        is_active[component] = False
+
+        graph, queue = graphs[component], ready[component]
+
+        while queue:
+            node = queue.popleft()
+
+            if node in ordering:
+                # Already ordered along with the rest of its group.
+                continue
+
+            # All ready ops in the same group as node are ordered with it.
+            key = graph.keys.get(node)
+            group = [node] if key is None else grouped[component].pop(key)
+
+            for node in group:
+                if not isinstance(node, _Barrier):
+                    ordering[node] = len(ordering)
+
+                for other, post in waiting.get(node, ()):
+                    graphs[other].n_deps[post] -= 1
+
+                    if not graphs[other].n_deps[post]:
+                        make_ready(other, post)
+
+                        if other != component and not is_active[other]:
+                            active.append(other)
+                            is_active[other] = True
+
+                for succ in graph.edges.get(node, ()):
+                    graph.n_deps[succ] -= 1
+
+                    if not graph.n_deps[succ]:
+                        make_ready(component, succ)
+
+    n_ops = sum(len(graph.ops) for graph in graphs)
+    if len(ordering) < n_ops:
+        unordered = [
+            op for graph in graphs for op in graph.ops
+            if op not in ordering]
+
+        raise BuildError(
+            "Could not find an ordering for %d operators, the operator "
+            "dependencies contain a cycle. Operators involved include: %s." % (
+                len(unordered), unordered[:5]))
+
+    return ordering
@@ -68,7 +68,8 @@ def make_boundary_predicate(network, cross_at_updates=True, max_size=np.inf):
     return predicate
 
 
-def verify_assignments(network, assignments, cross_at_updates=True):
+def verify_assignments(
+        network, assignments, cross_at_updates=True, tabulated=()):
     """ Propagate the assignments given in ``assignments``.
 
     This is used when an assignment of objects to components is supplied
@@ -87,16 +88,20 @@ def verify_assignments(network, assignments, cross_at_updates=True):
         Whether to require that Connections crossing component boundaries
         contain an update operator (effectively requiring the Connection to
         have a synapse).
+    tabulated: collection
+        Objects whose functions are tabulated (see nengo_mpi.tabulate),
+        which need not be simulated on component 0.
 
     """
     n_components = max(assignments.values()) + 1
 
     can_cross_boundary = make_boundary_predicate(network, cross_at_updates)
-    propagate_assignments(network, assignments, can_cross_boundary)
+    propagate_assignments(
+        network, assignments, can_cross_boundary, tabulated)
 
     if n_components > 1:
         component0, cluster_graph = network_to_cluster_graph(
-            network, can_cross_boundary)
+            network, can_cross_boundary, tabulated=tabulated)
 
         evaluate_partition(
             network, n_components, assignments, cluster_graph,
@@ -167,7 +172,7 @@ class Partitioner(object):
             print("Defaulting to work-balanced partitioner")
             return work_balanced_partitioner
 
-    def partition(self, network):
+    def partition(self, network, tabulated=()):
         """
         Partition ``network`` using the partitioning function ``self.func``.
 
@@ -185,6 +190,9 @@ class Partitioner(object):
         ----------
         network: nengo.Network
             The network to partition.
+        tabulated: collection
+            Objects whose functions are tabulated (see nengo_mpi.tabulate),
+            which need not be simulated on component 0.
 
         Returns
         -------
@@ -210,7 +218,7 @@ class Partitioner(object):
         if self.n_components > 1:
             # component0 is also in the cluster graph
             component0, cluster_graph = network_to_cluster_graph(
-                network, can_cross_boundary)
+                network, can_cross_boundary, tabulated=tabulated)
 
             n_clusters = len(cluster_graph)
 
@@ -238,7 +246,8 @@ class Partitioner(object):
             for cluster, component in iteritems(cluster_assignments):
                 cluster.assign_to_component(object_assignments, component)
 
-        propagate_assignments(network, object_assignments, can_cross_boundary)
+        propagate_assignments(
+            network, object_assignments, can_cross_boundary, tabulated)
 
         if self.n_components > 1:
             evaluate_partition(
@@ -451,7 +460,7 @@ def neurons2ensemble(e):
 
 def network_to_cluster_graph(
         network, can_cross_boundary,
-        use_weights=True, merge_nengo_nodes=True):
+        use_weights=True, merge_nengo_nodes=True, tabulated=()):
     """ Create a cluster graph from a nengo Network.
 
     A cluster graph is a graph wherein the nodes are maximally large
@@ -474,6 +483,9 @@ def network_to_cluster_graph(
         merged with a neighboring cluster. This is done because it is typically
         not useful to have a processor simulating only Nodes, as it will only
         add extra communication without easing the computational burden.
+    tabulated: collection
+        Objects whose functions are tabulated (see nengo_mpi.tabulate),
+        which need not be simulated on the master process.
 
     Returns
     -------
@@ -507,7 +519,7 @@ def network_to_cluster_graph(
     # merge together all clusters that have to go on component 0
     component0 = (
         x for x in cluster_graph.clusters
-        if for_component0(x, outputs))
+        if for_component0(x, outputs, tabulated))
 
     first = next(component0, None)
     if first is not None:
@@ -557,18 +569,22 @@ def network_to_cluster_graph(
     return component0, G
 
 
-def for_component0(cluster, outputs):
+def for_component0(cluster, outputs, tabulated=()):
     """ Returns whether the cluster must be simulated on process 0. """
 
     for obj in cluster.objects:
-        if isinstance(obj, Node) and callable(obj.output):
+        if (isinstance(obj, Node) and callable(obj.output) and
+                obj not in tabulated):
             return True
 
         if isinstance(obj, Node):
-            if any([conn.function is not None for conn in outputs[obj]]):
+            if any([
+                    conn.function is not None and conn not in tabulated
+                    for conn in outputs[obj]]):
                 return True
 
-        if isinstance(obj, Ensemble) and isinstance(obj.neuron_type, Direct):
+        if (isinstance(obj, Ensemble) and
+                isinstance(obj.neuron_type, Direct) and obj not in tabulated):
             return True
 
     return False
@@ -627,7 +643,8 @@ def duplicate_spaun_stim(network):
                 assert remove_from_network(network, node)
 
 
-def propagate_assignments(network, assignments, can_cross_boundary):
+def propagate_assignments(
+        network, assignments, can_cross_boundary, tabulated=()):
     """ Assign every object in ``network`` to a component.
 
     Propagates the component assignments stored in the dict ``assignments``
@@ -643,9 +660,10 @@ def propagate_assignments(network, assignments, can_cross_boundary):
     sure that certain types of objects are assigned to component 0.
 
     Objects that must be simulated on component 0 are:
-        1. Nodes with callable outputs.
-        2. Ensembles of Direct neurons.
-        3. Any Node that is the source for a Connection that has a function.
+        1. Nodes with callable outputs, unless they are tabulated.
+        2. Ensembles of Direct neurons, unless they are tabulated.
+        3. Any Node that is the source for a Connection that has a function,
+           unless the function is tabulated.
 
     Parameters
     ----------
@@ -663,6 +681,9 @@ def propagate_assignments(network, assignments, can_cross_boundary):
         A function which accepts a Connection, and returns a boolean specifying
         whether the Connection is allowed to cross component boundaries.
 
+    tabulated: collection
+        Objects whose functions are tabulated (see nengo_mpi.tabulate).
+
     Returns
     -------
     Nothing, but ``assignments`` is modified.
@@ -670,7 +691,7 @@ def propagate_assignments(network, assignments, can_cross_boundary):
     """
     def helper(network, assignments, outputs):
         for node in network.nodes:
-            if callable(node.output):
+            if callable(node.output) and node not in tabulated:
                 if node in assignments and assignments[node] != 0:
                     warnings.warn(
                         "Found Node with callable output that was assigned to "
@@ -680,7 +701,9 @@ def propagate_assignments(network, assignments, can_cross_boundary):
                 assignments[node] = 0
 
             else:
-                if any([conn.function is not None for conn in outputs[node]]):
+                if any([
+                        conn.function is not None and conn not in tabulated
+                        for conn in outputs[node]]):
                     if node in assignments and assignments[node] != 0:
                         warnings.warn(
                             "Found Node with an output connection whose "
@@ -694,7 +717,8 @@ def propagate_assignments(network, assignments, can_cross_boundary):
                     assignments[node] = assignments[network]
 
         for ensemble in network.ensembles:
-            if isinstance(ensemble.neuron_type, Direct):
+            if (isinstance(ensemble.neuron_type, Direct) and
+                    ensemble not in tabulated):
                 if ensemble in assignments and assignments[ensemble] != 0:
                     warnings.warn(
                         "Found Direct-mode ensemble that was assigned to a "
@@ -9,6 +9,7 @@ from nengo_mpi import Partitioner, PartitionError
 from nengo_mpi.partition import work_balanced_partitioner
 from nengo_mpi.partition import metis_available, metis_partitioner
 from nengo_mpi.partition.base import network_to_cluster_graph, make_boundary_predicate
+from nengo_mpi.tabulate import tabulated_objects
 
 
 @pytest.fixture
@@ -240,6 +241,30 @@ def test_cluster_graph():
     assert len(cluster_graph) == 4
 
 
+def test_tabulated_cluster_graph():
+    network = nengo.Network()
+
+    with network:
+        stim = nengo.Node(lambda t: [np.sin(t), t], label='stim')
+        D = nengo.Ensemble(1, 2, neuron_type=nengo.Direct(), label='D')
+        A = nengo.Ensemble(50, 1, label='A')
+
+        nengo.Connection(stim, D)
+        nengo.Connection(D, A, function=lambda x: x[0] * x[1])
+
+    bp = make_boundary_predicate(network)
+
+    component0, cluster_graph = network_to_cluster_graph(network, bp)
+    assert component0 is not None
+
+    tabulated = tabulated_objects(network, horizon=1.0, max_error=1e-3)
+    assert tabulated == set([stim, D, network.connections[1]])
+
+    component0, cluster_graph = network_to_cluster_graph(
+        network, bp, tabulated=tabulated)
+    assert component0 is None
+
+
 def test_learning_rules(rng):
     """ Test that connections with learning rules are not allowed
         to cross boundaries. """
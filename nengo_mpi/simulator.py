@@ -5,14 +5,18 @@ from functools import partial
 import logging
 import time
 
+import six
+
 import nengo
 from nengo.simulator import ProbeDict
-from nengo.cache import get_default_decoder_cache
 import nengo.utils.numpy as npext
-from nengo.exceptions import SimulatorClosed
+from nengo.exceptions import SimulationError, SimulatorClosed
 
+from nengo_mpi.cache import BuildCache, get_default_decoder_cache
+from nengo_mpi.decoders import solve_decoders
 from nengo_mpi.model import MpiBuilder, MpiModel
 from nengo_mpi.partition import Partitioner, verify_assignments
+from nengo_mpi.tabulate import tabulated_objects
 
 logger = logging.getLogger(__name__)
 
@@ -25,7 +29,10 @@ class Simulator(nengo.Simulator):
 
     def __init__(
             self, network, dt=0.001, seed=None, model=None,
-            partitioner=None, assignments=None, save_file=""):
+            partitioner=None, assignments=None, save_file="", shard=False,
+            build_cache=None, batch_size=1, build_processes=1,
+            solve_processes=1, incremental=False, aligned=False,
+            tabulate=None, tabulate_error=None, precision='double'):
         """ A simulator that can be executed in parallel using MPI.
 
         Parameters
@@ -44,8 +51,8 @@ class Simulator(nengo.Simulator):
             if you want to build the network manually, or to inject some
             build artifacts in the Model before building the network,
             then you can pass in an instance of ``MpiModel`` instance
-            or a ``nengo.builder.Model`` instance. If the latter, it
-            will be converted into an ``MpiModel``.
+            or a ``nengo.builder.Model`` instance. Currently, only the
+            decoder cache of the supplied model is used.
         partitioner: Partitioner
             Specifies how to assign nengo objects to MPI processes.
             ``partitioner`` and ``assignment`` cannot both be supplied.
@@ -57,6 +64,88 @@ class Simulator(nengo.Simulator):
             Name of file that will store all data added to the simulator.
             The simulator can later be reconstructed from this file. If
             equal to the empty string, then no file is created.
+        shard: bool
+            Whether to store each partition component in its own file, with
+            ``save_file`` holding a manifest that lists them. Only valid if
+            ``save_file`` is non-empty.
+        build_cache: BuildCache or string
+            Cache of previously built networks, or the name of the directory
+            storing such a cache. If the network has been built before with
+            the same seeds, dt and partition, the built network is loaded
+            from the cache rather than being built again. Sharded networks
+            are never cached. If None, the network is always built.
+        batch_size: int
+            Number of copies of the network to simulate side by side, which
+            is much faster than simulating them one after the other. Copy
+            ``i`` uses seed ``seed + i`` for its stochastic operators, but
+            is otherwise identical to the others. Probe data gains a
+            trailing axis of length ``batch_size``, indexed by copy. Only
+            valid if ``save_file`` is empty; for network files, use the
+            ``--batch`` option of the executables instead.
+        build_processes: int
+            Number of processes to build the network with. If greater
+            than 1, the components are divided between the processes,
+            each of which builds only the objects needed by its own
+            components and writes their shards. Only valid if ``shard``
+            is True, and not when running with ``python -m nengo_mpi``,
+            since processes that have initialized MPI cannot be forked.
+            Build artifacts, such as the parameters of built ensembles,
+            are not available afterwards.
+        solve_processes: int
+            Number of processes to solve for decoders with. If greater
+            than 1, the decoders of all connections with a seed are solved
+            for by a pool of processes before the network is built, and
+            the time taken is printed. Cannot be combined with
+            ``build_processes``, nor used when running with
+            ``python -m nengo_mpi``.
+        incremental: bool
+            Whether to reuse the shards of an earlier build in
+            ``save_file``. The network is built as with ``build_processes``,
+            and enough information is stored in the manifest for later
+            builds of the network to reuse shards. If ``save_file`` holds a
+            network built this way from a network with the same objects,
+            ``dt`` and number of components, only the components affected
+            by objects that changed since, or that moved to different
+            components, are built again. Only valid if ``shard`` is True,
+            and not when running with ``python -m nengo_mpi``.
+        aligned: bool
+            Whether to store read-only signals, such as connection weights,
+            uncompressed and aligned within ``save_file``. When the network
+            is loaded, they are then mapped into memory straight from the
+            file instead of being read, so processes on the same machine
+            share a single copy. Network files become larger. Only valid
+            if ``save_file`` is non-empty.
+        tabulate: float
+            Length of simulated time, in seconds, over which to evaluate
+            the functions of Nodes whose output is a function of time
+            alone while building. Such Nodes are then simulated by looking
+            up their output in a table, without calling into python, and
+            can be assigned to any component. The simulation, or the saved
+            network, can only be run for ``tabulate`` seconds. If None,
+            the functions are called on every step instead.
+        tabulate_error: float
+            Largest absolute error allowed when interpolating between
+            samples of functions of one to three inputs. If supplied, the
+            output functions of Nodes with one to three inputs, and the
+            functions of Connections out of Nodes and Direct-mode ensembles
+            that take one to three inputs, are sampled on a grid while
+            building, and simulated by interpolating between the samples.
+            Grids cover the radius of Direct-mode ensembles and [-1, 1]
+            for Nodes, and inputs outside of them are clamped to their
+            edges. Direct-mode ensembles whose functions are all sampled,
+            and Nodes whose functions are sampled, can be assigned to any
+            component. Node outputs must not depend on time. If None, the
+            functions are called on every step instead.
+        precision: string
+            Precision that the values of signals are stored in
+            ``save_file`` with, either 'double' or 'single'. Single
+            precision halves the size of the signals in network files.
+            Either can be simulated by either build of the C++ code,
+            values being converted as they are loaded, but read-only
+            signals in aligned files are only mapped into memory when the
+            precisions match. The C++ code simulates in double precision
+            unless it is built with ``make single``. Only valid if
+            ``save_file`` is non-empty.
 
         """
         print("Beginning build of MPI model...")
@@ -71,36 +160,102 @@ class Simulator(nengo.Simulator):
                 "closed. Call `close` on existing instances before "
                 "creating new ones.")
 
+        if int(batch_size) != batch_size or batch_size < 1:
+            raise ValueError(
+                "``batch_size'' must be a positive integer, got %s." %
+                batch_size)
+
+        if save_file and batch_size != 1:
+            raise ValueError(
+                "Cannot supply ``batch_size'' along with ``save_file''. "
+                "Supply the --batch option when simulating the saved "
+                "network instead.")
+
+        if build_processes != 1 and not shard:
+            raise ValueError(
+                "Cannot supply ``build_processes'' without ``shard''.")
+
+        if incremental and not shard:
+            raise ValueError(
+                "Cannot supply ``incremental'' without ``shard''.")
+
+        if solve_processes != 1 and (build_processes != 1 or incremental):
+            raise ValueError(
+                "Cannot supply ``solve_processes'' along with "
+                "``build_processes'' or ``incremental''.")
+
         if partitioner is not None and assignments is not None:
             raise ValueError(
                 "Cannot supply both ``assignments'' and ``partitioner'' to "
                 "Simulator.__init__.")
 
+        tabulated = tabulated_objects(network, tabulate, tabulate_error)
+
         if assignments is not None:
-            p = verify_assignments(network, assignments)
+            p = verify_assignments(network, assignments, tabulated=tabulated)
         else:
             if partitioner is None:
                 partitioner = Partitioner()
 
             print("    Partitioning network...")
-            p = partitioner.partition(network)
+            p = partitioner.partition(network, tabulated=tabulated)
 
         self.n_components, self.assignments = p
 
+        decoder_cache = (
+            get_default_decoder_cache() if model is None
+            else model.decoder_cache)
+
         dt = float(dt)
         self.model = MpiModel(
             self.n_components, self.assignments, dt=dt,
             label="%s, dt=%f" % (network, dt),
-            decoder_cache=get_default_decoder_cache(),
-            save_file=save_file)
+            decoder_cache=decoder_cache,
+            save_file=save_file, shard=shard, batch_size=int(batch_size),
+            aligned=aligned, tabulate=tabulate,
+            tabulate_error=tabulate_error, tabulated=tabulated,
+            precision=precision)
+
+        if isinstance(build_cache, six.string_types):
+            build_cache = BuildCache(build_cache)
+
+        cache_key = None
+        if build_cache is not None and not shard:
+            cache_key = build_cache.get_key(
+                network, dt, self.n_components, self.assignments,
+                aligned=aligned, tabulate=tabulate,
+                tabulate_error=tabulate_error, precision=precision)
+
+        if cache_key is not None and cache_key in build_cache:
+            print("    Loading network from build cache...")
+            self.model.load_network(*build_cache.load(cache_key, network))
+        elif build_processes != 1 or incremental:
+            print("    Building with %d processes..." % build_processes)
+            self.model.build_distributed(
+                network, build_processes, incremental=incremental)
+        else:
+            if solve_processes != 1:
+                print("    Solving for decoders with %d processes..." %
+                      solve_processes)
+                solve_decoders(self.model, network, solve_processes)
+
+            print("    Calling build...")
+            MpiBuilder.build(self.model, network)
+
+            self.model.decoder_cache.shrink()
 
-        print("    Calling build...")
-        MpiBuilder.build(self.model, network)
+            # Finalizing releases the built network as it is handed to the
+            # native simulator, so the file for the cache is written then.
+            network_file = (
+                build_cache.temp_file()
+                if cache_key is not None and self.model.runnable else None)
 
-        self.model.decoder_cache.shrink()
+            print("    Finalizing build...")
+            self.model.finalize_build(network_file)
 
-        print("    Finalizing build...")
-        self.model.finalize_build()
+            if cache_key is not None:
+                build_cache.store(
+                    cache_key, self.model, network, network_file)
 
         # probe -> list
         self._probe_outputs = self.model.params
@@ -115,6 +270,11 @@ class Simulator(nengo.Simulator):
 
         print("Building network took %f seconds." % (time.time() - then))
 
+        n_hits = getattr(self.model.decoder_cache, 'n_hits', None)
+        if n_hits is not None:
+            print("Decoder cache: %d hits, %d misses." % (
+                n_hits, self.model.decoder_cache.n_misses))
+
     @property
     def native_sim(self):
         if not self.model.runnable:
@@ -125,15 +285,20 @@ class Simulator(nengo.Simulator):
 
         return self.model.native_sim
 
+    @property
+    def batch_size(self):
+        """(int) The number of copies of the network being simulated."""
+        return self.native_sim.batch_size
+
     @property
     def n_steps(self):
         """(int) The current time step of the simulator."""
-        return self.model.get_value(self.model.step)[0]
+        return self.model.get_value(self.model.step).flat[0]
 
     @property
     def time(self):
         """(float) The current time of the simulator."""
-        return self.model.get_value(self.model.time)[0]
+        return self.model.get_value(self.model.time).flat[0]
 
     @property
     def closed(self):
@@ -180,6 +345,13 @@ class Simulator(nengo.Simulator):
             raise SimulatorClosed(
                 "MpiSimulator cannot run because it is closed.")
 
+        max_steps = self.model.tabulate_steps
+        if max_steps is not None and self.n_steps + steps > max_steps:
+            raise SimulationError(
+                "Cannot run for %d steps, since Node functions were only "
+                "tabulated for %d steps and %d have been run." % (
+                    steps, max_steps, self.n_steps))
+
         self.native_sim.run_n_steps(steps, progress_bar, log_filename)
 
         if not log_filename:
@@ -187,7 +359,10 @@ class Simulator(nengo.Simulator):
                 data = self.native_sim.get_probe_data(probe_key)
 
                 # The C++ code doesn't always exactly preserve the shape
-                true_shape = self.model.sig[probe]['in'].shape
+                true_shape = self.model.probe_shapes[probe]
+                if self.batch_size > 1:
+                    true_shape = true_shape + (self.batch_size,)
+
                 if data[0].shape != true_shape:
                     data = map(
                         partial(np.reshape, newshape=true_shape), data)
@@ -233,8 +408,6 @@ Simulator.unsupported = [
      'This test fails for an unknown reason'),
     ('test_neurons.test_izhikevich*',
      'nengo_mpi does not support Izhikevich neurons.'),
-    ('test_cache.test_cache_works*',
-     'Not set up correctly.'),
     ('test_connection.test_dist_transform',
      'nengo_mpi does not support supplying distributions for transforms.'),
     ('test_simulator.test_warn_on_opensim_gc',
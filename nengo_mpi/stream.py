@@ -0,0 +1,116 @@
+import os
+
+from nengo.builder.signal import Signal
+from nengo.builder.operator import Operator
+from nengo.node import Node
+
+import numpy as np
+
+
+class StreamInputOperator(Operator):
+    """
+    A placeholder operator meant to store the location of the data streamed
+    by a StreamInput, and forward it to the C++ code.
+    """
+
+    def __init__(self, output, step, filename, dataset, read_ahead):
+
+        self.output = output
+        self.step = step
+        self.filename = filename
+        self.dataset = dataset
+        self.read_ahead = int(read_ahead)
+
+        self.sets = [output]
+        self.incs = []
+        self.reads = [step]
+        self.updates = []
+
+    def make_step(self, signals, dt, rng):
+        def step():
+            pass
+
+        return step
+
+
+class StreamInput(Node):
+    """
+    A placeholder nengo object that outputs the rows of an array stored in
+    a file, one row per step: row ``i`` is output on step ``i + 1``.
+    When built, creates an instance of StreamInputOperator.
+
+    The C++ code reads the rows in blocks of ``read_ahead`` rows, on the
+    process simulating the component that the StreamInput is assigned to,
+    so the array never has to fit in memory. Simulating for more steps than
+    the array has rows is an error. StreamInputs output zeros in the
+    reference simulator.
+
+    Parameters
+    ----------
+    filename: string
+        Name of the file holding the array. Unless ``dataset`` is supplied,
+        a .npy file holding a C-ordered float64 or float32 array.
+    dataset: string
+        Name of a dataset in the HDF5 file ``filename`` to read rows from.
+    read_ahead: int
+        Number of rows to read at a time. Reading of .npy files is
+        additionally started a block ahead of the row being output.
+
+    """
+
+    # Attributes that the build depends on, besides the Node's parameters.
+    build_attributes = ('filename', 'dataset', 'read_ahead')
+
+    def __init__(self, filename, dataset=None, read_ahead=1024, label=None):
+        filename = os.path.abspath(filename)
+        n_rows, dimension = self.get_shape(filename, dataset)
+
+        super(StreamInput, self).__init__(
+            output=np.zeros(dimension), label=label)
+
+        self.filename = filename
+        self.dataset = dataset
+        self.read_ahead = int(read_ahead)
+        self.n_rows = n_rows
+
+        if self.read_ahead < 1:
+            raise ValueError("``read_ahead'' must be at least 1.")
+
+    @staticmethod
+    def get_shape(filename, dataset=None):
+        """ Return the number of rows and columns of a streamed array. """
+        if dataset is None:
+            data = np.load(filename, mmap_mode='r')
+
+            if (data.dtype not in (np.float64, np.float32) or
+                    not data.flags.c_contiguous):
+                raise ValueError(
+                    "Can only stream C-ordered float64 or float32 arrays "
+                    "from .npy files, %s holds a %s array." % (
+                        filename, data.dtype))
+
+            shape = data.shape
+        else:
+            import h5py as h5
+
+            with h5.File(filename, 'r') as f:
+                shape = f[dataset].shape
+
+        if len(shape) not in (1, 2):
+            raise ValueError(
+                "Can only stream arrays with 1 or 2 dimensions, got an "
+                "array with shape %s." % (shape,))
+
+        return shape[0], (shape[1] if len(shape) == 2 else 1)
+
+
+def build_stream_input(model, si):
+    output = Signal(np.zeros(si.size_out), name=str(si))
+
+    # Allows build_connection to get the output signal
+    model.sig[si]['out'] = output
+
+    op = StreamInputOperator(
+        output, model.step, si.filename, si.dataset, si.read_ahead)
+
+    model.add_op(op)
@@ -0,0 +1,366 @@
+"""Evaluating the functions of Nodes and Direct-mode ensembles ahead of time.
+
+Python functions in a network, i.e. the outputs of Nodes and the functions
+of Connections out of Nodes and Direct-mode ensembles, would otherwise be
+simulated by calling back into python on every step, which requires them
+to be on component 0. Instead, they can be evaluated while the network is
+built, and the tables of values simulated by native operators that can be
+on any component.
+
+Functions of time alone are evaluated on every step up to a given horizon.
+Functions of one to three input dimensions are sampled on a grid, which is
+refined until interpolating between its points is accurate to within a
+given error.
+
+"""
+import itertools
+
+import numpy as np
+
+from nengo.builder.connection import build_connection
+from nengo.builder.node import SimPyFunc, build_node
+from nengo.builder.operator import Operator
+from nengo.builder.signal import Signal
+from nengo.exceptions import BuildError
+from nengo.neurons import Direct
+from nengo.node import Node
+from nengo.processes import Process
+from nengo.utils.builder import find_all_io
+
+from nengo_mpi.spaun_mpi import SpaunStimulus
+
+# Largest number of input dimensions of a function that can be tabulated.
+MAX_TABULATED_DIMS = 3
+
+# Grids are refined from this many points per dimension...
+INITIAL_GRID_POINTS = 5
+
+# ...until the error bound is met, or they would exceed this many points.
+MAX_GRID_POINTS = 2 ** 18
+
+# Times at which functions of a Node's input are compared, to check that
+# they do not depend on time as well.
+CHECK_TIMES = (0.0, 0.3, 1.7)
+
+
+def is_time_function(node):
+    """ Return whether the output of ``node`` is a function of time alone. """
+    return (
+        callable(node.output) and not isinstance(node.output, Process) and
+        not isinstance(node, SpaunStimulus) and
+        node.size_in == 0 and node.size_out > 0)
+
+
+def is_input_function(node, rng=None):
+    """ Return whether the output of ``node`` is a function of its input.
+
+    The function must take one to MAX_TABULATED_DIMS input dimensions. It
+    is checked not to depend on time by comparing its outputs at a few
+    random inputs at each of CHECK_TIMES.
+
+    """
+    if (not callable(node.output) or isinstance(node.output, Process) or
+            isinstance(node, SpaunStimulus) or node.size_out == 0 or
+            not 0 < node.size_in <= MAX_TABULATED_DIMS):
+        return False
+
+    rng = np.random.RandomState(0) if rng is None else rng
+
+    for x in rng.uniform(-1, 1, size=(4, node.size_in)):
+        values = [
+            np.asarray(node.output(t, x), dtype='float64')
+            for t in CHECK_TIMES]
+
+        if any(not np.array_equal(values[0], v) for v in values[1:]):
+            return False
+
+    return True
+
+
+def has_input_function(conn):
+    """ Return whether ``conn`` calls a function that can be tabulated.
+
+    The functions of Connections out of Nodes and Direct-mode ensembles
+    are called from python, unlike those of Connections out of ensembles
+    of neurons, which are only used to solve for decoders.
+
+    """
+    direct = (
+        getattr(conn.pre_obj, 'neuron_type', None) is not None and
+        isinstance(conn.pre_obj.neuron_type, Direct))
+
+    return (
+        callable(conn.function) and
+        (isinstance(conn.pre_obj, Node) or direct) and
+        0 < conn.size_in <= MAX_TABULATED_DIMS)
+
+
+def tabulated_objects(network, horizon=None, max_error=None):
+    """ Return the objects in ``network`` that are to be tabulated.
+
+    Parameters
+    ----------
+    network: nengo.Network
+        The network to be built.
+    horizon: float or None
+        Length of simulated time, in seconds, that functions of time are
+        evaluated for. If None, functions of time are not tabulated.
+    max_error: float or None
+        Largest absolute error allowed when interpolating between samples
+        of functions of one to three input dimensions. If None, such
+        functions are not tabulated.
+
+    Returns
+    -------
+    tabulated: set
+        Nodes and Connections whose functions are tabulated, along with the
+        Direct-mode ensembles whose outgoing functions are all tabulated.
+        None of them need to be simulated on component 0.
+
+    """
+    tabulated = set()
+
+    if horizon is not None:
+        tabulated.update(
+            node for node in network.all_nodes if is_time_function(node))
+
+    if max_error is not None:
+        tabulated.update(
+            node for node in network.all_nodes if is_input_function(node))
+        tabulated.update(
+            conn for conn in network.all_connections
+            if has_input_function(conn))
+
+        _, outputs = find_all_io(network.all_connections)
+        tabulated.update(
+            ens for ens in network.all_ensembles
+            if isinstance(ens.neuron_type, Direct) and all(
+                conn.function is None or conn in tabulated
+                for conn in outputs[ens]))
+
+    return tabulated
+
+
+def tabulate_time_function(fn, size_out, dt, n_steps):
+    """ Evaluate ``fn`` on each of the first ``n_steps`` steps.
+
+    Row ``i`` of the returned array holds the output of ``fn`` at time
+    ``(i + 1) * dt``, which is when the simulator evaluates it on step
+    ``i + 1``.
+
+    """
+    table = np.zeros((n_steps, size_out))
+
+    for i in range(n_steps):
+        value = fn((i + 1) * dt)
+
+        if value is None:
+            raise BuildError(
+                "Function %r returned None while being tabulated." % fn)
+
+        table[i] = value
+
+    return table
+
+
+def grid_points(n_dims, n_points, radius):
+    """ Return the points of a grid, one per row, last dimension fastest. """
+    axis = np.linspace(-radius, radius, n_points)
+    return np.array(list(itertools.product(axis, repeat=n_dims)))
+
+
+def interpolate(table, n_points, radius, x):
+    """ Interpolate between the values in ``table`` at the points ``x``.
+
+    ``table`` holds the values of a function at ``grid_points(n_dims,
+    n_points, radius)``, and ``x`` has shape (n, n_dims). Points outside of
+    the grid are clamped to its edge. Matches the Interpolate operator in
+    the C++ code.
+
+    """
+    n_dims = x.shape[1]
+    scale = (n_points - 1) / (2.0 * radius)
+
+    pos = np.clip((x + radius) * scale, 0, n_points - 1)
+    lower = np.minimum(pos.astype(int), n_points - 2)
+    frac = pos - lower
+
+    result = np.zeros((x.shape[0], table.shape[1]))
+    for corner in itertools.product((0, 1), repeat=n_dims):
+        upper = np.array(corner)
+        weight = np.prod(np.where(upper, frac, 1 - frac), axis=1)
+        rows = np.ravel_multi_index(
+            (lower + upper).T, (n_points,) * n_dims)
+        result += weight[:, None] * table[rows]
+
+    return result
+
+
+def tabulate_input_function(fn, n_dims, size_out, radius, max_error):
+    """ Sample ``fn`` on a grid that it can be interpolated from.
+
+    The grid covers [-radius, radius] in each of the ``n_dims`` input
+    dimensions. Starting from INITIAL_GRID_POINTS points per dimension, the
+    grid is refined by halving its spacing until interpolating between the
+    points of the coarser grid reproduces ``fn`` at the points of the finer
+    one to within ``max_error``.
+
+    Returns
+    -------
+    table: ndarray
+        Values of ``fn`` at the points of the finer grid, one per row.
+    n_points: int
+        Number of points per dimension of the finer grid.
+
+    """
+    def sample(n_points):
+        table = np.zeros((n_points ** n_dims, size_out))
+        for i, x in enumerate(grid_points(n_dims, n_points, radius)):
+            table[i] = fn(x)
+
+        return table
+
+    n_points = INITIAL_GRID_POINTS
+    table = sample(n_points)
+    error = np.inf
+
+    while True:
+        fine_points = 2 * n_points - 1
+        if fine_points ** n_dims > MAX_GRID_POINTS:
+            raise BuildError(
+                "Could not tabulate function %r to within %g with at most "
+                "%d points, error was %g." % (
+                    fn, max_error, MAX_GRID_POINTS, error))
+
+        fine_table = sample(fine_points)
+        error = np.max(np.abs(fine_table - interpolate(
+            table, n_points, radius,
+            grid_points(n_dims, fine_points, radius))))
+
+        if error <= max_error:
+            return fine_table, fine_points
+
+        table, n_points = fine_table, fine_points
+
+
+class SimTabulated(Operator):
+    """ Set ``output`` to a row of ``table``, chosen by the current step.
+
+    Row ``i`` of ``table`` holds the value of ``output`` on step ``i + 1``.
+    Simulated in C++ by the Tabulated operator.
+
+    """
+    def __init__(self, table, output, step):
+        self.table = table
+        self.output = output
+        self.step = step
+
+        self.sets = [output]
+        self.incs = []
+        self.reads = [step]
+        self.updates = []
+
+    def make_step(self, signals, dt, rng):
+        table = self.table
+        output = signals[self.output]
+        step = signals[self.step]
+
+        def step_tabulated():
+            output[...] = table[step.item() - 1]
+
+        return step_tabulated
+
+
+class SimInterpolate(Operator):
+    """ Set ``output`` by interpolating ``table`` at the value of ``input``.
+
+    ``table`` holds the values of a function at the points of a grid with
+    ``n_points`` points per dimension of ``input``, between ``-radius`` and
+    ``radius`` (see grid_points). Simulated in C++ by the Interpolate
+    operator.
+
+    """
+    def __init__(self, table, input, output, radius, n_points):
+        self.table = table
+        self.input = input
+        self.output = output
+        self.radius = float(radius)
+        self.n_points = int(n_points)
+
+        self.sets = [output]
+        self.incs = []
+        self.reads = [input]
+        self.updates = []
+
+    def make_step(self, signals, dt, rng):
+        table = self.table
+        input = signals[self.input]
+        output = signals[self.output]
+        radius = self.radius
+        n_points = self.n_points
+
+        def step_interpolate():
+            output[...] = interpolate(
+                table, n_points, radius, input[None, :])[0]
+
+        return step_interpolate
+
+
+def _replace_pyfunc(model, obj, fn, radius):
+    """ Replace the SimPyFunc built for ``obj`` by a SimInterpolate. """
+    ops = model.object_ops[obj]
+
+    for i, op in enumerate(ops):
+        if isinstance(op, SimPyFunc):
+            table, n_points = tabulate_input_function(
+                fn, op.x.size, op.output.size, radius, model.tabulate_error)
+
+            ops[i] = SimInterpolate(table, op.x, op.output, radius, n_points)
+            return
+
+    raise BuildError("Found no python function to tabulate for %s." % obj)
+
+
+def build_tabulated_connection(model, conn):
+    """ Build a Connection, tabulating its function if ``model`` says to.
+
+    The SimPyFunc created by ``nengo.builder.connection.build_connection``
+    for Connections in ``model.tabulated`` is replaced by a SimInterpolate.
+    The function is sampled over the radius of a Direct-mode ensemble, and
+    over [-1, 1] for a Node.
+
+    """
+    build_connection(model, conn)
+
+    if conn in model.tabulated:
+        radius = getattr(conn.pre_obj, 'radius', 1.0)
+        _replace_pyfunc(model, conn, conn.function, radius)
+
+
+def build_tabulated_node(model, node):
+    """ Build a Node, tabulating its function if ``model`` says to.
+
+    Nodes in ``model.tabulated`` get a SimTabulated operator, if their
+    output is a function of time, or a SimInterpolate operator sampled over
+    [-1, 1], if it is a function of their input, in place of the SimPyFunc
+    that ``nengo.builder.node.build_node`` would create. All other Nodes are
+    built by ``build_node``.
+
+    """
+    if node not in model.tabulated:
+        return build_node(model, node)
+
+    if not is_time_function(node):
+        build_node(model, node)
+        _replace_pyfunc(model, node, lambda x: node.output(0.0, x), 1.0)
+        return
+
+    table = tabulate_time_function(
+        node.output, node.size_out, model.dt, model.tabulate_steps)
+
+    sig_out = Signal(np.zeros(node.size_out), name="%s.out" % node)
+    model.add_op(SimTabulated(table, sig_out, model.step))
+
+    model.sig[node]['in'] = None
+    model.sig[node]['out'] = sig_out
+    model.params[node] = None
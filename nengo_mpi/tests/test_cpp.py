@@ -1,12 +1,23 @@
 import os
 import subprocess
+import weakref
 import pytest
 import h5py
 
 import numpy as np
 
 import nengo_mpi
+from nengo_mpi.model import (
+    FILE_ALIGNMENT, MpiModel, MpiSend, MpiRecv, signal_values)
+from nengo_mpi.ordering import OpIndex
+from nengo_mpi.partition import work_balanced_partitioner
+from nengo_mpi.utils import NETWORK_FORMAT_VERSION, SIGNAL_RECORD_SIZE
 import nengo
+from nengo.builder import Signal
+from nengo.builder.neurons import SimNeurons
+from nengo.builder.operator import Copy, Reset
+from nengo.exceptions import BuildError
+from nengo.utils.simulator import operator_depencency_graph
 from nengo.neurons import LIF, LIFRate, RectifiedLinear, Sigmoid
 from nengo.neurons import AdaptiveLIF, AdaptiveLIFRate  # Izhikevich
 
@@ -17,7 +28,7 @@ all_neurons = [
 
 @pytest.mark.parametrize("neuron_type", all_neurons)
 @pytest.mark.parametrize("synapse", [None, 0.0, 0.02, 0.05])
-def test_basic_cpp(neuron_type, synapse):
+def test_basic_cpp(neuron_type, synapse, tmpdir):
     n_neurons = 40
 
     m = nengo.Network(seed=1)
@@ -41,27 +52,771 @@ def test_basic_cpp(neuron_type, synapse):
     refimpl_sim = nengo.Simulator(m)
     refimpl_sim.run(sim_time)
 
-    network_file = "test_nengo.net"
-    log_file = "test_nengo.h5"
+    network_file = str(tmpdir.join("test_nengo.net"))
+    log_file = str(tmpdir.join("test_nengo.h5"))
+
+    mpi_sim = nengo_mpi.Simulator(m, save_file=network_file)
+    subprocess.check_output(
+        ['nengo_cpp', '--noprog', network_file, str(sim_time)])
+
+    results = h5py.File(log_file, 'r')
+
+    probe_keys = mpi_sim.model.probe_keys
+    assert np.allclose(
+        refimpl_sim.data[A_p], results[str(probe_keys[A_p])],
+        atol=0.00001, rtol=0.00)
+    assert np.allclose(
+        refimpl_sim.data[B_p], results[str(probe_keys[B_p])],
+        atol=0.00001, rtol=0.00)
+
+
+def test_operator_tables(tmpdir):
+    m = nengo.Network(seed=1)
+    with m:
+        A = nengo.Ensemble(40, dimensions=2, neuron_type=LIF())
+        B = nengo.Ensemble(40, dimensions=2, neuron_type=LIF())
+        nengo.Connection(A, B, synapse=0.05)
+        nengo.Probe(B)
+
+    network_file = str(tmpdir.join("test_operator_tables.net"))
+
+    nengo_mpi.Simulator(m, save_file=network_file)
+
+    with h5py.File(network_file, 'r') as f:
+        assert f.attrs['format_version'] == NETWORK_FORMAT_VERSION
+
+        operators = f['0']['operators']
+        assert 'LIF' in operators
+        assert 'DotInc' in operators
+        assert 'TimeUpdate' in operators
+
+        lif = operators['LIF']
+        n_lif = lif['index'].shape[0]
+        assert n_lif == 2
+        assert lif['signals'].shape == (n_lif, 4, SIGNAL_RECORD_SIZE)
+        assert lif['params'].shape == (n_lif, 5)
+        assert 'arrays' not in lif
+
+
+def test_operator_ordering(monkeypatch, tmpdir):
+    # Keep the operators, which are otherwise released once written.
+    monkeypatch.setattr(
+        MpiModel, '_release_component', lambda self, component: None)
+
+    m = nengo.Network(seed=1)
+    with m:
+        A = nengo.Ensemble(40, dimensions=2)
+        B = nengo.Ensemble(40, dimensions=2)
+        C = nengo.Ensemble(40, dimensions=2)
+        nengo.Connection(A, B, synapse=None)
+        nengo.Connection(B, C, synapse=None)
+        nengo.Connection(C, A, synapse=0.05)
+        nengo.Probe(C)
+
+    network_file = str(tmpdir.join("test_operator_ordering.net"))
+
+    partitioner = nengo_mpi.Partitioner(
+        3, cross_at_updates=False, func=work_balanced_partitioner)
+
+    mpi_sim = nengo_mpi.Simulator(
+        m, partitioner=partitioner, save_file=network_file)
+
+    assert len(set(partitioner.object_assignments.values())) == 3
+
+    model = mpi_sim.model
+    ordering = model.global_ordering
+    sends = {}
+
+    for component in range(3):
+        ops = model.component_ops[component]
+        assert ops[0] is model.time_update
+
+        indices = [ordering[op] for op in ops]
+        assert indices == sorted(indices)
+
+        index = OpIndex(ops[1:])
+        graph = operator_depencency_graph(ops[1:])
+        for op, dependents in graph.items():
+            assert all(ordering[op] < ordering[d] for d in dependents)
+
+        for op in ops:
+            if isinstance(op, MpiSend):
+                sends[op.tag] = op
+                assert all(
+                    ordering[w] < ordering[op]
+                    for w in index.writers(op.signal))
+
+            if isinstance(op, MpiRecv):
+                assert all(
+                    ordering[op] < ordering[r]
+                    for r in index.readers(op.signal))
+
+    recvs = [
+        op for component in range(3)
+        for op in model.component_ops[component]
+        if isinstance(op, MpiRecv)]
+    assert len(recvs) == 3
+
+    for recv in recvs:
+        if not recv.is_update:
+            assert ordering[sends[recv.tag]] < ordering[recv]
+
+    # Components sharing a process access updated signals directly, so
+    # the signal must be read on all components before it is updated.
+    all_ops = [
+        op for component in range(3)
+        for op in model.component_ops[component]]
+    index = OpIndex(all_ops)
+
+    for recv in recvs:
+        if recv.is_update:
+            for r in index.readers(recv.signal):
+                assert all(
+                    ordering[r] < ordering[u]
+                    for u in index.updates[recv.signal])
+
+
+def test_grouped_neuron_ordering(monkeypatch, tmpdir):
+    # Keep the operators, which are otherwise released once written.
+    monkeypatch.setattr(
+        MpiModel, '_release_component', lambda self, component: None)
+
+    m = nengo.Network(seed=1)
+    with m:
+        stim = nengo.Node([0.5, -0.2])
+        ensembles = [nengo.Ensemble(20, dimensions=2) for i in range(5)]
+        other = nengo.Ensemble(20, dimensions=2, neuron_type=LIF(tau_rc=0.05))
+
+        for ens in ensembles + [other]:
+            nengo.Connection(stim, ens)
+
+        probes = [nengo.Probe(ens) for ens in ensembles]
+
+    sim_time = 0.1
+
+    refimpl_sim = nengo.Simulator(m)
+    refimpl_sim.run(sim_time)
+
+    network_file = str(tmpdir.join("test_grouped.net"))
+    log_file = str(tmpdir.join("test_grouped.h5"))
+
+    mpi_sim = nengo_mpi.Simulator(m, save_file=network_file)
+
+    model = mpi_sim.model
+    ordering = model.global_ordering
+
+    neuron_ops = [
+        op for op in model.component_ops[0]
+        if (isinstance(op, SimNeurons)
+            and op.neurons is not other.neuron_type)]
+    indices = sorted(ordering[op] for op in neuron_ops)
+    assert indices == list(range(indices[0], indices[0] + 5))
+
+    subprocess.check_output(
+        ['nengo_cpp', '--noprog', network_file, str(sim_time)])
+
+    with h5py.File(log_file, 'r') as results:
+        data = [
+            results[str(model.probe_keys[p])][()] for p in probes]
+
+    for p, d in zip(probes, data):
+        assert np.allclose(refimpl_sim.data[p], d, atol=0.00001, rtol=0.00)
+
+
+def test_sharded(tmpdir):
+    m = nengo.Network(seed=1)
+    with m:
+        A = nengo.Ensemble(40, dimensions=2)
+        B = nengo.Ensemble(40, dimensions=2)
+        nengo.Connection(A, B, synapse=0.05)
+        input = nengo.Node([0.1, -0.2])
+        nengo.Connection(input, A, synapse=0.05)
+        B_p = nengo.Probe(B)
+
+    assignments = {A: 0, B: 1, input: 0}
+    sim_time = 0.5
+
+    network_file = str(tmpdir.join("test_sharded.net"))
+    log_file = str(tmpdir.join("test_sharded.h5"))
+    shard_files = [
+        str(tmpdir.join("test_sharded.%d.net" % component))
+        for component in range(2)]
+
+    mpi_sim = nengo_mpi.Simulator(
+        m, assignments=assignments, save_file=network_file, shard=True)
+
+    with h5py.File(network_file, 'r') as f:
+        assert f.attrs['n_components'] == 2
+        assert '0' not in f
+        assert 'shards' in f
+
+    for shard_file in shard_files:
+        assert os.path.isfile(shard_file)
+
+    subprocess.check_output(
+        ['nengo_cpp', '--noprog', network_file, str(sim_time)])
+
+    with h5py.File(log_file, 'r') as results:
+        sharded_data = results[str(mpi_sim.model.probe_keys[B_p])][()]
+
+    refimpl_sim = nengo.Simulator(m)
+    refimpl_sim.run(sim_time)
+
+    assert np.allclose(
+        refimpl_sim.data[B_p], sharded_data, atol=0.00001, rtol=0.00)
+
+
+def test_distributed_build(tmpdir):
+    def make_network():
+        m = nengo.Network(seed=1)
+        with m:
+            input = nengo.Node([0.1, -0.2])
+            ensembles = [nengo.Ensemble(40, dimensions=2) for i in range(3)]
+            nengo.Connection(input, ensembles[0], synapse=0.05)
+            nengo.Connection(ensembles[0], ensembles[1], synapse=0.05)
+            nengo.Connection(ensembles[1], ensembles[2], synapse=0.01)
+            nengo.Connection(
+                ensembles[2], ensembles[0], synapse=0.05,
+                function=lambda x: x ** 2)
+            probes = [nengo.Probe(e, synapse=0.01) for e in ensembles]
+        return m, input, ensembles, probes
+
+    sim_time = 0.2
+    data = {}
+
+    for build_processes in [1, 2]:
+        m, input, ensembles, probes = make_network()
+        assignments = dict((e, i) for i, e in enumerate(ensembles))
+        assignments[input] = 0
+
+        network_file = str(
+            tmpdir.join("test_distributed_%d.net" % build_processes))
+        log_file = str(tmpdir.join("test_distributed_%d.h5" % build_processes))
+
+        mpi_sim = nengo_mpi.Simulator(
+            m, assignments=assignments, save_file=network_file,
+            shard=True, build_processes=build_processes)
+
+        subprocess.check_output(
+            ['nengo_cpp', '--noprog', network_file, str(sim_time)])
+
+        with h5py.File(log_file, 'r') as results:
+            data[build_processes] = [
+                results[str(mpi_sim.model.probe_keys[p])][()]
+                for p in probes]
+
+    for serial, distributed in zip(data[1], data[2]):
+        assert np.allclose(serial, distributed, atol=0.0, rtol=0.0)
+
+
+def test_build_after_mpi_init(monkeypatch, tmpdir):
+    # Processes that have initialized MPI must not be forked.
+    monkeypatch.setattr(nengo_mpi.model, 'mpi_initialized', lambda: True)
+
+    m = nengo.Network(seed=1)
+    with m:
+        A = nengo.Ensemble(40, dimensions=2)
+        B = nengo.Ensemble(40, dimensions=2)
+        nengo.Connection(A, B, synapse=0.05)
+        nengo.Probe(B)
+
+    assignments = {A: 0, B: 1}
+    network_file = str(tmpdir.join("test_mpi_init.net"))
+
+    # Shards are written by the building process instead.
+    nengo_mpi.Simulator(
+        m, assignments=assignments, save_file=network_file, shard=True)
+
+    for component in range(2):
+        assert tmpdir.join("test_mpi_init.%d.net" % component).check()
+
+    with pytest.raises(BuildError):
+        nengo_mpi.Simulator(
+            m, assignments=assignments, save_file=network_file,
+            shard=True, build_processes=2)
+
+
+def test_incremental_build(tmpdir):
+    def make_network(max_rates):
+        m = nengo.Network(seed=1)
+        with m:
+            input = nengo.Node([0.1, -0.2])
+            ensembles = [nengo.Ensemble(40, dimensions=2) for i in range(3)]
+            ensembles.append(nengo.Ensemble(
+                40, dimensions=2, max_rates=nengo.dists.Uniform(*max_rates)))
+            nengo.Connection(input, ensembles[0], synapse=0.05)
+            for pre, post in zip(ensembles[:-1], ensembles[1:]):
+                nengo.Connection(pre, post, synapse=0.05)
+            probes = [nengo.Probe(e, synapse=0.01) for e in ensembles]
+        return m, input, ensembles, probes
+
+    sim_time = 0.2
+    data = {}
+
+    def build(name, max_rates, incremental):
+        m, input, ensembles, probes = make_network(max_rates)
+        assignments = dict((e, i) for i, e in enumerate(ensembles))
+        assignments[input] = 0
+
+        network_file = str(tmpdir.join("test_incremental_%s.net" % name))
+        log_file = str(tmpdir.join("test_incremental_%s.h5" % name))
+        shard_files = [
+            str(tmpdir.join("test_incremental_%s.%d.net" % (name, component)))
+            for component in range(4)]
+
+        mpi_sim = nengo_mpi.Simulator(
+            m, assignments=assignments, save_file=network_file,
+            shard=True, incremental=incremental)
 
-    try:
-        nengo_mpi.Simulator(m, save_file=network_file)
         subprocess.check_output(
             ['nengo_cpp', '--noprog', network_file, str(sim_time)])
 
-        results = h5py.File(log_file, 'r')
-    finally:
-        try:
-            os.remove(network_file)
-        except:
-            pass
+        with h5py.File(log_file, 'r') as results:
+            data[name] = [
+                results[str(mpi_sim.model.probe_keys[p])][()]
+                for p in probes]
+
+        return shard_files
+
+    shard_files = build('inc', (200, 400), incremental=True)
+
+    for shard_file in shard_files:
+        os.utime(shard_file, (0, 0))
+
+    # Only the last ensemble changes, which affects the connection
+    # into it, so only the last two components are built again.
+    build('inc', (100, 200), incremental=True)
+
+    assert [os.path.getmtime(f) == 0 for f in shard_files] == [
+        True, True, False, False]
+
+    build('full', (100, 200), incremental=False)
+
+    for incremental, full in zip(data['inc'], data['full']):
+        assert np.allclose(incremental, full, atol=0.0, rtol=0.0)
+
+
+def test_in_memory_matches_file(tmpdir):
+    m = nengo.Network(seed=1)
+    with m:
+        A = nengo.Ensemble(40, dimensions=2)
+        B = nengo.Ensemble(40, dimensions=2)
+        nengo.Connection(A, B, synapse=0.05)
+        input = nengo.Node([0.1, -0.2])
+        nengo.Connection(input, A, synapse=0.05)
+        B_p = nengo.Probe(B)
+
+    assignments = {A: 0, B: 1, input: 0}
+    sim_time = 0.5
+
+    network_file = str(tmpdir.join("test_in_memory.net"))
+    log_file = str(tmpdir.join("test_in_memory.h5"))
+
+    mpi_sim = nengo_mpi.Simulator(
+        m, assignments=assignments, save_file=network_file)
+    subprocess.check_output(
+        ['nengo_cpp', '--noprog', network_file, str(sim_time)])
+
+    with h5py.File(log_file, 'r') as results:
+        file_data = results[str(mpi_sim.model.probe_keys[B_p])][()]
+
+    with nengo_mpi.Simulator(m, assignments=assignments) as sim:
+        sim.run(sim_time)
+        memory_data = sim.data[B_p]
+
+    assert np.allclose(file_data, memory_data, atol=0.0, rtol=0.0)
+
+
+def test_readonly_dedup(monkeypatch, tmpdir):
+    # Keep the base signals, which are otherwise released once written.
+    monkeypatch.setattr(
+        MpiModel, '_release_component', lambda self, component: None)
+
+    m = nengo.Network(seed=1)
+    with m:
+        # Identical seeds give identical encoders, gains and biases
+        A = nengo.Ensemble(40, dimensions=2, seed=2)
+        B = nengo.Ensemble(40, dimensions=2, seed=2)
+        nengo.Connection(A, B, synapse=0.05)
+        B_p = nengo.Probe(B)
+
+    assignments = {A: 0, B: 1}
+    sim_time = 0.2
+
+    network_file = str(tmpdir.join("test_readonly_dedup.net"))
+    log_file = str(tmpdir.join("test_readonly_dedup.h5"))
+
+    mpi_sim = nengo_mpi.Simulator(
+        m, assignments=assignments, save_file=network_file)
+    model = mpi_sim.model
+
+    with h5py.File(network_file, 'r') as f:
+        pool = f['readonly_signals'][()]
+        readonly_size = 0
+
+        for component in range(2):
+            group = f[str(component)]
+            readonly = group['signal_readonly'][()].astype(bool)
+            offsets = group['signal_offsets'][()]
+            sizes = np.prod(group['signal_shapes'][()], axis=1)
 
-        try:
-            os.remove(log_file)
-        except:
-            pass
+            readonly_size += sizes[readonly].sum()
+            assert group['signals'].size == sizes[~readonly].sum()
+
+            base_signals = list(model.base_signals[component].values())
+            for i in np.flatnonzero(readonly):
+                offset, size = offsets[i], sizes[i]
+                assert np.array_equal(
+                    pool[offset:offset + size],
+                    signal_values(base_signals[i]))
+
+        assert pool.size < readonly_size
+
+    subprocess.check_output(
+        ['nengo_cpp', '--noprog', network_file, str(sim_time)])
+
+    with h5py.File(log_file, 'r') as results:
+        file_data = results[str(model.probe_keys[B_p])][()]
+
+    refimpl_sim = nengo.Simulator(m)
+    refimpl_sim.run(sim_time)
 
     assert np.allclose(
-        refimpl_sim.data[A_p], results[str(id(A_p))], atol=0.00001, rtol=0.00)
+        refimpl_sim.data[B_p], file_data, atol=0.00001, rtol=0.00)
+
+
+@pytest.mark.parametrize("shard", [False, True])
+def test_aligned(shard, tmpdir):
+    m = nengo.Network(seed=1)
+    with m:
+        A = nengo.Ensemble(200, dimensions=2)
+        B = nengo.Ensemble(200, dimensions=2)
+        nengo.Connection(A, B, synapse=0.05)
+        input = nengo.Node([0.1, -0.2])
+        nengo.Connection(input, A, synapse=0.05)
+        B_p = nengo.Probe(B)
+
+    assignments = {A: 0, B: 1, input: 0}
+    sim_time = 0.2
+
+    network_file = str(tmpdir.join("test_aligned.net"))
+    log_file = str(tmpdir.join("test_aligned.h5"))
+    shard_files = [
+        str(tmpdir.join("test_aligned.%d.net" % component))
+        for component in range(2)]
+
+    mpi_sim = nengo_mpi.Simulator(
+        m, assignments=assignments, save_file=network_file,
+        shard=shard, aligned=True)
+
+    if shard:
+        readonly = [
+            (shard_file, '%d/readonly_signals' % component)
+            for component, shard_file in enumerate(shard_files)]
+    else:
+        readonly = [(network_file, 'readonly_signals')]
+
+    for filename, name in readonly:
+        with h5py.File(filename, 'r') as f:
+            dset = f[name]
+            assert dset.compression is None
+            assert dset.chunks is None
+            assert dset.id.get_offset() % FILE_ALIGNMENT == 0
+
+    output = subprocess.check_output(
+        ['nengo_cpp', '--noprog', network_file, str(sim_time)])
+    assert b"mapped from the network file" in output
+
+    with h5py.File(log_file, 'r') as results:
+        file_data = results[str(mpi_sim.model.probe_keys[B_p])][()]
+
+    refimpl_sim = nengo.Simulator(m)
+    refimpl_sim.run(sim_time)
+
     assert np.allclose(
-        refimpl_sim.data[B_p], results[str(id(B_p))], atol=0.00001, rtol=0.00)
+        refimpl_sim.data[B_p], file_data, atol=0.00001, rtol=0.00)
+
+
+def test_single_precision_file(tmpdir):
+    m = nengo.Network(seed=1)
+    with m:
+        A = nengo.Ensemble(200, dimensions=2)
+        B = nengo.Ensemble(200, dimensions=2)
+        nengo.Connection(A, B, synapse=0.05)
+        input = nengo.Node([0.1, -0.2])
+        nengo.Connection(input, A, synapse=0.05)
+        B_p = nengo.Probe(B)
+
+    assignments = {A: 0, B: 1, input: 0}
+    sim_time = 0.2
+
+    network_file = str(tmpdir.join("test_single_precision.net"))
+    log_file = str(tmpdir.join("test_single_precision.h5"))
+
+    mpi_sim = nengo_mpi.Simulator(
+        m, assignments=assignments, save_file=network_file,
+        precision='single')
+
+    with h5py.File(network_file, 'r') as f:
+        assert f['readonly_signals'].dtype == np.float32
+        for component in range(2):
+            assert f['%d/signals' % component].dtype == np.float32
+
+    # Either build of the C++ code can simulate the file.
+    subprocess.check_output(
+        ['nengo_cpp', '--noprog', network_file, str(sim_time)])
+
+    with h5py.File(log_file, 'r') as results:
+        file_data = results[str(mpi_sim.model.probe_keys[B_p])][()]
+
+    refimpl_sim = nengo.Simulator(m)
+    refimpl_sim.run(sim_time)
+
+    assert np.allclose(
+        refimpl_sim.data[B_p], file_data, atol=0.001, rtol=0.00)
+
+
+def test_fused_dot_incs(tmpdir):
+    m = nengo.Network(seed=1)
+    with m:
+        input = nengo.Node([0.3, -0.5])
+        A = nengo.Ensemble(50, dimensions=2)
+        nengo.Connection(input, A)
+
+        probes = []
+        for i, function in enumerate(
+                [None, lambda x: x ** 2, lambda x: [x[0] * x[1]],
+                 lambda x: -x]):
+            B = nengo.Ensemble(30, dimensions=2 if i != 2 else 1)
+            nengo.Connection(A, B, function=function, synapse=0.01)
+            probes.append(nengo.Probe(B))
+
+    sim_time = 0.2
+
+    refimpl_sim = nengo.Simulator(m)
+    refimpl_sim.run(sim_time)
+
+    network_file = str(tmpdir.join("test_fused.net"))
+    log_file = str(tmpdir.join("test_fused.h5"))
+
+    mpi_sim = nengo_mpi.Simulator(m, save_file=network_file)
+    subprocess.check_output(
+        ['nengo_cpp', '--noprog', network_file, str(sim_time)])
+
+    with h5py.File(log_file, 'r') as results:
+        data = [
+            results[str(mpi_sim.model.probe_keys[p])][()]
+            for p in probes]
+
+    for p, d in zip(probes, data):
+        assert np.allclose(refimpl_sim.data[p], d, atol=0.00001, rtol=0.00)
+
+
+def test_tabulated(tmpdir):
+    m = nengo.Network(seed=1)
+    with m:
+        stim = nengo.Node(lambda t: [np.sin(10 * t), t])
+        A = nengo.Ensemble(100, dimensions=2)
+        B = nengo.Ensemble(100, dimensions=2)
+        nengo.Connection(stim, A, synapse=0.05)
+        nengo.Connection(A, B, synapse=0.05)
+        stim_p = nengo.Probe(stim)
+        B_p = nengo.Probe(B)
+
+    assignments = {stim: 1, A: 1, B: 0}
+    sim_time = 0.2
+
+    network_file = str(tmpdir.join("test_tabulated.net"))
+    log_file = str(tmpdir.join("test_tabulated.h5"))
+
+    mpi_sim = nengo_mpi.Simulator(
+        m, assignments=assignments, save_file=network_file,
+        tabulate=sim_time)
+    assert mpi_sim.assignments[stim] == 1
+
+    with h5py.File(network_file, 'r') as f:
+        assert 'Tabulated' in f['1']['operators']
+
+    subprocess.check_output(
+        ['nengo_cpp', '--noprog', network_file, str(sim_time)])
+
+    with h5py.File(log_file, 'r') as results:
+        stim_data = results[str(mpi_sim.model.probe_keys[stim_p])][()]
+        B_data = results[str(mpi_sim.model.probe_keys[B_p])][()]
+
+    # The table ends at sim_time
+    with pytest.raises(subprocess.CalledProcessError):
+        subprocess.check_output(
+            ['nengo_cpp', '--noprog', network_file, str(2 * sim_time)])
+
+    refimpl_sim = nengo.Simulator(m)
+    refimpl_sim.run(sim_time)
+
+    assert np.allclose(refimpl_sim.data[stim_p], stim_data)
+    assert np.allclose(
+        refimpl_sim.data[B_p], B_data, atol=0.00001, rtol=0.00)
+
+
+def test_interpolated(tmpdir):
+    m = nengo.Network(seed=1)
+    with m:
+        stim = nengo.Node([0.3, -0.5])
+        D = nengo.Ensemble(1, dimensions=2, neuron_type=nengo.Direct())
+        square = nengo.Node(lambda t, x: x ** 2, size_in=2)
+        nengo.Connection(stim, D, synapse=0.01)
+        nengo.Connection(
+            D, square, function=lambda x: [x[0] * x[1], x[0] + x[1]],
+            synapse=0.01)
+        square_p = nengo.Probe(square)
+
+    assignments = {stim: 1, D: 1, square: 0}
+    sim_time = 0.2
+
+    network_file = str(tmpdir.join("test_interpolated.net"))
+    log_file = str(tmpdir.join("test_interpolated.h5"))
+
+    mpi_sim = nengo_mpi.Simulator(
+        m, assignments=assignments, save_file=network_file,
+        tabulate_error=1e-4)
+    assert mpi_sim.assignments[D] == 1
+
+    for component in ['0', '1']:
+        with h5py.File(network_file, 'r') as f:
+            assert 'Interpolate' in f[component]['operators']
+
+    subprocess.check_output(
+        ['nengo_cpp', '--noprog', network_file, str(sim_time)])
+
+    with h5py.File(log_file, 'r') as results:
+        file_data = results[str(mpi_sim.model.probe_keys[square_p])][()]
+
+    refimpl_sim = nengo.Simulator(m)
+    refimpl_sim.run(sim_time)
+
+    assert np.allclose(
+        refimpl_sim.data[square_p], file_data, atol=0.001, rtol=0.00)
+
+
+@pytest.mark.parametrize("use_hdf5", [False, True])
+def test_stream_input(use_hdf5, tmpdir):
+    data = np.random.RandomState(1).uniform(-1, 1, size=(250, 3))
+    sim_time = 0.2
+
+    data_file = str(tmpdir.join(
+        "test_stream_input.h5" if use_hdf5 else "test_stream_input.npy"))
+    network_file = str(tmpdir.join("test_stream_input.net"))
+    log_file = str(tmpdir.join("test_stream_input_log.h5"))
+
+    if use_hdf5:
+        with h5py.File(data_file, 'w') as f:
+            f.create_dataset('rows', data=data)
+    else:
+        np.save(data_file, data)
+
+    m = nengo.Network(seed=1)
+    with m:
+        stream = nengo_mpi.StreamInput(
+            data_file, dataset='rows' if use_hdf5 else None,
+            read_ahead=16)
+        A = nengo.Ensemble(50, dimensions=3)
+        nengo.Connection(stream, A, synapse=0.05)
+        stream_p = nengo.Probe(stream)
+
+    assert stream.size_out == 3
+    assert stream.n_rows == 250
+
+    mpi_sim = nengo_mpi.Simulator(
+        m, assignments={stream: 1, A: 0}, save_file=network_file)
+
+    subprocess.check_output(
+        ['nengo_cpp', '--noprog', '--log', log_file, network_file,
+         str(sim_time)])
+
+    with h5py.File(log_file, 'r') as results:
+        file_data = results[str(mpi_sim.model.probe_keys[stream_p])][()]
+
+    # There are only 250 rows
+    with pytest.raises(subprocess.CalledProcessError):
+        subprocess.check_output(
+            ['nengo_cpp', '--noprog', '--log', log_file, network_file,
+             '0.3'])
+
+    n_steps = int(np.round(sim_time / 0.001))
+    assert np.allclose(file_data, data[:n_steps])
+
+
+def test_finalize_releases_components(tmpdir):
+    m = nengo.Network(seed=1)
+    with m:
+        A = nengo.Ensemble(40, dimensions=2)
+        B = nengo.Ensemble(40, dimensions=2)
+        nengo.Connection(A, B, synapse=0.05)
+        B_p = nengo.Probe(B)
+
+    assignments = {A: 0, B: 1}
+    sim_time = 0.2
+
+    network_file = str(tmpdir.join("test_finalize_releases.net"))
+    log_file = str(tmpdir.join("test_finalize_releases.h5"))
+
+    mpi_sim = nengo_mpi.Simulator(
+        m, assignments=assignments, save_file=network_file)
+    model = mpi_sim.model
+
+    for component in range(2):
+        assert component not in model.component_ops
+        assert component not in model.base_signals
+        assert component not in model.op_records
+
+    assert not model.object_ops
+    assert list(model.global_ordering) == [model.time_update]
+
+    subprocess.check_output(
+        ['nengo_cpp', '--noprog', network_file, str(sim_time)])
+
+    with h5py.File(log_file, 'r') as results:
+        file_data = results[str(model.probe_keys[B_p])][()]
+
+    with nengo_mpi.Simulator(m, assignments=assignments) as sim:
+        sim.run(sim_time)
+
+    assert np.allclose(file_data, sim.data[B_p], atol=0.0, rtol=0.0)
+
+
+def test_finalize_frees_signals(tmpdir):
+    model = MpiModel(1, {}, save_file=str(tmpdir.join("test_frees.net")))
+
+    x = Signal(np.zeros(3), name='x')
+    y = Signal(np.zeros(3), name='y')
+    model.assign_ops(0, [Reset(x), Copy(x, y)])
+
+    refs = [weakref.ref(x), weakref.ref(y)]
+    del x, y
+
+    # Signals held only by a component are freed once it is written.
+    model.finalize_build()
+    assert all(ref() is None for ref in refs)
+
+
+def test_deterministic_keys(tmpdir):
+    def make_network():
+        m = nengo.Network(seed=1)
+        with m:
+            A = nengo.Ensemble(40, dimensions=2)
+            B = nengo.Ensemble(40, dimensions=2)
+            nengo.Connection(A, B, synapse=0.05)
+            nengo.Probe(B)
+        return m
+
+    network_files = [
+        str(tmpdir.join("test_keys_%d.net" % i)) for i in range(2)]
+
+    for network_file in network_files:
+        nengo_mpi.Simulator(make_network(), save_file=network_file)
+
+    with h5py.File(network_files[0], 'r') as f0:
+        with h5py.File(network_files[1], 'r') as f1:
+            assert np.array_equal(
+                f0['0']['signal_keys'][()], f1['0']['signal_keys'][()])
+            assert np.array_equal(
+                f0['probe_info'][()], f1['probe_info'][()])
@@ -93,18 +93,19 @@ def test_basic_mpi(neuron_type, synapse):
     n_processors = 2
 
     try:
-        nengo_mpi.Simulator(
+        mpi_sim = nengo_mpi.Simulator(
             m, partitioner=nengo_mpi.Partitioner(n_processors),
             save_file=network_file)
+        probe_keys = mpi_sim.model.probe_keys
 
         results = run_standalone_mpi(
             network_file, log_file, n_processors, sim_time)
 
         assert np.allclose(
-            refimpl_sim.data[A_p], results[str(id(A_p))],
+            refimpl_sim.data[A_p], results[str(probe_keys[A_p])],
             atol=0.00001, rtol=0.00)
         assert np.allclose(
-            refimpl_sim.data[B_p], results[str(id(B_p))],
+            refimpl_sim.data[B_p], results[str(probe_keys[B_p])],
             atol=0.00001, rtol=0.00)
     finally:
         try:
@@ -204,8 +205,9 @@ def test_random_graph(partitioner, refimpl_results):
     log_file_1p = "test_nengo_mpi_1p.h5"
 
     try:
-        nengo_mpi.Simulator(
+        mpi_sim = nengo_mpi.Simulator(
             m, partitioner=partitioner, save_file=network_file)
+        probe_keys = mpi_sim.model.probe_keys
 
         results = run_standalone_mpi(
             network_file, log_file, n_processors, sim_time)
@@ -214,12 +216,12 @@ def test_random_graph(partitioner, refimpl_results):
 
         for p in m.probes:
             assert np.allclose(
-                refimpl_sim.data[p], results[str(id(p))],
+                refimpl_sim.data[p], results[str(probe_keys[p])],
                 atol=0.00001, rtol=0.00)
 
         for p in m.probes:
             assert np.allclose(
-                refimpl_sim.data[p], results_1p[str(id(p))],
+                refimpl_sim.data[p], results_1p[str(probe_keys[p])],
                 atol=0.00001, rtol=0.00)
     finally:
         try:
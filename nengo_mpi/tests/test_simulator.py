@@ -1,10 +1,20 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+import weakref
+
 import nengo_mpi
+from nengo_mpi.utils import KeyMaker
 
 import nengo
 from nengo.neurons import LIF, LIFRate, RectifiedLinear, Sigmoid
 from nengo.neurons import AdaptiveLIF, AdaptiveLIFRate  # , Izhikevich
 from nengo.tests.test_learning_rules import learning_net
 from nengo.learning_rules import Voja
+from nengo.builder import Signal
+from nengo.exceptions import BuildError
 
 import numpy as np
 import pytest
@@ -191,6 +201,169 @@ def test_context_manager():
     assert nengo_mpi.Simulator.all_closed()
 
 
+def test_build_cache(tmpdir, monkeypatch):
+    network = nengo.Network(seed=3)
+
+    with network:
+        node = nengo.Node(0.5)
+        ens = nengo.Ensemble(100, 1)
+
+        nengo.Connection(node, ens, synapse=0.01)
+        probe = nengo.Probe(ens, synapse=0.01)
+
+    cache_dir = str(tmpdir)
+
+    with nengo_mpi.Simulator(network, build_cache=cache_dir) as mpi_sim:
+        mpi_sim.run(0.1)
+        built_data = mpi_sim.data[probe]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Network was built despite being cached.")
+
+    monkeypatch.setattr(
+        nengo_mpi.simulator.MpiBuilder, 'build', staticmethod(fail))
+
+    with nengo_mpi.Simulator(network, build_cache=cache_dir) as mpi_sim:
+        mpi_sim.run(0.1)
+        cached_data = mpi_sim.data[probe]
+
+    assert np.allclose(built_data, cached_data, atol=0.0, rtol=0.0)
+
+
+def test_key_maker_release():
+    make_key = KeyMaker()
+
+    a = Signal(np.zeros(3), name='a')
+    b = Signal(np.zeros(3), name='b')
+    assert make_key(a) == 0
+    assert make_key(b) == 1
+
+    # Released objects keep their keys while they are alive.
+    ref = weakref.ref(a)
+    make_key.release(a)
+    assert make_key(a) == 0
+
+    del a
+    assert ref() is None
+    assert len(make_key) == 1
+
+    # Keys of freed objects are not handed out again.
+    assert make_key(Signal(np.zeros(3), name='c')) == 2
+    assert make_key(b) == 1
+
+
+def test_decoder_cache(tmpdir):
+    network = nengo.Network(seed=3)
+
+    with network:
+        stim = nengo.Node(lambda t: np.sin(10 * t))
+        A = nengo.Ensemble(60, dimensions=1)
+        B = nengo.Ensemble(60, dimensions=1)
+        nengo.Connection(stim, A, synapse=0.01)
+        nengo.Connection(A, B, function=np.square)
+        B_p = nengo.Probe(B, synapse=0.02)
+
+    cache_dir = str(tmpdir)
+
+    # A lock left behind by a build that was killed while holding it
+    lock = tmpdir.join('index.lock')
+    lock.write('')
+    old = time.time() - 2 * nengo_mpi.cache.stale_lock_age
+    os.utime(str(lock), (old, old))
+
+    data = []
+    for n_hits, n_misses in [(0, 2), (2, 0)]:
+        decoder_cache = nengo_mpi.cache.DecoderCache(cache_dir=cache_dir)
+        model = nengo.builder.Model(dt=0.001, decoder_cache=decoder_cache)
+
+        with nengo_mpi.Simulator(network, model=model) as sim:
+            sim.run(0.1)
+            data.append(sim.data[B_p])
+
+        # The connection from A to B, and the decoded probe
+        assert decoder_cache.n_hits == n_hits
+        assert decoder_cache.n_misses == n_misses
+
+    assert np.allclose(data[0], data[1], atol=0.0, rtol=0.0)
+
+
+def test_stale_locks(tmpdir):
+    host = socket.gethostname()
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+
+    def lock_exists(owner, age):
+        lock = tmpdir.join('index.lock')
+        lock.write(owner)
+        old = time.time() - age
+        os.utime(str(lock), (old, old))
+
+        nengo_mpi.cache._break_stale_locks(str(tmpdir), max_age=60.)
+        exists = lock.check()
+
+        if exists:
+            lock.remove()
+
+        assert not [f for f in tmpdir.listdir() if f.ext == '.broken']
+        return exists
+
+    # Locks held on this host are kept exactly as long as their owner runs
+    assert lock_exists("%s %d\n" % (host, os.getpid()), age=600.)
+    assert not lock_exists("%s %d\n" % (host, exited.pid), age=0.)
+
+    # Other locks are kept until they are older than max_age
+    assert lock_exists("otherhost 1\n", age=10.)
+    assert not lock_exists("otherhost 1\n", age=600.)
+    assert lock_exists("", age=10.)
+    assert not lock_exists("", age=600.)
+
+
+def test_solve_processes():
+    network = nengo.Network(seed=3)
+
+    with network:
+        stim = nengo.Node(lambda t: np.sin(10 * t))
+        A = nengo.Ensemble(60, dimensions=1)
+        B = nengo.Ensemble(60, dimensions=1)
+        C = nengo.Ensemble(60, dimensions=2)
+        nengo.Connection(stim, A, synapse=0.01)
+        nengo.Connection(A, B, function=np.square)
+        nengo.Connection(A, C[0])
+        nengo.Connection(B, C[1], solver=nengo.solvers.LstsqL2(weights=True))
+        C_p = nengo.Probe(C, synapse=0.02)
+
+    data = {}
+    for solve_processes in [1, 2]:
+        with nengo_mpi.Simulator(
+                network, solve_processes=solve_processes) as sim:
+            sim.run(0.2)
+            data[solve_processes] = sim.data[C_p]
+
+        if solve_processes > 1:
+            # Three connections and the decoded probe, all solved up front
+            assert sim.model.decoder_cache.n_solved == 4
+            assert sim.model.decoder_cache.n_served == 4
+
+    assert np.allclose(data[1], data[2], atol=0.0, rtol=0.0)
+
+
+def test_solve_processes_after_mpi_init(monkeypatch, tmpdir):
+    # Processes that have initialized MPI must not be forked.
+    monkeypatch.setattr(nengo_mpi.model, 'mpi_initialized', lambda: True)
+
+    network = nengo.Network(seed=3)
+
+    with network:
+        A = nengo.Ensemble(60, dimensions=1)
+        B = nengo.Ensemble(60, dimensions=1)
+        nengo.Connection(A, B, function=np.square)
+
+    with pytest.raises(BuildError):
+        nengo_mpi.Simulator(
+            network, save_file=str(tmpdir.join("solve.net")),
+            solve_processes=2)
+
+
 def test_seeding():
     network = nengo.Network()
 
@@ -244,6 +417,71 @@ def test_seeding():
             pass
 
 
+def test_reset_restores_signals():
+    network = nengo.Network(seed=3)
+
+    with network:
+        stim = nengo.Node(lambda t: np.sin(10 * t))
+        A = nengo.Ensemble(40, dimensions=1)
+        B = nengo.Ensemble(40, dimensions=1, neuron_type=AdaptiveLIF())
+        nengo.Connection(stim, A, synapse=0.01)
+        nengo.Connection(A, B, synapse=0.05)
+        B_p = nengo.Probe(B, synapse=0.02)
+        spikes_p = nengo.Probe(B.neurons)
+
+    assignments = {stim: 0, A: 0, B: 1}
+
+    with nengo_mpi.Simulator(network, assignments=assignments) as sim:
+        sim.run(0.2)
+        decoded = sim.data[B_p]
+        spikes = sim.data[spikes_p]
+
+        sim.reset()
+        sim.run(0.2)
+
+        # Voltages, adaptation, filter states and time are all restored
+        assert np.array_equal(decoded, sim.data[B_p])
+        assert np.array_equal(spikes, sim.data[spikes_p])
+
+
+def test_batch_matches_seeds():
+    network = nengo.Network(seed=3)
+
+    with network:
+        stim = nengo.Node(lambda t: np.sin(10 * t))
+        noise = nengo.Node(nengo.processes.WhiteNoise(), size_out=2)
+        A = nengo.Ensemble(40, dimensions=2)
+        B = nengo.Ensemble(40, dimensions=1, neuron_type=AdaptiveLIF())
+        nengo.Connection(stim, A[0], synapse=0.01)
+        nengo.Connection(noise, A, synapse=0.01)
+        nengo.Connection(A, B, function=lambda x: x[0] * x[1])
+        A_p = nengo.Probe(A, synapse=0.02)
+        B_p = nengo.Probe(B, synapse=0.02)
+
+    seed = 10
+    batch_size = 3
+
+    with nengo_mpi.Simulator(
+            network, seed=seed, batch_size=batch_size) as sim:
+        sim.run(0.2)
+        batch_A = sim.data[A_p]
+        batch_B = sim.data[B_p]
+
+    assert batch_A.shape == (200, 2, batch_size)
+    assert batch_B.shape == (200, 1, batch_size)
+    assert not np.allclose(batch_A[..., 0], batch_A[..., 1])
+
+    # Each simulation in the batch is the simulation for a single seed
+    for i in range(batch_size):
+        with nengo_mpi.Simulator(network, seed=seed + i) as sim:
+            sim.run(0.2)
+
+            assert np.allclose(
+                batch_A[..., i], sim.data[A_p], atol=0.00001, rtol=0.00)
+            assert np.allclose(
+                batch_B[..., i], sim.data[B_p], atol=0.00001, rtol=0.00)
+
+
 def test_spaun_stim():
     spaun_vision = pytest.importorskip("_spaun.vision.lif_vision")
     spaun_config = pytest.importorskip("_spaun.config")
@@ -1,5 +1,5 @@
-import numpy as np
-from collections import OrderedDict
+from collections import defaultdict, OrderedDict
+import weakref
 
 
 OP_DELIM = ";"
@@ -11,15 +11,172 @@ assert (
     and STAND_IN != OP_DELIM
     and STAND_IN != PROBE_DELIM)
 
+# Version of the layout of network files written by MpiModel.
+# Version 1 stored operators as delimited strings; version 2 stores
+# one table per operator type (see ``store_op_tables`` in model.py);
+# version 3 stores each distinct read-only signal once per file (see
+# ``MpiModel._pool_readonly_signals``).
+NETWORK_FORMAT_VERSION = 3
+
+# Number of integers used to encode a signal view in an operator table:
+#     key, ndim, shape0, shape1, stride0, stride1, offset
+SIGNAL_RECORD_SIZE = 7
+
+# Kinds of the arguments taken by each native operator, in order:
+#     'S': a view of a signal
+#     'f': a numerical parameter
+#     'A': an array with an explicit shape
+#     'V': a flat vector of values
+#     'Q': a sequence of indices
+#     'T': a list of strings
+OP_SIGNATURES = {
+    'TimeUpdate': 'SSf',
+    'Reset': 'Sf',
+    'Copy': 'SS',
+    'SlicedCopy': 'SSffffffQQf',
+    'DotInc': 'SSS',
+    'ElementwiseInc': 'SSS',
+    'LIF': 'fffffSSSS',
+    'LIFRate': 'fffSS',
+    'AdaptiveLIF': 'fffffffSSSSS',
+    'AdaptiveLIFRate': 'ffffffSSS',
+    'RectifiedLinear': 'fSS',
+    'Sigmoid': 'ffSS',
+    'Izhikevich': 'ffffffSSSS',
+    'NoDenSynapse': 'SSf',
+    'SimpleSynapse': 'SSff',
+    'Synapse': 'SSVV',
+    'TriangleSynapse': 'SSfff',
+    'WhiteNoise': 'Sfffff',
+    'WhiteSignal': 'ASSf',
+    'PresentInput': 'ASSff',
+    'Tabulated': 'ASS',
+    'Interpolate': 'ASSff',
+    'BCM': 'SSSSff',
+    'Oja': 'SSSSfff',
+    'Voja': 'SSSSSVff',
+    'MpiSend': 'ffS',
+    'MpiRecv': 'ffSf',
+    'SpaunStimulus': 'SSTfff',
+    'StreamInput': 'SSTf',
+}
+
+
+class _KeyRef(weakref.ref):
+    """ A weak reference to a keyed object, used once it is released. """
+    __slots__ = ('index', 'obj_id')
+
+    def __new__(cls, obj, callback, index):
+        ref = super(_KeyRef, cls).__new__(cls, obj, callback)
+        ref.index = index
+        ref.obj_id = id(obj)
+        return ref
+
+    def __init__(self, obj, callback, index):
+        super(_KeyRef, self).__init__(obj, callback)
+
+
+class KeyMaker(object):
+    """ Creates unique keys for objects.
+
+    Keys are consecutive integers, handed out in the order in which objects
+    are first seen. Building the same network twice therefore produces the
+    same keys, so network files built from the same network can be compared
+    and reused.
+
+    Objects are kept alive by the KeyMaker, so that their ids cannot be
+    reused by other objects while they have a key. Once an object is no
+    longer needed by its owner, ``release`` lets the KeyMaker hold it by a
+    weak reference instead. The object keeps its key for as long as it is
+    alive, and its key is forgotten once it has been freed.
+
+    Once ``set_scope`` has been called, keys are instead handed out from a
+    range reserved for the current scope. This is used by distributed
+    builds (see ``MpiModel.build_distributed``), in which each process sees
+    only some of the objects, so that the order in which objects are first
+    seen differs between processes.
 
-def make_key(obj):
-    """ Create a unique key for an object.
+    """
+    # Number of low bits of a key that index the objects within a scope.
+    SCOPE_BITS = 32
 
-    Must be reproducable (i.e. produce the same key if called with
-    the same object multiple times).
+    def __init__(self):
+        # id of object -> index of the object in _objects and _keys
+        self._indices = {}
 
-    """
-    return id(obj)
+        # The keyed objects, or a _KeyRef for objects that were released,
+        # or None for released objects that have been freed.
+        self._objects = []
+        self._keys = []
+
+        self._scope = None
+        self._n_scoped = defaultdict(int)
+
+        indices, objects, keys = self._indices, self._objects, self._keys
+
+        def forget(ref):
+            if indices.get(ref.obj_id) == ref.index:
+                del indices[ref.obj_id]
+
+            objects[ref.index] = None
+            keys[ref.index] = None
+
+        self._forget = forget
+
+    def __len__(self):
+        """ Return the number of objects that currently have a key. """
+        return len(self._indices)
+
+    def __call__(self, obj):
+        """ Return the key for an object, creating one if necessary. """
+        index = self._indices.get(id(obj))
+
+        if index is not None:
+            return self._keys[index]
+
+        index = len(self._objects)
+
+        if self._scope is None:
+            key = index
+        else:
+            key = (
+                ((self._scope + 1) << self.SCOPE_BITS) +
+                self._n_scoped[self._scope])
+            self._n_scoped[self._scope] += 1
+
+        self._indices[id(obj)] = index
+        self._objects.append(obj)
+        self._keys.append(key)
+
+        return key
+
+    def release(self, obj):
+        """ Stop keeping ``obj`` alive.
+
+        ``obj`` keeps its key until it is freed, after which its key is
+        forgotten. Objects that do not support weak references, and objects
+        that have no key, are left as they are.
+
+        """
+        index = self._indices.get(id(obj))
+
+        if index is None or self._objects[index] is not obj:
+            return
+
+        try:
+            self._objects[index] = _KeyRef(obj, self._forget, index)
+        except TypeError:
+            pass
+
+    def set_scope(self, scope):
+        """ Hand out keys from the range reserved for ``scope``.
+
+        ``scope`` is a non-negative integer. The keys handed out in a scope
+        depend only on the scope and on the order in which objects are first
+        seen within it.
+
+        """
+        self._scope = scope
 
 
 def sanitize_label(s):
@@ -36,9 +193,11 @@ def pad(x):
             (x[0], 1) if len(x) == 1 else x))
 
 
-def signal_to_string(signal, debug=False):
+def signal_to_string(signal, make_key, debug=False):
     """ Convert a signal to a string.
 
+    ``make_key`` is called on the base of the signal to obtain its key.
+
     The format of the returned string is:
         signal_key:label:ndim:shape0,shape1:stride0,stride1:offset
 
@@ -59,10 +218,21 @@ def signal_to_string(signal, debug=False):
     return signal_string
 
 
-def ndarray_to_string(a):
-    s = "%d,%d," % np.atleast_2d(a).shape
-    s += ",".join([str(n) for n in a.flatten()])
-    return s
+def signal_to_record(signal, make_key):
+    """ Convert a signal to a tuple of integers.
+
+    ``make_key`` is called on the base of the signal to obtain its key.
+
+    The format of the returned tuple is:
+        (signal_key, ndim, shape0, shape1, stride0, stride1, offset)
+
+    """
+    shape = pad(signal.shape)
+    stride = pad(signal.elemstrides)
+
+    return (
+        make_key(signal.base), signal.ndim, shape[0], shape[1],
+        stride[0], stride[1], signal.elemoffset)
 
 
 # Stole this from nengo_ocl
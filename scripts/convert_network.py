@@ -0,0 +1,182 @@
+""" Convert network files written by older versions of nengo_mpi.
+
+Network files with format version 1 store the operators for each component
+as a list of delimited strings. This script rewrites such files so that
+operators are stored as one table per operator type, which is the layout
+expected by the current version of the nengo_mpi and nengo_cpp executables.
+
+Network files with format versions 1 and 2 store the values of all signals
+in each component. In the converted file all signals are treated as mutable,
+so the pool of read-only signals is empty. Rebuilding the network instead
+stores read-only signals with identical values only once.
+
+Sharded network files cannot be converted; rebuild them instead.
+
+Usage:
+
+    python convert_network.py old.net new.net
+
+"""
+from __future__ import print_function
+import argparse
+import ast
+
+import h5py as h5
+import numpy as np
+
+from nengo_mpi.utils import (
+    OP_DELIM, SIGNAL_DELIM, NETWORK_FORMAT_VERSION, OP_SIGNATURES, pad)
+from nengo_mpi.model import store_op_tables
+
+
+def read_string_list(dset):
+    """ Read a list of strings stored by ``store_string_list``. """
+    big_string = dset[()].tobytes().decode('ascii')
+    return big_string.split('\0')[:dset.attrs['n_strings']]
+
+
+def parse_signal(signal_string):
+    """ Convert a signal string to a signal record.
+
+    MpiSend and MpiRecv operators stored only the key of the base signal, the
+    remaining fields of the record are not used in that case.
+
+    """
+    if SIGNAL_DELIM not in signal_string:
+        return (int(signal_string), 0, 0, 0, 0, 0, 0)
+
+    key, _, ndim, shape, stride, offset = signal_string.split(SIGNAL_DELIM)
+    shape = pad([int(s) for s in shape.strip('(,)').split(',')])
+    stride = pad([int(s) for s in stride.strip('(,)').split(',')])
+
+    return (
+        int(key), int(ndim), shape[0], shape[1],
+        stride[0], stride[1], int(offset))
+
+
+def parse_arg(kind, arg):
+    """ Parse an argument of an operator string, given its kind. """
+    if kind == 'S':
+        return parse_signal(arg)
+
+    elif kind == 'f':
+        return float(arg)
+
+    elif kind == 'A':
+        values = [float(v) for v in arg.split(',')]
+        shape = int(values[0]), int(values[1])
+        return np.array(values[2:]).reshape(shape)
+
+    elif kind == 'V':
+        return np.array([float(v) for v in arg.split(',') if v])
+
+    elif kind == 'Q':
+        return np.array(ast.literal_eval(arg), dtype='float64')
+
+    elif kind == 'T':
+        arg = arg.strip('[]').replace('"', '').replace("'", '')
+        return [s.strip() for s in arg.split(',')]
+
+    raise ValueError("Unrecognized argument kind: %s." % kind)
+
+
+def parse_op_string(op_string):
+    """ Convert an operator string to an operator record. """
+    tokens = op_string.split(OP_DELIM)
+    index, op_type, args = int(float(tokens[0])), tokens[1], tokens[2:]
+
+    signature = OP_SIGNATURES[op_type]
+    if len(args) != len(signature):
+        raise ValueError(
+            "Operator of type %s expects %d arguments, received %d. "
+            "Operator string was: %s." % (
+                op_type, len(signature), len(args), op_string))
+
+    return (
+        op_type, index,
+        [parse_arg(kind, arg) for kind, arg in zip(signature, args)])
+
+
+def convert_network(infile, outfile, compression='gzip'):
+    """ Convert a network file to the current format version.
+
+    Parameters
+    ----------
+    infile: string
+        Name of network file to convert.
+    outfile: string
+        Name of file to store the converted network in.
+    compression: string
+        Compression to use for the operator tables.
+
+    """
+    with h5.File(infile, 'r') as src:
+        version = src.attrs.get('format_version', 1)
+
+        if version == NETWORK_FORMAT_VERSION:
+            raise ValueError(
+                "%s already has format version %d." % (infile, version))
+
+        if version > NETWORK_FORMAT_VERSION:
+            raise ValueError(
+                "%s has format version %d, which is newer than the "
+                "current version (%d)." % (
+                    infile, version, NETWORK_FORMAT_VERSION))
+
+        if 'shards' in src:
+            raise ValueError(
+                "%s is a sharded network, which cannot be converted. "
+                "Rebuild the network instead." % infile)
+
+        with h5.File(outfile, 'w') as dst:
+            for name, value in src.attrs.items():
+                dst.attrs[name] = value
+
+            dst.attrs['format_version'] = NETWORK_FORMAT_VERSION
+
+            for component in range(src.attrs['n_components']):
+                group = src[str(component)]
+                new_group = dst.create_group(str(component))
+
+                for name in group:
+                    if version > 1 or name != 'operators':
+                        group.copy(name, new_group)
+
+                if version == 1:
+                    op_records = [
+                        parse_op_string(s)
+                        for s in read_string_list(group['operators'])]
+
+                    store_op_tables(
+                        new_group, op_records, compression=compression)
+
+                # All signals are stored one after the other in 'signals'.
+                sizes = np.prod(group['signal_shapes'][()], axis=1)
+                offsets = np.cumsum(sizes) - sizes
+
+                new_group.create_dataset(
+                    'signal_offsets', data=offsets.astype('int64'),
+                    compression=compression)
+                new_group.create_dataset(
+                    'signal_readonly',
+                    data=np.zeros(len(sizes), dtype='uint8'),
+                    compression=compression)
+
+            dst.create_dataset(
+                'readonly_signals', data=np.zeros(0, dtype='float64'))
+
+            src.copy('probe_info', dst)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert a network file to the current format version.")
+
+    parser.add_argument('infile', type=str, help="Network file to convert.")
+    parser.add_argument(
+        'outfile', type=str, help="Name of file to store result in.")
+
+    args = parser.parse_args()
+
+    convert_network(args.infile, args.outfile)
+    print("Converted %s, stored result in %s." % (args.infile, args.outfile))